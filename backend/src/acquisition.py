@@ -0,0 +1,145 @@
+"""
+acquisition.py
+
+Background frame acquisition for IR Thermal Monitoring System.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Optional
+
+from .thermal_frame import ThermalFrame, to_thermal_frame
+
+FrameConsumer = Callable[[ThermalFrame], None]
+
+
+class AcquisitionService:
+    """
+    Owns the thermal sensor and captures frames on a single long-lived thread.
+    HTTP handlers read the latest published frame instead of touching the I2C bus.
+    """
+    def __init__(self, sensor: Any, interval: float = 0.5, rate_window: int = 32) -> None:
+        """
+        Args:
+            sensor: Object exposing read_frame() (ThermalSensor or MockThermalSensor).
+            interval: Target seconds between captures.
+            rate_window: Number of recent captures used to estimate the achieved rate.
+
+        Raises:
+            ValueError: If interval or rate_window is not positive.
+        """
+        if interval <= 0:
+            raise ValueError("Capture interval must be positive.")
+        if rate_window < 2:
+            raise ValueError("rate_window must be at least 2.")
+        self.sensor = sensor
+        self.interval = interval
+        self.frames_captured = 0
+        self.read_errors = 0
+        self.last_error: Optional[str] = None
+        self._latest: Optional[ThermalFrame] = None
+        self._capture_times: deque[float] = deque(maxlen=rate_window)
+        self._consumers: list[FrameConsumer] = []
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def add_consumer(self, consumer: FrameConsumer) -> None:
+        """Register a callable invoked with each new ThermalFrame on the capture thread."""
+        with self._lock:
+            self._consumers.append(consumer)
+
+    def start(self) -> None:
+        """Start the capture thread (no-op if already running)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="thermal-acquisition", daemon=True)
+        self._thread.start()
+        logging.info("Acquisition started at %.2f Hz target.", 1.0 / self.interval)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Signal the capture thread to stop and wait up to timeout seconds for it to exit."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logging.warning("Acquisition thread did not stop within %.1f s.", timeout)
+            self._thread = None
+        logging.info("Acquisition stopped after %d frames.", self.frames_captured)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def capture_once(self) -> bool:
+        """
+        Read one frame from the sensor, publish it and hand it to consumers.
+
+        Returns:
+            bool: True if a frame was captured, False if the sensor read failed.
+        """
+        try:
+            # Sensors that still return plain lists are wrapped with the read time.
+            frame = to_thermal_frame(self.sensor.read_frame(), time.time())
+        except Exception as e:
+            self.read_errors += 1
+            self.last_error = str(e)
+            logging.error("Sensor read failed in acquisition loop: %s", e)
+            return False
+        with self._lock:
+            self._latest = frame
+            self._capture_times.append(time.monotonic())
+            self.frames_captured += 1
+            consumers = list(self._consumers)
+        for consumer in consumers:
+            try:
+                consumer(frame)
+            except Exception as e:
+                logging.error("Frame consumer %r failed: %s", consumer, e, exc_info=True)
+        return True
+
+    def latest(self) -> Optional[ThermalFrame]:
+        """Return the most recent frame, or None before the first capture."""
+        with self._lock:
+            return self._latest
+
+    def frame_age(self) -> Optional[float]:
+        """Seconds elapsed since the latest frame was captured, or None if no frame yet."""
+        latest = self.latest()
+        if latest is None:
+            return None
+        return max(0.0, time.time() - latest.timestamp)
+
+    def capture_rate(self) -> float:
+        """Achieved capture rate in Hz over the recent rate window."""
+        with self._lock:
+            times = list(self._capture_times)
+        if len(times) < 2 or times[-1] <= times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def stats(self) -> dict[str, Any]:
+        """Return acquisition health figures for monitoring endpoints."""
+        return {
+            "running": self.running,
+            "frames_captured": self.frames_captured,
+            "read_errors": self.read_errors,
+            "last_error": self.last_error,
+            "frame_age_seconds": self.frame_age(),
+            "capture_rate_hz": self.capture_rate(),
+            "target_rate_hz": 1.0 / self.interval,
+        }
+
+    def _run(self) -> None:
+        next_deadline = time.monotonic()
+        while not self._stop_event.is_set():
+            self.capture_once()
+            next_deadline += self.interval
+            delay = next_deadline - time.monotonic()
+            if delay < 0:
+                # Fell behind (slow read); resynchronise instead of bursting to catch up.
+                next_deadline = time.monotonic()
+                delay = 0.0
+            self._stop_event.wait(delay)
@@ -4,141 +4,483 @@ alarms.py
 Alarm management for IR Thermal Monitoring System.
 """
 import logging
-from typing import List, Dict, Optional
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, List, Dict, Optional
 import sqlite3
+import numpy as np
 from .database import Database
-import smtplib
-from email.message import EmailMessage
-import json
-import os
+from .writer import BatchWriter
+from .notifications import EmailChannel, NotificationDispatcher
+from .webhooks import WebhookDispatcher, WebhookEndpoint
+
+if TYPE_CHECKING:
+    from .zones import ZoneStats
+
+MAX_EVENTS_IN_MEMORY = 1000
+
+ALARM_ARMED, ALARM_TRIGGERED, ALARM_COOLDOWN, ALARM_ACKNOWLEDGED = 0, 1, 2, 3
+ALARM_STATE_NAMES = ("armed", "triggered", "cooldown", "acknowledged")
 
 class AlarmEvent:
     """
     Represents an alarm event (zone, temperature, timestamp, type).
     """
-    def __init__(self, alarm_id: int, zone_id: int, temperature: float, timestamp: str, event_type: str, acknowledged: bool = False, acknowledged_at: Optional[str] = None) -> None:
-        self.alarm_id: int = alarm_id
+    def __init__(self, alarm_id: Optional[int], zone_id: int, temperature: float, timestamp: str, event_type: str, acknowledged: bool = False, acknowledged_at: Optional[str] = None, event_id: Optional[int] = None) -> None:
+        self.event_id: Optional[int] = event_id  # alarm_events row id, assigned by AlarmManager.log_event
+        self.alarm_id: Optional[int] = alarm_id  # None for events not raised by a configured alarm (e.g. anomalies)
         self.zone_id: int = zone_id
-        self.temperature: float = temperature
+        self.temperature: float = float(temperature)
         self.timestamp: str = timestamp
         self.event_type: str = event_type
         self.acknowledged: bool = acknowledged
         self.acknowledged_at: Optional[str] = acknowledged_at
 
+class AlarmTable:
+    """
+    Enabled alarms compiled into NumPy arrays sorted by zone_id, so all alarms can be
+    evaluated against a frame's per-zone temperatures in one vectorised call.
+    Configuration arrays are fixed; AlarmManager swaps in a new table on alarm CRUD.
+    The per-alarm state arrays are advanced by step() under AlarmManager's lock.
+    """
+    def __init__(self, alarms: Dict[int, Dict]) -> None:
+        rows = sorted(
+            (cfg["zone_id"], alarm_id, cfg)
+            for alarm_id, cfg in alarms.items()
+            if cfg["enabled"] and cfg["zone_id"] is not None and cfg["threshold"] is not None
+        )
+        self.zone_ids = np.array([r[0] for r in rows], dtype=np.int64)
+        self.alarm_ids = np.array([r[1] for r in rows], dtype=np.int64)
+        self.thresholds = np.array([r[2]["threshold"] for r in rows], dtype=np.float64)
+        self.hysteresis = np.array([r[2].get("hysteresis") or 0.0 for r in rows], dtype=np.float64)
+        self.cooldown = np.array([r[2].get("cooldown_period") or 0 for r in rows], dtype=np.float64)
+        self.state = np.array([_state_code(r[2].get("state")) for r in rows], dtype=np.int8)
+        self.last_triggered = np.array([_to_epoch(r[2].get("last_triggered")) for r in rows], dtype=np.float64)
+        self.rows = {int(alarm_id): i for i, alarm_id in enumerate(self.alarm_ids)}
+        self._mapped_zone_ids: Optional[np.ndarray] = None
+        self._positions = np.empty(0, dtype=np.int64)
+        self._found = np.empty(0, dtype=bool)
+
+    def _map_zones(self, zone_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Map each alarm to its zone's position in zone_ids. The mapping is cached while the
+        same array object is passed, e.g. ZoneStats.zone_ids between zone changes.
+        """
+        if self._mapped_zone_ids is not zone_ids:
+            if len(zone_ids) == 0:
+                self._positions = np.zeros(len(self.alarm_ids), dtype=np.int64)
+                self._found = np.zeros(len(self.alarm_ids), dtype=bool)
+            else:
+                order = np.argsort(zone_ids, kind="stable")
+                sorted_ids = zone_ids[order]
+                pos = np.minimum(np.searchsorted(sorted_ids, self.zone_ids), len(sorted_ids) - 1)
+                self._found = sorted_ids[pos] == self.zone_ids
+                self._positions = order[pos]
+            self._mapped_zone_ids = zone_ids
+        return self._positions, self._found
+
+    def evaluate(self, zone_ids: np.ndarray, temperatures: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Compare every alarm with its zone's temperature, ignoring alarm state.
+
+        Returns:
+            Tuple of (indices of alarms at or above threshold, per-alarm temperatures).
+            Alarms whose zone is absent from zone_ids report -inf and never fire.
+        """
+        zone_ids = np.asarray(zone_ids)
+        if len(self.alarm_ids) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        positions, found = self._map_zones(zone_ids)
+        temps = np.full(len(self.alarm_ids), -np.inf)
+        if len(zone_ids):
+            temps = np.where(found, np.asarray(temperatures, dtype=np.float64)[positions], -np.inf)
+        return np.flatnonzero(temps >= self.thresholds), temps
+
+    def step(self, zone_ids: np.ndarray, temperatures: np.ndarray, now: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Advance every alarm's state machine by one frame.
+
+        armed -> triggered when temperature >= threshold (an event fires).
+        triggered/acknowledged -> cooldown (or armed once cooldown has passed) when temperature
+        drops below threshold - hysteresis. cooldown -> armed cooldown_period seconds after the
+        last trigger. Alarms whose zone is absent from zone_ids only advance their cooldown.
+
+        Returns:
+            Tuple of (indices that fired, indices whose state changed, per-alarm temperatures).
+        """
+        if len(self.alarm_ids) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0, dtype=np.float64)
+        _, temps = self.evaluate(zone_ids, temperatures)
+        found = self._found
+        state = self.state
+        previous = state.copy()
+        in_cooldown = now < self.last_triggered + self.cooldown  # False while never triggered (NaN)
+        clearing = found & ((state == ALARM_TRIGGERED) | (state == ALARM_ACKNOWLEDGED)) & (temps < self.thresholds - self.hysteresis)
+        state[clearing] = np.where(in_cooldown[clearing], ALARM_COOLDOWN, ALARM_ARMED)
+        state[(state == ALARM_COOLDOWN) & ~in_cooldown] = ALARM_ARMED
+        fire = found & (state == ALARM_ARMED) & (temps >= self.thresholds)
+        state[fire] = ALARM_TRIGGERED
+        self.last_triggered[fire] = now
+        return np.flatnonzero(fire), np.flatnonzero(state != previous), temps
+
+    def __len__(self) -> int:
+        return len(self.alarm_ids)
+
 class AlarmManager:
     """
     Manages alarm configurations, checks, and event logging, now persistent.
+    Alarms are held in memory and compiled into an AlarmTable that is rebuilt only on alarm CRUD.
+    Per-alarm state (armed / triggered / cooldown / acknowledged) is evaluated in memory; state
+    changes and events are written behind by a BatchWriter once start_persistence() is called.
     """
     def __init__(self, db: Database) -> None:
         self.db = db
         self.alarms: Dict[int, Dict] = {}
-        self.events: List[AlarmEvent] = []
+        self.events: deque[AlarmEvent] = deque(maxlen=MAX_EVENTS_IN_MEMORY)
+        self.table = AlarmTable({})
+        self.state_writer: Optional[BatchWriter] = None
+        self.dispatcher: Optional[NotificationDispatcher] = None
+        self.webhooks: Optional[WebhookDispatcher] = None
+        # notify() delivers through these, created on first use, while no dispatcher has been started
+        self._inline_dispatcher: Optional[NotificationDispatcher] = None
+        self._inline_webhooks: Optional[WebhookDispatcher] = None
+        self._email_channels: Optional[List[EmailChannel]] = None
+        self._webhook_endpoints: Optional[List[WebhookEndpoint]] = None
+        self._next_event_id = 1
+        self._lock = threading.RLock()
         self.load_alarms_from_db()
 
+    def start_persistence(self, flush_interval: float = 1.0) -> BatchWriter:
+        """Start write-behind persistence of alarm state changes and events."""
+        if self.state_writer is None:
+            self.state_writer = BatchWriter(self.db, _write_alarm_batch, name="alarm-state-writer", flush_interval=flush_interval)
+        self.state_writer.start()
+        return self.state_writer
+
+    def stop_persistence(self, timeout: float = 10.0) -> None:
+        """Flush pending alarm writes and stop the writer."""
+        if self.state_writer is not None:
+            self.state_writer.stop(timeout)
+
+    def flush_persistence(self, timeout: float = 10.0) -> bool:
+        """Wait until queued alarm writes are committed (True if none are pending)."""
+        if self.state_writer is None:
+            return True
+        return self.state_writer.flush(timeout)
+
+    def _persist(self, item: tuple) -> None:
+        writer = self.state_writer
+        if writer is not None and writer.running:
+            writer.submit(item)
+        else:
+            with self.db.transaction():
+                _write_alarm_batch(self.db, [item])
+
+    def _persist_state(self, alarm_id: int, cfg: Dict) -> None:
+        self._persist(("state", alarm_id, cfg["state"], cfg["last_triggered"], int(cfg["acknowledged"]), cfg["acknowledged_at"]))
+
     def load_alarms_from_db(self) -> None:
-        self.alarms.clear()
-        cur = self.db.execute_query("SELECT id, zone_id, threshold, enabled, cooldown_period, last_triggered, acknowledged, acknowledged_at FROM alarms")
+        cur = self.db.execute_query("SELECT id, zone_id, threshold, enabled, cooldown_period, last_triggered, acknowledged, acknowledged_at, state, hysteresis FROM alarms")
+        alarms: Dict[int, Dict] = {}
         for row in cur.fetchall():
-            alarm_id, zone_id, threshold, enabled, cooldown, last_triggered, acknowledged, acknowledged_at = row
-            self.alarms[alarm_id] = {
+            alarm_id, zone_id, threshold, enabled, cooldown, last_triggered, acknowledged, acknowledged_at, state, hysteresis = row
+            alarms[alarm_id] = {
                 "zone_id": zone_id,
                 "threshold": threshold,
                 "enabled": bool(enabled),
                 "cooldown_period": cooldown,
                 "last_triggered": last_triggered,
                 "acknowledged": bool(acknowledged),
-                "acknowledged_at": acknowledged_at
+                "acknowledged_at": acknowledged_at,
+                "state": state if state in ALARM_STATE_NAMES else "armed",
+                "hysteresis": hysteresis or 0.0,
             }
+        # sqlite_sequence remembers ids of events already removed by retention, so they are never reused
+        next_event_id = self.db.execute_query(
+            "SELECT MAX(COALESCE((SELECT MAX(id) FROM alarm_events), 0), "
+            "COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'alarm_events'), 0)) + 1"
+        ).fetchone()[0]
+        with self._lock:
+            self.alarms = alarms
+            self.table = AlarmTable(alarms)
+            self._next_event_id = next_event_id
 
-    def add_alarm(self, alarm_id: int, zone_id: int, threshold: float, enabled: bool = True, cooldown_period: int = 600) -> None:
-        self.db.execute_query(
-            "INSERT OR REPLACE INTO alarms (id, zone_id, threshold, enabled, cooldown_period) VALUES (?, ?, ?, ?, ?)",
-            (alarm_id, zone_id, threshold, int(enabled), cooldown_period)
-        )
-        self.alarms[alarm_id] = {
-            "zone_id": zone_id,
-            "threshold": threshold,
-            "enabled": enabled,
-            "cooldown_period": cooldown_period,
-            "last_triggered": None,
-            "acknowledged": False,
-            "acknowledged_at": None
-        }
+    def add_alarm(self, alarm_id: int, zone_id: int, threshold: float, enabled: bool = True, cooldown_period: int = 600, hysteresis: float = 0.0) -> None:
+        with self._lock:
+            with self.db.transaction():
+                self.db.execute_query(
+                    "INSERT OR REPLACE INTO alarms (id, zone_id, threshold, enabled, cooldown_period, hysteresis, state) VALUES (?, ?, ?, ?, ?, ?, 'armed')",
+                    (alarm_id, zone_id, threshold, int(enabled), cooldown_period, hysteresis)
+                )
+            self.alarms[alarm_id] = {
+                "zone_id": zone_id,
+                "threshold": threshold,
+                "enabled": enabled,
+                "cooldown_period": cooldown_period,
+                "last_triggered": None,
+                "acknowledged": False,
+                "acknowledged_at": None,
+                "state": "armed",
+                "hysteresis": hysteresis,
+            }
+            self.table = AlarmTable(self.alarms)
         logging.info(f"Alarm {alarm_id} added for zone {zone_id}.")
 
     def remove_alarm(self, alarm_id: int) -> None:
-        if alarm_id in self.alarms:
-            self.db.execute_query("DELETE FROM alarms WHERE id = ?", (alarm_id,))
-            del self.alarms[alarm_id]
-            logging.info(f"Alarm {alarm_id} removed.")
-        else:
-            logging.warning(f"Attempted to remove non-existent alarm {alarm_id}.")
+        with self._lock:
+            if alarm_id in self.alarms:
+                with self.db.transaction():
+                    self.db.execute_query("DELETE FROM alarms WHERE id = ?", (alarm_id,))
+                del self.alarms[alarm_id]
+                self.table = AlarmTable(self.alarms)
+                logging.info(f"Alarm {alarm_id} removed.")
+            else:
+                logging.warning(f"Attempted to remove non-existent alarm {alarm_id}.")
 
     def check_thresholds(self, zone_id: int, temperature: float, timestamp: str) -> Optional[AlarmEvent]:
-        self.load_alarms_from_db()
-        for alarm_id, cfg in self.alarms.items():
-            if cfg["zone_id"] == zone_id and cfg["enabled"] and temperature >= cfg["threshold"]:
-                # Check cooldown and acknowledge logic here as needed
-                event = AlarmEvent(alarm_id, zone_id, temperature, timestamp, "threshold", cfg.get("acknowledged", False), cfg.get("acknowledged_at"))
+        """Check one zone temperature; returns the first fired alarm's event (see evaluate for all)."""
+        events = self.evaluate(np.array([zone_id], dtype=np.int64), np.array([temperature], dtype=np.float64), timestamp)
+        return events[0] if events else None
+
+    def evaluate(self, zone_ids: np.ndarray, temperatures: np.ndarray, timestamp: str, now: Optional[float] = None) -> List[AlarmEvent]:
+        """
+        Advance all enabled alarms against per-zone temperatures for one frame.
+
+        Args:
+            zone_ids: Zone IDs, parallel to temperatures (e.g. ZoneStats.zone_ids).
+            temperatures: Temperature per zone.
+            timestamp: Frame timestamp recorded on the events.
+            now: Frame time in epoch seconds for cooldown tracking (defaults to now).
+
+        Returns:
+            List[AlarmEvent]: One event per alarm that went from armed to triggered.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            table = self.table
+            fired, changed, temps = table.step(zone_ids, temperatures, now)
+            for i in changed:
+                alarm_id = int(table.alarm_ids[i])
+                cfg = self.alarms[alarm_id]
+                cfg["state"] = ALARM_STATE_NAMES[table.state[i]]
+                if table.state[i] == ALARM_TRIGGERED:
+                    cfg["last_triggered"] = timestamp
+                    cfg["acknowledged"] = False
+                    cfg["acknowledged_at"] = None
+                self._persist_state(alarm_id, cfg)
+            events = []
+            for i in fired:
+                alarm_id = int(table.alarm_ids[i])
+                event = AlarmEvent(alarm_id, int(table.zone_ids[i]), float(temps[i]), timestamp, "threshold")
                 self.log_event(event)
-                return event
-        return None
+                events.append(event)
+        self._dispatch(events)
+        return events
+
+    def emit_events(self, events: List[AlarmEvent]) -> None:
+        """Log events raised outside the alarm table (e.g. by the anomaly detector) and queue their notifications."""
+        for event in events:
+            self.log_event(event)
+        self._dispatch(events)
+
+    def _dispatch(self, events: List[AlarmEvent]) -> None:
+        for dispatcher in (self.dispatcher, self.webhooks):
+            if dispatcher is not None and dispatcher.running:
+                for event in events:
+                    dispatcher.submit(event)
+
+    def check_zone_stats(self, stats: "ZoneStats", timestamp: str, statistic: str = "average", now: Optional[float] = None) -> List[AlarmEvent]:
+        """Evaluate all alarms against one frame's ZoneStats using the given statistic ('average' or 'maximum')."""
+        if statistic not in ("average", "maximum"):
+            raise ValueError(f"Unsupported alarm statistic: {statistic}")
+        return self.evaluate(stats.zone_ids, getattr(stats, statistic), timestamp, now)
 
     def log_event(self, event: AlarmEvent) -> None:
+        with self._lock:
+            if event.event_id is None:
+                # Row ids are allocated here so clips and notifications can reference the
+                # event before the write-behind insert is committed.
+                event.event_id = self._next_event_id
+                self._next_event_id += 1
+            else:
+                self._next_event_id = max(self._next_event_id, event.event_id + 1)
         self.events.append(event)
+        self._persist(("event", event.event_id, event.zone_id, event.timestamp, event.temperature, event.alarm_id, event.event_type))
         logging.info(f"Alarm event logged: {event.__dict__}")
 
     def acknowledge_alarm(self, alarm_id: int) -> None:
-        self.db.execute_query("UPDATE alarms SET acknowledged = 1, acknowledged_at = CURRENT_TIMESTAMP WHERE id = ?", (alarm_id,))
-        self.load_alarms_from_db()
+        with self._lock:
+            cfg = self.alarms.get(alarm_id)
+            if cfg is None:
+                # Not loaded in memory; fall back to a direct update
+                with self.db.transaction():
+                    self.db.execute_query("UPDATE alarms SET acknowledged = 1, acknowledged_at = CURRENT_TIMESTAMP WHERE id = ?", (alarm_id,))
+                logging.warning(f"Acknowledged alarm {alarm_id} that is not loaded in memory.")
+                return
+            cfg["acknowledged"] = True
+            cfg["acknowledged_at"] = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+            row = self.table.rows.get(alarm_id)
+            if row is not None and self.table.state[row] == ALARM_TRIGGERED:
+                self.table.state[row] = ALARM_ACKNOWLEDGED
+                cfg["state"] = "acknowledged"
+            self._persist_state(alarm_id, cfg)
+        self.flush_persistence()
         logging.info(f"Alarm {alarm_id} acknowledged.")
 
+    def email_channels(self) -> List[EmailChannel]:
+        """Enabled email channels, parsed once and cached until notifications change."""
+        channels = self._email_channels
+        if channels is None:
+            channels = [
+                channel for channel in map(EmailChannel.from_notification, self._enabled_notifications("email"))
+                if channel is not None
+            ]
+            self._email_channels = channels
+        return channels
+
+    def webhook_endpoints(self) -> List[WebhookEndpoint]:
+        """Enabled webhook endpoints, parsed once and cached until notifications change."""
+        endpoints = self._webhook_endpoints
+        if endpoints is None:
+            endpoints = [
+                endpoint for endpoint in map(WebhookEndpoint.from_notification, self._enabled_notifications("webhook"))
+                if endpoint is not None
+            ]
+            self._webhook_endpoints = endpoints
+        return endpoints
+
+    def _enabled_notifications(self, type_: str) -> list[dict]:
+        return [n for n in self.get_notifications() if n["type"] == type_ and n["enabled"]]
+
+    def _notifications_changed(self) -> None:
+        self._email_channels = None
+        self._webhook_endpoints = None
+
+    def start_notifications(self, **options: Any) -> NotificationDispatcher:
+        """Deliver email notifications asynchronously; fired alarm events are queued for delivery."""
+        if self.dispatcher is None:
+            self.dispatcher = NotificationDispatcher(self.email_channels, **options)
+        self.dispatcher.start()
+        return self.dispatcher
+
+    def stop_notifications(self, timeout: float = 10.0) -> None:
+        for dispatcher in (self.dispatcher, self._inline_dispatcher):
+            if dispatcher is not None:
+                dispatcher.stop(timeout)
+
+    def start_webhooks(self, **options: Any) -> WebhookDispatcher:
+        """Deliver webhook notifications asynchronously; fired alarm events are queued for delivery."""
+        if self.webhooks is None:
+            self.webhooks = WebhookDispatcher(self.webhook_endpoints, self.db, **options)
+        self.webhooks.start()
+        return self.webhooks
+
+    def stop_webhooks(self, timeout: float = 10.0) -> None:
+        for webhooks in (self.webhooks, self._inline_webhooks):
+            if webhooks is not None:
+                webhooks.stop(timeout)
+
     def notify(self, event: AlarmEvent, email: Optional[str] = None, webhook: Optional[str] = None) -> None:
-        # Real email notification logic
-        notifications = self.get_notifications()
-        email_notifs = [n for n in notifications if n["type"] == "email" and n["enabled"]]
-        for notif in email_notifs:
-            try:
-                config = json.loads(notif["config"])
-                to_addr = config.get("to") or email
-                if not to_addr:
-                    logging.warning(f"No recipient for email notification: {notif}")
-                    continue
-                subject = config.get("subject", f"IR Alarm Event: Zone {event.zone_id}")
-                body = config.get("body", f"Alarm triggered in zone {event.zone_id} at {event.timestamp}. Temperature: {event.temperature}°C.")
-                # SMTP config from env or settings
-                smtp_host = os.getenv("SMTP_HOST") or config.get("smtp_host")
-                smtp_port = int(os.getenv("SMTP_PORT") or config.get("smtp_port", 587))
-                smtp_user = os.getenv("SMTP_USER") or config.get("smtp_user")
-                smtp_pass = os.getenv("SMTP_PASS") or config.get("smtp_pass")
-                from_addr = os.getenv("SMTP_FROM") or config.get("from") or smtp_user
-                if not all([smtp_host, smtp_port, smtp_user, smtp_pass, from_addr]):
-                    logging.error("Missing SMTP configuration for email notification.")
-                    continue
-                msg = EmailMessage()
-                msg["Subject"] = subject
-                msg["From"] = from_addr
-                msg["To"] = to_addr
-                msg.set_content(body)
-                with smtplib.SMTP(smtp_host, smtp_port) as server:
-                    server.starttls()
-                    server.login(smtp_user, smtp_pass)
-                    server.send_message(msg)
-                logging.info(f"Email notification sent to {to_addr} for event: {event.__dict__}")
-            except Exception as e:
-                logging.error(f"Failed to send email notification: {e}")
-        # Webhook placeholder
-        if webhook:
-            logging.info(f"Sending webhook notification for event: {event.__dict__}")
+        """
+        Send email and webhook notifications for event. Each kind is queued when its
+        dispatcher is running, otherwise delivered on the caller's thread without retries
+        through one dispatcher kept per manager, so its pooled connections are reused and
+        closed by stop_notifications() / stop_webhooks().
+
+        Args:
+            email: Recipient for email channels without a configured "to" address.
+            webhook: Extra webhook URL to POST to besides the configured endpoints.
+        """
+        dispatcher = self.dispatcher
+        if dispatcher is not None and dispatcher.running:
+            dispatcher.submit(event, email)
+        else:
+            (dispatcher or self._inline_notifications()).deliver([(event, email, time.monotonic())])
+        webhooks = self.webhooks
+        if webhooks is not None and webhooks.running:
+            webhooks.submit(event, webhook)
+        else:
+            (webhooks or self._inline_webhook_dispatcher()).deliver([(event, webhook, time.monotonic())])
+
+    def _inline_notifications(self) -> NotificationDispatcher:
+        with self._lock:
+            if self._inline_dispatcher is None:
+                self._inline_dispatcher = NotificationDispatcher(self.email_channels, max_retries=0)
+            return self._inline_dispatcher
+
+    def _inline_webhook_dispatcher(self) -> WebhookDispatcher:
+        with self._lock:
+            if self._inline_webhooks is None:
+                self._inline_webhooks = WebhookDispatcher(self.webhook_endpoints, self.db, max_retries=0)
+            return self._inline_webhooks
 
     def add_notification(self, name: str, type_: str, config: str, enabled: bool = True) -> int:
-        return self.db.add_notification(name, type_, config, enabled)
+        notification_id = self.db.add_notification(name, type_, config, enabled)
+        self._notifications_changed()
+        return notification_id
 
     def get_notifications(self) -> list[dict]:
         return self.db.get_notifications()
 
     def update_notification(self, notification_id: int, name: str, type_: str, config: str, enabled: bool) -> None:
         self.db.update_notification(notification_id, name, type_, config, enabled)
+        self._notifications_changed()
 
     def delete_notification(self, notification_id: int) -> None:
         self.db.delete_notification(notification_id)
+        self._notifications_changed()
+
+
+def _state_code(name: Optional[str]) -> int:
+    return ALARM_STATE_NAMES.index(name) if name in ALARM_STATE_NAMES else ALARM_ARMED
+
+def _to_epoch(timestamp: Optional[str]) -> float:
+    """Parse a stored DATETIME/ISO string (naive means UTC) to epoch seconds; NaN if absent or invalid."""
+    if not timestamp:
+        return float("nan")
+    try:
+        parsed = datetime.fromisoformat(str(timestamp).replace("Z", "+00:00"))
+    except ValueError:
+        return float("nan")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def _write_alarm_batch(db: Database, items: list[tuple]) -> None:
+    """Write queued alarm items; state updates are coalesced to the latest per alarm."""
+    states: Dict[int, tuple] = {}
+    events: list[tuple] = []
+    for item in items:
+        if item[0] == "state":
+            _, alarm_id, state, last_triggered, acknowledged, acknowledged_at = item
+            states[alarm_id] = (state, last_triggered, acknowledged, acknowledged_at, alarm_id)
+        elif item[0] == "event":
+            events.append(item[1:])
+    if states:
+        db.executemany(
+            "UPDATE alarms SET state = ?, last_triggered = ?, acknowledged = ?, acknowledged_at = ? WHERE id = ?",
+            list(states.values()),
+        )
+    if events:
+        db.executemany(
+            "INSERT INTO alarm_events (id, zone_id, timestamp, temperature, alarm_id, event_type) VALUES (?, ?, ?, ?, ?, ?)",
+            events,
+        )
+
+
+_registry: Optional[AlarmManager] = None
+_registry_lock = threading.Lock()
+
+def get_alarm_registry(db: Database) -> AlarmManager:
+    """
+    Return the process-wide AlarmManager for db, loading alarms from SQLite only on first use.
+    A different Database instance (e.g. a test database) gets a fresh manager.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None or _registry.db is not db:
+            _registry = AlarmManager(db)
+        return _registry
@@ -0,0 +1,107 @@
+"""
+animation.py
+
+Streaming animated GIF / APNG encoding for IR Thermal Monitoring System.
+
+Pillow's save_all collects every frame before writing anything, so clips are written
+here as a sequence of byte strings instead: the container header with the palette first,
+then one string per frame as frames arrive, then the trailer. Memory stays bounded by
+one frame and the header can be sent before any frame is rendered. Frames are palette-
+index images (see render.render_indexed) that share one precomputed palette; GIF frame
+data is LZW-encoded by Pillow's GIF encoder, APNG chunks are written with Pillow's PNG
+chunk writer.
+"""
+import io
+import itertools
+import struct
+import zlib
+from typing import Iterable, Iterator
+
+import numpy as np
+from PIL import GifImagePlugin, Image, PngImagePlugin
+
+ANIMATION_FORMATS = {"gif": "image/gif", "apng": "image/apng"}
+MIN_FRAME_MS = 20  # browsers slow down GIF frames shorter than 20 ms
+MAX_FRAME_MS = 10000
+DEFAULT_FRAME_MS = 100
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def timed_frames(batches: Iterable[tuple[np.ndarray, np.ndarray]], speed: float = 1.0) -> Iterator[tuple[np.ndarray, int]]:
+    """
+    Yield (image, duration_ms) per frame from (timestamps in seconds, (n, h, w) images)
+    batches. A frame lasts until the next frame's capture time, divided by speed and
+    clipped to MIN_FRAME_MS..MAX_FRAME_MS; the last frame repeats the previous duration.
+    One frame is held back to know its duration.
+    """
+    pending = None
+    duration = DEFAULT_FRAME_MS
+    for timestamps, images in batches:
+        for timestamp, image in zip(timestamps, images):
+            if pending is not None:
+                duration = int(np.clip(round((timestamp - pending[0]) * 1000.0 / speed), MIN_FRAME_MS, MAX_FRAME_MS))
+                yield pending[1], duration
+            pending = (timestamp, image)
+    if pending is not None:
+        yield pending[1], duration
+
+
+def _palette_bytes(palette: np.ndarray) -> bytes:
+    """Palette padded to 256 RGB entries."""
+    padded = np.zeros((256, 3), dtype=np.uint8)
+    padded[:len(palette)] = palette
+    return padded.tobytes()
+
+
+def gif_stream(frames: Iterable[tuple[np.ndarray, int]], palette: np.ndarray, width: int, height: int,
+               loop: int = 0) -> Iterator[bytes]:
+    """
+    Animated GIF of (h, w) uint8 palette-index images with durations in ms, a frame at a
+    time. loop is the number of repetitions, 0 for forever.
+    """
+    yield (b"GIF89a" + struct.pack("<HHBBB", width, height, 0xF7, 0, 0) + _palette_bytes(palette)
+           + b"!\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", loop) + b"\x00")
+    for image, duration_ms in frames:
+        yield b"".join(GifImagePlugin.getdata(Image.fromarray(image, mode="P"), duration=duration_ms))
+    yield b";"
+
+
+def _chunk(cid: bytes, *data: bytes) -> bytes:
+    buf = io.BytesIO()
+    PngImagePlugin.putchunk(buf, cid, *data)
+    return buf.getvalue()
+
+
+def apng_stream(frames: Iterable[tuple[np.ndarray, int]], palette: np.ndarray, width: int, height: int,
+                num_frames: int, loop: int = 0, compress_level: int = 6) -> Iterator[bytes]:
+    """
+    Animated PNG of (h, w) uint8 palette-index images with durations in ms, a frame at a
+    time. The frame count goes into the header, so exactly num_frames frames are written:
+    extra frames are dropped and missing ones repeat the last frame (frames added or
+    removed while the clip is streamed). loop is the number of plays, 0 for forever.
+    """
+    yield (PNG_SIGNATURE + _chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0))
+           + _chunk(b"acTL", struct.pack(">II", num_frames, loop))
+           + _chunk(b"PLTE", np.ascontiguousarray(palette, dtype=np.uint8).tobytes()))
+    sequence = 0
+    filter_bytes = np.zeros((height, 1), dtype=np.uint8)  # filter type 0 (none) per scanline
+
+    def frame_chunks(image: np.ndarray, duration_ms: int) -> bytes:
+        nonlocal sequence
+        fctl = _chunk(b"fcTL", struct.pack(">IIIIIHHBB", sequence, width, height, 0, 0, duration_ms, 1000, 0, 0))
+        data = zlib.compress(np.hstack([filter_bytes, image]).tobytes(), compress_level)
+        if sequence == 0:
+            sequence = 1
+            return fctl + _chunk(b"IDAT", data)
+        sequence += 2
+        return fctl + _chunk(b"fdAT", struct.pack(">I", sequence - 1), data)
+
+    last = None
+    written = 0
+    for last in itertools.islice(frames, num_frames):
+        yield frame_chunks(*last)
+        written += 1
+    if last is not None:
+        for _ in range(written, num_frames):
+            yield frame_chunks(*last)
+    yield _chunk(b"IEND")
@@ -0,0 +1,313 @@
+"""
+anomaly.py
+
+Online per-zone temperature anomaly detection for IR Thermal Monitoring System.
+
+frames.detect_anomalies scores a stored range when someone asks for it. AnomalyDetector
+runs as a FrameProcessor stats sink instead and scores every zone temperature as it
+arrives against the mean and variance of that zone's earlier samples. A new sample is
+folded in with weight max(1 / n, alpha): for the first 1 / alpha samples this is Welford's
+running mean and variance, after that an exponentially weighted one that follows slow
+drift. With seasons > 1 each zone keeps one baseline per slot of season_period (e.g. 24
+hour-of-day slots) and a sample is scored against, and folded into, its own slot only.
+
+The per-frame cost is a handful of vectorised operations over the zones, independent of
+history. Baselines live in (zones, seasons) arrays that are checkpointed to the
+single-row anomaly_state table and restored on startup. Anomalies are logged to
+alarm_events with event_type 'anomaly' and no alarm_id.
+"""
+import logging
+import math
+import threading
+import time
+from typing import Any, Optional
+
+import numpy as np
+
+from .alarms import AlarmEvent, AlarmManager
+from .database import Database
+from .rollups import epoch_to_iso
+from .thermal_frame import ThermalFrame
+from .writer import BatchWriter
+from .zones import ZoneStats
+
+ANOMALY_EVENT_TYPE = "anomaly"
+DAY_SECONDS = 86400.0
+
+_UPSERT = (
+    "INSERT INTO anomaly_state (id, saved_at, zones, seasons, season_period, zone_ids, count, mean, var, active, last_event) "
+    "VALUES (1, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (id) DO UPDATE SET saved_at = excluded.saved_at, zones = excluded.zones, seasons = excluded.seasons, "
+    "season_period = excluded.season_period, zone_ids = excluded.zone_ids, count = excluded.count, mean = excluded.mean, "
+    "var = excluded.var, active = excluded.active, last_event = excluded.last_event"
+)
+
+
+class AnomalyState:
+    """
+    Baselines of every tracked zone: row i of each array belongs to zone_ids[i], column j
+    of the 2-D arrays to season slot j.
+    """
+    __slots__ = ("zone_ids", "count", "mean", "var", "active", "last_event")
+
+    def __init__(self, seasons: int = 1, zone_ids: Any = ()) -> None:
+        zone_ids = np.asarray(zone_ids, dtype=np.int64)
+        n = len(zone_ids)
+        self.zone_ids = zone_ids
+        self.count = np.zeros((n, seasons), dtype=np.int32)
+        self.mean = np.zeros((n, seasons), dtype=np.float64)
+        self.var = np.zeros((n, seasons), dtype=np.float64)
+        self.active = np.zeros(n, dtype=bool)
+        self.last_event = np.full(n, np.nan)  # epoch seconds of the zone's last anomaly event
+
+    @property
+    def seasons(self) -> int:
+        return self.count.shape[1]
+
+    def grow(self, zone_ids: Any) -> None:
+        """Append fresh rows for zone_ids."""
+        extra = AnomalyState(self.seasons, zone_ids)
+        for name in self.__slots__:
+            setattr(self, name, np.concatenate([getattr(self, name), getattr(extra, name)]))
+
+    def copy(self) -> "AnomalyState":
+        state = AnomalyState.__new__(AnomalyState)
+        for name in self.__slots__:
+            setattr(state, name, getattr(self, name).copy())
+        return state
+
+    def to_row(self, season_period: float) -> tuple:
+        """(zones, seasons, season_period, zone_ids, count, mean, var, active, last_event) as stored in anomaly_state."""
+        return (len(self.zone_ids), self.seasons, season_period, self.zone_ids.tobytes(), self.count.tobytes(),
+                self.mean.tobytes(), self.var.tobytes(), self.active.astype(np.uint8).tobytes(), self.last_event.tobytes())
+
+    @classmethod
+    def from_row(cls, row: Any) -> "AnomalyState":
+        """State from (zones, seasons, zone_ids, count, mean, var, active, last_event)."""
+        zones, seasons = int(row[0]), int(row[1])
+        state = cls.__new__(cls)
+        state.zone_ids = np.frombuffer(row[2], dtype=np.int64).copy()
+        state.count = np.frombuffer(row[3], dtype=np.int32).reshape(zones, seasons).copy()
+        state.mean = np.frombuffer(row[4], dtype=np.float64).reshape(zones, seasons).copy()
+        state.var = np.frombuffer(row[5], dtype=np.float64).reshape(zones, seasons).copy()
+        state.active = np.frombuffer(row[6], dtype=np.uint8).astype(bool)
+        state.last_event = np.frombuffer(row[7], dtype=np.float64).copy()
+        return state
+
+
+def _write_anomaly_state(db: Database, items: list[tuple]) -> None:
+    """Store the latest queued checkpoint; earlier ones in the batch are superseded."""
+    db.executemany(_UPSERT, [items[-1]])
+
+
+class AnomalyDetector:
+    """
+    FrameProcessor stats sink that scores each zone temperature against its running baseline
+    and logs an anomaly event when |z| reaches z_threshold. A zone stays in the anomalous
+    state until |z| falls below clear_threshold, and fires again at most once per cooldown.
+    """
+    def __init__(self, alarms: AlarmManager, z_threshold: float = 5.0, alpha: float = 0.01, seasons: int = 1,
+                 season_period: float = DAY_SECONDS, warmup: int = 30, clear_threshold: Optional[float] = None,
+                 cooldown: float = 300.0, min_std: float = 0.05, statistic: str = "average",
+                 checkpoint_interval: float = 300.0) -> None:
+        """
+        Args:
+            alarms: AlarmManager that logs and dispatches the events.
+            z_threshold: |z| at which a sample is anomalous.
+            alpha: Weight of a new sample once more than 1 / alpha samples were seen.
+            seasons: Baselines per zone; 1 disables the seasonal baseline, 24 gives one per
+                hour of day with the default season_period.
+            season_period: Length in seconds of the seasonal cycle (UTC aligned).
+            warmup: Samples a baseline needs before it scores.
+            clear_threshold: |z| below which an anomalous zone is normal again (default z_threshold - 1).
+            cooldown: Shortest time in seconds between two events of one zone.
+            min_std: Floor on the standard deviation, so near-constant zones do not score huge z.
+            statistic: ZoneStats field to score ('average' or 'maximum').
+            checkpoint_interval: Seconds between checkpoints queued while frames are processed
+                (only while the writer thread runs; see start()).
+
+        Raises:
+            ValueError: For an unknown statistic or out-of-range parameters.
+        """
+        if statistic not in ("average", "maximum"):
+            raise ValueError(f"Unsupported anomaly statistic: {statistic}")
+        if not 0.0 < alpha <= 1.0:
+            raise ValueError("alpha must be in (0, 1].")
+        if seasons < 1 or season_period <= 0:
+            raise ValueError("seasons must be at least 1 and season_period positive.")
+        self.alarms = alarms
+        self.db = alarms.db
+        self.z_threshold = z_threshold
+        self.clear_threshold = z_threshold - 1.0 if clear_threshold is None else clear_threshold
+        self.alpha = alpha
+        self.season_period = float(season_period)
+        self.warmup = warmup
+        self.cooldown = cooldown
+        self.min_std = min_std
+        self.statistic = statistic
+        self.checkpoint_interval = checkpoint_interval
+        self.state = AnomalyState(seasons)
+        self.writer = BatchWriter(self.db, _write_anomaly_state, name="anomaly-state-writer", flush_interval=1.0,
+                                  max_batch=16, max_queue=16)
+        self.frames_scored = 0
+        self.events_emitted = 0
+        self._index: dict[int, int] = {}
+        self._mapped_zone_ids: Optional[np.ndarray] = None
+        self._slots = np.empty(0, dtype=np.int64)
+        self._last_checkpoint = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def seasons(self) -> int:
+        return self.state.seasons
+
+    def __call__(self, frame: ThermalFrame, stats: ZoneStats) -> None:
+        self.update(stats.zone_ids, getattr(stats, self.statistic), frame.timestamp, frame.isoformat())
+
+    def season_of(self, now: float) -> int:
+        """Season slot of epoch time now."""
+        if self.seasons == 1:
+            return 0
+        return min(int((now % self.season_period) * self.seasons / self.season_period), self.seasons - 1)
+
+    def _map_zones(self, zone_ids: np.ndarray) -> np.ndarray:
+        """State rows of zone_ids, adding rows for new zones; cached while the same array is passed."""
+        if self._mapped_zone_ids is not zone_ids:
+            new = [int(z) for z in dict.fromkeys(zone_ids.tolist()) if int(z) not in self._index]
+            if new:
+                start = len(self.state.zone_ids)
+                self.state.grow(new)
+                self._index.update((z, start + i) for i, z in enumerate(new))
+            self._slots = np.fromiter((self._index[int(z)] for z in zone_ids), dtype=np.int64, count=len(zone_ids))
+            self._mapped_zone_ids = zone_ids
+        return self._slots
+
+    def update(self, zone_ids: np.ndarray, temperatures: np.ndarray, now: float, timestamp: Optional[str] = None) -> list[AlarmEvent]:
+        """
+        Score one frame's per-zone temperatures, then fold them into the baselines.
+
+        Args:
+            zone_ids: Zone IDs, parallel to temperatures (e.g. ZoneStats.zone_ids).
+            temperatures: Temperature per zone; NaN samples are neither scored nor folded in.
+            now: Frame time in epoch seconds (selects the season slot, tracks cooldowns).
+            timestamp: Frame timestamp recorded on events (defaults to now as ISO-8601).
+
+        Returns:
+            list[AlarmEvent]: One event per zone that became anomalous.
+        """
+        zone_ids = np.asarray(zone_ids)
+        if len(zone_ids) == 0:
+            return []
+        with self._lock:
+            fired, z = self._step(zone_ids, np.asarray(temperatures, dtype=np.float64), now)
+        events = []
+        if len(fired):
+            if timestamp is None:
+                timestamp = epoch_to_iso(now)
+            for i in fired:
+                event = AlarmEvent(None, int(zone_ids[i]), float(temperatures[i]), timestamp, ANOMALY_EVENT_TYPE)
+                logging.info("Anomaly in zone %d: %.2f°C, z = %.1f", event.zone_id, event.temperature, z[i])
+                events.append(event)
+            self.alarms.emit_events(events)
+            self.events_emitted += len(events)
+        self.frames_scored += 1
+        # Periodic checkpoints only queue: the writer thread commits them on its own connection
+        if self.writer.running and time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+            self.checkpoint()
+        return events
+
+    def _step(self, zone_ids: np.ndarray, x: np.ndarray, now: float) -> tuple[np.ndarray, np.ndarray]:
+        rows = self._map_zones(zone_ids)
+        season = self.season_of(now)
+        state = self.state
+        count = state.count[rows, season]
+        mean = state.mean[rows, season]
+        var = state.var[rows, season]
+        valid = np.isfinite(x)
+        # Score against the baseline before this sample
+        with np.errstate(invalid="ignore"):
+            z = (x - mean) / np.sqrt(np.maximum(var, self.min_std * self.min_std))
+        z = np.where(valid & (count >= self.warmup), z, 0.0)
+        # Welford while 1 / n > alpha, EWMA afterwards; w = 1 on a zone's first sample
+        w = np.maximum(1.0 / (count + 1.0), self.alpha)
+        delta = np.where(valid, x - mean, 0.0)
+        state.mean[rows, season] = mean + w * delta
+        state.var[rows, season] = np.where(valid, (1.0 - w) * (var + w * delta * delta), var)
+        state.count[rows, season] = count + valid
+        level = np.abs(z)
+        active = state.active[rows]
+        cooled = ~(now < state.last_event[rows] + self.cooldown)  # True while never fired (NaN)
+        fire = ~active & cooled & (level >= self.z_threshold)
+        state.active[rows] = (active & (level >= self.clear_threshold)) | fire
+        state.last_event[rows[fire]] = now
+        return np.flatnonzero(fire), z
+
+    def baselines(self, now: Optional[float] = None) -> list[dict]:
+        """Per-zone baseline of the season slot of now (defaults to the current time)."""
+        season = self.season_of(time.time() if now is None else now)
+        with self._lock:
+            state = self.state.copy()
+        std = np.sqrt(np.maximum(state.var[:, season], 0.0))
+        return [
+            {"zone_id": int(zone_id), "season": season, "samples": int(state.count[i, season]),
+             "mean": float(state.mean[i, season]), "std": float(std[i]), "active": bool(state.active[i])}
+            for i, zone_id in enumerate(state.zone_ids)
+        ]
+
+    def checkpoint(self, timeout: Optional[float] = None) -> bool:
+        """
+        Queue a copy of the state for writing. With a timeout, wait until it is committed;
+        while the writer is not running it is then written on the calling thread.
+
+        Returns:
+            bool: False if waiting timed out.
+        """
+        with self._lock:
+            row = (time.time(),) + self.state.to_row(self.season_period)
+        self._last_checkpoint = time.monotonic()
+        self.writer.submit(row, timeout=0)
+        if timeout is not None:
+            return self.writer.flush(timeout)
+        return True
+
+    def restore(self) -> bool:
+        """
+        Load the checkpointed state. A checkpoint taken with a different season layout is
+        ignored, so the baselines start over.
+
+        Returns:
+            bool: True if state was restored.
+        """
+        row = self.db.execute_query(
+            "SELECT zones, seasons, season_period, zone_ids, count, mean, var, active, last_event FROM anomaly_state WHERE id = 1"
+        ).fetchone()
+        if row is None:
+            return False
+        if row[1] != self.seasons or not math.isclose(row[2], self.season_period):
+            logging.warning("Ignoring anomaly detector checkpoint with %d seasons over %ss; configured %d over %ss.",
+                            row[1], row[2], self.seasons, self.season_period)
+            return False
+        row = tuple(row)
+        state = AnomalyState.from_row(row[:2] + row[3:])
+        with self._lock:
+            self.state = state
+            self._index = {int(z): i for i, z in enumerate(state.zone_ids)}
+            self._mapped_zone_ids = None
+        logging.info("Restored anomaly baselines of %d zone(s).", len(state.zone_ids))
+        return True
+
+    def start(self) -> None:
+        """Start the writer thread; checkpoints are queued every checkpoint_interval from then on."""
+        self.writer.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Checkpoint the state, then stop the writer thread."""
+        self.checkpoint(timeout)
+        self.writer.stop(timeout)
+
+    def stats(self) -> dict[str, Any]:
+        stats = self.writer.stats()
+        stats.update(frames_scored=self.frames_scored, events_emitted=self.events_emitted, zones=len(self.state.zone_ids),
+                     seasons=self.seasons, z_threshold=self.z_threshold, alpha=self.alpha, warmup=self.warmup,
+                     checkpoint_interval=self.checkpoint_interval)
+        return stats
@@ -0,0 +1,198 @@
+"""
+broadcast.py
+
+Live frame broadcast for IR Thermal Monitoring System viewers.
+
+FrameBroadcaster is an acquisition consumer. Each captured frame is handed to the event
+loop(s) of the subscribed viewers in one call, wrapped in a LiveFrame whose wire
+encodings (JSON text for WebSockets, an event-stream record for SSE) are built on first
+use and shared by every subscriber, so a frame is encoded once whatever the number of
+viewers. Every subscriber reads from its own small queue that drops its oldest frame when
+full: a slow client skips frames instead of making the server buffer them.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Optional
+
+from .thermal_frame import ThermalFrame
+
+DEFAULT_QUEUE_SIZE = 2
+MAX_QUEUE_SIZE = 16
+SSE_KEEPALIVE_SECONDS = 15.0
+
+
+class LiveFrame:
+    """A captured frame with its sequence number and lazily built, shared encodings."""
+    __slots__ = ("seq", "frame", "_json", "_sse", "_broadcaster")
+
+    def __init__(self, seq: int, frame: ThermalFrame, broadcaster: "FrameBroadcaster") -> None:
+        self.seq = seq
+        self.frame = frame
+        self._json: Optional[str] = None
+        self._sse: Optional[bytes] = None
+        self._broadcaster = broadcaster
+
+    def json(self) -> str:
+        """{"seq", "timestamp", "frame"} as compact JSON text."""
+        if self._json is None:
+            self._json = json.dumps({"seq": self.seq, "timestamp": self.frame.isoformat(), "frame": self.frame.tolist()},
+                                    separators=(",", ":"))
+            self._broadcaster.frames_encoded += 1
+        return self._json
+
+    def sse(self) -> bytes:
+        """The frame as one text/event-stream record of event type 'frame'."""
+        if self._sse is None:
+            self._sse = f"id: {self.seq}\nevent: frame\ndata: {self.json()}\n\n".encode()
+        return self._sse
+
+
+class Subscription:
+    """
+    One viewer's bounded queue of LiveFrames. Used only on its event loop's thread; the
+    broadcaster delivers frames there through call_soon_threadsafe.
+    """
+    def __init__(self, broadcaster: "FrameBroadcaster", loop: asyncio.AbstractEventLoop, queue_size: int) -> None:
+        self.broadcaster = broadcaster
+        self.loop = loop
+        self.sent = 0
+        self.dropped = 0
+        self.closed = False
+        self._queue: deque[LiveFrame] = deque(maxlen=queue_size)
+        self._ready = asyncio.Event()
+
+    def put(self, item: LiveFrame) -> None:
+        """Queue a frame, dropping the oldest queued one if the queue is full."""
+        if self.closed:
+            return
+        if len(self._queue) == self._queue.maxlen:
+            self.dropped += 1
+        self._queue.append(item)
+        self._ready.set()
+
+    async def get(self) -> Optional[LiveFrame]:
+        """Wait for the next frame; None once the subscription is closed."""
+        while not self._queue:
+            if self.closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        return self._queue.popleft()
+
+    def close(self) -> None:
+        """Stop receiving frames and wake a waiting get()."""
+        if not self.closed:
+            self.closed = True
+            self._queue.clear()
+            self._ready.set()
+            self.broadcaster.unsubscribe(self)
+
+
+class FrameBroadcaster:
+    """Acquisition consumer that pushes every captured frame to all live subscribers."""
+    def __init__(self, default_queue_size: int = DEFAULT_QUEUE_SIZE) -> None:
+        self.default_queue_size = default_queue_size
+        self.frames_published = 0
+        self.frames_encoded = 0
+        self._latest: Optional[LiveFrame] = None
+        self._subscribers: dict[asyncio.AbstractEventLoop, set[Subscription]] = {}
+        self._dropped_closed = 0  # drops of subscriptions that have gone
+        self._sent_closed = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, frame: ThermalFrame) -> None:
+        with self._lock:
+            self.frames_published += 1
+            item = LiveFrame(self.frames_published, frame, self)
+            self._latest = item
+            loops = [(loop, tuple(subscribers)) for loop, subscribers in self._subscribers.items() if subscribers]
+        for loop, subscribers in loops:
+            try:
+                loop.call_soon_threadsafe(_deliver, item, subscribers)
+            except RuntimeError:
+                # The loop was closed under its subscribers (e.g. server shutdown)
+                with self._lock:
+                    self._subscribers.pop(loop, None)
+
+    def subscribe(self, queue_size: Optional[int] = None) -> Subscription:
+        """
+        Subscribe the running event loop's caller to live frames. The latest frame, if any,
+        is queued right away so a new viewer does not wait for the next capture.
+
+        Args:
+            queue_size: Frames the subscriber may fall behind before old ones are dropped
+                (clamped to 1..MAX_QUEUE_SIZE; defaults to default_queue_size).
+        """
+        size = min(max(queue_size or self.default_queue_size, 1), MAX_QUEUE_SIZE)
+        loop = asyncio.get_running_loop()
+        subscription = Subscription(self, loop, size)
+        with self._lock:
+            self._subscribers.setdefault(loop, set()).add(subscription)
+            latest = self._latest
+        if latest is not None:
+            subscription.put(latest)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.loop)
+            if subscribers is not None and subscription in subscribers:
+                subscribers.discard(subscription)
+                self._dropped_closed += subscription.dropped
+                self._sent_closed += subscription.sent
+                if not subscribers:
+                    del self._subscribers[subscription.loop]
+
+    def close(self) -> None:
+        """Close every subscription, ending their streams (e.g. on shutdown)."""
+        with self._lock:
+            subscribers = [(loop, tuple(subs)) for loop, subs in self._subscribers.items()]
+        for loop, subs in subscribers:
+            for subscription in subs:
+                try:
+                    loop.call_soon_threadsafe(subscription.close)
+                except RuntimeError:
+                    self.unsubscribe(subscription)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            subscribers = [s for subs in self._subscribers.values() for s in subs]
+            dropped, sent = self._dropped_closed, self._sent_closed
+        return {
+            "subscribers": len(subscribers),
+            "frames_published": self.frames_published,
+            "frames_encoded": self.frames_encoded,
+            "frames_sent": sent + sum(s.sent for s in subscribers),
+            "frames_dropped": dropped + sum(s.dropped for s in subscribers),
+        }
+
+
+def _deliver(item: LiveFrame, subscribers: tuple[Subscription, ...]) -> None:
+    for subscription in subscribers:
+        subscription.put(item)
+
+
+async def sse_events(subscription: Subscription, keepalive: float = SSE_KEEPALIVE_SECONDS) -> AsyncIterator[bytes]:
+    """
+    text/event-stream body for a subscription: one record per frame and a comment line
+    every keepalive seconds without frames, so proxies keep the connection open. The
+    subscription is closed when the stream ends or the client goes away.
+    """
+    try:
+        yield b"retry: 2000\n\n"
+        while True:
+            try:
+                item = await asyncio.wait_for(subscription.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if item is None:
+                return
+            yield item.sse()
+            subscription.sent += 1
+    finally:
+        subscription.close()
+        logging.debug("SSE viewer left after %d frames (%d dropped).", subscription.sent, subscription.dropped)
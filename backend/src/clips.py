@@ -0,0 +1,174 @@
+"""
+clips.py
+
+Chunked event clip storage for IR Thermal Monitoring System.
+
+An event clip stores an alarm event's frames as event_clips rows of up to
+CLIP_CHUNK_FRAMES frames each: one (n, 24, 32) frame BLOB, encoded with the codec
+named in the row (see frame_codecs.py), plus an int64 epoch-nanosecond timestamp
+BLOB. (event_id, first_offset) indexes each chunk by the offset of its first frame
+within the clip, so any frame range is a few rows.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Iterator, Optional
+
+import numpy as np
+
+from .frame_codecs import RAW_CODEC, CodecError, decode_frames, encode_frames
+from .thermal_frame import FRAME_SHAPE
+
+CLIP_CHUNK_FRAMES = 64
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def ns_to_iso(timestamp_ns: int) -> str:
+    """Epoch nanoseconds to the naive UTC ISO-8601 format used across the API."""
+    return (_EPOCH + timedelta(microseconds=int(timestamp_ns) // 1000)).isoformat()
+
+
+def clip_chunk_row(event_id: Optional[int], first_offset: int, timestamps_ns: np.ndarray, frames: np.ndarray,
+                   codec: str = RAW_CODEC) -> tuple:
+    """Build the event_clips parameters for one chunk (frames must be (n, 24, 32))."""
+    timestamps_ns = np.ascontiguousarray(timestamps_ns, dtype="<i8")
+    return (
+        event_id,
+        first_offset,
+        len(frames),
+        ns_to_iso(timestamps_ns[0]),
+        ns_to_iso(timestamps_ns[-1]),
+        timestamps_ns.tobytes(),
+        encode_frames(frames, codec),
+        codec,
+    )
+
+
+def write_clip_chunks(db: Any, rows: list[tuple]) -> None:
+    """Insert rows built by clip_chunk_row with one executemany."""
+    db.executemany(
+        "INSERT INTO event_clips (event_id, first_offset, frame_count, start_time, end_time, timestamps, frames, codec) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+
+
+def _chunk_frames(blob: bytes, codec: Optional[str], count: int) -> np.ndarray:
+    frames = decode_frames(blob, codec)
+    if len(frames) != count:
+        raise CodecError(f"Clip chunk holds {len(frames)} frames, expected {count}.")
+    return frames
+
+
+def has_clip(db: Any, event_id: int) -> bool:
+    return db.execute_query("SELECT 1 FROM event_clips WHERE event_id = ? LIMIT 1", (event_id,)).fetchone() is not None
+
+
+def event_data_version(db: Any, event_id: int) -> Optional[tuple]:
+    """
+    A value that changes whenever frames of the event are added or removed, for keying
+    derived data such as rendered images: row counts, last row ids, time range and stored
+    bytes of its clip chunks and legacy rows (the time range and sizes also tell apart an
+    event restored from a different database). None if the event has no frames. Uses the
+    event_id indexes and BLOB lengths, not the frame data.
+    """
+    row = db.execute_query(
+        "SELECT COUNT(*), MAX(id), MIN(start_time), MAX(end_time), SUM(LENGTH(frames)) FROM event_clips WHERE event_id = ?",
+        (event_id,),
+    ).fetchone()
+    legacy = db.execute_query(
+        "SELECT COUNT(*), MAX(id), MIN(timestamp), MAX(timestamp), SUM(LENGTH(frame)) FROM thermal_frames WHERE event_id = ?",
+        (event_id,),
+    ).fetchone()
+    if not row[0] and not legacy[0]:
+        return None
+    return tuple(row) + tuple(legacy)
+
+
+def event_frame_count(db: Any, event_id: int, legacy: bool = False) -> int:
+    """Number of frames in an event clip, or in its legacy thermal_frames rows if legacy."""
+    if legacy:
+        row = db.execute_query("SELECT COUNT(*) FROM thermal_frames WHERE event_id = ?", (event_id,)).fetchone()
+    else:
+        row = db.execute_query("SELECT SUM(frame_count) FROM event_clips WHERE event_id = ?", (event_id,)).fetchone()
+    return int(row[0] or 0)
+
+
+def clip_timestamps(db: Any, event_id: int) -> np.ndarray:
+    """All frame timestamps (epoch ns) of an event clip, without reading the frame BLOBs."""
+    cur = db.execute_query("SELECT timestamps FROM event_clips WHERE event_id = ? ORDER BY first_offset", (event_id,))
+    parts = [np.frombuffer(row[0], dtype="<i8") for row in cur.fetchall()]
+    return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+
+def iter_clip_chunks(db: Any, event_id: Optional[int] = None) -> Iterator[tuple[Optional[int], int, np.ndarray, np.ndarray]]:
+    """
+    Yield (event_id, first_offset, timestamps_ns, frames) per chunk, in clip order.
+    Frames are decoded (n, 24, 32) float32 arrays, read-only for raw float32 chunks.
+    All clips if event_id is None.
+    """
+    query = "SELECT event_id, first_offset, timestamps, frames, codec FROM event_clips"
+    params: tuple = ()
+    if event_id is not None:
+        query += " WHERE event_id = ?"
+        params = (event_id,)
+    cur = db.execute_query(query + " ORDER BY event_id, first_offset", params)
+    while True:
+        rows = cur.fetchmany(16)
+        if not rows:
+            return
+        for row in rows:
+            timestamps = np.frombuffer(row[2], dtype="<i8")
+            frames = _chunk_frames(row[3], row[4], len(timestamps))
+            yield row[0], row[1], timestamps, frames
+
+
+def read_clip(db: Any, event_id: int, start: int = 0, stop: Optional[int] = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Read frames [start, stop) of an event clip, touching only the chunks that overlap the range.
+
+    Returns:
+        Tuple of (timestamps_ns, frames) with frames shaped (n, 24, 32).
+    """
+    query = "SELECT first_offset, timestamps, frames, codec FROM event_clips WHERE event_id = ? AND first_offset + frame_count > ?"
+    params: tuple = (event_id, start)
+    if stop is not None:
+        query += " AND first_offset < ?"
+        params += (stop,)
+    cur = db.execute_query(query + " ORDER BY first_offset", params)
+    timestamps, frames = [], []
+    for first_offset, ts_blob, frame_blob, codec in cur.fetchall():
+        ts = np.frombuffer(ts_blob, dtype="<i8")
+        lo = max(start - first_offset, 0)
+        hi = len(ts) if stop is None else min(stop - first_offset, len(ts))
+        timestamps.append(ts[lo:hi])
+        frames.append(_chunk_frames(frame_blob, codec, len(ts))[lo:hi])
+    if not frames:
+        return np.empty(0, dtype=np.int64), np.empty((0,) + FRAME_SHAPE, dtype=np.float32)
+    return np.concatenate(timestamps), np.concatenate(frames)
+
+
+def read_event_frames(db: Any, event_id: int) -> tuple[list[int], list[str], np.ndarray]:
+    """
+    All frames of an event, from its clip if one exists, else from legacy thermal_frames rows.
+
+    Returns:
+        Tuple of (ids, ISO timestamps, (n, 24, 32) frames). Clip frames use their offset
+        within the clip as id; legacy frames use the thermal_frames row id.
+    """
+    if has_clip(db, event_id):
+        timestamps, frames = read_clip(db, event_id)
+        return list(range(len(frames))), [ns_to_iso(ts) for ts in timestamps], frames
+    cur = db.execute_query("SELECT id, timestamp, frame, codec FROM thermal_frames WHERE event_id = ? ORDER BY timestamp ASC", (event_id,))
+    ids, labels, arrays = [], [], []
+    for row in cur.fetchall():
+        try:
+            decoded = decode_frames(row[2], row[3]) if row[2] is not None else None
+        except CodecError:
+            decoded = None
+        if decoded is None or len(decoded) != 1:
+            continue  # skip malformed rows, as the endpoints always have
+        ids.append(row[0])
+        labels.append(row[1])
+        arrays.append(decoded[0])
+    frames = np.stack(arrays) if arrays else np.empty((0,) + FRAME_SHAPE, dtype=np.float32)
+    return ids, labels, frames
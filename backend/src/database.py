@@ -3,12 +3,15 @@ database.py
 
 Database handler for IR Thermal Monitoring System (SQLite3).
 """
+import os
 import sqlite3
 import logging
 from contextlib import contextmanager
-from typing import Optional, Any, Iterator
+from typing import Optional, Any, Iterable, Iterator
 import shutil
 
+BUSY_TIMEOUT_SECONDS = 10.0  # how long a connection waits for another connection's write transaction
+
 class Database:
     """
     Handles SQLite3 database operations for the IR Thermal Monitoring System.
@@ -20,9 +23,11 @@ class Database:
     def connect(self) -> None:
         """Open a connection to the SQLite database and apply PRAGMA settings."""
         if self.conn is None:
-            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self.conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=BUSY_TIMEOUT_SECONDS)
             assert self.conn is not None
             self.conn.row_factory = sqlite3.Row
+            # Must precede the first table (and the WAL switch) to apply to a new file; see enable_incremental_vacuum()
+            self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
             # Enable WAL mode and other performance optimizations
             self.conn.execute("PRAGMA journal_mode=WAL;")
             self.conn.execute("PRAGMA synchronous=NORMAL;")
@@ -43,6 +48,36 @@ class Database:
                 "value": "10",
                 "description": "Number of minutes to keep frames in buffer"
             },
+            {
+                "key": "frame_codec",
+                "value": "i16+delta+zlib",
+                "description": "Codec for stored event frames (f32, i16, i16+zlib, i16+delta+zlib, i16+delta+lzma, ...)"
+            },
+            {
+                "key": "recording_enabled",
+                "value": "false",
+                "description": "Continuously record every frame to hourly segment files"
+            },
+            {
+                "key": "recording_dir",
+                "value": "",
+                "description": "Directory for recording segment files (empty: 'recordings' next to the database)"
+            },
+            {
+                "key": "render_cache_dir",
+                "value": "",
+                "description": "Directory for cached rendered images (empty: 'render_cache' next to the database)"
+            },
+            {
+                "key": "render_cache_memory_mb",
+                "value": "32",
+                "description": "Memory (MB) for cached rendered images"
+            },
+            {
+                "key": "render_cache_disk_mb",
+                "value": "256",
+                "description": "Disk space (MB) for cached rendered images"
+            },
             {
                 "key": "email_notifications_enabled",
                 "value": "false",
@@ -68,10 +103,65 @@ class Database:
                 "value": "1",
                 "description": "Interval between temperature captures (seconds)"
             },
+            {
+                "key": "zone_series_flush_interval",
+                "value": "5",
+                "description": "Longest time (seconds) per-zone temperature rows wait before being committed"
+            },
+            {
+                "key": "zone_series_batch_size",
+                "value": "1000",
+                "description": "Per-zone temperature rows written per transaction"
+            },
+            {
+                "key": "pixel_rollup_flush_interval",
+                "value": "60",
+                "description": "Longest time (seconds) before per-pixel heatmap accumulators are written"
+            },
+            {
+                "key": "anomaly_detection_enabled",
+                "value": "false",
+                "description": "Score every zone temperature against its running baseline; anomalies are logged as events and sent to the enabled notifications"
+            },
+            {
+                "key": "anomaly_z_threshold",
+                "value": "5.0",
+                "description": "Z-score at which a zone temperature is logged as an anomaly"
+            },
+            {
+                "key": "anomaly_ewma_alpha",
+                "value": "0.01",
+                "description": "Weight of each new sample in the anomaly baselines (smaller adapts slower)"
+            },
+            {
+                "key": "anomaly_seasonal",
+                "value": "false",
+                "description": "Keep a separate anomaly baseline per hour of day"
+            },
+            {
+                "key": "anomaly_cooldown",
+                "value": "300",
+                "description": "Shortest time (seconds) between two anomaly events of one zone"
+            },
+            {
+                "key": "anomaly_checkpoint_interval",
+                "value": "300",
+                "description": "Seconds between checkpoints of the anomaly baselines"
+            },
             {
                 "key": "data_retention_days",
                 "value": "30",
                 "description": "Number of days to keep historical data"
+            },
+            {
+                "key": "retention_interval_minutes",
+                "value": "60",
+                "description": "Minutes between retention runs that delete data older than data_retention_days"
+            },
+            {
+                "key": "max_zones",
+                "value": "64",
+                "description": "Maximum number of zones per camera"
             }
         ]
         
@@ -121,6 +211,29 @@ class Database:
             temperature REAL,
             FOREIGN KEY (zone_id) REFERENCES zones(id)
         );
+        CREATE TABLE IF NOT EXISTS thermal_rollups (
+            resolution INTEGER NOT NULL,   -- bucket width in seconds: 60, 3600 or 86400
+            zone_id INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,       -- bucket start, epoch seconds (UTC)
+            count INTEGER NOT NULL,
+            sum REAL NOT NULL,
+            sumsq REAL NOT NULL,
+            min REAL,
+            max REAL,
+            PRIMARY KEY (resolution, zone_id, bucket)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS pixel_rollups (
+            id INTEGER PRIMARY KEY,
+            resolution INTEGER NOT NULL,   -- bucket width in seconds: 3600 or 86400
+            bucket INTEGER NOT NULL,       -- bucket start, epoch seconds (UTC)
+            frames INTEGER NOT NULL,
+            count BLOB,                    -- 24 x 32 int32 samples per pixel
+            sum BLOB,                      -- 24 x 32 float64
+            sumsq BLOB,                    -- 24 x 32 float64
+            min BLOB,                      -- 24 x 32 float32
+            max BLOB,                      -- 24 x 32 float32
+            UNIQUE (resolution, bucket)
+        );
         CREATE TABLE IF NOT EXISTS alarm_events (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             zone_id INTEGER,
@@ -129,14 +242,50 @@ class Database:
             alarm_id INTEGER,
             FOREIGN KEY (zone_id) REFERENCES zones(id)
         );
+        CREATE TABLE IF NOT EXISTS anomaly_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),  -- single checkpoint row of the online anomaly detector
+            saved_at REAL,                 -- epoch seconds
+            zones INTEGER,
+            seasons INTEGER,
+            season_period REAL,
+            zone_ids BLOB,                 -- zones int64
+            count BLOB,                    -- zones x seasons int32
+            mean BLOB,                     -- zones x seasons float64
+            var BLOB,                      -- zones x seasons float64
+            active BLOB,                   -- zones uint8
+            last_event BLOB                -- zones float64 epoch seconds
+        );
         CREATE TABLE IF NOT EXISTS thermal_frames (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             event_id INTEGER,
             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
             frame BLOB,
             frame_size INTEGER,
+            codec TEXT,                    -- frame_codecs name; NULL is raw float32
             FOREIGN KEY (event_id) REFERENCES alarm_events(id)
         );
+        CREATE TABLE IF NOT EXISTS event_clips (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_id INTEGER,              -- alarm_events row the clip belongs to
+            first_offset INTEGER NOT NULL, -- index of the chunk's first frame within the clip
+            frame_count INTEGER NOT NULL,
+            start_time DATETIME,
+            end_time DATETIME,
+            timestamps BLOB,               -- frame_count int64 epoch nanoseconds
+            frames BLOB,                   -- frame_count x 24 x 32 frames, row-major, encoded with codec
+            codec TEXT,                    -- frame_codecs name; NULL is raw float32
+            FOREIGN KEY (event_id) REFERENCES alarm_events(id)
+        );
+        CREATE TABLE IF NOT EXISTS recording_segments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            path TEXT NOT NULL UNIQUE,     -- segment file (see recording.py)
+            start_ns INTEGER NOT NULL,     -- first frame, epoch nanoseconds
+            end_ns INTEGER,                -- last frame as of the last sync
+            frame_count INTEGER DEFAULT 0,
+            capacity INTEGER NOT NULL,
+            closed INTEGER DEFAULT 0,      -- 0 while the recorder may still append
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
         CREATE TABLE IF NOT EXISTS alarms (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             zone_id INTEGER,
@@ -146,6 +295,8 @@ class Database:
             last_triggered DATETIME,                 -- New: last triggered timestamp
             acknowledged BOOLEAN DEFAULT 0,          -- New: persistent acknowledge
             acknowledged_at DATETIME,                -- New: acknowledge timestamp
+            state TEXT DEFAULT 'armed',              -- armed / triggered / cooldown / acknowledged
+            hysteresis REAL DEFAULT 0,               -- degrees below threshold required to clear
             FOREIGN KEY (zone_id) REFERENCES zones(id)
         );
         CREATE TABLE IF NOT EXISTS notifications (
@@ -156,6 +307,15 @@ class Database:
             enabled BOOLEAN DEFAULT 1,
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP
         );
+        CREATE TABLE IF NOT EXISTS webhook_dead_letters (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            notification_id INTEGER,      -- NULL for ad-hoc webhook URLs
+            url TEXT NOT NULL,
+            payload TEXT NOT NULL,        -- JSON body that could not be delivered
+            error TEXT,
+            attempts INTEGER,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
         CREATE TABLE IF NOT EXISTS settings (
             key TEXT PRIMARY KEY,
             value TEXT NOT NULL,
@@ -163,24 +323,57 @@ class Database:
         );
         CREATE INDEX IF NOT EXISTS idx_thermal_data_timestamp ON thermal_data(timestamp);
         CREATE INDEX IF NOT EXISTS idx_thermal_data_zone_time ON thermal_data(zone_id, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_thermal_rollups_bucket ON thermal_rollups(resolution, bucket);
         CREATE INDEX IF NOT EXISTS idx_thermal_frames_timestamp ON thermal_frames(timestamp);
         CREATE INDEX IF NOT EXISTS idx_thermal_frames_event ON thermal_frames(event_id);
         CREATE INDEX IF NOT EXISTS idx_alarm_events_timestamp ON alarm_events(timestamp);
         CREATE INDEX IF NOT EXISTS idx_alarm_events_alarm_id ON alarm_events(alarm_id);
+        CREATE INDEX IF NOT EXISTS idx_event_clips_event ON event_clips(event_id, first_offset);
+        CREATE INDEX IF NOT EXISTS idx_recording_segments_start ON recording_segments(start_ns);
         CREATE INDEX IF NOT EXISTS idx_zones_active ON zones(id);
         CREATE INDEX IF NOT EXISTS idx_alarms_enabled ON alarms(enabled);
         """
         assert self.conn is not None
         self.conn.executescript(schema)
+        # Columns added after the first release; CREATE TABLE IF NOT EXISTS does not add them
+        self._ensure_column("alarms", "state", "TEXT DEFAULT 'armed'")
+        self._ensure_column("alarms", "hysteresis", "REAL DEFAULT 0")
+        self._ensure_column("thermal_frames", "codec", "TEXT")
+        self._ensure_column("event_clips", "codec", "TEXT")
+        self._ensure_column("alarm_events", "event_type", "TEXT DEFAULT 'threshold'")
         self.conn.commit()
         # Initialize default settings after schema creation
         self.initialize_default_settings()
         logging.info("Database schema initialized.")
 
+    def _ensure_column(self, table: str, column: str, declaration: str) -> None:
+        """Add a column to an existing table if it is missing (idempotent schema upgrade)."""
+        assert self.conn is not None
+        existing = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+        if column not in existing:
+            self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+            logging.info("Added column %s.%s.", table, column)
+
+    def clone(self) -> "Database":
+        """
+        A separately connected Database on the same file. Background writer threads each use
+        their own, so one thread's commit or rollback never covers another thread's rows;
+        SQLite (WAL) serialises their write transactions.
+        """
+        clone = Database(self.db_path)
+        clone.connect()
+        return clone
+
     @contextmanager
     def transaction(self) -> Iterator[sqlite3.Connection]:
-        """Context manager for DB transactions with rollback on failure."""
+        """
+        Context manager for DB transactions with rollback on failure. Takes the write lock up
+        front (BEGIN IMMEDIATE), waiting up to BUSY_TIMEOUT_SECONDS for other connections,
+        so a transaction that reads before it writes cannot fail on a stale snapshot.
+        """
         assert self.conn is not None
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN IMMEDIATE")
         try:
             yield self.conn
             self.conn.commit()
@@ -195,6 +388,23 @@ class Database:
         cur = self.conn.execute(query, params)
         return cur
 
+    def executemany(self, query: str, params_seq: Iterable[tuple]) -> sqlite3.Cursor:
+        """Execute a query once per parameter tuple and return the cursor."""
+        assert self.conn is not None
+        return self.conn.executemany(query, params_seq)
+
+    def iter_query_chunks(self, query: str, params: tuple = (), chunk_rows: int = 65536) -> Iterator[list[tuple]]:
+        """Execute a query and yield its rows in lists of up to chunk_rows plain tuples (no sqlite3.Row wrapping)."""
+        assert self.conn is not None
+        cur = self.conn.cursor()
+        cur.row_factory = None
+        cur.execute(query, params)
+        while True:
+            rows = cur.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield rows
+
     def close(self) -> None:
         """Close the database connection."""
         if self.conn:
@@ -227,6 +437,15 @@ class Database:
             for row in cur.fetchall()
         ]
 
+    def get_webhook_dead_letters(self, limit: int = 100) -> list[dict]:
+        """Retrieve the most recent undeliverable webhook payloads."""
+        assert self.conn is not None
+        cur = self.conn.execute(
+            "SELECT id, notification_id, url, payload, error, attempts, created_at FROM webhook_dead_letters ORDER BY id DESC LIMIT ?",
+            (limit,)
+        )
+        return [dict(row) for row in cur.fetchall()]
+
     def update_notification(self, notification_id: int, name: str, type_: str, config: str, enabled: bool) -> None:
         """Update an existing notification config."""
         assert self.conn is not None
@@ -272,28 +491,106 @@ class Database:
         self.conn.execute("DELETE FROM settings WHERE key = ?", (key,))
         self.conn.commit()
 
+    def checkpoint(self, mode: str = "TRUNCATE") -> tuple[int, int, int]:
+        """
+        Run a WAL checkpoint so the main database file holds all committed data. Nothing is
+        committed here, so call it between transactions: SQLite refuses to checkpoint while
+        this connection is writing, and reports busy while other connections are.
+
+        Returns:
+            tuple: (busy, wal_pages, checkpointed_pages) as reported by SQLite.
+        """
+        assert self.conn is not None
+        if mode not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+            raise ValueError(f"Unknown WAL checkpoint mode: {mode}")
+        row = self.conn.execute(f"PRAGMA wal_checkpoint({mode});").fetchone()
+        return (int(row[0]), int(row[1]), int(row[2]))
+
+    def storage_stats(self) -> dict[str, int]:
+        """Page and file sizes: the database file, its WAL, and free pages awaiting reuse or vacuum."""
+        assert self.conn is not None
+        page_size = self.conn.execute("PRAGMA page_size;").fetchone()[0]
+        page_count = self.conn.execute("PRAGMA page_count;").fetchone()[0]
+        freelist_count = self.conn.execute("PRAGMA freelist_count;").fetchone()[0]
+        sizes = [os.path.getsize(path) if os.path.exists(path) else 0 for path in (self.db_path, self.db_path + "-wal")]
+        return {
+            "auto_vacuum": self.conn.execute("PRAGMA auto_vacuum;").fetchone()[0],
+            "page_size": page_size,
+            "page_count": page_count,
+            "freelist_count": freelist_count,
+            "free_bytes": freelist_count * page_size,
+            "file_bytes": sizes[0],
+            "wal_bytes": sizes[1],
+        }
+
+    def enable_incremental_vacuum(self) -> bool:
+        """
+        Switch an existing database to auto_vacuum=INCREMENTAL so freed pages can be returned
+        to the filesystem. Files created before the setting need a full VACUUM once, which
+        rewrites the whole database and blocks writers while it runs.
+
+        Returns:
+            bool: True if the database was converted, False if it already was incremental.
+        """
+        assert self.conn is not None
+        if self.conn.execute("PRAGMA auto_vacuum;").fetchone()[0] == 2:
+            return False
+        self.conn.commit()
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+        self.conn.execute("VACUUM;")
+        logging.info("Database converted to incremental auto-vacuum.")
+        return True
+
+    def incremental_vacuum(self, pages: int) -> int:
+        """
+        Return up to `pages` free pages to the filesystem (incremental auto-vacuum only), in one
+        transaction. Returns pages released.
+        """
+        with self.transaction() as conn:
+            before = conn.execute("PRAGMA freelist_count;").fetchone()[0]
+            # execute() runs only the pragma's first step, which frees one page; executescript()
+            # would run it to completion but first commits whatever this connection has open
+            for _ in range(min(int(pages), before)):
+                conn.execute("PRAGMA incremental_vacuum(1);")
+            return before - conn.execute("PRAGMA freelist_count;").fetchone()[0]
+
     def backup(self, backup_path: str) -> None:
-        """Backup the current database to the specified file."""
+        """
+        Backup the current database to the specified file. SQLite's backup API copies the
+        pages as this connection sees them, so committed rows still in the WAL are included
+        even when other connections keep a checkpoint from completing.
+        """
         assert self.conn is not None
-        with open(self.db_path, 'rb') as src, open(backup_path, 'wb') as dst:
-            dst.write(src.read())
+        target = sqlite3.connect(backup_path)
+        try:
+            self.conn.backup(target)
+        finally:
+            target.close()
 
     def restore(self, backup_path: str) -> None:
+        """
+        Replace the database contents with a backup file. The pages are copied with SQLite's
+        backup API through this connection, so the copy takes the write lock like any other
+        write and connections opened with clone() see the restored data through the WAL
+        instead of a file replaced underneath them.
+        """
         assert self.conn is not None
-        self.conn.close()
-        import shutil
-        shutil.copy2(backup_path, self.db_path)
-        self.connect()
+        self.conn.commit()
+        source = sqlite3.connect(backup_path)
+        try:
+            source.backup(self.conn)
+        finally:
+            source.close()
 
     def stream_backup(self):
-        """Stream the current database file for backup purposes."""
+        """The current database, including rows still in the WAL, as bytes for backup purposes."""
         assert self.conn is not None
-        with open(self.db_path, 'rb') as f:
-            return f.read()
+        return self.conn.serialize()
 
     def migrate(self) -> None:
-        """Re-initialize the schema (idempotent, safe for upgrades)."""
+        """Re-initialize the schema (idempotent, safe for upgrades) and enable incremental vacuum."""
         self.initialize_schema()
+        self.enable_incremental_vacuum()
 
     def get_thermal_data(self, start_time: str, end_time: str, zone_id: int | None = None) -> list[dict]:
         """Fetch thermal_data rows for a time range and optional zone."""
@@ -0,0 +1,102 @@
+"""
+downsample.py
+
+Downsampling of time series for charting in IR Thermal Monitoring System.
+
+Both methods return the indices of the samples to keep, in time order, so the kept points
+are real samples (timestamps and temperatures are never interpolated):
+
+- lttb: Largest-Triangle-Three-Buckets. Keeps the first and last sample and, from each of
+  max_points - 2 equal-count buckets, the sample forming the largest triangle with the
+  previously kept sample and the next bucket's mean. Preserves the visual shape.
+- minmax: The minimum and maximum sample of each of max_points / 2 buckets, so every peak
+  and trough survives.
+"""
+import math
+
+import numpy as np
+
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+DEFAULT_MAX_POINTS = 1000
+MIN_POINTS = 3
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Indices of at most max_points samples chosen by Largest-Triangle-Three-Buckets.
+
+    Args:
+        x: Sample positions (e.g. epoch seconds), ascending.
+        y: Sample values.
+        max_points: Points to keep; at least 3.
+
+    Raises:
+        ValueError: If max_points is below 3 or x and y differ in length.
+    """
+    n = len(y)
+    if len(x) != n:
+        raise ValueError("x and y must have the same length.")
+    if max_points < MIN_POINTS:
+        raise ValueError(f"max_points must be at least {MIN_POINTS}.")
+    if n <= max_points:
+        return np.arange(n)
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    # max_points - 2 buckets over the samples between the fixed first and last one;
+    # each bucket is wider than one sample, so none is empty
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[:-1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[:-1], edges[:-1]) / counts
+    # Third triangle vertex for each bucket: the next bucket's mean, or the last sample
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+    kept = np.empty(max_points, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Twice the triangle area; the constant factor does not change the argmax
+        area = np.abs((x[a] - next_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def minmax_indices(y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Indices of the minimum and maximum sample of each of max_points // 2 equal-count buckets,
+    ascending and without duplicates (at most max_points).
+
+    Raises:
+        ValueError: If max_points is below 3.
+    """
+    if max_points < MIN_POINTS:
+        raise ValueError(f"max_points must be at least {MIN_POINTS}.")
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    size = math.ceil(n / (max_points // 2))
+    rows = math.ceil(n / size)
+    # Pad the ragged last bucket so min and max never pick a padding slot
+    low = np.full(rows * size, np.inf)
+    high = np.full(rows * size, -np.inf)
+    low[:n] = y
+    high[:n] = y
+    offsets = np.arange(rows) * size
+    kept = np.concatenate([offsets + low.reshape(rows, size).argmin(axis=1), offsets + high.reshape(rows, size).argmax(axis=1)])
+    return np.unique(kept)
+
+
+def downsample_indices(x: np.ndarray, y: np.ndarray, max_points: int, method: str = "lttb") -> np.ndarray:
+    """
+    Indices of at most max_points samples to keep with the given method.
+
+    Raises:
+        ValueError: For an unknown method or max_points below 3.
+    """
+    if method == "lttb":
+        return lttb_indices(x, y, max_points)
+    if method == "minmax":
+        return minmax_indices(y, max_points)
+    raise ValueError(f"Unknown downsampling method {method!r}; expected one of {', '.join(DOWNSAMPLE_METHODS)}.")
@@ -0,0 +1,166 @@
+"""
+frame_codecs.py
+
+Frame BLOB codecs for IR Thermal Monitoring System.
+
+A codec turns a stack of (24, 32) frames into one BLOB and back. Stored rows name their
+codec in a codec column (NULL means the original raw float32 format), so the codec can
+change without rewriting existing rows. Codec names compose a value format, an optional
+temporal delta and an optional compressor, joined by "+":
+
+    f32      little-endian float32, lossless (the legacy format)
+    i16      int16 centi-degrees: 0.01 degC steps, +/-327.67 degC, NaN preserved
+    delta    store each frame as the difference from the previous frame in the BLOB
+             (i16 only; wraps modulo 2**16, so it is exact)
+    zlib     deflate the result
+    lzma     LZMA (xz) the result; smaller and slower than zlib
+
+e.g. "f32", "i16", "i16+zlib", "i16+delta+zlib", "f32+lzma". Further codecs can be added
+with register_codec().
+"""
+import lzma
+import zlib
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+
+import numpy as np
+
+from .thermal_frame import FRAME_DTYPE, FRAME_PIXELS, FRAME_SHAPE
+
+RAW_CODEC = "f32"
+DEFAULT_CODEC = "i16+delta+zlib"
+
+CENTI_DTYPE = np.dtype("<i2")
+_CENTI_NAN = np.iinfo(np.int16).min  # reserved for NaN; finite values clip to +/-32767
+_CENTI_MAX = np.iinfo(np.int16).max
+
+_COMPRESSORS: dict[str, tuple[Callable[[bytes], bytes], Callable[[bytes], bytes], tuple[type[Exception], ...]]] = {
+    "zlib": (lambda data: zlib.compress(data, 6), zlib.decompress, (zlib.error,)),
+    "lzma": (lambda data: lzma.compress(data, preset=6), lzma.decompress, (lzma.LZMAError,)),
+}
+
+
+class CodecError(ValueError):
+    """Raised for unknown codec names and BLOBs that do not decode to whole frames."""
+
+
+class FrameCodec(ABC):
+    """Base class: encode (n, 24, 32) float32 frames to a BLOB and decode them back."""
+    name: str = ""
+    lossless: bool = True
+
+    @abstractmethod
+    def encode(self, frames: np.ndarray) -> bytes:
+        """Encode (n, 24, 32) float32 frames to one BLOB."""
+
+    @abstractmethod
+    def decode_values(self, blob: bytes) -> np.ndarray:
+        """Decode to a flat float32 array (not checked for whole frames)."""
+
+    def decode(self, blob: bytes) -> np.ndarray:
+        """
+        Decode a BLOB to (n, 24, 32) float32 frames.
+
+        Raises:
+            CodecError: If the BLOB is corrupt or does not hold whole frames.
+        """
+        values = self.decode_values(blob)
+        if values.size % FRAME_PIXELS:
+            raise CodecError(f"{self.name} BLOB holds {values.size} values, not a whole number of frames.")
+        return values.reshape((-1,) + FRAME_SHAPE)
+
+
+class LayeredCodec(FrameCodec):
+    """Value format, optional temporal delta and optional compressor, as described in the module docstring."""
+    def __init__(self, values: str = "f32", delta: bool = False, compressor: Optional[str] = None) -> None:
+        if values not in ("f32", "i16"):
+            raise CodecError(f"Unknown frame value format {values!r}.")
+        if delta and values != "i16":
+            raise CodecError("delta requires i16 values.")
+        if compressor is not None and compressor not in _COMPRESSORS:
+            raise CodecError(f"Unknown frame compressor {compressor!r}.")
+        self.values = values
+        self.delta = delta
+        self.compressor = compressor
+        self.name = "+".join([values] + (["delta"] if delta else []) + ([compressor] if compressor else []))
+        self.lossless = values == "f32"
+
+    def encode(self, frames: np.ndarray) -> bytes:
+        arr = np.asarray(frames, dtype=np.float32).reshape(-1, FRAME_PIXELS)
+        if self.values == "f32":
+            data = arr.astype(FRAME_DTYPE, copy=False).tobytes()
+        else:
+            centi = np.rint(np.clip(arr, -_CENTI_MAX / 100, _CENTI_MAX / 100) * 100)
+            centi[np.isnan(arr)] = _CENTI_NAN
+            q = centi.astype(CENTI_DTYPE)
+            if self.delta and len(q) > 1:
+                q[1:] = q[1:] - q[:-1]  # right side is evaluated first; int16 wraps
+            data = q.tobytes()
+        if self.compressor:
+            data = _COMPRESSORS[self.compressor][0](data)
+        return data
+
+    def decode_values(self, blob: bytes) -> np.ndarray:
+        data = blob
+        if self.compressor:
+            decompress, errors = _COMPRESSORS[self.compressor][1], _COMPRESSORS[self.compressor][2]
+            try:
+                data = decompress(blob)
+            except errors as e:
+                raise CodecError(f"Corrupt {self.name} BLOB: {e}") from e
+        if self.values == "f32":
+            if len(data) % FRAME_DTYPE.itemsize:
+                raise CodecError(f"{self.name} BLOB length {len(data)} is not a multiple of {FRAME_DTYPE.itemsize}.")
+            return np.frombuffer(data, dtype=FRAME_DTYPE)
+        if len(data) % CENTI_DTYPE.itemsize:
+            raise CodecError(f"{self.name} BLOB length {len(data)} is not a multiple of {CENTI_DTYPE.itemsize}.")
+        q = np.frombuffer(data, dtype=CENTI_DTYPE)
+        if self.delta and q.size > FRAME_PIXELS:
+            q = np.cumsum(q.reshape(-1, FRAME_PIXELS), axis=0, dtype=np.int16).reshape(-1)
+        values = q.astype(np.float32) / np.float32(100)
+        values[q == _CENTI_NAN] = np.nan
+        return values
+
+
+_CODECS: dict[str, FrameCodec] = {}
+
+
+def register_codec(codec: FrameCodec) -> None:
+    """Make a codec available by name for encoding and for decoding stored rows."""
+    if not isinstance(codec, FrameCodec):
+        raise CodecError(f"{codec!r} is not a FrameCodec.")
+    if not codec.name:
+        raise CodecError("Codec must have a name.")
+    _CODECS[codec.name] = codec
+
+
+def get_codec(name: Optional[str] = None) -> FrameCodec:
+    """
+    Look up a codec by name; None (rows written before codecs existed) is raw float32.
+
+    Raises:
+        CodecError: If no codec of that name is registered.
+    """
+    try:
+        return _CODECS[name or RAW_CODEC]
+    except KeyError:
+        raise CodecError(f"Unknown frame codec {name!r}; available: {', '.join(codec_names())}.") from None
+
+
+def codec_names() -> list[str]:
+    return sorted(_CODECS)
+
+
+def encode_frames(frames: np.ndarray, codec: Optional[str] = None) -> bytes:
+    return get_codec(codec).encode(frames)
+
+
+def decode_frames(blob: bytes, codec: Optional[str] = None) -> np.ndarray:
+    """Decode a stored BLOB to (n, 24, 32) float32 frames; see FrameCodec.decode."""
+    return get_codec(codec).decode(blob)
+
+
+for _values in ("f32", "i16"):
+    for _delta in ((False, True) if _values == "i16" else (False,)):
+        for _compressor in (None, "zlib", "lzma"):
+            register_codec(LayeredCodec(_values, _delta, _compressor))
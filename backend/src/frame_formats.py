@@ -0,0 +1,134 @@
+"""
+frame_formats.py
+
+Binary wire formats for frame responses of IR Thermal Monitoring System.
+
+Frame endpoints answer with JSON (or CSV for exports) unless the Accept header prefers
+application/octet-stream, optionally with a dtype parameter:
+
+    application/octet-stream                  float32 (same as dtype=float32)
+    application/octet-stream; dtype=float16   float16, about 0.01-0.03 degC resolution
+    application/octet-stream; dtype=int16     int16 centi-degrees (value * 0.01 degC),
+                                              -32768 for NaN
+
+The body is a sequence of fixed-size little-endian records, one per frame: the capture
+time as float64 epoch seconds followed by the 24 x 32 values, row-major. Records are
+streamed as frames are read, so the frame count is body length / X-Frame-Record-Bytes.
+Response headers describe the layout: X-Frame-Dtype, X-Frame-Height, X-Frame-Width,
+X-Frame-Scale (degC per unit), X-Frame-Nodata (int16 only) and X-Frame-Record-Bytes.
+"""
+from typing import Optional
+
+import numpy as np
+
+from .frame_codecs import get_codec
+from .thermal_frame import FRAME_HEIGHT, FRAME_SHAPE, FRAME_WIDTH
+
+BINARY_MEDIA_TYPE = "application/octet-stream"
+TIMESTAMP_DTYPE = np.dtype("<f8")
+
+
+class FrameFormatError(ValueError):
+    """Raised when an Accept header asks for a binary frame dtype that is not supported."""
+
+
+class FrameFormat:
+    """One binary record layout: a float64 timestamp and a frame of dtype values."""
+    def __init__(self, name: str, dtype: str, scale: float = 1.0, nodata: Optional[int] = None) -> None:
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        self.scale = scale
+        self.nodata = nodata
+        self.record_dtype = np.dtype([("timestamp", TIMESTAMP_DTYPE), ("frame", self.dtype, FRAME_SHAPE)])
+
+    @property
+    def media_type(self) -> str:
+        return f"{BINARY_MEDIA_TYPE}; dtype={self.name}"
+
+    @property
+    def record_bytes(self) -> int:
+        return self.record_dtype.itemsize
+
+    def headers(self) -> dict[str, str]:
+        headers = {
+            "X-Frame-Dtype": self.name,
+            "X-Frame-Height": str(FRAME_HEIGHT),
+            "X-Frame-Width": str(FRAME_WIDTH),
+            "X-Frame-Scale": repr(self.scale),
+            "X-Frame-Record-Bytes": str(self.record_bytes),
+            "Vary": "Accept",
+        }
+        if self.nodata is not None:
+            headers["X-Frame-Nodata"] = str(self.nodata)
+        return headers
+
+    def encode(self, timestamps: np.ndarray, frames: np.ndarray) -> bytes:
+        """
+        Records for (n,) epoch-second timestamps and (n, 24, 32) frames.
+
+        Raises:
+            ValueError: If timestamps and frames differ in length.
+        """
+        frames = np.asarray(frames, dtype=np.float32).reshape((-1,) + FRAME_SHAPE)
+        if len(timestamps) != len(frames):
+            raise ValueError("timestamps and frames must have the same length.")
+        records = np.empty(len(frames), dtype=self.record_dtype)
+        records["timestamp"] = timestamps
+        if self.name == "int16":
+            # Same centi-degree rounding, clipping and NaN code as stored i16 frames
+            records["frame"] = np.frombuffer(get_codec("i16").encode(frames), dtype=self.dtype).reshape(frames.shape)
+        else:
+            records["frame"] = frames
+        return records.tobytes()
+
+    def decode(self, body: bytes) -> tuple[np.ndarray, np.ndarray]:
+        """(timestamps, (n, 24, 32) float32 frames in degC) from a response body; NaN for nodata."""
+        records = np.frombuffer(body, dtype=self.record_dtype)
+        values = records["frame"].astype(np.float32)
+        if self.nodata is not None:
+            values[records["frame"] == self.nodata] = np.nan
+        if self.scale != 1.0:
+            values *= np.float32(self.scale)
+        return records["timestamp"].copy(), values
+
+
+FRAME_FORMATS = {
+    "float32": FrameFormat("float32", "<f4"),
+    "float16": FrameFormat("float16", "<f2"),
+    "int16": FrameFormat("int16", "<i2", scale=0.01, nodata=int(np.iinfo(np.int16).min)),
+}
+
+
+def negotiate_frame_format(accept: Optional[str]) -> Optional[FrameFormat]:
+    """
+    The binary format an Accept header prefers, or None for the endpoint's default
+    representation (JSON or CSV). The entry with the highest q wins, the first listed on
+    ties; binary is used only if that entry is application/octet-stream.
+
+    Raises:
+        FrameFormatError: If the preferred octet-stream entry names an unsupported dtype.
+    """
+    if not accept:
+        return None
+    best: Optional[tuple[float, str, str]] = None
+    for entry in accept.split(","):
+        media_type, _, params = entry.partition(";")
+        q, dtype = 1.0, "float32"
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            key, value = key.strip().lower(), value.strip().strip('"').lower()
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+            elif key == "dtype":
+                dtype = value
+        if q > 0 and (best is None or q > best[0]):
+            best = (q, media_type.strip().lower(), dtype)
+    if best is None or best[1] != BINARY_MEDIA_TYPE:
+        return None
+    try:
+        return FRAME_FORMATS[best[2]]
+    except KeyError:
+        raise FrameFormatError(f"Unsupported frame dtype {best[2]!r}; available: {', '.join(FRAME_FORMATS)}.") from None
@@ -4,133 +4,340 @@ frames.py
 Event-triggered frame storage for IR Thermal Monitoring System.
 """
 import threading
-from collections import deque
-from typing import List, Tuple, Protocol, runtime_checkable, Any
+import time
+from functools import partial
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple, Protocol, Union, runtime_checkable, Any
 import logging
 from types import TracebackType
 import numpy as np
+from .thermal_frame import FRAME_SHAPE, FrameLike, ThermalFrame, as_frame_array, frame_from_bytes, frame_to_bytes
+from .clips import clip_chunk_row, write_clip_chunks
+from .frame_codecs import RAW_CODEC, get_codec
+from .timeseries import ZoneSeries
+from .writer import BatchWriter
+
+ThermalData = Union[ZoneSeries, List[dict]]
+
+class FrameRingBuffer:
+    """
+    Preallocated ring of (capacity, 24, 32) float32 frames with a parallel int64 timestamp array.
+    Writes are O(1) copies into the ring with no per-frame allocation. Readers take no lock:
+    a sequence-number check after copying drops any frames the writer overwrote meanwhile.
+    """
+    def __init__(self, capacity: int) -> None:
+        if capacity <= 0:
+            raise ValueError("Ring buffer capacity must be positive.")
+        self.capacity = capacity
+        self.frames = np.zeros((capacity,) + FRAME_SHAPE, dtype=np.float32)
+        self.timestamps = np.zeros(capacity, dtype=np.int64)  # epoch nanoseconds
+        self.labels: list[Optional[str]] = [None] * capacity
+        self._write_seq = 0   # logical index of the next frame; frames < _write_seq are complete
+        self._claimed_seq = 0  # bumped before a slot is written; frames < _claimed_seq - capacity may be torn
+        self._start_seq = 0   # oldest logical index still visible (moved by clear())
+        self._write_lock = threading.Lock()  # serialises writers only
+
+    def write(self, frame: FrameLike, timestamp_ns: int, label: Optional[str] = None) -> None:
+        """Copy one frame into the next slot, overwriting the oldest once full."""
+        arr = as_frame_array(frame)
+        with self._write_lock:
+            seq = self._write_seq
+            slot = seq % self.capacity
+            self._claimed_seq = seq + 1
+            self.frames[slot] = arr
+            self.timestamps[slot] = timestamp_ns
+            self.labels[slot] = label
+            self._write_seq = seq + 1
+
+    def snapshot(self, n: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, list[Optional[str]]]:
+        """
+        Copy the most recent n frames (all retained frames if n is None), oldest first.
+
+        Returns:
+            Tuple of (timestamps_ns, frames, labels); frames is one contiguous (k, 24, 32) array.
+        """
+        end = self._write_seq
+        start = max(self._start_seq, end - self.capacity)
+        if n is not None:
+            start = max(start, end - n)
+        if end <= start:
+            return np.empty(0, dtype=np.int64), np.empty((0,) + FRAME_SHAPE, dtype=np.float32), []
+        first, last = start % self.capacity, (end - 1) % self.capacity
+        if first <= last:
+            frames = self.frames[first:last + 1].copy()
+            timestamps = self.timestamps[first:last + 1].copy()
+            labels = self.labels[first:last + 1]
+        else:
+            frames = np.concatenate((self.frames[first:], self.frames[:last + 1]))
+            timestamps = np.concatenate((self.timestamps[first:], self.timestamps[:last + 1]))
+            labels = self.labels[first:] + self.labels[:last + 1]
+        # Any frame the writer lapped while we were copying is discarded (oldest first).
+        torn = self._claimed_seq - self.capacity - start
+        if torn > 0:
+            frames, timestamps, labels = frames[torn:], timestamps[torn:], labels[torn:]
+        return timestamps, frames, labels
+
+    def clear(self) -> None:
+        with self._write_lock:
+            self._start_seq = self._write_seq
+
+    def __len__(self) -> int:
+        end = self._write_seq
+        return end - max(self._start_seq, end - self.capacity)
+
 
 class ThermalFrameBuffer:
     """
-    Circular buffer for pre-alarm frame storage in memory.
-    Thread-safe for concurrent access.
+    Circular buffer for pre-alarm frame storage in memory, backed by a FrameRingBuffer.
+    Thread-safe for one capture writer and any number of lock-free readers.
     """
     def __init__(self, capacity: int):
         self.capacity = capacity
-        self.buffer: deque[Tuple[str, List[float]]] = deque(maxlen=capacity)
-        self.lock = threading.Lock()
+        self.ring = FrameRingBuffer(capacity)
 
-    def append(self, frame: List[float], timestamp: str) -> None:
-        with self.lock:
-            self.buffer.append((timestamp, frame.copy()))
-            logging.debug("Frame appended at %s. Buffer size: %d", timestamp, len(self.buffer))
+    def append(self, frame: FrameLike, timestamp: str) -> None:
+        self.ring.write(frame, _timestamp_ns(frame, timestamp), timestamp)
+        logging.debug("Frame appended at %s. Buffer size: %d", timestamp, len(self.ring))
+
+    def snapshot(self, n: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, list[Optional[str]]]:
+        """Return (timestamps_ns, frames, timestamp strings) for the last n frames in one copy."""
+        return self.ring.snapshot(n)
 
-    def get_all(self) -> List[Tuple[str, List[float]]]:
-        with self.lock:
-            return list(self.buffer)
+    def get_all(self) -> List[Tuple[str, np.ndarray]]:
+        _, frames, labels = self.ring.snapshot()
+        return [(label or "", frame) for label, frame in zip(labels, frames)]
 
     def clear(self) -> None:
-        with self.lock:
-            self.buffer.clear()
-            logging.info("ThermalFrameBuffer cleared.")
+        self.ring.clear()
+        logging.info("ThermalFrameBuffer cleared.")
 
     def __len__(self) -> int:
-        with self.lock:
-            return len(self.buffer)
+        return len(self.ring)
+
+def _timestamp_ns(frame: FrameLike, timestamp: str) -> int:
+    """Capture time of frame in epoch nanoseconds, from the frame itself when it carries one."""
+    if isinstance(frame, ThermalFrame):
+        return int(frame.timestamp * 1e9)
+    return _iso_to_ns(timestamp)
+
+def _iso_to_ns(timestamp: str) -> int:
+    """Parse an ISO-8601 timestamp (naive means UTC) to epoch nanoseconds; unparsable means now."""
+    try:
+        parsed = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return time.time_ns()
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1e9)
 
 @runtime_checkable
 class DBProtocol(Protocol):
     def transaction(self) -> Any: ...
     def execute_query(self, query: str, params: tuple = ...) -> object: ...
+    def executemany(self, query: str, params_seq: Any) -> object: ...
     def __enter__(self) -> Any: ...
     def __exit__(self, exc_type: type[BaseException] | None, exc_val: BaseException | None, exc_tb: TracebackType | None) -> None: ...
 
+def _write_frame_batches(db: DBProtocol, items: list[tuple], codec: str = RAW_CODEC) -> None:
+    """
+    Encode queued items with codec and insert them with one executemany per table:
+    ("frames", timestamps, frames, event_id) rows go to thermal_frames, one per frame;
+    ("clip", event_id, first_offset, timestamps_ns, frames) chunks go to event_clips.
+    """
+    encoder = get_codec(codec)
+    frame_rows = []
+    clip_rows = []
+    for item in items:
+        if item[0] == "clip":
+            clip_rows.append(clip_chunk_row(*item[1:], codec=codec))
+        else:
+            _, timestamps, frames, event_id = item
+            frame_rows += [
+                (event_id, timestamp, encoder.encode(frame), frame.size, codec)
+                for timestamp, frame in zip(timestamps, frames)
+            ]
+    if frame_rows:
+        db.executemany("INSERT INTO thermal_frames (event_id, timestamp, frame, frame_size, codec) VALUES (?, ?, ?, ?, ?)", frame_rows)
+    if clip_rows:
+        write_clip_chunks(db, clip_rows)
+
 class EventTriggeredStorage:
     """
     Main storage coordinator for alarm events.
-    Persists pre-event buffer and post-event frames to DB.
+    Persists pre-event buffer and post-event frames to DB through a BatchWriter thread, so
+    the capture path only copies frames into a bounded queue. The writer commits on its own
+    connection, so a failed batch rolls back only its own clip rows. Until start() is called
+    (or after stop()), frames are written on the caller's thread.
+
+    With clip_chunk_frames set, an event's frames are stored as an event clip (see clips.py):
+    chunks of that many frames per event_clips row instead of one thermal_frames row each.
+    Frames are encoded with the named frame codec (see frame_codecs.py) on the writer thread.
     """
-    def __init__(self, buffer: ThermalFrameBuffer, db: DBProtocol, post_event_frames: int = 20) -> None:
+    def __init__(self, buffer: ThermalFrameBuffer, db: DBProtocol, post_event_frames: int = 20,
+                 flush_interval: float = 1.0, max_queue: int = 10000, clip_chunk_frames: Optional[int] = None,
+                 codec: str = RAW_CODEC) -> None:
+        if clip_chunk_frames is not None and clip_chunk_frames <= 0:
+            raise ValueError("clip_chunk_frames must be positive.")
         self.buffer = buffer
         self.db = db
         self.post_event_frames = post_event_frames
+        self.clip_chunk_frames = clip_chunk_frames
+        self.codec = get_codec(codec).name
+        self.writer = BatchWriter(db, partial(_write_frame_batches, codec=self.codec), name="frame-writer",
+                                  flush_interval=flush_interval, max_queue=max_queue)
+        self.frames_queued = 0
+        self.event_id: Optional[int] = None
         self._post_event_count = 0
         self._event_active = False
+        self._clip_offset = 0  # clip offset of the first pending frame
+        self._clip_timestamps: list[np.ndarray] = []
+        self._clip_frames: list[np.ndarray] = []
+        self._clip_pending = 0
         self._lock = threading.Lock()
 
-    def record_frame(self, frame: list[float], timestamp: str) -> None:
+    def start(self) -> None:
+        """Start the background frame writer."""
+        self.writer.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Write every queued frame (including a partial clip chunk), then stop the background writer."""
+        with self._lock:
+            self._flush_clip(final=True)
+        self.writer.stop(timeout)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until every frame queued so far is committed (True if drained within timeout)."""
+        return self.writer.flush(timeout)
+
+    def stats(self) -> dict[str, Any]:
+        """Writer queue depth and commit latency plus event state."""
+        stats = self.writer.stats()
+        stats.update(frames_queued=self.frames_queued, event_active=self._event_active, buffered_frames=len(self.buffer))
+        return stats
+
+    def record_frame(self, frame: FrameLike, timestamp: str | None = None) -> None:
+        if timestamp is None:
+            if not isinstance(frame, ThermalFrame):
+                raise ValueError("timestamp is required for frames without capture time.")
+            timestamp = frame.isoformat()
         self.buffer.append(frame, timestamp)
         with self._lock:
             if self._event_active:
                 self._post_event_count -= 1
-                self._persist_frame(frame, timestamp)
+                # Copy: the caller may reuse its array before the writer serialises it
+                frames = np.array(as_frame_array(frame), dtype=np.float32)[np.newaxis]
+                if self.clip_chunk_frames:
+                    self._append_clip(np.array([_timestamp_ns(frame, timestamp)], dtype=np.int64), frames)
+                else:
+                    self._enqueue(("frames", [timestamp], frames, self.event_id), 1)
                 if self._post_event_count <= 0:
                     self._event_active = False
+                    self._flush_clip(final=True)
                     self.buffer.clear()
             logging.debug("Frame appended at %s. Buffer size: %d", timestamp, len(self.buffer))
 
-    def trigger_event(self) -> None:
+    def trigger_event(self, event_id: Optional[int] = None) -> None:
+        """
+        Persist the buffered pre-event frames and start recording post-event frames.
+
+        Args:
+            event_id: alarm_events row the stored frames are linked to.
+        """
         with self._lock:
             if self._event_active:
                 logging.warning("Event already active; ignoring trigger.")
                 return
-            # Persist pre-event frames
-            for ts, frame in self.buffer.get_all():
-                self._persist_frame(frame, ts)
+            self.event_id = event_id
+            # Pre-event frames go to the writer as one batch from a single buffer snapshot
+            timestamps_ns, frames, labels = self.buffer.snapshot()
+            if self.clip_chunk_frames:
+                self._clip_offset = 0
+                self._append_clip(timestamps_ns, frames)
+            elif len(frames):
+                self._enqueue(("frames", [label or "" for label in labels], frames, event_id), len(frames))
             self._event_active = True
             self._post_event_count = self.post_event_frames
-            logging.info("Event triggered: persisting %d pre-event frames and %d post-event frames.", len(self.buffer.get_all()), self.post_event_frames)
-
-    def _persist_frame(self, frame: list[float], timestamp: str) -> None:
-        try:
-            with self.db.transaction():
-                self.db.execute_query(
-                    "INSERT INTO thermal_frames (timestamp, frame, frame_size) VALUES (?, ?, ?)",
-                    (timestamp, self._serialize_frame(frame), len(frame)),
-                )
-            logging.debug("Frame persisted at %s.", timestamp)
-        except (AttributeError, RuntimeError, ValueError) as exc:
-            logging.error("Failed to persist frame: %s", exc)
+            logging.info("Event %s triggered: persisting %d pre-event frames and %d post-event frames.", event_id, len(frames), self.post_event_frames)
+
+    def _append_clip(self, timestamps_ns: np.ndarray, frames: np.ndarray) -> None:
+        """Add frames to the pending clip chunk, queueing every chunk that fills up."""
+        if len(frames) == 0:
+            return
+        self._clip_timestamps.append(timestamps_ns)
+        self._clip_frames.append(frames)
+        self._clip_pending += len(frames)
+        if self._clip_pending >= (self.clip_chunk_frames or 0):
+            self._flush_clip(final=False)
+
+    def _flush_clip(self, final: bool) -> None:
+        """Queue full chunks of pending clip frames (and the remainder when final)."""
+        if not self._clip_pending:
+            return
+        chunk = self.clip_chunk_frames or self._clip_pending
+        timestamps = np.concatenate(self._clip_timestamps)
+        frames = np.concatenate(self._clip_frames)
+        ready = len(frames) if final else len(frames) - len(frames) % chunk
+        for start in range(0, ready, chunk):
+            part = slice(start, min(start + chunk, ready))
+            count = part.stop - part.start
+            self._enqueue(("clip", self.event_id, self._clip_offset, timestamps[part], frames[part]), count)
+            self._clip_offset += count
+        self._clip_timestamps = [timestamps[ready:]] if ready < len(frames) else []
+        self._clip_frames = [frames[ready:]] if ready < len(frames) else []
+        self._clip_pending = len(frames) - ready
+
+    def _enqueue(self, item: tuple, frame_count: int) -> None:
+        # Never block the capture thread; the writer counts and logs dropped batches
+        if self.writer.submit(item, timeout=0):
+            self.frames_queued += frame_count
+        if not self.writer.running:
+            self.writer.flush()
 
     @staticmethod
-    def _serialize_frame(frame: list[float]) -> bytes:
-        import struct
-        return struct.pack(f"{len(frame)}f", *frame)
+    def _serialize_frame(frame: FrameLike) -> bytes:
+        return frame_to_bytes(frame)
+
+    @staticmethod
+    def _deserialize_frame(blob: bytes) -> np.ndarray:
+        return frame_from_bytes(blob)
+
+def _temperatures(thermal_data: ThermalData) -> np.ndarray:
+    if isinstance(thermal_data, ZoneSeries):
+        return thermal_data.temperatures
+    return np.array([d["temperature"] for d in thermal_data], dtype=np.float64)
 
-def compute_heatmap(thermal_data: list[dict], width: int, height: int) -> list[list[float]]:
+def compute_heatmap(thermal_data: ThermalData, width: int, height: int) -> list[list[float]]:
     """Aggregate temperature data into a heatmap grid."""
-    # For demo: assume each data point is for a pixel (x, y) in the grid, or just average per grid cell
-    # Here, we just fill the grid with average temperature for simplicity
-    if not thermal_data:
-        return [[0.0 for _ in range(width)] for _ in range(height)]
-    temps = [d["temperature"] for d in thermal_data]
-    avg = float(np.mean(temps)) if temps else 0.0
-    return [[avg for _ in range(width)] for _ in range(height)]
-
-def compute_trend(thermal_data: list[dict]) -> tuple[list[str], list[float]]:
+    # Samples carry no pixel position, so every cell holds the mean temperature of the range
+    temps = _temperatures(thermal_data)
+    avg = float(np.nanmean(temps)) if len(temps) and not np.isnan(temps).all() else 0.0
+    return np.full((height, width), avg).tolist()
+
+def compute_trend(thermal_data: ThermalData) -> tuple[list[str], list[float]]:
     """Return time series of average temperature."""
-    if not thermal_data:
-        return [], []
-    timestamps = [d["timestamp"] for d in thermal_data]
-    values = [d["temperature"] for d in thermal_data]
-    return timestamps, values
-
-def detect_anomalies(thermal_data: list[dict], z_thresh: float = 2.5) -> list[dict]:
-    """Detect anomalies in temperature using z-score."""
-    if not thermal_data:
-        return []
-    temps = np.array([d["temperature"] for d in thermal_data])
-    mean = np.mean(temps)
-    std = np.std(temps)
-    anomalies = []
-    for d in thermal_data:
-        if std > 0 and abs((d["temperature"] - mean) / std) > z_thresh:
-            anomalies.append(d)
-    return anomalies
-
-def get_frame_stats(frame_bytes: bytes) -> dict:
-    import numpy as np
-    arr = np.frombuffer(frame_bytes, dtype=np.float32)
+    if isinstance(thermal_data, ZoneSeries):
+        return thermal_data.isoformat(), thermal_data.temperatures.tolist()
+    return [d["timestamp"] for d in thermal_data], [d["temperature"] for d in thermal_data]
+
+def anomaly_mask(temperatures: np.ndarray, z_thresh: float = 2.5) -> np.ndarray:
+    """Boolean mask of temperatures whose z-score against the whole array exceeds z_thresh."""
+    if not len(temperatures) or np.isnan(temperatures).all():
+        return np.zeros(len(temperatures), dtype=bool)
+    mean, std = np.nanmean(temperatures), np.nanstd(temperatures)
+    if std == 0:
+        return np.zeros(len(temperatures), dtype=bool)
+    return np.abs(temperatures - mean) > z_thresh * std
+
+def detect_anomalies(thermal_data: ThermalData, z_thresh: float = 2.5) -> list[dict]:
+    """Detect anomalies in temperature using z-score. Returns the anomalous samples as dicts."""
+    mask = anomaly_mask(_temperatures(thermal_data), z_thresh)
+    if isinstance(thermal_data, ZoneSeries):
+        return thermal_data.take(mask).to_rows()
+    return [thermal_data[i] for i in np.flatnonzero(mask)]
+
+def get_frame_stats(frame_bytes: bytes, codec: Optional[str] = None) -> dict:
+    """Mean/min/max/std of a stored frame BLOB, decoded with its codec (None is raw float32)."""
+    arr = get_codec(codec).decode_values(frame_bytes)
     return {
         "mean": float(np.mean(arr)) if arr.size else 0.0,
         "min": float(np.min(arr)) if arr.size else 0.0,
@@ -1,26 +1,96 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Path
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Header, Path, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
 from dotenv import load_dotenv
 from pydantic import BaseModel
 from typing import List, Optional
+from datetime import datetime, timezone
 import os
+import tempfile
 os.environ['MOCK_SENSOR'] = '1'
 from backend.src.sensor import ThermalSensor, MockThermalSensor
-from backend.src.zones import ZonesManager
+from backend.src.zones import ZonesManager, get_zone_registry
 from backend.src.database import Database
-from backend.src.alarms import AlarmManager
-from backend.src.frames import compute_heatmap, compute_trend, detect_anomalies
+from backend.src.downsample import DEFAULT_MAX_POINTS, downsample_indices
+from backend.src.alarms import AlarmManager, get_alarm_registry
+from backend.src.animation import ANIMATION_FORMATS, apng_stream, gif_stream, timed_frames
+from backend.src.anomaly import ANOMALY_EVENT_TYPE, DAY_SECONDS, AnomalyDetector
+from backend.src.broadcast import DEFAULT_QUEUE_SIZE, FrameBroadcaster, sse_events
+from backend.src.clips import CLIP_CHUNK_FRAMES, clip_timestamps, event_data_version, event_frame_count, has_clip, iter_clip_chunks, ns_to_iso, read_event_frames
+from backend.src.frame_codecs import DEFAULT_CODEC, CodecError, get_codec
+from backend.src.frame_formats import FrameFormat, FrameFormatError, negotiate_frame_format
+from backend.src.frames import EventTriggeredStorage, ThermalFrameBuffer, anomaly_mask, compute_heatmap, compute_trend, detect_anomalies
+from backend.src.acquisition import AcquisitionService
+from backend.src.pipeline import FrameProcessor
+from backend.src.rollups import (
+    DEFAULT_POINTS, RAW_RESOLUTION, RESOLUTION_NAMES, bucket_series, choose_resolution, ensure_rollups, epoch_to_iso,
+    iso_to_epoch, parse_resolution, range_summary,
+)
+from backend.src.pixel_rollups import PixelRollupWriter, pixel_stats
+from backend.src.recording import SegmentRecorder, list_segments, recover_segments
+from backend.src.render import (
+    COLORMAPS, IMAGE_FORMATS, INTERPOLATIONS, MAX_SCALE, SCALINGS, LiveImageRenderer, RenderCache, cache_key, encode_jpeg, encode_png,
+    parse_color, render_indexed, render_palette,
+)
+from backend.src.retention import RetentionJob
+from backend.src.timeseries import ZoneSeries, ZoneSeriesWriter, fetch_zone_series
+from backend.src.thermal_frame import FRAME_HEIGHT, FRAME_PIXELS, FRAME_WIDTH, ThermalFrame
+import asyncio
 import sys
 import argparse
+import threading
+from contextlib import asynccontextmanager
 from functools import lru_cache
+from typing import AsyncIterator, Iterator
 import logging
 import csv
+import numpy as np
 
 load_dotenv()
 
-app = FastAPI(title="IR Thermal Monitoring API", version="1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Start the background acquisition loop and frame pipeline for the lifetime of the app."""
+    acquisition = get_acquisition_singleton()
+    alarms = get_alarm_registry(get_db())
+    ensure_rollups(get_db())
+    get_pipeline_singleton()
+    anomalies = get_anomaly_detector_singleton()
+    recorder = get_recorder_singleton()
+    storage = get_event_storage_singleton()
+    series = get_zone_series_singleton()
+    pixels = get_pixel_rollup_singleton()
+    retention = get_retention_singleton()
+    broadcaster = get_broadcaster()
+    alarms.start_persistence()
+    storage.start()
+    series.start()
+    pixels.start()
+    retention.start()
+    if anomalies is not None:
+        anomalies.start()
+    alarms.start_notifications()
+    alarms.start_webhooks()
+    acquisition.start()
+    try:
+        yield
+    finally:
+        acquisition.stop()
+        broadcaster.close()
+        alarms.stop_webhooks()
+        alarms.stop_notifications()
+        if anomalies is not None:
+            anomalies.stop()
+        retention.stop()
+        pixels.stop()
+        series.stop()
+        storage.stop()
+        if recorder is not None:
+            recorder.close()
+        alarms.stop_persistence()
+
+app = FastAPI(title="IR Thermal Monitoring API", version="1.0", lifespan=lifespan)
 
 # CORS middleware must be added before any other middleware
 app.add_middleware(
@@ -62,10 +132,10 @@ def get_db() -> Database:
     return db
 
 def get_zones_manager(db: Database = Depends(get_db)) -> ZonesManager:
-    return ZonesManager(db)
+    return get_zone_registry(db)
 
 def get_alarm_manager(db: Database = Depends(get_db)) -> AlarmManager:
-    return AlarmManager(db)
+    return get_alarm_registry(db)
 
 # --- Pydantic Models ---
 class ZoneRequest(BaseModel):
@@ -103,11 +173,33 @@ class ZoneResponse(BaseModel):
 class ThermalFrameResponse(BaseModel):
     timestamp: str
     frame: List[float]
+    age_seconds: Optional[float] = None
+
+class AcquisitionStatusResponse(BaseModel):
+    running: bool
+    frames_captured: int
+    read_errors: int
+    last_error: Optional[str] = None
+    frame_age_seconds: Optional[float] = None
+    capture_rate_hz: float
+    target_rate_hz: float
 
 class ZoneAverageResponse(BaseModel):
     zone_id: int
     average: float
 
+class ZoneStatsEntry(BaseModel):
+    zone_id: int
+    average: float
+    min: float
+    max: float
+    std: float
+    pixel_count: int
+
+class ZoneStatsResponse(BaseModel):
+    timestamp: str
+    zones: List[ZoneStatsEntry]
+
 class NotificationRequest(BaseModel):
     name: str
     type: str  # 'email', 'webhook', 'sms'
@@ -122,6 +214,15 @@ class NotificationResponse(BaseModel):
     enabled: bool
     created_at: str
 
+class WebhookDeadLetterResponse(BaseModel):
+    id: int
+    notification_id: Optional[int]
+    url: str
+    payload: str
+    error: Optional[str]
+    attempts: Optional[int]
+    created_at: str
+
 class EventFrameResponse(BaseModel):
     id: int
     event_id: int
@@ -145,12 +246,20 @@ class HeatmapRequest(BaseModel):
     zone_id: Optional[int] = None
 
 class HeatmapResponse(BaseModel):
-    heatmap: list[list[float]]
+    heatmap: list[list[Optional[float]]]  # per-pixel mean; null where a pixel has no samples
     width: int
     height: int
     start_time: str
     end_time: str
     zone_id: Optional[int] = None
+    max: Optional[list[list[Optional[float]]]] = None
+    std: Optional[list[list[Optional[float]]]] = None
+    x: int = 0  # position of the grid within the frame
+    y: int = 0
+    frames: int = 0
+    source: str = "pixels"  # "pixels" (pixel_rollups) or "zones" (flat zone average)
+    covered_start: Optional[str] = None  # hour-aligned span of the merged buckets
+    covered_end: Optional[str] = None
 
 class TrendRequest(BaseModel):
     start_time: str
@@ -161,6 +270,8 @@ class TrendResponse(BaseModel):
     timestamps: list[str]
     values: list[float]
     zone_id: Optional[int] = None
+    resolution: str = "raw"
+    source_points: int = 0  # samples in the range before downsampling to max_points
 
 class AnomalyRequest(BaseModel):
     start_time: str
@@ -170,6 +281,7 @@ class AnomalyRequest(BaseModel):
 class AnomalyResponse(BaseModel):
     anomalies: list[dict]
     zone_id: Optional[int] = None
+    resolution: str = "raw"
 
 class ReportResponse(BaseModel):
     report_type: str
@@ -179,7 +291,7 @@ class ReportResponse(BaseModel):
     summary: dict
 
 class AlarmEventResponse(BaseModel):
-    alarm_id: int
+    alarm_id: Optional[int] = None
     zone_id: int
     temperature: float
     timestamp: str
@@ -201,17 +313,350 @@ def get_sensor_singleton() -> ThermalSensor | MockThermalSensor:
 def get_sensor() -> ThermalSensor | MockThermalSensor:
     return get_sensor_singleton()
 
+DEFAULT_CAPTURE_INTERVAL = 1.0
+DEFAULT_FRAME_BUFFER_MINUTES = 10
+DEFAULT_ZONE_SERIES_FLUSH_INTERVAL = 5.0
+DEFAULT_ZONE_SERIES_BATCH_SIZE = 1000
+DEFAULT_RETENTION_INTERVAL_MINUTES = 60.0
+DEFAULT_PIXEL_ROLLUP_FLUSH_INTERVAL = 60.0
+DEFAULT_RENDER_CACHE_MEMORY_MB = 32.0
+DEFAULT_RENDER_CACHE_DISK_MB = 256.0
+DEFAULT_ANOMALY_Z_THRESHOLD = 5.0
+DEFAULT_ANOMALY_EWMA_ALPHA = 0.01
+DEFAULT_ANOMALY_COOLDOWN = 300.0
+DEFAULT_ANOMALY_CHECKPOINT_INTERVAL = 300.0
+
+def get_capture_interval(db: Database) -> float:
+    """Read the capture_interval setting (seconds), falling back to the default if missing or invalid."""
+    setting = db.get_setting("capture_interval")
+    try:
+        interval = float(setting["value"]) if setting else DEFAULT_CAPTURE_INTERVAL
+    except ValueError:
+        logging.warning("Invalid capture_interval setting %r; using %.1f s.", setting, DEFAULT_CAPTURE_INTERVAL)
+        return DEFAULT_CAPTURE_INTERVAL
+    if interval <= 0:
+        logging.warning("Non-positive capture_interval %.3f; using %.1f s.", interval, DEFAULT_CAPTURE_INTERVAL)
+        return DEFAULT_CAPTURE_INTERVAL
+    return interval
+
+@lru_cache()
+def get_acquisition_singleton() -> AcquisitionService:
+    return AcquisitionService(get_sensor_singleton(), interval=get_capture_interval(get_db()))
+
+def get_frame_buffer_capacity(db: Database) -> int:
+    """Pre-event buffer length in frames: frame_buffer_minutes of capture at capture_interval."""
+    setting = db.get_setting("frame_buffer_minutes")
+    try:
+        minutes = float(setting["value"]) if setting else DEFAULT_FRAME_BUFFER_MINUTES
+    except ValueError:
+        logging.warning("Invalid frame_buffer_minutes setting %r; using %d.", setting, DEFAULT_FRAME_BUFFER_MINUTES)
+        minutes = DEFAULT_FRAME_BUFFER_MINUTES
+    return max(1, int(minutes * 60 / get_capture_interval(db)))
+
+def get_frame_codec(db: Database) -> str:
+    """Codec for newly stored event frames, from the frame_codec setting."""
+    setting = db.get_setting("frame_codec")
+    try:
+        return get_codec(setting["value"] if setting else DEFAULT_CODEC).name
+    except CodecError as e:
+        logging.warning("Invalid frame_codec setting: %s Using %s.", e, DEFAULT_CODEC)
+        return DEFAULT_CODEC
+
+@lru_cache
+def get_event_storage_singleton() -> EventTriggeredStorage:
+    db = get_db()
+    return EventTriggeredStorage(ThermalFrameBuffer(get_frame_buffer_capacity(db)), db, clip_chunk_frames=CLIP_CHUNK_FRAMES,
+                                 codec=get_frame_codec(db))
+
+def get_positive_setting(db: Database, key: str, default: float) -> float:
+    """Read a positive numeric setting, falling back to default if missing or invalid."""
+    setting = db.get_setting(key)
+    try:
+        value = float(setting["value"]) if setting else default
+    except ValueError:
+        logging.warning("Invalid %s setting %r; using %s.", key, setting, default)
+        return default
+    if value <= 0:
+        logging.warning("Non-positive %s %s; using %s.", key, value, default)
+        return default
+    return value
+
+@lru_cache
+def get_zone_series_singleton() -> ZoneSeriesWriter:
+    db = get_db()
+    return ZoneSeriesWriter(
+        db,
+        flush_interval=get_positive_setting(db, "zone_series_flush_interval", DEFAULT_ZONE_SERIES_FLUSH_INTERVAL),
+        batch_size=int(get_positive_setting(db, "zone_series_batch_size", DEFAULT_ZONE_SERIES_BATCH_SIZE)),
+    )
+
+@lru_cache
+def get_pixel_rollup_singleton() -> PixelRollupWriter:
+    """Create the per-pixel heatmap accumulator and register it on the acquisition loop."""
+    db = get_db()
+    pixels = PixelRollupWriter(db, flush_interval=get_positive_setting(db, "pixel_rollup_flush_interval", DEFAULT_PIXEL_ROLLUP_FLUSH_INTERVAL))
+    get_acquisition_singleton().add_consumer(pixels)
+    return pixels
+
+@lru_cache
+def get_broadcaster() -> FrameBroadcaster:
+    """Create the live frame broadcaster and register it on the acquisition loop."""
+    broadcaster = FrameBroadcaster()
+    get_acquisition_singleton().add_consumer(broadcaster)
+    return broadcaster
+
+@lru_cache
+def get_live_image_renderer() -> LiveImageRenderer:
+    """Renderer of the latest frame shared by all clients of /api/v1/thermal/live/image."""
+    return LiveImageRenderer()
+
+@lru_cache
+def get_retention_singleton() -> RetentionJob:
+    db = get_db()
+    return RetentionJob(db, interval=get_positive_setting(db, "retention_interval_minutes", DEFAULT_RETENTION_INTERVAL_MINUTES) * 60)
+
+def get_retention() -> RetentionJob:
+    return get_retention_singleton()
+
+def get_bool_setting(db: Database, key: str) -> bool:
+    """True if the setting is one of 1/true/yes/on (case-insensitive)."""
+    setting = db.get_setting(key)
+    return bool(setting) and setting["value"].strip().lower() in ("1", "true", "yes", "on")
+
+@lru_cache
+def get_anomaly_detector_singleton() -> Optional[AnomalyDetector]:
+    """Create the online anomaly detector from its checkpoint, if anomaly_detection_enabled is set."""
+    db = get_db()
+    if not get_bool_setting(db, "anomaly_detection_enabled"):
+        return None
+    detector = AnomalyDetector(
+        get_alarm_registry(db),
+        z_threshold=get_positive_setting(db, "anomaly_z_threshold", DEFAULT_ANOMALY_Z_THRESHOLD),
+        alpha=min(get_positive_setting(db, "anomaly_ewma_alpha", DEFAULT_ANOMALY_EWMA_ALPHA), 1.0),
+        seasons=24 if get_bool_setting(db, "anomaly_seasonal") else 1,
+        season_period=DAY_SECONDS,
+        cooldown=get_positive_setting(db, "anomaly_cooldown", DEFAULT_ANOMALY_COOLDOWN),
+        checkpoint_interval=get_positive_setting(db, "anomaly_checkpoint_interval", DEFAULT_ANOMALY_CHECKPOINT_INTERVAL),
+    )
+    try:
+        detector.restore()
+    except Exception as e:
+        logging.error("Could not restore anomaly baselines: %s", e)
+    return detector
+
+@lru_cache
+def get_pipeline_singleton() -> FrameProcessor:
+    """Create the frame pipeline and register it on the acquisition loop."""
+    db = get_db()
+    pipeline = FrameProcessor(get_zone_registry(db), get_alarm_registry(db), storage=get_event_storage_singleton())
+    pipeline.add_sink(get_zone_series_singleton())
+    detector = get_anomaly_detector_singleton()
+    if detector is not None:
+        pipeline.add_sink(detector)
+    get_acquisition_singleton().add_consumer(pipeline)
+    return pipeline
+
+def get_recording_dir(db: Database) -> str:
+    """recording_dir setting, or a 'recordings' directory next to the database file."""
+    setting = db.get_setting("recording_dir")
+    if setting and setting["value"].strip():
+        return setting["value"].strip()
+    return os.path.join(os.path.dirname(os.path.abspath(db.db_path)), "recordings")
+
+@lru_cache
+def get_recorder_singleton() -> Optional[SegmentRecorder]:
+    """Create the continuous recorder and register it on the acquisition loop, if recording_enabled is set."""
+    db = get_db()
+    if not get_bool_setting(db, "recording_enabled"):
+        return None
+    recover_segments(db)
+    recorder = SegmentRecorder(db, get_recording_dir(db), get_capture_interval(db))
+    recorder.start()
+    get_acquisition_singleton().add_consumer(recorder)
+    return recorder
+
+def get_acquisition() -> AcquisitionService:
+    return get_acquisition_singleton()
+
+def parse_time_ns(value: str) -> int:
+    """ISO-8601 query parameter (naive means UTC) to epoch nanoseconds; 400 if unparsable."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid ISO-8601 time: {value!r}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1e9)
+
+def latest_frame_or_503(acquisition: AcquisitionService) -> ThermalFrame:
+    """Return the latest captured frame or raise 503 if none is available yet."""
+    latest = acquisition.latest()
+    if latest is None:
+        raise HTTPException(status_code=503, detail="No thermal frame captured yet; check /api/v1/thermal/acquisition")
+    return latest
+
+def get_frame_format(accept: Optional[str] = Header(None)) -> Optional[FrameFormat]:
+    """Binary frame format negotiated from the Accept header; None keeps the JSON/CSV default. 406 for unknown dtypes."""
+    try:
+        return negotiate_frame_format(accept)
+    except FrameFormatError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+def iter_frame_batches(db: Database, event_id: Optional[int] = None, legacy: bool = True) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """
+    Stored frames as (epoch-second timestamps, (n, 24, 32) frames) batches of at most
+    CLIP_CHUNK_FRAMES: legacy thermal_frames rows (if legacy) in timestamp order, then event
+    clip frames. All events if event_id is None.
+    """
+    if legacy:
+        query = "SELECT timestamp, frame, codec FROM thermal_frames"
+        params: tuple = ()
+        if event_id is not None:
+            query += " WHERE event_id = ?"
+            params = (event_id,)
+        for rows in db.iter_query_chunks(query + " ORDER BY timestamp ASC", params, chunk_rows=CLIP_CHUNK_FRAMES):
+            yield np.array([iso_to_epoch(row[0]) for row in rows]), np.stack([get_codec(row[2]).decode(row[1])[0] for row in rows])
+    for _, _, timestamps_ns, chunk in iter_clip_chunks(db, event_id):
+        yield timestamps_ns / 1e9, chunk
+
+def frame_records(db: Database, fmt: FrameFormat, event_id: Optional[int] = None, legacy: bool = True) -> Iterator[bytes]:
+    """Binary records of stored frames, a batch at a time (see iter_frame_batches)."""
+    for timestamps, frames in iter_frame_batches(db, event_id, legacy):
+        yield fmt.encode(timestamps, frames)
+
+def binary_frames_response(fmt: FrameFormat, db: Database, event_id: Optional[int] = None, legacy: bool = True) -> StreamingResponse:
+    return StreamingResponse(frame_records(db, fmt, event_id, legacy), media_type=fmt.media_type, headers=fmt.headers())
+
 # --- API Endpoints ---
 @app.get("/api/v1/thermal/real-time", response_model=ThermalFrameResponse)
-def get_real_time_frame(sensor: ThermalSensor | MockThermalSensor = Depends(get_sensor)) -> ThermalFrameResponse:
+def get_real_time_frame(acquisition: AcquisitionService = Depends(get_acquisition),
+                        fmt: Optional[FrameFormat] = Depends(get_frame_format)):
+    """Latest frame as JSON, or as one binary record when the Accept header asks for application/octet-stream."""
     try:
-        frame = sensor.read_frame()
-        from datetime import datetime
-        return ThermalFrameResponse(timestamp=datetime.utcnow().isoformat(), frame=frame)
+        frame = latest_frame_or_503(acquisition)
+        if fmt is not None:
+            headers = {**fmt.headers(), "X-Frame-Timestamp": frame.isoformat(), "X-Frame-Age-Seconds": f"{acquisition.frame_age():.3f}"}
+            return Response(fmt.encode(np.array([frame.timestamp]), frame.data), media_type=fmt.media_type, headers=headers)
+        return ThermalFrameResponse(timestamp=frame.isoformat(), frame=frame.tolist(), age_seconds=acquisition.frame_age())
+    except HTTPException:
+        raise
     except Exception as e:
         logging.exception("Error in get_real_time_frame")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.websocket("/api/v1/thermal/live")
+async def live_frames(websocket: WebSocket, queue_size: int = DEFAULT_QUEUE_SIZE,
+                      broadcaster: FrameBroadcaster = Depends(get_broadcaster)) -> None:
+    """Push every captured frame as a JSON text message; slow viewers skip stale frames."""
+    await websocket.accept()
+    subscription = broadcaster.subscribe(queue_size)
+
+    async def close_on_disconnect() -> None:
+        # Viewers only listen; a receive returns when the client goes away
+        try:
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+        finally:
+            subscription.close()
+
+    watcher = asyncio.create_task(close_on_disconnect())
+    try:
+        while (item := await subscription.get()) is not None:
+            await websocket.send_text(item.json())
+            subscription.sent += 1
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        watcher.cancel()
+        subscription.close()
+
+@app.get("/api/v1/thermal/live/events")
+async def live_frame_events(queue_size: int = DEFAULT_QUEUE_SIZE, broadcaster: FrameBroadcaster = Depends(get_broadcaster)) -> StreamingResponse:
+    """Server-Sent Events fallback of /api/v1/thermal/live: one 'frame' event per captured frame."""
+    return StreamingResponse(sse_events(broadcaster.subscribe(queue_size)), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/v1/thermal/live/status")
+def get_live_status() -> dict:
+    """Live viewers connected and frames published, encoded, sent and dropped; live image renders and hits."""
+    return {**get_broadcaster().stats(), "image": get_live_image_renderer().stats()}
+
+@app.get("/api/v1/thermal/live/image")
+def get_live_image(format: str = "png", colormap: str = "iron", vmin: Optional[float] = None, vmax: Optional[float] = None,
+                   zones: bool = False, scale: int = 10, interpolation: str = "bicubic", quality: int = 85,
+                   if_none_match: Optional[str] = Header(None), acquisition: AcquisitionService = Depends(get_acquisition),
+                   renderer: LiveImageRenderer = Depends(get_live_image_renderer), db: Database = Depends(get_db)):
+    """
+    The latest frame as a PNG or JPEG (format=png|jpeg), upscaled scale times with
+    nearest, bilinear or bicubic interpolation and coloured like /events/{id}/frames.png.
+    Each captured frame is rendered once per parameter set whatever the number of polling
+    clients; the ETag changes with the frame, so If-None-Match gets a 304 until a new
+    frame is captured.
+    """
+    try:
+        if format not in IMAGE_FORMATS or colormap not in COLORMAPS or interpolation not in INTERPOLATIONS \
+                or not 1 <= scale <= MAX_SCALE or not 1 <= quality <= 95:
+            raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(IMAGE_FORMATS)}, colormap one of "
+                                                        f"{', '.join(COLORMAPS)}, interpolation one of {', '.join(INTERPOLATIONS)}, "
+                                                        f"scale between 1 and {MAX_SCALE} and quality between 1 and 95")
+        frame = latest_frame_or_503(acquisition)
+        outlines = zone_outlines(db) if zones else ()
+        params = (format, colormap, vmin, vmax, outlines, scale, interpolation, quality if format == "jpeg" else None)
+        etag = renderer.etag(frame, params)
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Frame-Timestamp": frame.isoformat(),
+                   "X-Frame-Age-Seconds": f"{acquisition.frame_age():.3f}"}
+        if if_none_match is not None and etag in (tag.strip() for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
+
+        def render() -> bytes:
+            index, palette = render_indexed(frame.data, colormap, "frame", vmin, vmax, outlines, scale, interpolation=interpolation)
+            return encode_png(index, palette) if format == "png" else encode_jpeg(palette[index], quality)
+
+        image, cached = renderer.get(frame, params, render)
+        headers["X-Render-Cache"] = "hit" if cached else "miss"
+        return Response(image, media_type=IMAGE_FORMATS[format], headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.exception("Error in get_live_image")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/v1/thermal/acquisition", response_model=AcquisitionStatusResponse)
+def get_acquisition_status(acquisition: AcquisitionService = Depends(get_acquisition)) -> AcquisitionStatusResponse:
+    return AcquisitionStatusResponse(**acquisition.stats())
+
+@app.get("/api/v1/thermal/storage")
+def get_storage_status() -> dict:
+    """Event frame writer queue depth, commit latency and event state."""
+    return get_event_storage_singleton().stats()
+
+@app.get("/api/v1/thermal/zone-series")
+def get_zone_series_status() -> dict:
+    """thermal_data ingestion queue depth, commit latency and rows queued."""
+    return get_zone_series_singleton().stats()
+
+@app.get("/api/v1/recording/status")
+def get_recording_status() -> dict:
+    """Continuous recorder state: frames written and the open segment."""
+    recorder = get_recorder_singleton()
+    return {"enabled": recorder is not None, **(recorder.stats() if recorder else {})}
+
+@app.get("/api/v1/recording/segments")
+def get_recording_segments(start: Optional[str] = None, end: Optional[str] = None, db: Database = Depends(get_db)) -> list[dict]:
+    """Segment catalog entries overlapping [start, end) (ISO-8601; naive means UTC)."""
+    try:
+        start_ns = parse_time_ns(start) if start else None
+        end_ns = parse_time_ns(end) if end else None
+        return [
+            {**entry, "start_time": ns_to_iso(entry["start_ns"]), "end_time": ns_to_iso(entry["end_ns"]) if entry["end_ns"] is not None else None}
+            for entry in list_segments(db, start_ns, end_ns)
+        ]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.exception("Error in get_recording_segments")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/v1/zones", response_model=List[ZoneResponse])
 def get_zones(zones_manager: ZonesManager = Depends(get_zones_manager)) -> list[ZoneResponse]:
     try:
@@ -255,17 +700,32 @@ def delete_zone(zone_id: int, zones_manager: ZonesManager = Depends(get_zones_ma
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/v1/zones/{zone_id}/average", response_model=ZoneAverageResponse)
-def get_zone_average(zone_id: int, zones_manager: ZonesManager = Depends(get_zones_manager), sensor: ThermalSensor | MockThermalSensor = Depends(get_sensor)) -> ZoneAverageResponse:
+def get_zone_average(zone_id: int, zones_manager: ZonesManager = Depends(get_zones_manager), acquisition: AcquisitionService = Depends(get_acquisition)) -> ZoneAverageResponse:
     try:
-        frame = sensor.read_frame()
+        frame = latest_frame_or_503(acquisition)
         avg = zones_manager.compute_zone_average(zone_id, frame)
         return ZoneAverageResponse(zone_id=zone_id, average=avg)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e)) from e
+    except HTTPException:
+        raise
     except Exception as e:
         logging.exception("Error in get_zone_average")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/v1/zones/stats", response_model=ZoneStatsResponse)
+def get_zone_stats(zones_manager: ZonesManager = Depends(get_zones_manager), acquisition: AcquisitionService = Depends(get_acquisition)) -> ZoneStatsResponse:
+    try:
+        frame = latest_frame_or_503(acquisition)
+        stats = zones_manager.compute_zone_stats(frame)
+        entries = [ZoneStatsEntry(zone_id=zone_id, **values) for zone_id, values in stats.as_dict().items()]
+        return ZoneStatsResponse(timestamp=frame.isoformat(), zones=entries)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.exception("Error in get_zone_stats")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/v1/health")
 def health() -> dict[str, str]:
     return {"status": "ok"}
@@ -309,9 +769,34 @@ def delete_notification(notification_id: int, alarm_manager: AlarmManager = Depe
         logging.exception("Error in delete_notification")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/v1/notifications/status")
+def get_notification_status(alarm_manager: AlarmManager = Depends(get_alarm_manager)) -> dict:
+    """Queue depth, delivery counters and latency for the email and webhook dispatchers."""
+    return {
+        "email": alarm_manager.dispatcher.stats() if alarm_manager.dispatcher else None,
+        "webhook": alarm_manager.webhooks.stats() if alarm_manager.webhooks else None,
+    }
+
+@app.get("/api/v1/notifications/dead-letters", response_model=List[WebhookDeadLetterResponse])
+def get_webhook_dead_letters(limit: int = 100, db: Database = Depends(get_db)):
+    try:
+        return [WebhookDeadLetterResponse(**row) for row in db.get_webhook_dead_letters(limit)]
+    except Exception as e:
+        logging.exception("Error in get_webhook_dead_letters")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/v1/events/{event_id}/frames", response_model=List[EventFrameResponse])
-def get_event_frames(event_id: int, db: Database = Depends(get_db)):
+def get_event_frames(event_id: int, db: Database = Depends(get_db), fmt: Optional[FrameFormat] = Depends(get_frame_format)):
+    """Frame metadata of an event as JSON, or the frames themselves as binary records."""
     try:
+        if fmt is not None:
+            return binary_frames_response(fmt, db, event_id, legacy=not has_clip(db, event_id))
+        if has_clip(db, event_id):
+            # Clip frames are listed from the chunk index without reading the frame BLOBs
+            return [
+                EventFrameResponse(id=offset, event_id=event_id, timestamp=ns_to_iso(ts), frame_size=FRAME_PIXELS)
+                for offset, ts in enumerate(clip_timestamps(db, event_id))
+            ]
         cur = db.execute_query(
             "SELECT id, event_id, timestamp, frame_size FROM thermal_frames WHERE event_id = ? ORDER BY timestamp ASC",
             (event_id,)
@@ -329,47 +814,128 @@ def get_event_frames(event_id: int, db: Database = Depends(get_db)):
 
 from fastapi.responses import StreamingResponse, Response, JSONResponse
 import io
-from PIL import Image
 import numpy as np
 
+_render_caches: dict[str, RenderCache] = {}
+_render_caches_lock = threading.Lock()  # sync endpoints run on a thread pool; one cache per database
+
+def get_render_cache(db: Database = Depends(get_db)) -> RenderCache:
+    """Rendered-image cache of db, created on first use from the render_cache_* settings."""
+    path = os.path.abspath(db.db_path)
+    with _render_caches_lock:
+        cache = _render_caches.get(path)
+        if cache is None:
+            setting = db.get_setting("render_cache_dir")
+            directory = setting["value"].strip() if setting and setting["value"].strip() else os.path.join(os.path.dirname(path), "render_cache")
+            cache = RenderCache(
+                directory,
+                max_memory_bytes=int(get_positive_setting(db, "render_cache_memory_mb", DEFAULT_RENDER_CACHE_MEMORY_MB) * (1 << 20)),
+                max_disk_bytes=int(get_positive_setting(db, "render_cache_disk_mb", DEFAULT_RENDER_CACHE_DISK_MB) * (1 << 20)),
+            )
+            _render_caches[path] = cache
+    return cache
+
+def zone_outlines(db: Database) -> tuple:
+    """(x, y, width, height, (r, g, b)) of the enabled zones, for render.render_indexed."""
+    return tuple((z.x, z.y, z.width, z.height, parse_color(z.color))
+                 for z in sorted(get_zone_registry(db).get_zones(), key=lambda z: z.id) if z.enabled)
+
 @app.get("/api/v1/events/{event_id}/frames.png")
-def download_event_frames_png(event_id: int, db: Database = Depends(get_db)):
+def download_event_frames_png(event_id: int, colormap: str = "gray", scaling: str = "shared", vmin: Optional[float] = None,
+                              vmax: Optional[float] = None, zones: bool = False, scale: int = 1,
+                              if_none_match: Optional[str] = Header(None), db: Database = Depends(get_db),
+                              cache: RenderCache = Depends(get_render_cache)):
+    """
+    An event's frames stacked top to bottom as one PNG, coloured through a colormap LUT
+    (gray, iron, rainbow) with one colour range for the whole clip (scaling=shared) or per
+    frame (scaling=frame), optionally upscaled and with zone outlines. Renders are cached
+    by event data version and parameters; the ETag allows conditional requests.
+    """
     try:
-        cur = db.execute_query(
-            "SELECT frame FROM thermal_frames WHERE event_id = ? ORDER BY timestamp ASC",
-            (event_id,)
-        )
-        frames = [row[0] for row in cur.fetchall()]
-        if not frames:
+        if colormap not in COLORMAPS or scaling not in SCALINGS or not 1 <= scale <= MAX_SCALE:
+            raise HTTPException(status_code=400, detail=f"colormap must be one of {', '.join(COLORMAPS)}, scaling one of "
+                                                        f"{', '.join(SCALINGS)} and scale between 1 and {MAX_SCALE}")
+        version = event_data_version(db, event_id)
+        if version is None:
             raise HTTPException(status_code=404, detail="No frames found for event")
-        # For demo: stack frames vertically as grayscale PNG
-        images = []
-        for frame_bytes in frames:
-            arr = np.frombuffer(frame_bytes, dtype=np.float32)
-            if arr.size == 32*24:
-                arr = arr.reshape((24,32))
-                arr = ((arr - arr.min()) / (np.ptp(arr) or 1) * 255).astype(np.uint8)
-                img = Image.fromarray(arr, mode="L")
-                images.append(img)
-        if not images:
-            raise HTTPException(status_code=500, detail="No valid frames to render")
-        # Stack vertically
-        total_height = sum(img.height for img in images)
-        out_img = Image.new("L", (images[0].width, total_height))
-        y = 0
-        for img in images:
-            out_img.paste(img, (0, y))
-            y += img.height
-        buf = io.BytesIO()
-        out_img.save(buf, format="PNG")
-        buf.seek(0)
-        return StreamingResponse(buf, media_type="image/png")
+        outlines = zone_outlines(db) if zones else ()
+        key = cache_key("event-png", event_id, version, colormap, scaling, vmin, vmax, outlines, scale)
+        etag = f'"{key}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if if_none_match is not None and etag in (tag.strip() for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
+        png, source = cache.get(key)
+        if png is None:
+            _, _, frames = read_event_frames(db, event_id)
+            if not len(frames):
+                raise HTTPException(status_code=404, detail="No frames found for event")
+            png = encode_png(*render_indexed(frames, colormap, scaling, vmin, vmax, outlines, scale))
+            cache.put(key, png)
+        headers["X-Render-Cache"] = source
+        return Response(png, media_type="image/png", headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         logging.exception("Error in download_event_frames_png")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/v1/render/cache")
+def get_render_cache_status(cache: RenderCache = Depends(get_render_cache)) -> dict:
+    """Rendered-image cache size and hit counters."""
+    return cache.stats()
+
+@app.get("/api/v1/events/{event_id}/clip")
+def export_event_clip(event_id: int, format: str = "gif", colormap: str = "iron", scaling: str = "shared",
+                      vmin: Optional[float] = None, vmax: Optional[float] = None, zones: bool = False, scale: int = 4,
+                      speed: float = 1.0, loop: int = 0, db: Database = Depends(get_db)):
+    """
+    An event's frames as an animated GIF or APNG (format=gif|apng) for playback, each
+    frame shown until the next one was captured (divided by speed). Colouring options are
+    those of /frames.png. The response is streamed: frames are read a chunk at a time,
+    rendered against one precomputed palette and encoded as they go, so memory does not
+    grow with the event length. With scaling=shared and no vmin/vmax, the colour range is
+    found in a first pass over the stored frames, after the header has been sent.
+    """
+    try:
+        if format not in ANIMATION_FORMATS or colormap not in COLORMAPS or scaling not in SCALINGS \
+                or not 1 <= scale <= MAX_SCALE or not speed > 0 or not 0 <= loop <= 65535:
+            raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(ANIMATION_FORMATS)}, colormap one of "
+                                                        f"{', '.join(COLORMAPS)}, scaling one of {', '.join(SCALINGS)}, scale "
+                                                        f"between 1 and {MAX_SCALE}, speed positive and loop 0..65535")
+        legacy = not has_clip(db, event_id)
+        num_frames = event_frame_count(db, event_id, legacy)
+        if not num_frames:
+            raise HTTPException(status_code=404, detail="No frames found for event")
+        outlines = zone_outlines(db) if zones else ()
+        palette = render_palette(colormap, True, outlines)
+        height, width = FRAME_HEIGHT * scale, FRAME_WIDTH * scale
+
+        def indexed_batches() -> Iterator[tuple[np.ndarray, np.ndarray]]:
+            lo, hi = vmin, vmax
+            if scaling == "shared" and (lo is None or hi is None):
+                found = [(np.nanmin(frames), np.nanmax(frames)) for _, frames in iter_frame_batches(db, event_id, legacy)
+                         if np.isfinite(frames).any()]
+                lo = min(f[0] for f in found) if lo is None and found else lo
+                hi = max(f[1] for f in found) if hi is None and found else hi
+            for timestamps, frames in iter_frame_batches(db, event_id, legacy):
+                index, _ = render_indexed(frames, colormap, scaling, lo, hi, outlines, scale, reserve_nan=True)
+                yield timestamps, index.reshape(len(frames), height, width)
+
+        frames = timed_frames(indexed_batches(), speed)
+        if format == "gif":
+            body = gif_stream(frames, palette, width, height, loop)
+        else:
+            body = apng_stream(frames, palette, width, height, num_frames, loop)
+        return StreamingResponse(body, media_type=ANIMATION_FORMATS[format],
+                                 headers={"Content-Disposition": f'inline; filename="event_{event_id}.{"png" if format == "apng" else format}"'})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.exception("Error in export_event_clip")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/v1/events/{event_id}/frames/blobs")
-def get_event_frame_blobs(event_id: int, db: Database = Depends(get_db)):
+def get_event_frame_blobs(event_id: int, db: Database = Depends(get_db), fmt: Optional[FrameFormat] = Depends(get_frame_format)):
     """
     Returns all frames for an event as a list of dicts:
     [{
@@ -380,16 +946,34 @@ def get_event_frame_blobs(event_id: int, db: Database = Depends(get_db)):
         "frame": base64-encoded float32 array (32x24, row-major)
     }, ...]
     Frame format: 32x24 float32, row-major, base64-encoded for transport.
+    Frames stored as an event clip use their offset within the clip as id.
+    With Accept: application/octet-stream the frames are sent as binary records instead
+    (see frame_formats).
     """
     import base64
     try:
+        if fmt is not None:
+            return binary_frames_response(fmt, db, event_id, legacy=not has_clip(db, event_id))
+        if has_clip(db, event_id):
+            frames = []
+            for _, first_offset, timestamps, chunk in iter_clip_chunks(db, event_id):
+                for i, (ts, frame) in enumerate(zip(timestamps, chunk)):
+                    frames.append({
+                        "id": first_offset + i,
+                        "event_id": event_id,
+                        "timestamp": ns_to_iso(ts),
+                        "frame_size": FRAME_PIXELS,
+                        "frame": base64.b64encode(frame.tobytes()).decode("ascii")
+                    })
+            return JSONResponse(content=frames)
         cur = db.execute_query(
-            "SELECT id, event_id, timestamp, frame_size, frame FROM thermal_frames WHERE event_id = ? ORDER BY timestamp ASC",
+            "SELECT id, event_id, timestamp, frame_size, frame, codec FROM thermal_frames WHERE event_id = ? ORDER BY timestamp ASC",
             (event_id,)
         )
         frames = []
         for row in cur.fetchall():
-            frame_b64 = base64.b64encode(row[4]).decode("ascii")
+            values = get_codec(row[5]).decode_values(row[4])
+            frame_b64 = base64.b64encode(values.astype("<f4", copy=False).tobytes()).decode("ascii")
             frames.append({
                 "id": row[0],
                 "event_id": row[1],
@@ -403,16 +987,22 @@ def get_event_frame_blobs(event_id: int, db: Database = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/v1/frames/export")
-def export_frames(event_id: Optional[int] = None, overlay: Optional[str] = None, db: Database = Depends(get_db)):
+def export_frames(event_id: Optional[int] = None, overlay: Optional[str] = None, db: Database = Depends(get_db),
+                  fmt: Optional[FrameFormat] = Depends(get_frame_format)):
+    """Stored frames as CSV metadata (with per-frame stats for overlay=stats), or as binary records."""
     try:
-        query = "SELECT id, event_id, timestamp, frame_size, frame FROM thermal_frames"
+        if fmt is not None:
+            return binary_frames_response(fmt, db, event_id)
+        query = "SELECT id, event_id, timestamp, frame_size, frame, codec FROM thermal_frames"
         params = ()
         if event_id is not None:
             query += " WHERE event_id = ?"
             params = (event_id,)
         cur = db.execute_query(query, params)
         frames = cur.fetchall()
-        if not frames:
+        clips = iter_clip_chunks(db, event_id)
+        first_chunk = next(clips, None)
+        if not frames and first_chunk is None:
             raise HTTPException(status_code=404, detail="No frames found")
         import io, csv
         output = io.StringIO()
@@ -424,12 +1014,24 @@ def export_frames(event_id: Optional[int] = None, overlay: Optional[str] = None,
         for row in frames:
             base = list(row[:4])
             if overlay == "stats":
-                stats = get_frame_stats(row[4])
+                stats = get_frame_stats(row[4], row[5])
                 writer.writerow(base + [stats[c] for c in stat_cols])
             else:
                 writer.writerow(base)
+        # Event clip frames follow, one CSV row per frame with its clip offset as id
+        if first_chunk is not None:
+            import itertools
+            for clip_event_id, first_offset, timestamps, chunk in itertools.chain([first_chunk], clips):
+                if overlay == "stats":
+                    flat = chunk.reshape(len(chunk), -1).astype(np.float64)
+                    chunk_stats = np.column_stack((flat.mean(axis=1), flat.min(axis=1), flat.max(axis=1), flat.std(axis=1)))
+                for i, ts in enumerate(timestamps):
+                    base = [first_offset + i, clip_event_id, ns_to_iso(ts), FRAME_PIXELS]
+                    writer.writerow(base + (chunk_stats[i].tolist() if overlay == "stats" else []))
         output.seek(0)
         return StreamingResponse(output, media_type="text/csv", headers={"Content-Disposition": "attachment; filename=frames.csv"})
+    except HTTPException:
+        raise
     except Exception as e:
         logging.exception("Error in export_frames")
         raise HTTPException(status_code=500, detail=str(e))
@@ -458,25 +1060,38 @@ def set_setting(setting: SettingsRequest, db: Database = Depends(get_db)):
 @app.post("/api/v1/database/backup")
 def backup_database(db: Database = Depends(get_db)):
     try:
+        # Commit queued alarm state, then copy the database (WAL included) to a temporary file
+        get_alarm_registry(db).flush_persistence()
+        fd, backup_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        db.backup(backup_path)
         def file_iterator():
-            with open(db.db_path, 'rb') as f:
-                while True:
-                    chunk = f.read(8192)
-                    if not chunk:
-                        break
-                    yield chunk
+            try:
+                with open(backup_path, 'rb') as f:
+                    while True:
+                        chunk = f.read(8192)
+                        if not chunk:
+                            break
+                        yield chunk
+            finally:
+                os.remove(backup_path)
         return StreamingResponse(file_iterator(), media_type="application/octet-stream", headers={"Content-Disposition": "attachment; filename=ir_monitoring_backup.db"})
     except Exception as e:
         logging.exception("Error in backup_database")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/v1/database/restore")
-def restore_database(file: UploadFile = File(...), db: Database = Depends(get_db)):
+def restore_database(file: UploadFile = File(...), db: Database = Depends(get_db),
+                     retention: RetentionJob = Depends(get_retention)):
     try:
         temp_path = "restore_temp.db"
         with open(temp_path, "wb") as f:
             f.write(file.file.read())
-        db.restore(temp_path)
+        get_alarm_registry(db).flush_persistence()
+        with retention.paused():
+            db.restore(temp_path)
+        get_zone_registry(db).load_zones_from_db()
+        get_alarm_registry(db).load_alarms_from_db()
         return {"status": "restored"}
     except Exception as e:
         logging.exception("Error in restore_database")
@@ -491,52 +1106,138 @@ def migrate_database(db: Database = Depends(get_db)):
         logging.exception("Error in migrate_database")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/v1/database/retention")
+def get_retention_status() -> dict:
+    """Retention job counters and the report of its last run."""
+    return get_retention_singleton().stats()
+
+@app.post("/api/v1/database/retention/run")
+def run_retention() -> dict:
+    """Delete data older than data_retention_days now and report rows and bytes reclaimed."""
+    try:
+        return get_retention_singleton().run_once()
+    except Exception as e:
+        logging.exception("Error in run_retention")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def analytics_window(start_time: str, end_time: str, points: int, resolution: Optional[str]) -> tuple[float, float, int]:
+    """
+    Parse an analytics time range and pick its resolution: the named one, else the coarsest
+    rollup that still yields `points` buckets (raw rows for short ranges).
+    """
+    try:
+        start, end = iso_to_epoch(start_time), iso_to_epoch(end_time)
+        seconds = parse_resolution(resolution) if resolution else choose_resolution(start, end, points)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return start, end, seconds
+
+def analytics_points(db: Database, start_time: str, end_time: str, start: float, end: float, resolution: int,
+                     zone_id: Optional[int]) -> ZoneSeries:
+    """thermal_data samples for raw resolution, else one point per rollup bucket (bucket mean as temperature)."""
+    if resolution == RAW_RESOLUTION:
+        return fetch_zone_series(db, start_time, end_time, zone_id)
+    series = bucket_series(db, start, end, resolution, zone_id)
+    return ZoneSeries(
+        np.array([bucket for bucket, _ in series], dtype=np.int64) * 1_000_000,
+        np.array([totals.mean for _, totals in series], dtype=np.float64),
+        None if zone_id is None else np.full(len(series), zone_id),
+        count=np.array([totals.count for _, totals in series], dtype=np.int64),
+        min=np.array([totals.min for _, totals in series], dtype=np.float64),
+        max=np.array([totals.max for _, totals in series], dtype=np.float64),
+    )
+
+def downsample_series(series: ZoneSeries, max_points: int, method: str) -> ZoneSeries:
+    """Keep at most max_points samples of a trend (see downsample.py); 400 on a bad method or max_points."""
+    try:
+        kept = downsample_indices(series.epochs, series.temperatures, max_points, method)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return series.take(kept) if len(kept) < len(series) else series
+
+def pixel_grid(values: np.ndarray, count: np.ndarray) -> list[list[Optional[float]]]:
+    """2-D array as nested lists, with None for pixels that have no samples."""
+    grid = values.astype(np.float64).astype(object)
+    grid[count == 0] = None
+    return grid.tolist()
+
+def zone_window(db: Database, zone_id: Optional[int]) -> tuple[int, int, int, int]:
+    """(x, y, width, height) of a zone clipped to the frame; the whole frame without a zone."""
+    grid = db.get_zone_grid(zone_id) if zone_id else {}
+    if not grid:
+        return 0, 0, FRAME_WIDTH, FRAME_HEIGHT
+    x, y = min(max(grid["x"], 0), FRAME_WIDTH), min(max(grid["y"], 0), FRAME_HEIGHT)
+    return x, y, min(max(grid["x"] + grid["width"], x), FRAME_WIDTH) - x, min(max(grid["y"] + grid["height"], y), FRAME_HEIGHT) - y
+
 @app.get("/api/v1/analytics/heatmap", response_model=HeatmapResponse)
-def get_heatmap(start_time: str, end_time: str, zone_id: Optional[int] = None, db: Database = Depends(get_db)):
-    # Fetch data
-    data = db.get_thermal_data(start_time, end_time, zone_id)
-    # Use default grid size or zone grid
-    if zone_id:
-        grid = db.get_zone_grid(zone_id)
-        width, height = grid.get("width", 32), grid.get("height", 24)
-    else:
-        width, height = 32, 24
-    heatmap = compute_heatmap(data, width, height)
-    return HeatmapResponse(heatmap=heatmap, width=width, height=height, start_time=start_time, end_time=end_time, zone_id=zone_id)
+def get_heatmap(start_time: str, end_time: str, zone_id: Optional[int] = None, points: int = DEFAULT_POINTS,
+                resolution: Optional[str] = None, db: Database = Depends(get_db)):
+    """
+    Per-pixel mean, max and std over the range, merged from the pixel rollups (whole hours)
+    and cropped to the zone. points and resolution apply only to the source="zones" fallback
+    for ranges without pixel rollups, where they pick the zone rollups the flat average is
+    taken from; they do not change pixel heatmaps.
+    """
+    start, end, seconds = analytics_window(start_time, end_time, points, resolution)
+    x, y, width, height = zone_window(db, zone_id)
+    stats, covered_start, covered_end = pixel_stats(db, start, end)
+    if stats.frames:
+        region = stats.crop(x, y, width, height)
+        return HeatmapResponse(
+            heatmap=pixel_grid(region.mean, region.count), max=pixel_grid(region.max, region.count),
+            std=pixel_grid(region.std, region.count), width=width, height=height, x=x, y=y, frames=region.frames,
+            start_time=start_time, end_time=end_time, zone_id=zone_id,
+            covered_start=epoch_to_iso(covered_start), covered_end=epoch_to_iso(covered_end),
+        )
+    # No frames were accumulated for the range (e.g. data from before pixel rollups): flat zone average
+    summary = range_summary(db, start, end, zone_id, max_resolution=seconds)
+    heatmap = compute_heatmap([{"temperature": summary.mean}] if summary.count else [], width, height)
+    return HeatmapResponse(heatmap=heatmap, width=width, height=height, x=x, y=y, start_time=start_time, end_time=end_time,
+                           zone_id=zone_id, source="zones")
 
 @app.get("/api/v1/analytics/trends", response_model=TrendResponse)
-def get_trends(start_time: str, end_time: str, zone_id: Optional[int] = None, db: Database = Depends(get_db)):
-    data = db.get_thermal_data(start_time, end_time, zone_id)
-    timestamps, values = compute_trend(data)
-    return TrendResponse(timestamps=timestamps, values=values, zone_id=zone_id)
+def get_trends(start_time: str, end_time: str, zone_id: Optional[int] = None, points: int = DEFAULT_POINTS,
+               resolution: Optional[str] = None, max_points: int = DEFAULT_MAX_POINTS, downsample: str = "lttb",
+               db: Database = Depends(get_db)):
+    start, end, seconds = analytics_window(start_time, end_time, points, resolution)
+    data = analytics_points(db, start_time, end_time, start, end, seconds, zone_id)
+    timestamps, values = compute_trend(downsample_series(data, max_points, downsample))
+    return TrendResponse(timestamps=timestamps, values=values, zone_id=zone_id, resolution=RESOLUTION_NAMES[seconds],
+                         source_points=len(data))
 
 @app.get("/api/v1/analytics/anomalies", response_model=AnomalyResponse)
-def get_anomalies(start_time: str, end_time: str, zone_id: Optional[int] = None, db: Database = Depends(get_db)):
-    data = db.get_thermal_data(start_time, end_time, zone_id)
+def get_anomalies(start_time: str, end_time: str, zone_id: Optional[int] = None, points: int = DEFAULT_POINTS,
+                  resolution: Optional[str] = None, db: Database = Depends(get_db)):
+    start, end, seconds = analytics_window(start_time, end_time, points, resolution)
+    data = analytics_points(db, start_time, end_time, start, end, seconds, zone_id)
     anomalies = detect_anomalies(data)
-    return AnomalyResponse(anomalies=anomalies, zone_id=zone_id)
+    return AnomalyResponse(anomalies=anomalies, zone_id=zone_id, resolution=RESOLUTION_NAMES[seconds])
+
+@app.get("/api/v1/analytics/anomalies/live")
+def get_live_anomalies() -> dict:
+    """Online anomaly detector counters and each zone's current baseline."""
+    detector = get_anomaly_detector_singleton()
+    if detector is None:
+        return {"enabled": False}
+    return {"enabled": True, "event_type": ANOMALY_EVENT_TYPE, **detector.stats(), "baselines": detector.baselines()}
 
 @app.get("/api/v1/reports", response_model=ReportResponse)
-def get_report(report_type: str, start_time: str, end_time: str, zone_id: Optional[int] = None, db: Database = Depends(get_db)):
+def get_report(report_type: str, start_time: str, end_time: str, zone_id: Optional[int] = None, points: int = DEFAULT_POINTS,
+               resolution: Optional[str] = None, max_points: int = DEFAULT_MAX_POINTS, downsample: str = "lttb",
+               db: Database = Depends(get_db)):
     # For now, support 'summary' (mean/min/max), 'trend', 'anomaly_count'
-    data = db.get_thermal_data(start_time, end_time, zone_id)
-    summary = {}
+    start, end, seconds = analytics_window(start_time, end_time, points, resolution)
+    summary: dict = {"resolution": RESOLUTION_NAMES[seconds]}
     if report_type == "summary":
-        temps = [d["temperature"] for d in data]
-        summary = {
-            "count": len(temps),
-            "mean": float(np.mean(temps)) if temps else 0.0,
-            "min": float(np.min(temps)) if temps else 0.0,
-            "max": float(np.max(temps)) if temps else 0.0,
-        }
+        totals = range_summary(db, start, end, zone_id, max_resolution=seconds)
+        summary.update(totals.as_dict())
     elif report_type == "trend":
-        from backend.src.frames import compute_trend
-        ts, vals = compute_trend(data)
-        summary = {"timestamps": ts, "values": vals}
+        data = analytics_points(db, start_time, end_time, start, end, seconds, zone_id)
+        ts, vals = compute_trend(downsample_series(data, max_points, downsample))
+        summary.update(timestamps=ts, values=vals, source_points=len(data))
     elif report_type == "anomaly_count":
-        from backend.src.frames import detect_anomalies
-        anomalies = detect_anomalies(data)
-        summary = {"anomaly_count": len(anomalies)}
+        mask = anomaly_mask(analytics_points(db, start_time, end_time, start, end, seconds, zone_id).temperatures)
+        summary.update(anomaly_count=int(mask.sum()))
     else:
         raise HTTPException(status_code=400, detail="Unknown report_type")
     return ReportResponse(report_type=report_type, start_time=start_time, end_time=end_time, zone_id=zone_id, summary=summary)
@@ -545,7 +1246,8 @@ def get_report(report_type: str, start_time: str, end_time: str, zone_id: Option
 def get_alarm_history(db: Database = Depends(get_db)):
     try:
         cur = db.execute_query("""
-            SELECT ae.id, ae.zone_id, ae.temperature, ae.timestamp, ae.alarm_id, a.acknowledged, a.acknowledged_at
+            SELECT ae.id, ae.zone_id, ae.temperature, ae.timestamp, ae.alarm_id, a.acknowledged, a.acknowledged_at,
+                   COALESCE(ae.event_type, 'threshold')
             FROM alarm_events ae
             LEFT JOIN alarms a ON ae.alarm_id = a.id
             ORDER BY ae.timestamp DESC LIMIT 100
@@ -556,9 +1258,9 @@ def get_alarm_history(db: Database = Depends(get_db)):
                 zone_id=row[1],
                 temperature=row[2],
                 timestamp=row[3],
-                event_type="threshold",
-                acknowledged=bool(row[5]) if len(row) > 5 and row[5] is not None else False,
-                acknowledged_at=row[6] if len(row) > 6 else None
+                event_type=row[7],
+                acknowledged=bool(row[5]) if row[5] is not None else False,
+                acknowledged_at=row[6]
             )
             for row in cur.fetchall()
         ]
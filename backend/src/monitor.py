@@ -9,6 +9,7 @@ from backend.src.sensor import ThermalSensor
 from backend.src.database import Database
 from backend.src.frames import ThermalFrameBuffer
 from backend.src.alarms import AlarmManager
+from backend.src.thermal_frame import FRAME_SHAPE, as_frame_array
 
 class SystemMonitor:
     """
@@ -23,7 +24,7 @@ class SystemMonitor:
     def check_sensor_health(self) -> bool:
         try:
             frame = self.sensor.read_frame()
-            healthy = isinstance(frame, list) and len(frame) == 768
+            healthy = as_frame_array(frame).shape == FRAME_SHAPE
             logging.info(f"Sensor health: {'OK' if healthy else 'FAIL'}.")
             return healthy
         except Exception as e:
@@ -0,0 +1,452 @@
+"""
+notifications.py
+
+Asynchronous alarm notification delivery for IR Thermal Monitoring System.
+"""
+import json
+import logging
+import os
+import queue
+import smtplib
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+if TYPE_CHECKING:
+    from .alarms import AlarmEvent
+
+
+class EmailChannel:
+    """
+    One enabled email notification, with its JSON config parsed once.
+    Environment variables SMTP_HOST/PORT/USER/PASS/FROM override the stored config.
+    """
+    def __init__(self, notification_id: int, host: str, port: int, from_addr: str, to_addr: Optional[str] = None,
+                 user: Optional[str] = None, password: Optional[str] = None, starttls: bool = True,
+                 subject: Optional[str] = None, body: Optional[str] = None) -> None:
+        self.notification_id = notification_id
+        self.host = host
+        self.port = port
+        self.from_addr = from_addr
+        self.to_addr = to_addr
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.subject = subject
+        self.body = body
+
+    @property
+    def server_key(self) -> tuple[str, int, Optional[str]]:
+        """Connections are shared between channels with the same server and login."""
+        return (self.host, self.port, self.user)
+
+    @classmethod
+    def from_notification(cls, notification: dict) -> Optional["EmailChannel"]:
+        """
+        Build a channel from a notifications row; returns None (and logs) if the config is unusable.
+        """
+        try:
+            config = json.loads(notification["config"] or "{}")
+            host = os.getenv("SMTP_HOST") or config.get("smtp_host")
+            port = int(os.getenv("SMTP_PORT") or config.get("smtp_port", 587))
+            user = os.getenv("SMTP_USER") or config.get("smtp_user")
+            password = os.getenv("SMTP_PASS") or config.get("smtp_pass")
+        except (ValueError, TypeError, AttributeError) as e:
+            logging.error("Invalid config for notification %s: %s", notification.get("id"), e)
+            return None
+        from_addr = os.getenv("SMTP_FROM") or config.get("from") or user
+        if not host or not from_addr or bool(user) != bool(password):
+            logging.error("Missing SMTP configuration for email notification %s.", notification.get("id"))
+            return None
+        return cls(
+            notification["id"], host, port, from_addr, config.get("to"), user, password,
+            bool(config.get("starttls", True)), config.get("subject"), config.get("body"),
+        )
+
+
+def build_email(channel: EmailChannel, to_addr: str, events: list["AlarmEvent"]) -> EmailMessage:
+    """Compose one message for a single event, or a digest when a burst was coalesced."""
+    msg = EmailMessage()
+    msg["From"] = channel.from_addr
+    msg["To"] = to_addr
+    if len(events) == 1:
+        event = events[0]
+        msg["Subject"] = channel.subject or f"IR Alarm Event: Zone {event.zone_id}"
+        msg.set_content(channel.body or f"Alarm triggered in zone {event.zone_id} at {event.timestamp}. Temperature: {event.temperature}°C.")
+    else:
+        zones = sorted({e.zone_id for e in events})
+        msg["Subject"] = f"IR Alarm Digest: {len(events)} events in zone(s) {', '.join(map(str, zones))}"
+        lines = [f"{len(events)} alarm events occurred:", ""]
+        lines += [f"- {e.timestamp}: {f'alarm {e.alarm_id}' if e.alarm_id is not None else e.event_type}, zone {e.zone_id}, {e.temperature:.2f}°C" for e in events]
+        msg.set_content("\n".join(lines))
+    return msg
+
+
+class SMTPConnectionPool:
+    """
+    Keeps logged-in SMTP sessions open per server so repeated deliveries skip
+    connect, STARTTLS and login. Idle sessions are checked with NOOP before reuse.
+    """
+    def __init__(self, max_idle_per_host: int = 2, idle_timeout: float = 60.0, timeout: float = 10.0,
+                 smtp_factory: Callable[..., smtplib.SMTP] = smtplib.SMTP) -> None:
+        self.max_idle_per_host = max_idle_per_host
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.smtp_factory = smtp_factory
+        self.connections_opened = 0
+        self.connections_reused = 0
+        self._idle: dict[tuple, list[tuple[smtplib.SMTP, float]]] = {}
+        self._lock = threading.Lock()
+
+    def send(self, channel: EmailChannel, message: EmailMessage) -> None:
+        """Send message over a pooled session; a failed session is closed, not returned."""
+        server = self._acquire(channel)
+        try:
+            server.send_message(message)
+        except Exception:
+            _quietly_close(server)
+            raise
+        self._release(channel.server_key, server)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for sessions in idle.values():
+            for server, _ in sessions:
+                _quietly_close(server)
+
+    def _acquire(self, channel: EmailChannel) -> smtplib.SMTP:
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                sessions = self._idle.get(channel.server_key)
+                if not sessions:
+                    break
+                server, last_used = sessions.pop()
+            if now - last_used > self.idle_timeout:
+                _quietly_close(server)
+                continue
+            try:
+                if server.noop()[0] == 250:
+                    self.connections_reused += 1
+                    return server
+            except (smtplib.SMTPException, OSError):
+                pass
+            _quietly_close(server)
+        server = self.smtp_factory(channel.host, channel.port, timeout=self.timeout)
+        try:
+            if channel.starttls:
+                server.starttls()
+            if channel.user:
+                server.login(channel.user, channel.password)
+        except Exception:
+            _quietly_close(server)
+            raise
+        self.connections_opened += 1
+        return server
+
+    def _release(self, key: tuple, server: smtplib.SMTP) -> None:
+        with self._lock:
+            sessions = self._idle.setdefault(key, [])
+            if len(sessions) < self.max_idle_per_host:
+                sessions.append((server, time.monotonic()))
+                return
+        _quietly_close(server)
+
+
+def _quietly_close(server: smtplib.SMTP) -> None:
+    try:
+        server.quit()
+    except Exception:
+        try:
+            server.close()
+        except Exception:
+            pass
+
+
+QueuedItem = tuple["AlarmEvent", Optional[str], float]  # (event, extra recipient, enqueue monotonic time)
+
+
+class QueuedDispatcher(ABC):
+    """
+    Base for delivering alarm events off the alarm path. submit() only enqueues; a collector
+    thread gathers events arriving within batch_window into one batch, subclasses turn the
+    batch into delivery jobs, and a bounded worker pool runs them. Subclasses implement jobs().
+    """
+    name = "dispatcher"
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 1000, batch_window: float = 2.0,
+                 max_batch: int = 50, max_retries: int = 3, retry_backoff: float = 1.0) -> None:
+        """
+        Args:
+            max_workers: Concurrent deliveries.
+            max_queue: Events waiting for collection; submit() drops beyond this.
+            batch_window: Seconds to gather further events after the first of a burst.
+            max_batch: Most events collected into one batch.
+            max_retries: Extra attempts after a failed delivery.
+            retry_backoff: Delay before the first retry, doubled for each later one.
+        """
+        if max_workers <= 0 or max_queue <= 0 or max_batch <= 0 or batch_window < 0:
+            raise ValueError("max_workers, max_queue and max_batch must be positive and batch_window non-negative.")
+        self.max_workers = max_workers
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.dropped = 0
+        self._stats_lock = threading.Lock()  # counters are updated from submitters, the collector and workers
+        self._latencies: deque[float] = deque(maxlen=100)
+        self._queue: queue.Queue[QueuedItem] = queue.Queue(maxsize=max_queue)
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._pending = 0  # queued events plus delivery jobs not yet finished
+        self._idle = threading.Condition()
+        self._stop_event = threading.Event()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @abstractmethod
+    def jobs(self, batch: list[QueuedItem]) -> list[Callable[[], None]]:
+        """Return the delivery jobs for one collected batch (each runs on a worker)."""
+
+    def start(self) -> None:
+        """Start the collector thread and worker pool (no-op if already running)."""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        logging.info("%s started with %d workers.", self.name, self.max_workers)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Deliver queued events (retry waits are cut short), then stop the workers. Pooled
+        connections are released either way, also those of a dispatcher that was only used
+        through deliver().
+        """
+        if self._thread is None:
+            self._close()
+            return
+        self._stop_event.set()
+        self._thread.join(timeout)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self._thread = None
+        self._executor = None
+        self._close()
+        logging.info("%s stopped; %d sent, %d failed.", self.name, self.sent, self.failed)
+
+    def _close(self) -> None:
+        """Release pooled connections; called by stop()."""
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, event: "AlarmEvent", recipient: Optional[str] = None) -> bool:
+        """
+        Queue an event without blocking.
+
+        Args:
+            recipient: Extra target for this event: the email address used by channels
+                without a "to" address, or an additional webhook URL.
+
+        Returns:
+            bool: False if the queue was full and the event was dropped.
+        """
+        try:
+            with self._idle:
+                self._queue.put_nowait((event, recipient, time.monotonic()))
+                self._pending += 1
+            return True
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            logging.error("%s queue full; dropping notification for alarm %s.", self.name, event.alarm_id)
+            return False
+
+    def deliver(self, batch: list[QueuedItem]) -> None:
+        """Run every delivery job for batch on the calling thread."""
+        for job in self.jobs(batch):
+            job()
+
+    def wait_idle(self, timeout: float = 10.0) -> bool:
+        """Wait until the queue is empty and no delivery is in flight (for tests and shutdown)."""
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        """Return queue depth, delivery counters and delivery latency (enqueue to sent)."""
+        latencies = list(self._latencies)
+        return {
+            "running": self.running,
+            "queue_depth": self.queue_depth,
+            "in_flight": max(self._pending - self.queue_depth, 0),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "dropped": self.dropped,
+            "avg_latency_ms": sum(latencies) / len(latencies) * 1e3 if latencies else None,
+            "max_latency_ms": max(latencies) * 1e3 if latencies else None,
+        }
+
+    def _retry(self, send: Callable[[], None], what: str) -> Optional[Exception]:
+        """Call send until it succeeds or max_retries is exhausted; returns the final error, if any."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                send()
+                return None
+            except Exception as e:
+                if attempt == self.max_retries:
+                    with self._stats_lock:
+                        self.failed += 1
+                    logging.error("Failed to deliver %s after %d attempts: %s", what, attempt + 1, e)
+                    return e
+                with self._stats_lock:
+                    self.retries += 1
+                delay = self.retry_backoff * 2 ** attempt
+                logging.warning("Delivering %s failed (%s); retrying in %.1f s.", what, e, delay)
+                self._stop_event.wait(delay)
+        return None
+
+    def _delivered(self, items: list[QueuedItem]) -> None:
+        now = time.monotonic()
+        self._latencies.extend(now - item[2] for item in items)
+        with self._stats_lock:
+            self.sent += 1
+
+    def _collect(self, first: QueuedItem) -> list[QueuedItem]:
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _finish(self, count: int) -> None:
+        with self._idle:
+            self._pending -= count
+            self._idle.notify_all()
+
+    def _run_job(self, job: Callable[[], None]) -> None:
+        try:
+            job()
+        except Exception as e:
+            logging.error("%s delivery job failed: %s", self.name, e, exc_info=True)
+        finally:
+            self._slots.release()
+            self._finish(1)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop_event.is_set():
+                    return
+                continue
+            batch = self._collect(first)
+            try:
+                jobs = self.jobs(batch)
+            except Exception as e:
+                logging.error("%s could not plan deliveries: %s", self.name, e, exc_info=True)
+                jobs = []
+            # Swap the batch's queued events for its jobs in the pending count
+            with self._idle:
+                self._pending += len(jobs)
+            self._finish(len(batch))
+            for job in jobs:
+                self._slots.acquire()
+                executor = self._executor
+                if executor is None:
+                    self._run_job(job)
+                else:
+                    executor.submit(self._run_job, job)
+
+
+class NotificationDispatcher(QueuedDispatcher):
+    """
+    Email delivery: one message per channel and recipient for each collected burst,
+    sent as a digest when the burst holds more than one event.
+    """
+    name = "notification-dispatcher"
+
+    def __init__(
+        self,
+        channels: Callable[[], list[EmailChannel]],
+        pool: Optional[SMTPConnectionPool] = None,
+        max_workers: int = 4,
+        max_queue: int = 1000,
+        digest_window: float = 2.0,
+        max_digest: int = 50,
+        max_retries: int = 3,
+        retry_backoff: float = 1.0,
+    ) -> None:
+        """
+        Args:
+            channels: Returns the current enabled email channels (called once per batch).
+            pool: SMTP session pool; a default pool is created if omitted.
+            digest_window: Seconds to gather further events into one digest.
+            max_digest: Most events combined into one message.
+            Other arguments as for QueuedDispatcher.
+        """
+        super().__init__(max_workers, max_queue, digest_window, max_digest, max_retries, retry_backoff)
+        self.channels = channels
+        self.pool = pool or SMTPConnectionPool()
+        self.digests = 0
+
+    def stats(self) -> dict[str, Any]:
+        stats = super().stats()
+        stats.update(
+            digests=self.digests,
+            connections_opened=self.pool.connections_opened,
+            connections_reused=self.pool.connections_reused,
+        )
+        return stats
+
+    def jobs(self, batch: list[QueuedItem]) -> list[Callable[[], None]]:
+        jobs: list[Callable[[], None]] = []
+        for channel in self.channels():
+            by_recipient: dict[str, list[QueuedItem]] = {}
+            for item in batch:
+                to_addr = channel.to_addr or item[1]
+                if not to_addr:
+                    logging.warning("No recipient for email notification %s.", channel.notification_id)
+                    continue
+                by_recipient.setdefault(to_addr, []).append(item)
+            jobs += [partial(self._send, channel, to_addr, group) for to_addr, group in by_recipient.items()]
+        return jobs
+
+    def _close(self) -> None:
+        self.pool.close()
+
+    def _send(self, channel: EmailChannel, to_addr: str, items: list[QueuedItem]) -> None:
+        events = [item[0] for item in items]
+        message = build_email(channel, to_addr, events)
+        if self._retry(partial(self.pool.send, channel, message), f"email to {to_addr}") is None:
+            self._delivered(items)
+            if len(events) > 1:
+                with self._stats_lock:
+                    self.digests += 1
+            logging.info("Email notification sent to %s for %d event(s).", to_addr, len(events))
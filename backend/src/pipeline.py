@@ -0,0 +1,50 @@
+"""
+pipeline.py
+
+Per-frame processing pipeline for IR Thermal Monitoring System.
+"""
+import logging
+from typing import Callable, Optional
+
+from .alarms import AlarmManager
+from .frames import EventTriggeredStorage
+from .thermal_frame import ThermalFrame
+from .zones import ZoneStats, ZonesManager
+
+StatsSink = Callable[[ThermalFrame, ZoneStats], None]
+
+
+class FrameProcessor:
+    """
+    Acquisition consumer that computes zone statistics once per frame and evaluates
+    every alarm against them. With event storage attached, every frame is buffered and
+    a fired alarm persists the pre- and post-event frames. Further per-frame features
+    register as stats sinks.
+    """
+    def __init__(self, zones: ZonesManager, alarms: AlarmManager, statistic: str = "average",
+                 storage: Optional[EventTriggeredStorage] = None) -> None:
+        self.zones = zones
+        self.alarms = alarms
+        self.statistic = statistic
+        self.storage = storage
+        self.frames_processed = 0
+        self._sinks: list[StatsSink] = []
+
+    def add_sink(self, sink: StatsSink) -> None:
+        """Register a callable invoked as sink(frame, stats) after alarm evaluation."""
+        self._sinks.append(sink)
+
+    def __call__(self, frame: ThermalFrame) -> None:
+        stats = self.zones.compute_zone_stats(frame)
+        events = self.alarms.check_zone_stats(stats, frame.isoformat(), self.statistic, now=frame.timestamp)
+        if self.storage is not None:
+            self.storage.record_frame(frame)
+            if events:
+                # One clip per trigger; simultaneous alarms share the first event's clip
+                self.storage.trigger_event(events[0].event_id)
+        for sink in self._sinks:
+            try:
+                sink(frame, stats)
+            except Exception as e:
+                logging.error("Stats sink %r failed: %s", sink, e, exc_info=True)
+        self.frames_processed += 1
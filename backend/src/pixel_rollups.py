@@ -0,0 +1,226 @@
+"""
+pixel_rollups.py
+
+Per-pixel temperature rollups for IR Thermal Monitoring System heatmaps.
+
+pixel_rollups holds, per 1-hour and 1-day bucket (bucket = bucket start in epoch seconds,
+UTC), the per-pixel sample count, sum, sum of squares, min and max of every captured frame
+as 24x32 arrays. PixelRollupWriter folds each frame into the open buckets in memory on
+the capture thread and periodically hands snapshots to a BatchWriter, so heatmaps over
+any range merge a few stored buckets instead of re-reading frames.
+"""
+import logging
+import math
+import time
+from typing import Any, Optional
+
+import numpy as np
+
+from .database import Database
+from .thermal_frame import FRAME_SHAPE, ThermalFrame
+from .writer import BatchWriter
+
+PIXEL_RESOLUTIONS = (86400, 3600)  # coarsest first
+RECENT_BUCKETS = 8  # closed buckets kept in memory in case frames return to them
+
+_UPSERT = (
+    "INSERT INTO pixel_rollups (resolution, bucket, frames, count, sum, sumsq, min, max) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (resolution, bucket) DO UPDATE SET frames = excluded.frames, count = excluded.count, "
+    "sum = excluded.sum, sumsq = excluded.sumsq, min = excluded.min, max = excluded.max"
+)
+_COLUMNS = "frames, count, sum, sumsq, min, max"
+_SELECT_BUCKET = f"SELECT {_COLUMNS} FROM pixel_rollups WHERE resolution = ? AND bucket = ?"
+
+
+class PixelStats:
+    """Per-pixel count/sum/sumsq/min/max of a set of frames, combinable across buckets."""
+    __slots__ = ("frames", "count", "sum", "sumsq", "min", "max")
+
+    def __init__(self, shape: tuple[int, int] = FRAME_SHAPE) -> None:
+        self.frames = 0
+        self.count = np.zeros(shape, dtype=np.int32)
+        self.sum = np.zeros(shape, dtype=np.float64)
+        self.sumsq = np.zeros(shape, dtype=np.float64)
+        self.min = np.full(shape, np.inf, dtype=np.float32)
+        self.max = np.full(shape, -np.inf, dtype=np.float32)
+
+    def add(self, frame: np.ndarray) -> None:
+        """Fold one frame in; NaN pixels are not counted."""
+        if np.isfinite(frame).all():
+            self.count += 1
+            self.sum += frame
+            self.sumsq += np.square(frame, dtype=np.float64)
+            np.minimum(self.min, frame, out=self.min)
+            np.maximum(self.max, frame, out=self.max)
+        else:
+            finite = np.isfinite(frame)
+            values = np.where(finite, frame, 0.0)
+            self.count += finite
+            self.sum += values
+            self.sumsq += values * values
+            np.fmin(self.min, frame, out=self.min)
+            np.fmax(self.max, frame, out=self.max)
+        self.frames += 1
+
+    def merge(self, other: "PixelStats") -> "PixelStats":
+        self.frames += other.frames
+        self.count += other.count
+        self.sum += other.sum
+        self.sumsq += other.sumsq
+        np.minimum(self.min, other.min, out=self.min)
+        np.maximum(self.max, other.max, out=self.max)
+        return self
+
+    def crop(self, x: int, y: int, width: int, height: int) -> "PixelStats":
+        """The stats of a rectangle of pixels (clipped to the frame)."""
+        rows, cols = slice(max(y, 0), max(y + height, 0)), slice(max(x, 0), max(x + width, 0))
+        stats = PixelStats.__new__(PixelStats)
+        stats.frames = self.frames
+        for name in ("count", "sum", "sumsq", "min", "max"):
+            setattr(stats, name, getattr(self, name)[rows, cols])
+        return stats
+
+    @property
+    def mean(self) -> np.ndarray:
+        """Per-pixel mean; NaN where a pixel has no samples."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count > 0, self.sum / self.count, np.nan)
+
+    @property
+    def std(self) -> np.ndarray:
+        """Per-pixel population standard deviation; NaN where a pixel has no samples."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self.sum / self.count
+            return np.where(self.count > 0, np.sqrt(np.maximum(self.sumsq / self.count - mean * mean, 0.0)), np.nan)
+
+    def to_row(self) -> tuple:
+        return (self.frames, self.count.tobytes(), self.sum.tobytes(), self.sumsq.tobytes(), self.min.tobytes(), self.max.tobytes())
+
+    @classmethod
+    def from_row(cls, row: Any) -> "PixelStats":
+        """Stats from (frames, count, sum, sumsq, min, max) as stored in pixel_rollups."""
+        stats = cls.__new__(cls)
+        stats.frames = row[0]
+        stats.count = np.frombuffer(row[1], dtype=np.int32).reshape(FRAME_SHAPE).copy()
+        stats.sum = np.frombuffer(row[2], dtype=np.float64).reshape(FRAME_SHAPE).copy()
+        stats.sumsq = np.frombuffer(row[3], dtype=np.float64).reshape(FRAME_SHAPE).copy()
+        stats.min = np.frombuffer(row[4], dtype=np.float32).reshape(FRAME_SHAPE).copy()
+        stats.max = np.frombuffer(row[5], dtype=np.float32).reshape(FRAME_SHAPE).copy()
+        return stats
+
+
+def _write_pixel_rollups(db: Database, items: list[tuple[int, int, tuple]]) -> None:
+    """Store (resolution, bucket, to_row()) snapshots; a later snapshot of a bucket replaces an earlier one."""
+    db.executemany(_UPSERT, [(resolution, bucket) + row for resolution, bucket, row in items])
+
+
+class PixelRollupWriter:
+    """
+    Acquisition consumer that keeps the open hour and day buckets of per-pixel stats in
+    memory and stores a snapshot of each every flush_interval seconds and when its bucket
+    closes. A bucket reopened after a restart resumes from its stored snapshot; one reopened
+    soon after it closed (clock stepped back) resumes from the closed state kept in memory,
+    whose snapshot may still be queued, so the capture thread never waits for the writer.
+    """
+    def __init__(self, db: Database, flush_interval: float = 60.0, max_queue: int = 1000) -> None:
+        """
+        Args:
+            db: Database holding pixel_rollups.
+            flush_interval: Longest time in seconds before open buckets are written.
+            max_queue: Snapshots that may wait for the writer before new ones are dropped.
+        """
+        self.db = db
+        self.flush_interval = flush_interval
+        self.writer = BatchWriter(db, _write_pixel_rollups, name="pixel-rollup-writer", flush_interval=1.0,
+                                  max_batch=len(PIXEL_RESOLUTIONS) * 4, max_queue=max_queue)
+        self._open: dict[int, tuple[int, PixelStats]] = {}
+        self._recent: dict[tuple[int, int], PixelStats] = {}  # closed buckets, oldest first
+        self._last_flush = time.monotonic()
+        self.frames_added = 0
+
+    def __call__(self, frame: ThermalFrame) -> None:
+        for resolution in PIXEL_RESOLUTIONS:
+            bucket = math.floor(frame.timestamp / resolution) * resolution
+            current = self._open.get(resolution)
+            if current is None or current[0] != bucket:
+                if current is not None:
+                    self._submit(resolution, *current)
+                    self._recent[(resolution, current[0])] = current[1]
+                    if len(self._recent) > RECENT_BUCKETS:
+                        del self._recent[next(iter(self._recent))]
+                current = (bucket, self._resume(resolution, bucket))
+                self._open[resolution] = current
+            current[1].add(frame.data)
+        self.frames_added += 1
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.snapshot()
+
+    def snapshot(self) -> None:
+        """Queue the current state of every open bucket for writing."""
+        for resolution, (bucket, stats) in self._open.items():
+            self._submit(resolution, bucket, stats)
+        self._last_flush = time.monotonic()
+
+    def start(self) -> None:
+        self.writer.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Write the open buckets, then stop the writer thread."""
+        self.flush(timeout)
+        self.writer.stop(timeout)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Write the open buckets and wait until they are committed."""
+        self.snapshot()
+        return self.writer.flush(timeout)
+
+    def stats(self) -> dict[str, Any]:
+        stats = self.writer.stats()
+        stats.update(frames_added=self.frames_added, flush_interval=self.flush_interval,
+                     open_buckets={str(resolution): bucket for resolution, (bucket, _) in self._open.items()})
+        return stats
+
+    def _submit(self, resolution: int, bucket: int, stats: PixelStats) -> None:
+        self.writer.submit((resolution, bucket, stats.to_row()), timeout=0)
+
+    def _resume(self, resolution: int, bucket: int) -> PixelStats:
+        # Rare (once per bucket). A recently closed bucket is newer in memory than in the table;
+        # others are read through the writer's connection, never the one shared with requests
+        recent = self._recent.pop((resolution, bucket), None)
+        if recent is not None:
+            return recent
+        try:
+            rows = self.writer.read(_SELECT_BUCKET, (resolution, bucket))
+        except Exception as e:
+            logging.error("Could not load pixel rollup %d/%d: %s", resolution, bucket, e)
+            rows = []
+        return PixelStats.from_row(rows[0]) if rows else PixelStats()
+
+
+def pixel_stats(db: Database, start: float, end: float) -> tuple[PixelStats, Optional[int], Optional[int]]:
+    """
+    Merge the stored per-pixel buckets covering [start, end]: whole days from the daily
+    rollup and hours for the remainder. Ranges are widened to whole hours.
+
+    Returns:
+        tuple: (PixelStats, first covered second, end of the last covered bucket); the
+        bounds are None if no bucket overlaps the range.
+    """
+    hour, day = PIXEL_RESOLUTIONS[1], PIXEL_RESOLUTIONS[0]
+    first_hour, end_hour = math.floor(start / hour) * hour, math.floor(end / hour) * hour + hour
+    first_day, end_day = math.ceil(first_hour / day) * day, math.floor(end_hour / day) * day
+    if first_day < end_day:
+        query = (f"SELECT resolution, bucket, {_COLUMNS} FROM pixel_rollups WHERE "
+                 "(resolution = ? AND bucket >= ? AND bucket < ?) OR "
+                 "(resolution = ? AND ((bucket >= ? AND bucket < ?) OR (bucket >= ? AND bucket < ?)))")
+        params: tuple = (day, first_day, end_day, hour, first_hour, first_day, end_day, end_hour)
+    else:
+        query = f"SELECT resolution, bucket, {_COLUMNS} FROM pixel_rollups WHERE resolution = ? AND bucket >= ? AND bucket < ?"
+        params = (hour, first_hour, end_hour)
+    merged = PixelStats()
+    covered_start = covered_end = None
+    for row in db.execute_query(query, params).fetchall():
+        merged.merge(PixelStats.from_row(row[2:]))
+        covered_start = row[1] if covered_start is None else min(covered_start, row[1])
+        covered_end = row[1] + row[0] if covered_end is None else max(covered_end, row[1] + row[0])
+    return merged, covered_start, covered_end
@@ -0,0 +1,349 @@
+"""
+recording.py
+
+Continuous recording for IR Thermal Monitoring System.
+
+Every captured frame is appended to a fixed-layout segment file covering at most one
+clock hour. A segment file is a 64-byte header, an int64 epoch-nanosecond timestamp
+index and a float32 frame array, both preallocated for the segment's capacity:
+
+    header      magic, version, frame shape, capacity, frame count, first timestamp
+    timestamps  capacity x int64 (the first `count` are valid, ascending)
+    frames      capacity x 24 x 32 little-endian float32
+
+Appending is two memory copies into a writable memmap plus a header count update, and
+reads go through read-only numpy.memmap views, so a range inside one segment is returned
+without copying. SQLite holds only the segment catalog (recording_segments), which the
+recorder updates through a BatchWriter together with the msync of the segment pages.
+"""
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Iterator, Optional
+
+import numpy as np
+
+from .thermal_frame import FRAME_DTYPE, FRAME_HEIGHT, FRAME_SHAPE, FRAME_WIDTH, FrameLike, ThermalFrame, as_frame_array
+from .writer import BatchWriter
+
+SEGMENT_MAGIC = b"IRCAMSEG"
+SEGMENT_VERSION = 1
+SEGMENT_SECONDS = 3600
+SEGMENT_SUFFIX = ".seg"
+HOUR_NS = SEGMENT_SECONDS * 1_000_000_000
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("height", "<u4"),
+    ("width", "<u4"),
+    ("capacity", "<u4"),
+    ("count", "<u4"),
+    ("reserved0", "<u4"),
+    ("start_ns", "<i8"),
+    ("reserved1", "V24"),
+])
+HEADER_SIZE = HEADER_DTYPE.itemsize  # 64 bytes; keeps the timestamp and frame arrays 8-byte aligned
+TIMESTAMP_DTYPE = np.dtype("<i8")
+
+
+def segment_capacity(capture_interval: float) -> int:
+    """Frames to preallocate per hourly segment: one hour at capture_interval plus 25% for jitter."""
+    return int(math.ceil(SEGMENT_SECONDS / capture_interval * 1.25)) + 16
+
+
+class Segment:
+    """
+    One segment file mapped into memory. Read-only unless opened writable by the recorder.
+    timestamps and frames are views over the valid prefix of the file's arrays.
+    """
+    def __init__(self, path: str, writable: bool = False) -> None:
+        """
+        Raises:
+            ValueError: If the file is not a segment of this version and frame shape.
+            OSError: If the file cannot be opened.
+        """
+        mode = "r+" if writable else "r"
+        self.path = path
+        self.writable = writable
+        self._header = np.memmap(path, dtype=HEADER_DTYPE, mode=mode, shape=(1,))
+        header = self._header[0]
+        if header["magic"] != SEGMENT_MAGIC or header["version"] != SEGMENT_VERSION:
+            raise ValueError(f"{path} is not a version {SEGMENT_VERSION} recording segment.")
+        if (header["height"], header["width"]) != FRAME_SHAPE:
+            raise ValueError(f"{path} holds {header['height']}x{header['width']} frames, expected {FRAME_HEIGHT}x{FRAME_WIDTH}.")
+        self.capacity = int(header["capacity"])
+        self.start_ns = int(header["start_ns"])
+        self._timestamps = np.memmap(path, dtype=TIMESTAMP_DTYPE, mode=mode, offset=HEADER_SIZE, shape=(self.capacity,))
+        self._frames = np.memmap(path, dtype=FRAME_DTYPE, mode=mode, offset=HEADER_SIZE + TIMESTAMP_DTYPE.itemsize * self.capacity,
+                                 shape=(self.capacity,) + FRAME_SHAPE)
+
+    @classmethod
+    def create(cls, path: str, capacity: int, start_ns: int) -> "Segment":
+        """Create an empty segment file (sparse where the filesystem allows) and open it writable."""
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header[0] = (SEGMENT_MAGIC, SEGMENT_VERSION, FRAME_HEIGHT, FRAME_WIDTH, capacity, 0, 0, start_ns, b"")
+        with open(path, "xb") as f:
+            f.write(header.tobytes())
+            f.truncate(segment_file_size(capacity))
+        return cls(path, writable=True)
+
+    @property
+    def count(self) -> int:
+        return int(self._header[0]["count"])
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._timestamps[:self.count]
+
+    @property
+    def frames(self) -> np.ndarray:
+        return self._frames[:self.count]
+
+    @property
+    def end_ns(self) -> Optional[int]:
+        count = self.count
+        return int(self._timestamps[count - 1]) if count else None
+
+    def append(self, timestamp_ns: int, frame: np.ndarray) -> None:
+        """Write one frame; the header count is bumped last so readers never see a partial frame."""
+        count = self.count
+        if count >= self.capacity:
+            raise ValueError(f"Segment {self.path} is full.")
+        self._frames[count] = frame
+        self._timestamps[count] = timestamp_ns
+        self._header[0]["count"] = count + 1
+
+    def range(self, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> tuple[np.ndarray, np.ndarray]:
+        """Frames with start_ns <= timestamp < end_ns as (timestamps, frames) memmap views, without copying."""
+        timestamps = self.timestamps
+        lo = 0 if start_ns is None else int(np.searchsorted(timestamps, start_ns, side="left"))
+        hi = len(timestamps) if end_ns is None else int(np.searchsorted(timestamps, end_ns, side="left"))
+        return timestamps[lo:hi], self._frames[lo:hi]
+
+    def flush(self) -> None:
+        """msync written frames, then the header, to the file."""
+        if self.writable:
+            self._frames.flush()
+            self._timestamps.flush()
+            self._header.flush()
+
+
+def segment_file_size(capacity: int) -> int:
+    return HEADER_SIZE + capacity * (TIMESTAMP_DTYPE.itemsize + FRAME_DTYPE.itemsize * FRAME_HEIGHT * FRAME_WIDTH)
+
+
+def _segment_row(row: Any) -> dict[str, Any]:
+    return {
+        "id": row[0], "path": row[1], "start_ns": row[2], "end_ns": row[3],
+        "frame_count": row[4], "capacity": row[5], "closed": bool(row[6]),
+    }
+
+
+_SEGMENT_COLUMNS = "id, path, start_ns, end_ns, frame_count, capacity, closed"
+
+
+def list_segments(db: Any, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> list[dict[str, Any]]:
+    """Catalog rows of segments that may hold frames in [start_ns, end_ns), oldest first."""
+    query = f"SELECT {_SEGMENT_COLUMNS} FROM recording_segments WHERE 1 = 1"
+    params: tuple = ()
+    if end_ns is not None:
+        query += " AND start_ns < ?"
+        params += (end_ns,)
+    if start_ns is not None:
+        # Open segments keep growing past the end_ns last written to the catalog
+        query += " AND (closed = 0 OR end_ns >= ?)"
+        params += (start_ns,)
+    return [_segment_row(row) for row in db.execute_query(query + " ORDER BY start_ns", params).fetchall()]
+
+
+def iter_range(db: Any, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """
+    Yield (timestamps_ns, frames) per segment for frames with start_ns <= timestamp < end_ns.
+    Each pair is a read-only view into the segment file; nothing is copied.
+    """
+    for entry in list_segments(db, start_ns, end_ns):
+        try:
+            segment = Segment(entry["path"])
+        except (OSError, ValueError) as e:
+            logging.warning("Skipping recording segment %s: %s", entry["path"], e)
+            continue
+        timestamps, frames = segment.range(start_ns, end_ns)
+        if len(timestamps):
+            yield timestamps, frames
+
+
+def read_range(db: Any, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Recorded frames with start_ns <= timestamp < end_ns as (timestamps_ns, (n, 24, 32) frames).
+    A range inside one segment is returned as memmap views; ranges spanning segments are concatenated.
+    """
+    parts = list(iter_range(db, start_ns, end_ns))
+    if not parts:
+        return np.empty(0, dtype=np.int64), np.empty((0,) + FRAME_SHAPE, dtype=np.float32)
+    if len(parts) == 1:
+        return parts[0]
+    return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+
+def _write_catalog(db: Any, items: list[tuple]) -> None:
+    """
+    Apply queued catalog changes in order: ("open", path, start_ns, capacity) adds a segment's
+    row; ("sync", segment, end_ns, frame_count, closed) msyncs the segment's pages, then
+    records how many frames they hold.
+    """
+    for item in items:
+        if item[0] == "open":
+            _, path, start_ns, capacity = item
+            db.execute_query(
+                "INSERT INTO recording_segments (path, start_ns, frame_count, capacity, closed) VALUES (?, ?, 0, ?, 0)",
+                (path, start_ns, capacity),
+            )
+            continue
+        _, segment, end_ns, frame_count, closed = item
+        try:
+            segment.flush()
+        except (OSError, ValueError) as e:
+            # The header stays authoritative; recover_segments() re-reads it after a crash
+            logging.error("Syncing recording segment %s failed: %s", segment.path, e)
+        db.execute_query(
+            "UPDATE recording_segments SET end_ns = ?, frame_count = ?, closed = ? WHERE path = ?",
+            (end_ns, frame_count, int(closed), segment.path),
+        )
+
+
+class SegmentRecorder:
+    """
+    Acquisition consumer that appends every frame to the current hourly segment. A new
+    segment starts at each clock hour, when the current one is full, or when the clock
+    goes backwards. The catalog row of the open segment is refreshed every sync_interval
+    seconds, when the segment's pages are also synced to disk. Catalog writes and syncs run
+    on a BatchWriter thread with its own connection, so the capture path only creates
+    segment files and copies frames; until start() is called they run on the caller's thread.
+    """
+    def __init__(self, db: Any, directory: str, capture_interval: float = 1.0, sync_interval: float = 10.0) -> None:
+        self.db = db
+        self.directory = os.path.abspath(directory)
+        self.capacity = segment_capacity(capture_interval)
+        self.sync_interval = sync_interval
+        self.catalog = BatchWriter(db, _write_catalog, name="recording-catalog")
+        self.segment: Optional[Segment] = None
+        self._last_sync = 0.0
+        self.frames_recorded = 0
+        self.segments_created = 0
+        self.write_errors = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __call__(self, frame: ThermalFrame) -> None:
+        self.write(frame)
+
+    def write(self, frame: FrameLike, timestamp_ns: Optional[int] = None) -> None:
+        """Append one frame; timestamp_ns defaults to the ThermalFrame's capture time."""
+        if timestamp_ns is None:
+            if not isinstance(frame, ThermalFrame):
+                raise ValueError("timestamp_ns is required for frames without capture time.")
+            timestamp_ns = int(frame.timestamp * 1e9)
+        arr = as_frame_array(frame)
+        with self._lock:
+            try:
+                segment = self.segment
+                if segment is None or segment.full or timestamp_ns // HOUR_NS != segment.start_ns // HOUR_NS \
+                        or timestamp_ns < (segment.end_ns or segment.start_ns):
+                    segment = self._rotate(timestamp_ns)
+                segment.append(timestamp_ns, arr)
+                self.frames_recorded += 1
+                if time.monotonic() - self._last_sync >= self.sync_interval:
+                    self._sync()
+            except (OSError, ValueError, sqlite3.Error) as e:
+                self.write_errors += 1
+                logging.error("Recording write failed: %s", e)
+
+    def start(self) -> None:
+        """Start the background catalog writer."""
+        self.catalog.start()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until every catalog change queued so far is committed (True if drained within timeout)."""
+        return self.catalog.flush(timeout)
+
+    def close(self) -> None:
+        """Sync and close the open segment, mark it closed in the catalog and stop the catalog writer."""
+        with self._lock:
+            self._close_segment()
+        self.catalog.stop()
+
+    def stats(self) -> dict[str, Any]:
+        segment = self.segment
+        return {
+            "directory": self.directory,
+            "frames_recorded": self.frames_recorded,
+            "segments_created": self.segments_created,
+            "write_errors": self.write_errors,
+            "current_segment": segment.path if segment else None,
+            "current_frames": segment.count if segment else 0,
+            "segment_capacity": self.capacity,
+            "catalog_queue_depth": self.catalog.queue_depth,
+            "catalog_failed_batches": self.catalog.failed_batches,
+        }
+
+    def _rotate(self, start_ns: int) -> Segment:
+        self._close_segment()
+        start = datetime.fromtimestamp(start_ns / 1e9, timezone.utc)
+        path = os.path.join(self.directory, f"{start:%Y%m%d-%H%M%S}-{start_ns % 1_000_000_000:09d}{SEGMENT_SUFFIX}")
+        segment = Segment.create(path, self.capacity, start_ns)
+        self._submit(("open", path, start_ns, self.capacity))
+        self.segment = segment
+        self.segments_created += 1
+        self._last_sync = time.monotonic()
+        logging.info("Recording to new segment %s (%d frames capacity).", path, self.capacity)
+        return segment
+
+    def _sync(self, closed: bool = False) -> None:
+        segment = self.segment
+        if segment is None:
+            return
+        self._submit(("sync", segment, segment.end_ns, segment.count, closed))
+        self._last_sync = time.monotonic()
+
+    def _submit(self, item: tuple) -> None:
+        # Never block the capture thread; the writer counts and logs dropped changes
+        self.catalog.submit(item, timeout=0)
+        if not self.catalog.running:
+            self.catalog.flush()
+
+    def _close_segment(self) -> None:
+        if self.segment is None:
+            return
+        self._sync(closed=True)
+        self.segment = None
+
+
+def recover_segments(db: Any) -> int:
+    """
+    Close catalog rows left open by an unclean shutdown, taking the frame count and end
+    time from each segment's header. Returns the number of rows recovered.
+    """
+    recovered = 0
+    for row in db.execute_query(f"SELECT {_SEGMENT_COLUMNS} FROM recording_segments WHERE closed = 0").fetchall():
+        entry = _segment_row(row)
+        try:
+            segment = Segment(entry["path"])
+            count, end_ns = segment.count, segment.end_ns
+        except (OSError, ValueError) as e:
+            logging.warning("Recording segment %s unreadable (%s); closing its catalog row empty.", entry["path"], e)
+            count, end_ns = 0, None
+        with db.transaction() as conn:
+            conn.execute("UPDATE recording_segments SET end_ns = ?, frame_count = ?, closed = 1 WHERE id = ?", (end_ns, count, entry["id"]))
+        recovered += 1
+    if recovered:
+        logging.info("Recovered %d open recording segment(s).", recovered)
+    return recovered
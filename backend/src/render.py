@@ -0,0 +1,438 @@
+"""
+render.py
+
+Frame rendering and rendered-image caching for IR Thermal Monitoring System.
+
+render_indexed turns a (n, 24, 32) stack into one image of the frames stacked top to
+bottom in a single vectorised pass: temperatures are scaled to colormap levels with one
+range for the whole stack (comparable frames) or one per frame, optionally upscaled by
+pixel repetition and overlaid with zone outlines. The result is a palette-index image
+plus the colormap LUT as its palette, which encodes as a palette PNG several times faster
+and smaller than RGB; render_frames looks the palette up for an RGB image.
+
+Upscaling can also interpolate temperatures (bilinear / bicubic) with per-axis weight
+matrices precomputed per size, two matrix multiplies per frame. LiveImageRenderer renders
+the latest captured frame once per parameter set for any number of polling clients.
+
+RenderCache keeps encoded images in a size-bounded LRU in memory, backed by a size-bounded
+LRU directory so renders survive restarts. Keys are built by cache_key from everything a
+render depends on, including the data version of the source frames.
+"""
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Optional
+
+import numpy as np
+from PIL import Image
+
+from .thermal_frame import FRAME_HEIGHT, FRAME_SHAPE, FRAME_WIDTH
+
+RENDER_VERSION = 1  # bump when rendering output changes, so cached images are not reused
+SCALINGS = ("shared", "frame")
+MAX_SCALE = 16
+NAN_COLOR = (0, 0, 0)
+DEFAULT_ZONE_COLOR = (255, 0, 0)
+MAX_ZONE_COLORS = 32  # palette slots reserved for zone outlines at most
+INTERPOLATIONS = ("nearest", "bilinear", "bicubic")
+IMAGE_FORMATS = {"png": "image/png", "jpeg": "image/jpeg"}
+
+# Colormaps as (position, (r, g, b)) anchors, interpolated linearly into 256-entry LUTs
+_ANCHORS: dict[str, list[tuple[float, tuple[int, int, int]]]] = {
+    "gray": [(0.0, (0, 0, 0)), (1.0, (255, 255, 255))],
+    "iron": [(0.0, (0, 0, 0)), (0.15, (30, 0, 100)), (0.35, (140, 0, 150)), (0.55, (220, 50, 60)),
+             (0.75, (250, 140, 0)), (0.9, (255, 215, 50)), (1.0, (255, 255, 255))],
+    "rainbow": [(0.0, (0, 0, 128)), (0.15, (0, 0, 255)), (0.35, (0, 255, 255)), (0.5, (0, 255, 0)),
+                (0.65, (255, 255, 0)), (0.85, (255, 0, 0)), (1.0, (128, 0, 0))],
+}
+
+
+def _build_lut(anchors: list[tuple[float, tuple[int, int, int]]]) -> np.ndarray:
+    """(257, 3) uint8 LUT: 256 interpolated colours plus NAN_COLOR at index 256."""
+    positions = np.array([a[0] for a in anchors])
+    colours = np.array([a[1] for a in anchors], dtype=np.float64)
+    x = np.linspace(0.0, 1.0, 256)
+    lut = np.column_stack([np.interp(x, positions, colours[:, c]) for c in range(3)])
+    return np.vstack([np.rint(lut), NAN_COLOR]).astype(np.uint8)
+
+
+COLORMAPS: dict[str, np.ndarray] = {name: _build_lut(anchors) for name, anchors in _ANCHORS.items()}
+
+
+def parse_color(value: Optional[str], default: tuple[int, int, int] = DEFAULT_ZONE_COLOR) -> tuple[int, int, int]:
+    """'#RRGGBB' to an (r, g, b) tuple; default if missing or malformed."""
+    text = (value or "").strip().lstrip("#")
+    if len(text) != 6:
+        return default
+    try:
+        return (int(text[0:2], 16), int(text[2:4], 16), int(text[4:6], 16))
+    except ValueError:
+        return default
+
+
+def color_range(frames: np.ndarray, scaling: str = "shared", vmin: Optional[float] = None,
+                vmax: Optional[float] = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Lower bound and span of the colour scale, broadcastable against (n, 24, 32) frames.
+    vmin / vmax, when given, fix that end of the scale for every frame.
+
+    Raises:
+        ValueError: For an unknown scaling.
+    """
+    if scaling not in SCALINGS:
+        raise ValueError(f"Unknown scaling {scaling!r}; expected one of {', '.join(SCALINGS)}.")
+    axis = None if scaling == "shared" else (1, 2)
+    finite = np.isfinite(frames)
+    with np.errstate(invalid="ignore"):
+        lo = np.where(finite, frames, np.inf).min(axis=axis, keepdims=True) if vmin is None else np.full((1, 1, 1), vmin)
+        hi = np.where(finite, frames, -np.inf).max(axis=axis, keepdims=True) if vmax is None else np.full((1, 1, 1), vmax)
+    lo = np.where(np.isfinite(lo), lo, 0.0)  # frames without a finite pixel
+    hi = np.where(np.isfinite(hi), hi, lo)
+    span = np.where(hi > lo, hi - lo, 1.0)
+    return lo.reshape(-1, 1, 1), span.reshape(-1, 1, 1)
+
+
+@lru_cache(maxsize=64)
+def interpolation_weights(size: int, scale: int, method: str = "bilinear") -> np.ndarray:
+    """
+    Read-only (size * scale, size) float32 matrix W that upscales along one axis: for a
+    (24, 32) frame F, Wy @ F @ Wx.T is the (24 * scale, 32 * scale) interpolated frame, so
+    each frame costs two matrix multiplies. Output pixel centres map back onto the input
+    grid (half-pixel aligned) and taps beyond the edge are clamped to the edge pixel.
+    'bicubic' uses the Keys kernel with a = -0.5. Cached per size, scale and method.
+
+    Raises:
+        ValueError: For an unknown method.
+    """
+    if method not in INTERPOLATIONS:
+        raise ValueError(f"Unknown interpolation {method!r}; expected one of {', '.join(INTERPOLATIONS)}.")
+    out = size * scale
+    weights = np.zeros((out, size), dtype=np.float64)
+    rows = np.arange(out)
+    if method == "nearest":
+        weights[rows, rows // scale] = 1.0
+    else:
+        x = (rows + 0.5) / scale - 0.5
+        base = np.floor(x).astype(int)
+        t = x - base
+        if method == "bilinear":
+            taps = [(0, 1.0 - t), (1, t)]
+        else:
+            d = np.abs(np.stack([t + 1.0, t, 1.0 - t, 2.0 - t]))
+            kernel = np.where(d <= 1.0, (1.5 * d - 2.5) * d * d + 1.0, ((-0.5 * d + 2.5) * d - 4.0) * d + 2.0)
+            taps = [(offset, kernel[i]) for i, offset in enumerate((-1, 0, 1, 2))]
+        for offset, w in taps:
+            np.add.at(weights, (rows, np.clip(base + offset, 0, size - 1)), w)
+    weights = weights.astype(np.float32)
+    weights.flags.writeable = False
+    return weights
+
+
+def _zone_colours(zones: list[tuple[int, int, int, int, tuple[int, int, int]]]) -> list[tuple[int, int, int]]:
+    return list(dict.fromkeys(tuple(z[4]) for z in zones))[:MAX_ZONE_COLORS]
+
+
+def render_palette(colormap: str = "iron", nan: bool = False,
+                   zones: Iterable[tuple[int, int, int, int, tuple[int, int, int]]] = ()) -> np.ndarray:
+    """
+    The (k, 3) uint8 palette render_indexed uses for colormap: colormap levels, then
+    NAN_COLOR if nan, then the zone outline colours.
+
+    Raises:
+        ValueError: For an unknown colormap.
+    """
+    lut = COLORMAPS.get(colormap)
+    if lut is None:
+        raise ValueError(f"Unknown colormap {colormap!r}; expected one of {', '.join(COLORMAPS)}.")
+    colours = _zone_colours(list(zones))
+    levels = 256 - len(colours) - nan
+    palette = lut[:256] if levels == 256 else lut[np.rint(np.arange(levels) * (255.0 / (levels - 1))).astype(np.intp)]
+    if nan:
+        palette = np.vstack([palette, lut[256:]])
+    if colours:
+        palette = np.vstack([palette, np.array(colours, dtype=np.uint8)])
+    return palette
+
+
+def render_indexed(frames: np.ndarray, colormap: str = "iron", scaling: str = "shared", vmin: Optional[float] = None,
+                   vmax: Optional[float] = None, zones: Iterable[tuple[int, int, int, int, tuple[int, int, int]]] = (),
+                   scale: int = 1, reserve_nan: bool = False, interpolation: str = "nearest") -> tuple[np.ndarray, np.ndarray]:
+    """
+    Render frames as a (n * 24 * scale, 32 * scale) uint8 palette-index image, frames
+    stacked top to bottom, and its (k, 3) uint8 RGB palette (k <= 256).
+
+    Temperatures use all 256 colormap levels; when NaN pixels or zone outlines are present
+    the last palette slots hold NAN_COLOR and the outline colours, and the levels are
+    resampled from the colormap into the remaining slots. Outline colours beyond
+    MAX_ZONE_COLORS distinct ones are drawn in the last of them. With reserve_nan the NaN
+    slot is kept even without NaN pixels, so batches of one clip share a palette.
+
+    Args:
+        frames: (n, 24, 32) temperatures; NaN pixels are drawn in NAN_COLOR.
+        colormap: Name in COLORMAPS.
+        scaling: 'shared' for one colour range over all frames, 'frame' for one per frame.
+        vmin, vmax: Fixed ends of the colour range (override the data range).
+        zones: (x, y, width, height, (r, g, b)) rectangles outlined on every frame.
+        scale: Integer upscaling factor, 1..MAX_SCALE.
+        reserve_nan: Reserve the NaN palette slot whether or not any pixel is NaN.
+        interpolation: How temperatures are upscaled, one of INTERPOLATIONS: 'nearest'
+            repeats pixels, 'bilinear' / 'bicubic' apply interpolation_weights (NaN
+            pixels are filled with the middle of the colour range for this and drawn in
+            NAN_COLOR over their upscaled area).
+
+    Raises:
+        ValueError: For an unknown colormap, scaling or interpolation, or an out-of-range
+            scale.
+    """
+    if not 1 <= scale <= MAX_SCALE:
+        raise ValueError(f"scale must be between 1 and {MAX_SCALE}.")
+    if interpolation not in INTERPOLATIONS:
+        raise ValueError(f"Unknown interpolation {interpolation!r}; expected one of {', '.join(INTERPOLATIONS)}.")
+    frames = np.asarray(frames, dtype=np.float32).reshape((-1,) + FRAME_SHAPE)
+    zones = list(zones)
+    colours = _zone_colours(zones)
+    nan = np.isnan(frames)
+    has_nan = reserve_nan or bool(nan.any())
+    palette = render_palette(colormap, has_nan, zones)
+    levels = 256 - len(colours) - has_nan
+    lo, span = color_range(frames, scaling, vmin, vmax)
+    interpolate = scale > 1 and interpolation != "nearest"
+    if interpolate:
+        wy = interpolation_weights(FRAME_HEIGHT, scale, interpolation)
+        wx = interpolation_weights(FRAME_WIDTH, scale, interpolation)
+        frames = wy @ np.where(nan, (lo + span / 2).astype(np.float32), frames) @ wx.T
+        nan = nan.repeat(scale, axis=1).repeat(scale, axis=2)
+    with np.errstate(invalid="ignore"):
+        level = np.clip((frames - lo) * ((levels - 1) / span), 0.0, levels - 1)
+    level[nan] = 0.0
+    index = np.rint(level, out=level).astype(np.uint8)
+    if has_nan:
+        index[nan] = levels
+    if scale > 1 and not interpolate:
+        index = index.repeat(scale, axis=1).repeat(scale, axis=2)
+    height, width = FRAME_HEIGHT * scale, FRAME_WIDTH * scale
+    for x, y, w, h, colour in zones:
+        slot = 256 - len(colours) + (colours.index(tuple(colour)) if tuple(colour) in colours else len(colours) - 1)
+        x0, y0 = max(x * scale, 0), max(y * scale, 0)
+        x1, y1 = min((x + w) * scale, width) - 1, min((y + h) * scale, height) - 1
+        if x0 > x1 or y0 > y1:
+            continue  # entirely outside the frame
+        index[:, y0, x0:x1 + 1] = slot
+        index[:, y1, x0:x1 + 1] = slot
+        index[:, y0:y1 + 1, x0] = slot
+        index[:, y0:y1 + 1, x1] = slot
+    return index.reshape(-1, width), palette
+
+
+def render_frames(frames: np.ndarray, colormap: str = "iron", scaling: str = "shared", vmin: Optional[float] = None,
+                  vmax: Optional[float] = None, zones: Iterable[tuple[int, int, int, int, tuple[int, int, int]]] = (),
+                  scale: int = 1, interpolation: str = "nearest") -> np.ndarray:
+    """Like render_indexed, as a (n * 24 * scale, 32 * scale, 3) uint8 RGB image."""
+    index, palette = render_indexed(frames, colormap, scaling, vmin, vmax, zones, scale, interpolation=interpolation)
+    return palette[index]
+
+
+def encode_png(image: np.ndarray, palette: Optional[np.ndarray] = None, compress_level: int = 6) -> bytes:
+    """PNG of an RGB image, or of a palette-index image with its (k, 3) palette."""
+    buf = io.BytesIO()
+    if palette is None:
+        Image.fromarray(image).save(buf, format="PNG", compress_level=compress_level)
+    else:
+        indexed = Image.fromarray(image, mode="P")
+        indexed.putpalette(np.ascontiguousarray(palette, dtype=np.uint8).tobytes())
+        indexed.save(buf, format="PNG", compress_level=compress_level)
+    return buf.getvalue()
+
+
+def encode_jpeg(rgb: np.ndarray, quality: int = 85) -> bytes:
+    buf = io.BytesIO()
+    Image.fromarray(rgb).save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def cache_key(*parts: Any) -> str:
+    """Stable key for a render from its inputs (event, data version, render parameters)."""
+    return hashlib.sha256(repr((RENDER_VERSION,) + parts).encode()).hexdigest()[:32]
+
+
+class RenderCache:
+    """
+    LRU of encoded images bounded by total bytes in memory and, if a directory is given, on
+    disk. A disk hit is promoted to memory. The disk index is rebuilt from file modification
+    times at startup.
+    """
+    def __init__(self, directory: Optional[str] = None, max_memory_bytes: int = 32 << 20, max_disk_bytes: int = 256 << 20) -> None:
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes if directory else 0
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.evictions = 0
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        if directory:
+            self._load_disk_index()
+
+    def _load_disk_index(self) -> None:
+        assert self.directory is not None
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".bin"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._evict_disk()
+
+    def _path(self, key: str) -> str:
+        assert self.directory is not None
+        return os.path.join(self.directory, key + ".bin")
+
+    def get(self, key: str) -> tuple[Optional[bytes], str]:
+        """(data, 'memory' | 'disk') on a hit, (None, 'miss') otherwise."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return data, "memory"
+            on_disk = key in self._disk
+        if on_disk:
+            try:
+                with open(self._path(key), "rb") as f:
+                    data = f.read()
+                os.utime(self._path(key))
+            except OSError:
+                data = None
+            with self._lock:
+                if data is None:
+                    self._forget_disk(key)
+                else:
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+                    self.hits_disk += 1
+                    self._put_memory(key, data)
+                    return data, "disk"
+        with self._lock:
+            self.misses += 1
+        return None, "miss"
+
+    def put(self, key: str, data: bytes) -> None:
+        with self._lock:
+            self._put_memory(key, data)
+        if self.directory and len(data) <= self.max_disk_bytes:
+            try:
+                fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, self._path(key))
+            except OSError as e:
+                logging.warning("Could not write render cache entry %s: %s", key, e)
+                return
+            with self._lock:
+                self._forget_disk(key)
+                self._disk[key] = len(data)
+                self._disk_bytes += len(data)
+                self._evict_disk()
+
+    def _put_memory(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.evictions += 1
+
+    def _forget_disk(self, key: str) -> None:
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+
+    def _evict_disk(self) -> None:
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory), "memory_bytes": self._memory_bytes, "max_memory_bytes": self.max_memory_bytes,
+                "disk_entries": len(self._disk), "disk_bytes": self._disk_bytes, "max_disk_bytes": self.max_disk_bytes,
+                "hits_memory": self.hits_memory, "hits_disk": self.hits_disk, "misses": self.misses, "evictions": self.evictions,
+            }
+
+
+class _LiveEntry:
+    __slots__ = ("lock", "frame", "data")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.frame: Any = None
+        self.data = b""
+
+
+class LiveImageRenderer:
+    """
+    Encoded images of the latest frame, rendered at most once per captured frame and
+    parameter set however many clients poll. The entry of a parameter set keeps the frame
+    it was rendered from and is re-rendered when asked for with a different frame;
+    concurrent requests for the same entry wait for one render. At most max_entries
+    parameter sets are kept (LRU).
+    """
+    def __init__(self, max_entries: int = 32) -> None:
+        self.max_entries = max_entries
+        self.renders = 0
+        self.hits = 0
+        self._entries: OrderedDict[tuple, _LiveEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def etag(frame: Any, params: tuple) -> str:
+        """Strong ETag of frame rendered with params, known without rendering."""
+        return f'"{cache_key("live", frame.timestamp, params)}"'
+
+    def get(self, frame: Any, params: tuple, render: Callable[[], bytes]) -> tuple[bytes, bool]:
+        """(image, True) if frame was already rendered with params, else (render(), False)."""
+        with self._lock:
+            entry = self._entries.get(params)
+            if entry is None:
+                entry = self._entries[params] = _LiveEntry()
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(params)
+        with entry.lock:
+            if entry.frame is frame:
+                with self._lock:
+                    self.hits += 1
+                return entry.data, True
+            data = render()
+            entry.frame, entry.data = frame, data
+        with self._lock:
+            self.renders += 1
+        return data, False
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "renders": self.renders, "hits": self.hits}
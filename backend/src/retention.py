@@ -0,0 +1,313 @@
+"""
+retention.py
+
+Data retention and space reclamation for IR Thermal Monitoring System.
+
+RetentionJob deletes rows older than the data_retention_days setting from thermal_data,
+the 1-minute thermal_rollups, the hourly pixel_rollups, alarm_events with their frames and
+clips, and closed recording segments. The job uses its own connection, never the one shared
+by request handlers. Deletes run in small chunks, each its own short transaction on that
+connection, so the writer threads (each on their own connection too) wait for the write
+lock only briefly. Freed pages are then handed back to the filesystem with incremental
+auto-vacuum and the WAL is checkpointed and truncated.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Iterator, Optional
+
+from .database import Database
+from .rollups import epoch_to_iso
+
+DEFAULT_RETENTION_DAYS = 30.0
+DEFAULT_INTERVAL = 3600.0
+DEFAULT_CHECKPOINT_INTERVAL = 300.0
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+_EVENT_EXPIRED = "event_id IN (SELECT id FROM alarm_events WHERE timestamp < ?)"
+
+# (table, key columns, expiry condition, cutoff kinds bound to the condition's placeholders).
+# Children of alarm_events come first so no frame or clip outlives its event.
+RETENTION_TABLES: tuple[tuple[str, str, str, tuple[str, ...]], ...] = (
+    ("thermal_frames", "id", f"timestamp < ? OR {_EVENT_EXPIRED}", ("iso", "iso")),
+    ("event_clips", "id", f"end_time < ? OR {_EVENT_EXPIRED}", ("iso", "iso")),
+    ("alarm_events", "id", "timestamp < ?", ("iso",)),
+    ("thermal_data", "id", "timestamp < ?", ("iso",)),
+    # Hourly/daily zone rollups and daily pixel rollups are a few rows per day and are kept for long-range analytics
+    ("thermal_rollups", "resolution, zone_id, bucket", "resolution = 60 AND bucket < ?", ("epoch",)),
+    ("pixel_rollups", "id", "resolution = 3600 AND bucket < ?", ("epoch",)),
+    ("webhook_dead_letters", "id", "created_at < ?", ("sql",)),
+)
+
+
+def get_retention_days(db: Database, default: float = DEFAULT_RETENTION_DAYS) -> float:
+    """data_retention_days setting; 0 or less keeps data forever. Invalid values fall back to default."""
+    setting = db.get_setting("data_retention_days")
+    if not setting:
+        return default
+    try:
+        return float(setting["value"])
+    except ValueError:
+        logging.warning("Invalid data_retention_days setting %r; using %s.", setting["value"], default)
+        return default
+
+
+class RetentionJob:
+    """
+    Background thread that enforces data_retention_days every `interval` seconds and
+    checkpoints the WAL every `checkpoint_interval` seconds in between. run_once() may also
+    be called directly (e.g. from the API); runs never overlap. Both run on the job's own
+    connection (Database.clone(), opened on first use and closed by stop()).
+    """
+    def __init__(
+        self,
+        db: Database,
+        interval: float = DEFAULT_INTERVAL,
+        checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+        chunk_rows: int = 2000,
+        chunk_seconds: float = 0.05,
+        chunk_pause: float = 0.02,
+        vacuum_pages: int = 1024,
+    ) -> None:
+        """
+        Args:
+            db: Database to prune; the job opens its own connection to the same file.
+            interval: Seconds between retention runs.
+            checkpoint_interval: Seconds between WAL checkpoints.
+            chunk_rows: Rows deleted per transaction to start with; adapted to chunk_seconds.
+            chunk_seconds: Target duration of one delete transaction.
+            chunk_pause: Seconds to yield to other writers between chunks.
+            vacuum_pages: Pages released per incremental_vacuum step.
+        """
+        if interval <= 0 or checkpoint_interval <= 0 or chunk_rows <= 0 or chunk_seconds <= 0 or vacuum_pages <= 0:
+            raise ValueError("interval, checkpoint_interval, chunk_rows, chunk_seconds and vacuum_pages must be positive.")
+        self.db = db
+        self._conn: Optional[Database] = None
+        self.interval = interval
+        self.checkpoint_interval = checkpoint_interval
+        self.chunk_rows = chunk_rows
+        self.max_chunk_rows = chunk_rows * 8
+        self.chunk_seconds = chunk_seconds
+        self.chunk_pause = chunk_pause
+        self.vacuum_pages = vacuum_pages
+        self.runs = 0
+        self.failed_runs = 0
+        self.checkpoints = 0
+        self.last_report: Optional[dict[str, Any]] = None
+        self._run_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def start(self) -> None:
+        """Start the retention thread (no-op if already running)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+        logging.info("Retention job started (every %.0f s, checkpoint every %.0f s).", self.interval, self.checkpoint_interval)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the thread (a run in progress stops after its current chunk) and close the job's connection."""
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logging.warning("Retention job did not stop within %.1f s.", timeout)
+                return  # the thread still uses the connection
+            self._thread = None
+        with self._run_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @contextmanager
+    def paused(self) -> Iterator[None]:
+        """
+        Hold off runs and checkpoints and close the job's connection for the duration, e.g.
+        while the database is restored; the connection is reopened by the next run.
+        """
+        with self._run_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            yield
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def run_once(self, now: Optional[float] = None) -> dict[str, Any]:
+        """
+        Delete expired data, release freed pages and truncate the WAL.
+
+        Args:
+            now: Reference time in epoch seconds (defaults to the current time).
+
+        Returns:
+            dict: Rows deleted per table, segment files removed, pages vacuumed, and the
+            database, WAL and segment bytes reclaimed.
+        """
+        with self._run_lock:
+            started = time.perf_counter()
+            now = time.time() if now is None else now
+            db = self._connection()
+            retention_days = get_retention_days(db)
+            before = db.storage_stats()
+            report: dict[str, Any] = {
+                "started_at": epoch_to_iso(now),
+                "retention_days": retention_days,
+                "cutoff": None,
+                "rows_deleted": {},
+                "segments_deleted": 0,
+                "segment_bytes_reclaimed": 0,
+            }
+            try:
+                if retention_days > 0:
+                    cutoff = now - retention_days * 86400
+                    report["cutoff"] = epoch_to_iso(cutoff)
+                    for table, key, condition, kinds in RETENTION_TABLES:
+                        report["rows_deleted"][table] = self._delete_expired(table, key, condition, _cutoff_params(cutoff, kinds))
+                    report["segments_deleted"], report["segment_bytes_reclaimed"] = self._delete_segments(int(cutoff * 1e9))
+                report["pages_vacuumed"] = self._vacuum(before["auto_vacuum"])
+                self._checkpoint()
+            except Exception:
+                self.failed_runs += 1
+                logging.exception("Retention run failed.")
+                raise
+            after = db.storage_stats()
+            db_bytes_before = before["file_bytes"] + before["wal_bytes"]
+            db_bytes_after = after["file_bytes"] + after["wal_bytes"]
+            report.update(
+                auto_vacuum=AUTO_VACUUM_MODES.get(after["auto_vacuum"], str(after["auto_vacuum"])),
+                db_bytes_before=db_bytes_before,
+                db_bytes_after=db_bytes_after,
+                free_bytes=after["free_bytes"],
+                bytes_reclaimed=max(db_bytes_before - db_bytes_after, 0) + report["segment_bytes_reclaimed"],
+                duration_s=time.perf_counter() - started,
+            )
+            self.runs += 1
+            self.last_report = report
+            logging.info(
+                "Retention run: %d rows and %d segments older than %s deleted, %d bytes reclaimed in %.1f s.",
+                sum(report["rows_deleted"].values()), report["segments_deleted"], report["cutoff"],
+                report["bytes_reclaimed"], report["duration_s"],
+            )
+            return report
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "checkpoint_interval": self.checkpoint_interval,
+            "runs": self.runs,
+            "failed_runs": self.failed_runs,
+            "checkpoints": self.checkpoints,
+            "chunk_rows": self.chunk_rows,
+            "last_report": self.last_report,
+        }
+
+    def _connection(self) -> Database:
+        """The job's own connection; callers hold _run_lock."""
+        if self._conn is None:
+            self._conn = self.db.clone()
+        return self._conn
+
+    def _delete_expired(self, table: str, key: str, condition: str, params: tuple) -> int:
+        """Delete matching rows chunk by chunk, sizing chunks so each transaction takes about chunk_seconds."""
+        query = f"DELETE FROM {table} WHERE ({key}) IN (SELECT {key} FROM {table} WHERE {condition} LIMIT ?)"
+        deleted = 0
+        while not self._stop_event.is_set():
+            limit = self.chunk_rows
+            started = time.perf_counter()
+            with self._connection().transaction() as conn:
+                count = conn.execute(query, params + (limit,)).rowcount
+            elapsed = time.perf_counter() - started
+            deleted += count
+            if count < limit:
+                break
+            if elapsed > self.chunk_seconds:
+                self.chunk_rows = max(limit // 2, 1)
+            elif elapsed < self.chunk_seconds / 4:
+                self.chunk_rows = min(limit * 2, self.max_chunk_rows)
+            self._stop_event.wait(self.chunk_pause)
+        return deleted
+
+    def _delete_segments(self, cutoff_ns: int) -> tuple[int, int]:
+        """Remove closed recording segments whose last frame is older than cutoff_ns. Returns (segments, bytes)."""
+        db = self._connection()
+        rows = db.execute_query(
+            "SELECT id, path FROM recording_segments WHERE closed = 1 AND COALESCE(end_ns, start_ns) < ? ORDER BY start_ns",
+            (cutoff_ns,),
+        ).fetchall()
+        removed = reclaimed = 0
+        for segment_id, path in rows:
+            if self._stop_event.is_set():
+                break
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                reclaimed += size
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logging.warning("Could not remove recording segment %s: %s", path, e)
+                continue
+            with db.transaction() as conn:
+                conn.execute("DELETE FROM recording_segments WHERE id = ?", (segment_id,))
+            removed += 1
+        return removed, reclaimed
+
+    def _vacuum(self, auto_vacuum: int) -> int:
+        """Release free pages in vacuum_pages steps; without incremental auto-vacuum they stay for reuse."""
+        db = self._connection()
+        if auto_vacuum != 2:
+            if db.storage_stats()["freelist_count"]:
+                logging.info("Database is not in incremental auto-vacuum mode; freed pages will be reused but the "
+                             "file will not shrink until the database is migrated.")
+            return 0
+        released = 0
+        while not self._stop_event.is_set():
+            step = db.incremental_vacuum(self.vacuum_pages)
+            released += step
+            if step < self.vacuum_pages:
+                break
+            self._stop_event.wait(self.chunk_pause)
+        return released
+
+    def _checkpoint(self) -> None:
+        busy, wal_pages, checkpointed = self._connection().checkpoint("TRUNCATE")
+        self.checkpoints += 1
+        if busy:
+            logging.debug("WAL checkpoint busy (%d of %d pages written).", checkpointed, wal_pages)
+
+    def _run(self) -> None:
+        next_run = time.monotonic()
+        while not self._stop_event.is_set():
+            if time.monotonic() >= next_run:
+                try:
+                    self.run_once()
+                except Exception:
+                    pass  # logged by run_once; retried at the next interval
+                next_run = time.monotonic() + self.interval
+            elif self._run_lock.acquire(blocking=False):
+                try:
+                    self._checkpoint()
+                except Exception as e:
+                    logging.error("WAL checkpoint failed: %s", e)
+                finally:
+                    self._run_lock.release()
+            self._stop_event.wait(min(self.checkpoint_interval, max(next_run - time.monotonic(), 0.0)))
+
+
+def _cutoff_params(cutoff: float, kinds: tuple[str, ...]) -> tuple:
+    """Bind the cutoff in each column's stored format: ISO-8601, epoch seconds, or SQLite CURRENT_TIMESTAMP text."""
+    values = {
+        "iso": epoch_to_iso(cutoff),
+        "epoch": int(cutoff),
+        "sql": datetime.fromtimestamp(cutoff, timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    return tuple(values[kind] for kind in kinds)
@@ -0,0 +1,238 @@
+"""
+rollups.py
+
+Multi-resolution zone temperature rollups for IR Thermal Monitoring System analytics.
+
+thermal_rollups holds count, sum, sum of squares, min and max of thermal_data temperatures
+per zone per 1-minute, 1-hour and 1-day bucket (bucket = bucket start in epoch seconds,
+UTC). Rows are upserted in the same transaction as the thermal_data rows they summarise.
+
+Range queries are exact for count/mean/min/max: buckets that lie entirely inside the
+requested range come from the rollup, and the ragged edges are summarised from the next
+finer resolution, down to raw thermal_data rows for the last partial minute.
+"""
+import logging
+import math
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+import numpy as np
+
+ROLLUP_RESOLUTIONS = (86400, 3600, 60)  # coarsest first
+RAW_RESOLUTION = 0
+RESOLUTION_NAMES = {RAW_RESOLUTION: "raw", 60: "1m", 3600: "1h", 86400: "1d"}
+DEFAULT_POINTS = 500
+
+_UPSERT = (
+    "INSERT INTO thermal_rollups (resolution, zone_id, bucket, count, sum, sumsq, min, max) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (resolution, zone_id, bucket) DO UPDATE SET "
+    "count = count + excluded.count, sum = sum + excluded.sum, sumsq = sumsq + excluded.sumsq, "
+    "min = MIN(min, excluded.min), max = MAX(max, excluded.max)"
+)
+
+
+def epoch_to_iso(seconds: float) -> str:
+    """Epoch seconds to the naive UTC ISO-8601 format thermal_data timestamps use."""
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def iso_to_epoch(timestamp: str) -> float:
+    """
+    Parse an ISO-8601 timestamp (naive means UTC) to epoch seconds.
+
+    Raises:
+        ValueError: If the timestamp cannot be parsed.
+    """
+    parsed = datetime.fromisoformat(timestamp)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def parse_resolution(name: str) -> int:
+    """'raw', '1m', '1h' or '1d' to a bucket width in seconds (0 for raw)."""
+    for seconds, label in RESOLUTION_NAMES.items():
+        if label == name:
+            return seconds
+    raise ValueError(f"Unknown resolution {name!r}; expected one of {', '.join(RESOLUTION_NAMES.values())}.")
+
+
+def choose_resolution(start: float, end: float, points: int = DEFAULT_POINTS) -> int:
+    """Coarsest rollup resolution that still gives at least `points` buckets over [start, end]; 0 (raw) if none does."""
+    span = end - start
+    for resolution in ROLLUP_RESOLUTIONS:
+        if span / resolution >= points:
+            return resolution
+    return RAW_RESOLUTION
+
+
+def rollup_rows(epochs: np.ndarray, zone_ids: np.ndarray, values: np.ndarray) -> list[tuple]:
+    """
+    Aggregate raw samples into thermal_rollups parameter rows for every resolution.
+    Non-finite values are skipped, matching SQLite, which stores NaN as NULL.
+    """
+    epochs, zone_ids, values = np.asarray(epochs, dtype=np.float64), np.asarray(zone_ids, dtype=np.int64), np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    if not finite.all():
+        epochs, zone_ids, values = epochs[finite], zone_ids[finite], values[finite]
+    if not len(values):
+        return []
+    rows: list[tuple] = []
+    for resolution in ROLLUP_RESOLUTIONS:
+        buckets = (np.floor(epochs / resolution) * resolution).astype(np.int64)
+        order = np.lexsort((buckets, zone_ids))
+        z, b, v = zone_ids[order], buckets[order], values[order]
+        starts = np.flatnonzero(np.r_[True, (z[1:] != z[:-1]) | (b[1:] != b[:-1])])
+        counts = np.diff(np.r_[starts, len(v)])
+        rows += zip(
+            [resolution] * len(starts), z[starts].tolist(), b[starts].tolist(), counts.tolist(),
+            np.add.reduceat(v, starts).tolist(), np.add.reduceat(v * v, starts).tolist(),
+            np.minimum.reduceat(v, starts).tolist(), np.maximum.reduceat(v, starts).tolist(),
+        )
+    return rows
+
+
+def update_rollups(db: Any, epochs: np.ndarray, zone_ids: np.ndarray, values: np.ndarray) -> None:
+    """Fold raw samples into thermal_rollups; call inside the transaction that inserts them."""
+    rows = rollup_rows(epochs, zone_ids, values)
+    if rows:
+        db.executemany(_UPSERT, rows)
+
+
+def rebuild_rollups(db: Any) -> int:
+    """Recompute thermal_rollups from every thermal_data row. Returns the number of rollup rows."""
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM thermal_rollups")
+        for resolution in ROLLUP_RESOLUTIONS:
+            conn.execute(
+                "INSERT INTO thermal_rollups (resolution, zone_id, bucket, count, sum, sumsq, min, max) "
+                "SELECT ?, zone_id, bucket, COUNT(*), SUM(temperature), SUM(temperature * temperature), MIN(temperature), MAX(temperature) "
+                "FROM (SELECT zone_id, temperature, (CAST(strftime('%s', timestamp) AS INTEGER) / ?) * ? AS bucket "
+                "      FROM thermal_data WHERE zone_id IS NOT NULL AND temperature IS NOT NULL) "
+                "WHERE bucket IS NOT NULL GROUP BY zone_id, bucket",
+                (resolution, resolution, resolution),
+            )
+        count = conn.execute("SELECT COUNT(*) FROM thermal_rollups").fetchone()[0]
+    logging.info("Rebuilt %d thermal rollup rows.", count)
+    return count
+
+
+def ensure_rollups(db: Any) -> bool:
+    """Backfill thermal_rollups from thermal_data if it has never been built (e.g. after an upgrade)."""
+    if db.execute_query("SELECT 1 FROM thermal_rollups LIMIT 1").fetchone() is not None:
+        return False
+    if db.execute_query("SELECT 1 FROM thermal_data LIMIT 1").fetchone() is None:
+        return False
+    rebuild_rollups(db)
+    return True
+
+
+class Totals:
+    """count/sum/sumsq/min/max of a set of samples, combinable across buckets."""
+    __slots__ = ("count", "sum", "sumsq", "min", "max")
+
+    def __init__(self, count: int = 0, total: float = 0.0, sumsq: float = 0.0,
+                 minimum: Optional[float] = None, maximum: Optional[float] = None) -> None:
+        self.count = count
+        self.sum = total
+        self.sumsq = sumsq
+        self.min = minimum
+        self.max = maximum
+
+    def add(self, other: "Totals") -> "Totals":
+        if other.count:
+            self.count += other.count
+            self.sum += other.sum
+            self.sumsq += other.sumsq
+            self.min = other.min if self.min is None else min(self.min, other.min)  # type: ignore[type-var]
+            self.max = other.max if self.max is None else max(self.max, other.max)  # type: ignore[type-var]
+        return self
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(max(self.sumsq / self.count - self.mean ** 2, 0.0)) if self.count else 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "min": self.min if self.min is not None else 0.0,
+            "max": self.max if self.max is not None else 0.0,
+            "std": self.std,
+        }
+
+
+def _zone_filter(zone_id: Optional[int]) -> tuple[str, tuple]:
+    return (" AND zone_id = ?", (zone_id,)) if zone_id is not None else ("", ())
+
+
+def _raw_totals(db: Any, start: float, end: float, end_inclusive: bool, zone_id: Optional[int]) -> Totals:
+    where, params = _zone_filter(zone_id)
+    row = db.execute_query(
+        "SELECT COUNT(temperature), SUM(temperature), SUM(temperature * temperature), MIN(temperature), MAX(temperature) "
+        f"FROM thermal_data WHERE timestamp >= ? AND timestamp {'<=' if end_inclusive else '<'} ?{where}",
+        (epoch_to_iso(start), epoch_to_iso(end)) + params,
+    ).fetchone()
+    return Totals(row[0], row[1] or 0.0, row[2] or 0.0, row[3], row[4])
+
+
+def _totals(db: Any, start: float, end: float, end_inclusive: bool, zone_id: Optional[int], resolutions: tuple[int, ...]) -> Totals:
+    """Exact totals over [start, end) (or [start, end]) from the given resolutions, finest last, then raw rows."""
+    if not resolutions:
+        return _raw_totals(db, start, end, end_inclusive, zone_id)
+    resolution, finer = resolutions[0], resolutions[1:]
+    first = math.ceil(start / resolution) * resolution
+    last = math.floor(end / resolution) * resolution  # buckets in [first, last) lie inside the range
+    if first >= last:
+        return _totals(db, start, end, end_inclusive, zone_id, finer)
+    where, params = _zone_filter(zone_id)
+    row = db.execute_query(
+        f"SELECT SUM(count), SUM(sum), SUM(sumsq), MIN(min), MAX(max) FROM thermal_rollups "
+        f"WHERE resolution = ? AND bucket >= ? AND bucket < ?{where}",
+        (resolution, first, last) + params,
+    ).fetchone()
+    totals = Totals(row[0] or 0, row[1] or 0.0, row[2] or 0.0, row[3], row[4])
+    if start < first:
+        totals.add(_totals(db, start, first, False, zone_id, finer))
+    if last < end or end_inclusive:
+        totals.add(_totals(db, last, end, end_inclusive, zone_id, finer))
+    return totals
+
+
+def range_summary(db: Any, start: float, end: float, zone_id: Optional[int] = None,
+                  max_resolution: int = ROLLUP_RESOLUTIONS[0]) -> Totals:
+    """
+    Exact count/mean/min/max of thermal_data temperatures with start <= timestamp <= end,
+    using rollups no coarser than max_resolution (0 scans raw rows only).
+    """
+    return _totals(db, start, end, True, zone_id, tuple(r for r in ROLLUP_RESOLUTIONS if r <= max_resolution))
+
+
+def bucket_series(db: Any, start: float, end: float, resolution: int, zone_id: Optional[int] = None) -> list[tuple[int, Totals]]:
+    """
+    Per-bucket totals at one rollup resolution for start <= timestamp <= end, as
+    (bucket start, Totals) in time order. Without zone_id every zone's samples are pooled.
+    Edge buckets cover only their part of the range, so every point is exact.
+    """
+    finer = tuple(r for r in ROLLUP_RESOLUTIONS if r < resolution)
+    first = math.ceil(start / resolution) * resolution
+    last = math.floor(end / resolution) * resolution
+    series: list[tuple[int, Totals]] = []
+    if first > last:  # the whole range lies inside one bucket
+        totals = _totals(db, start, end, True, zone_id, finer)
+        return [(last, totals)] if totals.count else []
+    if start < first:
+        series.append((first - resolution, _totals(db, start, first, False, zone_id, finer)))
+    where, params = _zone_filter(zone_id)
+    cur = db.execute_query(
+        "SELECT bucket, SUM(count), SUM(sum), SUM(sumsq), MIN(min), MAX(max) FROM thermal_rollups "
+        f"WHERE resolution = ? AND bucket >= ? AND bucket < ?{where} GROUP BY bucket ORDER BY bucket",
+        (resolution, first, last) + params,
+    )
+    series += [(row[0], Totals(row[1], row[2], row[3], row[4], row[5])) for row in cur.fetchall()]
+    series.append((last, _totals(db, last, end, True, zone_id, finer)))
+    return [(bucket, totals) for bucket, totals in series if totals.count]
@@ -5,14 +5,26 @@ MLX90640 sensor handler for IR Thermal Monitoring System.
 """
 import time
 import logging
-from typing import List
-import random
+from typing import Optional
+
+import numpy as np
+
+from .thermal_frame import FRAME_PIXELS, FRAME_SHAPE, ThermalFrame
 
 try:
     import smbus2
 except ImportError:
     smbus2 = None
 
+try:
+    import board
+    import busio
+    from adafruit_mlx90640 import MLX90640
+except ImportError:
+    board = None
+    busio = None
+    MLX90640 = None
+
 
 class ThermalSensor:
     """
@@ -31,12 +43,8 @@ class ThermalSensor:
         Raises:
             RuntimeError: If required libraries are not installed or I2C bus cannot be opened.
         """
-        try:
-            import board
-            import busio
-            from adafruit_mlx90640 import MLX90640
-        except ImportError as e:
-            raise RuntimeError("Required hardware libraries not installed or not supported on this platform.") from e
+        if busio is None or MLX90640 is None:
+            raise RuntimeError("Required hardware libraries not installed or not supported on this platform.")
         self.board = board
         self.busio = busio
         self.MLX90640 = MLX90640
@@ -55,24 +63,25 @@ class ThermalSensor:
             logging.error(f"Failed to initialize MLX90640: {e}")
             raise RuntimeError(f"Cannot initialize MLX90640 sensor: {e}")
 
-    def read_frame(self) -> List[float]:
+    def read_frame(self) -> ThermalFrame:
         """
         Read a thermal frame (768 temperature points) from the MLX90640 sensor.
 
         Returns:
-            List[float]: List of 768 temperature readings (°C).
+            ThermalFrame: (24, 32) float32 temperatures (°C) with capture timestamp.
 
         Raises:
             IOError: If repeated I2C read failures occur.
         """
         retries = 0
-        frame = [0] * 768  # Adafruit expects ints, will be filled with floats
+        # The driver assigns pixels by index, so it fills the float32 buffer directly.
+        frame = np.zeros(FRAME_PIXELS, dtype=np.float32)
         while retries <= self.max_retries:
             try:
                 self.sensor.getFrame(frame)
-                if len(frame) != 768:
+                if len(frame) != FRAME_PIXELS:
                     raise ValueError("MLX90640 frame length incorrect")
-                return [float(x) for x in frame]
+                return ThermalFrame(frame.reshape(FRAME_SHAPE), time.time())
             except Exception as e:
                 logging.warning(f"Read frame attempt {retries + 1} failed: {e}")
                 retries += 1
@@ -85,13 +94,12 @@ class MockThermalSensor:
     """
     Mock sensor for development/testing. Generates random temperature frames with noise.
     """
-    def __init__(self, base_temp: float = 25.0, noise: float = 2.0):
+    def __init__(self, base_temp: float = 25.0, noise: float = 2.0, seed: Optional[int] = None):
         self.base_temp = base_temp
         self.noise = noise
+        self._rng = np.random.default_rng(seed)
 
-    def read_frame(self) -> List[float]:
+    def read_frame(self) -> ThermalFrame:
         # Simulate 768 temperature readings with random noise
-        return [
-            random.gauss(self.base_temp, self.noise)
-            for _ in range(768)
-        ]
+        data = self._rng.normal(self.base_temp, self.noise, FRAME_SHAPE).astype(np.float32)
+        return ThermalFrame(data, time.time())
@@ -0,0 +1,123 @@
+"""
+thermal_frame.py
+
+Frame type for IR Thermal Monitoring System: a (24, 32) float32 array with its capture time.
+"""
+import time
+from datetime import datetime, timezone
+from typing import Any, Iterator, Optional, Sequence, Union
+
+import numpy as np
+
+FRAME_HEIGHT = 24
+FRAME_WIDTH = 32
+FRAME_PIXELS = FRAME_HEIGHT * FRAME_WIDTH
+FRAME_SHAPE = (FRAME_HEIGHT, FRAME_WIDTH)
+# Storage byte order is fixed little-endian float32, matching existing thermal_frames BLOBs.
+FRAME_DTYPE = np.dtype("<f4")
+
+
+class ThermalFrame:
+    """
+    One MLX90640 capture: a read-only (24, 32) float32 array plus capture time (epoch seconds).
+    Also behaves like the legacy flat list of 768 floats (len, iteration, flat indexing).
+    """
+    __slots__ = ("data", "timestamp")
+
+    def __init__(self, data: "FrameLike", timestamp: Optional[float] = None) -> None:
+        """
+        Args:
+            data: Frame values; any shape with 768 elements. Float32 arrays are not copied.
+            timestamp: Capture time in epoch seconds (defaults to now).
+
+        Raises:
+            ValueError: If data does not hold exactly 768 values.
+        """
+        arr = as_frame_array(data)
+        if arr.flags.writeable:
+            arr = arr.view()
+            arr.flags.writeable = False
+        self.data: np.ndarray = arr
+        self.timestamp: float = time.time() if timestamp is None else float(timestamp)
+
+    @classmethod
+    def frombytes(cls, blob: bytes, timestamp: Optional[float] = None) -> "ThermalFrame":
+        """Build a frame over a serialized BLOB without copying it."""
+        return cls(frame_from_bytes(blob), timestamp)
+
+    def tobytes(self) -> bytes:
+        """Serialize to little-endian float32 bytes, row-major."""
+        return frame_to_bytes(self.data)
+
+    def tolist(self) -> list[float]:
+        """Return the legacy flat list of 768 floats."""
+        return self.data.ravel().tolist()
+
+    def isoformat(self) -> str:
+        """Capture time as a naive UTC ISO-8601 string (the format used across the API)."""
+        return datetime.fromtimestamp(self.timestamp, timezone.utc).replace(tzinfo=None).isoformat()
+
+    def copy(self) -> "ThermalFrame":
+        return ThermalFrame(self.data.copy(), self.timestamp)
+
+    # --- Compatibility shim for callers written against List[float] ---
+    def __len__(self) -> int:
+        return FRAME_PIXELS
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self.tolist())
+
+    def __getitem__(self, index: Any) -> Any:
+        value = self.data.reshape(-1)[index]
+        return float(value) if np.ndim(value) == 0 else value
+
+    def __array__(self, dtype: Any = None, copy: Optional[bool] = None) -> np.ndarray:
+        if dtype is None or np.dtype(dtype) == self.data.dtype:
+            return self.data.copy() if copy else self.data
+        return self.data.astype(dtype)
+
+    def __repr__(self) -> str:
+        return f"ThermalFrame(timestamp={self.timestamp!r}, shape={self.data.shape})"
+
+
+FrameLike = Union[ThermalFrame, np.ndarray, Sequence[float]]
+
+
+def as_frame_array(frame: FrameLike) -> np.ndarray:
+    """
+    Return frame values as a (24, 32) float32 array, without copying when already float32.
+
+    Raises:
+        ValueError: If the frame does not hold exactly 768 values.
+    """
+    if isinstance(frame, ThermalFrame):
+        return frame.data
+    arr = np.asarray(frame, dtype=np.float32)
+    if arr.size != FRAME_PIXELS:
+        raise ValueError(f"Thermal frame must have {FRAME_PIXELS} values, got {arr.size}.")
+    return arr.reshape(FRAME_SHAPE)
+
+
+def to_thermal_frame(frame: FrameLike, timestamp: Optional[float] = None) -> ThermalFrame:
+    """Wrap sensor output in a ThermalFrame; frames that already are one are returned unchanged."""
+    if isinstance(frame, ThermalFrame):
+        return frame
+    return ThermalFrame(frame, timestamp)
+
+
+def frame_to_bytes(frame: FrameLike) -> bytes:
+    """Serialize frame values as little-endian float32 bytes."""
+    return as_frame_array(frame).astype(FRAME_DTYPE, copy=False).tobytes()
+
+
+def frame_from_bytes(blob: bytes) -> np.ndarray:
+    """
+    Return a read-only (24, 32) float32 view over a serialized frame BLOB.
+
+    Raises:
+        ValueError: If the BLOB is not exactly one frame long.
+    """
+    arr = np.frombuffer(blob, dtype=FRAME_DTYPE)
+    if arr.size != FRAME_PIXELS:
+        raise ValueError(f"Frame BLOB must hold {FRAME_PIXELS} float32 values, got {arr.size}.")
+    return arr.reshape(FRAME_SHAPE)
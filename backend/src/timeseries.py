@@ -0,0 +1,210 @@
+"""
+timeseries.py
+
+Zone temperature time series (thermal_data) ingestion for IR Thermal Monitoring System.
+"""
+import warnings
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+from .database import Database
+from .rollups import iso_to_epoch, update_rollups
+from .thermal_frame import ThermalFrame
+from .writer import BatchWriter
+from .zones import ZoneStats
+
+ZONE_STATISTICS = ("average", "minimum", "maximum", "std")
+FETCH_CHUNK_ROWS = 65536
+_NAT = np.datetime64("NaT", "us")
+
+
+def parse_timestamps(timestamps: Sequence[str]) -> np.ndarray:
+    """
+    ISO-8601 strings to a datetime64[us] array (naive UTC). Parsed in bulk by NumPy; strings
+    NumPy will not take (UTC offsets, 'Z') fall back to iso_to_epoch, unparsable ones become NaT.
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            return np.array(timestamps, dtype="datetime64[us]")
+    except (ValueError, UserWarning):
+        pass
+    parsed = np.empty(len(timestamps), dtype="datetime64[us]")
+    for i, timestamp in enumerate(timestamps):
+        try:
+            parsed[i] = np.datetime64(round(iso_to_epoch(str(timestamp)) * 1e6), "us")
+        except ValueError:
+            parsed[i] = _NAT
+    return parsed
+
+
+def format_timestamps(timestamps: np.ndarray) -> list[str]:
+    """datetime64[us] array to ISO-8601 strings, formatted like datetime.isoformat() (no fraction on whole seconds)."""
+    text = np.datetime_as_string(timestamps, unit="us")
+    whole = timestamps.astype(np.int64) % 1_000_000 == 0
+    if whole.any():
+        text[whole] = np.datetime_as_string(timestamps[whole], unit="s")
+    return text.tolist()
+
+
+class ZoneSeries:
+    """
+    Columnar zone temperature samples: datetime64[us] timestamps, float64 temperatures and
+    int64 zone ids (None when the samples pool several zones), plus optional extra columns
+    such as a rollup bucket's count/min/max. A series built from stored ISO strings keeps
+    them and parses them only when timestamps are first needed.
+    """
+    __slots__ = ("_timestamps", "_text", "temperatures", "zone_ids", "extra")
+
+    def __init__(self, timestamps: Optional[np.ndarray], temperatures: np.ndarray, zone_ids: Optional[np.ndarray] = None,
+                 text: Optional[np.ndarray] = None, **extra: np.ndarray) -> None:
+        """
+        Args:
+            timestamps: datetime64[us] sample times; may be None if text is given.
+            temperatures: Sample temperatures.
+            zone_ids: Zone of each sample, or None for samples pooled across zones.
+            text: The timestamps as stored ISO-8601 strings (object array), returned as-is by isoformat().
+            extra: Further per-sample columns, included by to_rows().
+        """
+        if timestamps is None and text is None:
+            raise ValueError("ZoneSeries needs timestamps or their text.")
+        self._timestamps = None if timestamps is None else np.asarray(timestamps, dtype="datetime64[us]")
+        self._text = text
+        self.temperatures = np.asarray(temperatures, dtype=np.float64)
+        self.zone_ids = None if zone_ids is None else np.asarray(zone_ids, dtype=np.int64)
+        self.extra = extra
+
+    @classmethod
+    def empty(cls) -> "ZoneSeries":
+        return cls(np.empty(0, dtype="datetime64[us]"), np.empty(0), np.empty(0, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return len(self.temperatures)
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        if self._timestamps is None:
+            self._timestamps = parse_timestamps(self._text.tolist())  # type: ignore[union-attr]
+        return self._timestamps
+
+    @property
+    def epochs(self) -> np.ndarray:
+        """Timestamps as float64 epoch seconds."""
+        return self.timestamps.astype(np.int64) / 1e6
+
+    def isoformat(self) -> list[str]:
+        return self._text.tolist() if self._text is not None else format_timestamps(self.timestamps)
+
+    def take(self, index: np.ndarray) -> "ZoneSeries":
+        """Subset by integer indices or boolean mask."""
+        return ZoneSeries(
+            None if self._timestamps is None else self._timestamps[index],
+            self.temperatures[index],
+            None if self.zone_ids is None else self.zone_ids[index],
+            text=None if self._text is None else self._text[index],
+            **{name: column[index] for name, column in self.extra.items()},
+        )
+
+    def to_rows(self, zone_id: Optional[int] = None) -> list[dict]:
+        """One dict per sample; zone_id fills in for pooled series."""
+        zone_ids = self.zone_ids.tolist() if self.zone_ids is not None else [zone_id] * len(self)
+        columns = {name: column.tolist() for name, column in self.extra.items()}
+        return [
+            {"timestamp": timestamp, "temperature": temperature, "zone_id": zone,
+             **{name: values[i] for name, values in columns.items()}}
+            for i, (timestamp, temperature, zone) in enumerate(zip(self.isoformat(), self.temperatures.tolist(), zone_ids))
+        ]
+
+
+_FETCH_DTYPE = np.dtype([("timestamp", object), ("temperature", np.float64), ("zone_id", np.int64)])
+
+
+def fetch_zone_series(db: Database, start_time: str, end_time: str, zone_id: Optional[int] = None,
+                      chunk_rows: int = FETCH_CHUNK_ROWS) -> ZoneSeries:
+    """
+    thermal_data rows with start_time <= timestamp <= end_time as columns, in time order.
+    Rows are fetched chunk_rows at a time as plain tuples and each chunk is converted to a
+    structured array in one call. Rows without a temperature are skipped, as in thermal_rollups;
+    a missing zone id reads as -1.
+    """
+    query = ("SELECT timestamp, temperature, COALESCE(zone_id, -1) FROM thermal_data "
+             "WHERE timestamp BETWEEN ? AND ? AND temperature IS NOT NULL")
+    params: tuple = (start_time, end_time)
+    if zone_id is not None:
+        query += " AND zone_id = ?"
+        params += (zone_id,)
+    chunks = [np.array(rows, dtype=_FETCH_DTYPE) for rows in db.iter_query_chunks(query + " ORDER BY timestamp ASC", params, chunk_rows)]
+    if not chunks:
+        return ZoneSeries.empty()
+    columns = np.concatenate(chunks)
+    return ZoneSeries(None, columns["temperature"].copy(), columns["zone_id"].copy(), text=columns["timestamp"].copy())
+
+
+def _write_zone_rows(db: Database, items: list[tuple[str, np.ndarray, np.ndarray]]) -> None:
+    """
+    Insert every (timestamp, zone_ids, values) item as thermal_data rows with one executemany,
+    and fold the same samples into thermal_rollups in the same transaction.
+    """
+    rows = [
+        (zone_id, timestamp, value)
+        for timestamp, zone_ids, values in items
+        for zone_id, value in zip(zone_ids.tolist(), values.tolist())
+    ]
+    db.executemany("INSERT INTO thermal_data (zone_id, timestamp, temperature) VALUES (?, ?, ?)", rows)
+    # Bucket by the stored timestamp string so rollups and raw range queries agree at bucket edges
+    epochs = np.repeat([iso_to_epoch(timestamp) for timestamp, _, _ in items], [len(zone_ids) for _, zone_ids, _ in items])
+    update_rollups(db, epochs, np.concatenate([zone_ids for _, zone_ids, _ in items]), np.concatenate([values for _, _, values in items]))
+
+
+class ZoneSeriesWriter:
+    """
+    Frame pipeline sink that records one thermal_data row per zone for every frame and keeps
+    thermal_rollups (see rollups.py) up to date. Each frame's rows are queued as one item; a BatchWriter thread commits them with a
+    single executemany once batch_size rows are pending or flush_interval seconds have
+    passed. Rows and their rollups commit in one transaction on the writer's own connection,
+    so neither outlives a failed batch. Until start() is called (or after stop()), rows are
+    written on the caller's thread.
+    """
+    def __init__(self, db: Database, statistic: str = "average", flush_interval: float = 5.0,
+                 batch_size: int = 1000, max_queue: int = 10000) -> None:
+        """
+        Args:
+            db: Database holding thermal_data.
+            statistic: Zone statistic stored as the row temperature (average, minimum, maximum or std).
+            flush_interval: Longest time in seconds a row waits before being committed.
+            batch_size: Rows per transaction.
+            max_queue: Frames that may wait for the writer before new ones are dropped.
+        """
+        if statistic not in ZONE_STATISTICS:
+            raise ValueError(f"Unknown zone statistic {statistic!r}; expected one of {', '.join(ZONE_STATISTICS)}.")
+        self.statistic = statistic
+        self.writer = BatchWriter(db, _write_zone_rows, name="zone-series-writer", flush_interval=flush_interval,
+                                  max_batch=batch_size, max_queue=max_queue, item_size=lambda item: len(item[1]))
+        self.rows_queued = 0
+
+    def __call__(self, frame: ThermalFrame, stats: ZoneStats) -> None:
+        if not len(stats):
+            return
+        # ZoneStats arrays are fresh per frame (zone_ids are never mutated), so no copy is needed
+        if self.writer.submit((frame.isoformat(), stats.zone_ids, getattr(stats, self.statistic)), timeout=0):
+            self.rows_queued += len(stats)
+        if not self.writer.running:
+            self.writer.flush()
+
+    def start(self) -> None:
+        self.writer.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Commit every queued row, then stop the writer thread."""
+        self.writer.stop(timeout)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        return self.writer.flush(timeout)
+
+    def stats(self) -> dict[str, Any]:
+        """Writer queue depth and commit latency; items are frames, rows_queued counts thermal_data rows."""
+        stats = self.writer.stats()
+        stats.update(rows_queued=self.rows_queued, statistic=self.statistic, batch_size=self.writer.max_batch,
+                     flush_interval=self.writer.flush_interval)
+        return stats
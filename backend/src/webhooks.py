@@ -0,0 +1,318 @@
+"""
+webhooks.py
+
+Webhook delivery for IR Thermal Monitoring System alarm events.
+"""
+import http.client
+import json
+import logging
+import threading
+from collections import deque
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Optional
+from urllib.parse import urlsplit
+
+from .database import Database
+from .notifications import QueuedDispatcher, QueuedItem
+from .writer import BatchWriter
+
+if TYPE_CHECKING:
+    from .alarms import AlarmEvent
+
+DEFAULT_WEBHOOK_TIMEOUT = 5.0
+
+
+class WebhookError(Exception):
+    """Raised when an endpoint answers with a non-2xx status."""
+
+
+class WebhookEndpoint:
+    """
+    One webhook target. Config keys (JSON in notifications.config): url, headers,
+    timeout (seconds), max_concurrency (simultaneous POSTs), batch (opt in to one POST
+    carrying several events) and max_batch.
+    """
+    def __init__(self, notification_id: Optional[int], url: str, headers: Optional[dict[str, str]] = None,
+                 timeout: float = DEFAULT_WEBHOOK_TIMEOUT, max_concurrency: int = 2,
+                 batch: bool = False, max_batch: int = 20) -> None:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Unsupported webhook URL: {url}")
+        if timeout <= 0 or max_concurrency <= 0 or max_batch <= 0:
+            raise ValueError("timeout, max_concurrency and max_batch must be positive.")
+        self.notification_id = notification_id
+        self.url = url
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.batch = batch
+        self.max_batch = max_batch
+
+    @property
+    def limiter_key(self) -> tuple[Optional[int], str]:
+        """Concurrency limits are tracked per notification and URL, so they outlive reparsed endpoints."""
+        return (self.notification_id, self.url)
+
+    @property
+    def server_key(self) -> tuple[str, str, int]:
+        return (self.scheme, self.host, self.port)
+
+    @classmethod
+    def from_notification(cls, notification: dict) -> Optional["WebhookEndpoint"]:
+        """Build an endpoint from a notifications row; returns None (and logs) if the config is unusable."""
+        try:
+            config = json.loads(notification["config"] or "{}")
+            return cls(
+                notification["id"], config["url"], config.get("headers"),
+                float(config.get("timeout", DEFAULT_WEBHOOK_TIMEOUT)), int(config.get("max_concurrency", 2)),
+                bool(config.get("batch", False)), int(config.get("max_batch", 20)),
+            )
+        except (KeyError, ValueError, TypeError, AttributeError) as e:
+            logging.error("Invalid config for webhook notification %s: %s", notification.get("id"), e)
+            return None
+
+
+def event_payload(event: "AlarmEvent") -> dict[str, Any]:
+    return {
+        "alarm_id": event.alarm_id,
+        "zone_id": event.zone_id,
+        "temperature": event.temperature,
+        "timestamp": event.timestamp,
+        "event_type": event.event_type,
+    }
+
+
+class HTTPConnectionPool:
+    """
+    Keep-alive HTTP(S) connections per server, reused across POSTs. A reused connection
+    that the server has meanwhile closed is replaced once before the error is reported.
+    """
+    def __init__(self, max_idle_per_host: int = 4) -> None:
+        self.max_idle_per_host = max_idle_per_host
+        self.connections_opened = 0
+        self.connections_reused = 0
+        self._idle: dict[tuple[str, str, int], list[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def post(self, endpoint: WebhookEndpoint, body: bytes) -> int:
+        """
+        POST body to endpoint and return the status code.
+
+        Raises:
+            WebhookError: If the endpoint answered with a non-2xx status.
+            OSError, http.client.HTTPException: On connection or protocol failure.
+        """
+        conn, reused = self._acquire(endpoint)
+        try:
+            response = self._request(conn, endpoint, body)
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            conn.close()
+            if not reused:
+                raise
+            conn = self._new_connection(endpoint)
+            try:
+                response = self._request(conn, endpoint, body)
+            except Exception:
+                conn.close()
+                raise
+        except Exception:
+            conn.close()
+            raise
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(endpoint.server_key, conn)
+        if not 200 <= response.status < 300:
+            raise WebhookError(f"{endpoint.url} answered HTTP {response.status} {response.reason}")
+        return response.status
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    @staticmethod
+    def _request(conn: http.client.HTTPConnection, endpoint: WebhookEndpoint, body: bytes) -> http.client.HTTPResponse:
+        conn.timeout = endpoint.timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(endpoint.timeout)
+        conn.request("POST", endpoint.path, body, endpoint.headers)
+        response = conn.getresponse()
+        response.read()  # drain so the connection can carry the next request
+        return response
+
+    def _new_connection(self, endpoint: WebhookEndpoint) -> http.client.HTTPConnection:
+        with self._lock:
+            self.connections_opened += 1
+        if endpoint.scheme == "https":
+            return http.client.HTTPSConnection(endpoint.host, endpoint.port, timeout=endpoint.timeout)
+        return http.client.HTTPConnection(endpoint.host, endpoint.port, timeout=endpoint.timeout)
+
+    def _acquire(self, endpoint: WebhookEndpoint) -> tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            conns = self._idle.get(endpoint.server_key)
+            if conns:
+                self.connections_reused += 1
+                return conns.pop(), True
+        return self._new_connection(endpoint), False
+
+    def _release(self, key: tuple[str, str, int], conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            conns = self._idle.setdefault(key, [])
+            if len(conns) < self.max_idle_per_host:
+                conns.append(conn)
+                return
+        conn.close()
+
+
+class _EndpointQueue:
+    """POSTs waiting for one endpoint, and how many workers are draining them."""
+    __slots__ = ("max_concurrency", "active", "posts")
+
+    def __init__(self, max_concurrency: int) -> None:
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self.posts: deque[Callable[[], None]] = deque()
+
+
+def _write_dead_letters(db: Database, rows: list[tuple]) -> None:
+    db.executemany(
+        "INSERT INTO webhook_dead_letters (notification_id, url, payload, error, attempts) VALUES (?, ?, ?, ?, ?)",
+        rows,
+    )
+
+
+class WebhookDispatcher(QueuedDispatcher):
+    """
+    Webhook delivery: each collected batch becomes one POST per event, or one POST per
+    max_batch events for endpoints that opt in to batching. POSTs are queued per endpoint
+    and drained by at most max_concurrency workers each, so a slow endpoint holds only its
+    own share of the pool instead of parking workers that other endpoints could use.
+    Deliveries that still fail after retries go to the webhook_dead_letters table, written
+    by a BatchWriter on its own connection.
+    """
+    name = "webhook-dispatcher"
+
+    def __init__(
+        self,
+        endpoints: Callable[[], list[WebhookEndpoint]],
+        db: Database,
+        pool: Optional[HTTPConnectionPool] = None,
+        max_workers: int = 4,
+        max_queue: int = 1000,
+        batch_window: float = 0.5,
+        max_batch: int = 100,
+        max_retries: int = 2,
+        retry_backoff: float = 0.5,
+    ) -> None:
+        """
+        Args:
+            endpoints: Returns the current enabled webhook endpoints (called once per batch).
+            db: Database holding the webhook_dead_letters table.
+            pool: Keep-alive connection pool; a default pool is created if omitted.
+            Other arguments as for QueuedDispatcher.
+        """
+        super().__init__(max_workers, max_queue, batch_window, max_batch, max_retries, retry_backoff)
+        self.endpoints = endpoints
+        self.pool = pool or HTTPConnectionPool()
+        self.dead_letters = BatchWriter(db, _write_dead_letters, name="webhook-dead-letters")
+        self.dead_lettered = 0
+        self.events_delivered = 0
+        self._adhoc: dict[str, WebhookEndpoint] = {}
+        self._endpoint_queues: dict[tuple[Optional[int], str], _EndpointQueue] = {}
+        self._queues_lock = threading.Lock()
+
+    def start(self) -> None:
+        self.dead_letters.start()
+        super().start()
+
+    def _close(self) -> None:
+        self.pool.close()
+        self.dead_letters.stop()
+
+    def deliver(self, batch: list[QueuedItem]) -> None:
+        """Run every delivery for batch on the calling thread, dead letters included."""
+        super().deliver(batch)
+        if not self.dead_letters.running:
+            self.dead_letters.stop()
+
+    def stats(self) -> dict[str, Any]:
+        stats = super().stats()
+        stats.update(
+            events_delivered=self.events_delivered,
+            dead_lettered=self.dead_lettered,
+            connections_opened=self.pool.connections_opened,
+            connections_reused=self.pool.connections_reused,
+        )
+        return stats
+
+    def _adhoc_endpoint(self, url: str) -> Optional[WebhookEndpoint]:
+        """Endpoint for a URL passed to submit(); kept so its concurrency limit holds across batches."""
+        endpoint = self._adhoc.get(url)
+        if endpoint is None:
+            try:
+                endpoint = self._adhoc[url] = WebhookEndpoint(None, url)
+            except ValueError as e:
+                logging.error("Skipping webhook: %s", e)
+        return endpoint
+
+    def jobs(self, batch: list[QueuedItem]) -> list[Callable[[], None]]:
+        targets = [(endpoint, batch) for endpoint in self.endpoints()]
+        for url in dict.fromkeys(item[1] for item in batch if item[1]):
+            endpoint = self._adhoc_endpoint(url)
+            if endpoint is not None:
+                targets.append((endpoint, [item for item in batch if item[1] == url]))
+        jobs: list[Callable[[], None]] = []
+        with self._queues_lock:
+            for endpoint, items in targets:
+                if endpoint.batch:
+                    posts = [partial(self._post, endpoint, items[i:i + endpoint.max_batch]) for i in range(0, len(items), endpoint.max_batch)]
+                else:
+                    posts = [partial(self._post, endpoint, [item]) for item in items]
+                pending = self._endpoint_queues.get(endpoint.limiter_key)
+                if pending is None:
+                    pending = self._endpoint_queues[endpoint.limiter_key] = _EndpointQueue(endpoint.max_concurrency)
+                pending.max_concurrency = endpoint.max_concurrency
+                pending.posts.extend(posts)
+                # Only endpoints with a free slot get a worker; the rest wait in their own queue
+                drainers = min(pending.max_concurrency - pending.active, len(pending.posts))
+                pending.active += max(drainers, 0)
+                jobs += [partial(self._drain, pending) for _ in range(drainers)]
+        return jobs
+
+    def _drain(self, pending: _EndpointQueue) -> None:
+        """Send an endpoint's queued POSTs one after another until its queue is empty."""
+        while True:
+            with self._queues_lock:
+                if not pending.posts:
+                    pending.active -= 1
+                    return
+                post = pending.posts.popleft()
+            try:
+                post()
+            except Exception as e:
+                logging.error("%s delivery failed: %s", self.name, e, exc_info=True)
+
+    def _post(self, endpoint: WebhookEndpoint, items: list[QueuedItem]) -> None:
+        if endpoint.batch:
+            payload: Any = {"events": [event_payload(item[0]) for item in items]}
+        else:
+            payload = event_payload(items[0][0])
+        body = json.dumps(payload).encode()
+
+        error = self._retry(partial(self.pool.post, endpoint, body), f"webhook {endpoint.url}")
+        if error is None:
+            self._delivered(items)
+            with self._stats_lock:
+                self.events_delivered += len(items)
+            logging.info("Webhook %s delivered %d event(s).", endpoint.url, len(items))
+            return
+        with self._stats_lock:
+            self.dead_lettered += 1
+        self.dead_letters.submit((endpoint.notification_id, endpoint.url, body.decode(), str(error), self.max_retries + 1))
@@ -0,0 +1,246 @@
+"""
+writer.py
+
+Background batched SQLite writer for IR Thermal Monitoring System.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Optional
+
+from .database import Database
+
+BatchHandler = Callable[[Database, list[Any]], None]
+
+
+class _FlushMarker:
+    """Queue sentinel: set once every item queued before it has been committed."""
+    def __init__(self) -> None:
+        self.done = threading.Event()
+
+
+class BatchWriter:
+    """
+    Runs SQLite writes on a dedicated thread fed by a bounded queue.
+    Items are collected for up to flush_interval seconds (or max_batch items) and handed
+    to the handler in one transaction, keeping commits off the capture and request paths.
+    Batches are written through the writer's own connection (Database.clone(), opened on
+    first write and closed by stop()), so a failing batch rolls back only its own rows and
+    never commits or discards another thread's transaction.
+    """
+    def __init__(
+        self,
+        db: Database,
+        handler: BatchHandler,
+        name: str = "db-writer",
+        flush_interval: float = 1.0,
+        max_batch: int = 1000,
+        max_queue: int = 10000,
+        item_size: Optional[Callable[[Any], int]] = None,
+    ) -> None:
+        """
+        Args:
+            db: Database the handler writes to; the handler gets a clone of it with its own
+                connection (databases without clone(), e.g. test doubles, are used directly).
+            handler: Called as handler(db, items) inside a transaction on the writer thread.
+            name: Thread name, also used in log messages.
+            flush_interval: Longest time in seconds an item waits before being committed.
+            max_batch: Most items written per transaction (counted in item_size units if given).
+            max_queue: Queue bound; submit() blocks or fails when it is reached.
+            item_size: Weight of one item, e.g. the rows it expands to; defaults to 1 per item.
+        """
+        if flush_interval <= 0 or max_batch <= 0 or max_queue <= 0:
+            raise ValueError("flush_interval, max_batch and max_queue must be positive.")
+        self.db = db
+        self.handler = handler
+        self.name = name
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.item_size = item_size or (lambda item: 1)
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self.items_written = 0
+        self.commits = 0
+        self.failed_batches = 0
+        self.dropped = 0
+        self._commit_latencies: deque[float] = deque(maxlen=100)
+        self._conn: Optional[Database] = None
+        self._write_lock = threading.Lock()  # one batch at a time on the writer's connection
+        self._conn_lock = threading.Lock()  # read() may open the connection from another thread
+
+    def start(self) -> None:
+        """Start the writer thread (no-op if already running)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        logging.info("%s started.", self.name)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Drain pending items, then stop the writer thread and close the writer's connection."""
+        thread = self._thread
+        self.flush(timeout)
+        if thread is not None:
+            self._stop_event.set()
+            try:
+                self._queue.put_nowait(_FlushMarker())  # wake the thread from its queue wait
+            except queue.Full:
+                pass
+            thread.join(timeout)
+            if thread.is_alive():
+                logging.warning("%s did not stop within %.1f s; %d items pending.", self.name, timeout, self.queue_depth)
+            self._thread = None
+        with self._write_lock, self._conn_lock:
+            if self._conn is not None and self._conn is not self.db:
+                self._conn.close()
+            self._conn = None
+        if thread is not None:
+            logging.info("%s stopped after %d items in %d commits.", self.name, self.items_written, self.commits)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, item: Any, timeout: Optional[float] = 1.0) -> bool:
+        """
+        Queue one item for the next batch.
+
+        Args:
+            timeout: Seconds to wait for queue space; 0 never blocks, None waits forever.
+
+        Returns:
+            bool: False if the queue stayed full and the item was dropped.
+        """
+        try:
+            if timeout == 0:
+                self._queue.put_nowait(item)
+            else:
+                self._queue.put(item, timeout=timeout)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logging.error("%s queue full (%d items); dropping write. Check disk health and commit latency.", self.name, self.queue_depth)
+            return False
+
+    def flush(self, timeout: Optional[float] = 10.0) -> bool:
+        """
+        Wait until every item submitted before this call has been committed.
+        Without a running thread, pending items are written on the caller's thread.
+
+        Returns:
+            bool: True if drained within timeout.
+        """
+        if not self.running:
+            self._drain_inline()
+            return True
+        marker = _FlushMarker()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.done.wait(timeout)
+
+    def read(self, query: str, params: tuple = ()) -> list[Any]:
+        """
+        Rows of a read-only query run on the writer's own connection, for producers that must
+        not use the connection shared by request handlers. Queued items are not waited for.
+        """
+        return self._connection().execute_query(query, params).fetchall()
+
+    def stats(self) -> dict[str, Any]:
+        """Return queue depth and commit latency figures."""
+        latencies = list(self._commit_latencies)
+        return {
+            "running": self.running,
+            "queue_depth": self.queue_depth,
+            "items_written": self.items_written,
+            "commits": self.commits,
+            "failed_batches": self.failed_batches,
+            "dropped": self.dropped,
+            "last_commit_ms": latencies[-1] * 1e3 if latencies else None,
+            "avg_commit_ms": sum(latencies) / len(latencies) * 1e3 if latencies else None,
+            "max_commit_ms": max(latencies) * 1e3 if latencies else None,
+        }
+
+    def _connection(self) -> Database:
+        with self._conn_lock:
+            if self._conn is None:
+                clone = getattr(self.db, "clone", None)
+                self._conn = clone() if clone is not None else self.db
+            return self._conn
+
+    def _write(self, items: list[Any]) -> None:
+        if not items:
+            return
+        with self._write_lock:
+            started = time.perf_counter()
+            try:
+                db = self._connection()
+                with db.transaction():
+                    self.handler(db, items)
+            except Exception as e:
+                self.failed_batches += 1
+                logging.error("%s failed to write %d items: %s", self.name, len(items), e, exc_info=True)
+                return
+            self._commit_latencies.append(time.perf_counter() - started)
+            self.items_written += len(items)
+            self.commits += 1
+
+    def _drain_inline(self) -> None:
+        items: list[Any] = []
+        markers: list[_FlushMarker] = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            (markers if isinstance(item, _FlushMarker) else items).append(item)
+        batch: list[Any] = []
+        size = 0
+        for item in items:
+            batch.append(item)
+            size += self.item_size(item)
+            if size >= self.max_batch:
+                self._write(batch)
+                batch, size = [], 0
+        self._write(batch)
+        for marker in markers:
+            marker.done.set()
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            items: list[Any] = []
+            markers: list[_FlushMarker] = []
+            size = 0
+            deadline = time.monotonic() + self.flush_interval
+            item: Any = first
+            while True:
+                if isinstance(item, _FlushMarker):
+                    markers.append(item)
+                    break  # commit now so the flush caller is released promptly
+                items.append(item)
+                size += self.item_size(item)
+                if size >= self.max_batch:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            self._write(items)
+            for marker in markers:
+                marker.done.set()
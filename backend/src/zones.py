@@ -4,9 +4,14 @@ zones.py
 Zone management for IR Thermal Monitoring System.
 """
 import logging
-from typing import List, Dict, Optional
+import threading
+import numpy as np
+from typing import Iterable, List, Dict, Optional
 import sqlite3
 from .database import Database
+from .thermal_frame import FRAME_PIXELS, FRAME_SHAPE, FrameLike, as_frame_array
+
+DEFAULT_MAX_ZONES = 64
 
 class Zone:
     """
@@ -23,37 +28,131 @@ class Zone:
         self.enabled: bool = enabled
         self.threshold: float | None = threshold
 
+class ZoneStats:
+    """
+    Statistics for every zone of one frame, as parallel arrays ordered like zone_ids.
+    Zones with no pixels inside the frame report 0.0 for every statistic.
+    """
+    def __init__(self, zone_ids: np.ndarray, average: np.ndarray, minimum: np.ndarray, maximum: np.ndarray, std: np.ndarray, count: np.ndarray) -> None:
+        self.zone_ids = zone_ids
+        self.average = average
+        self.minimum = minimum
+        self.maximum = maximum
+        self.std = std
+        self.count = count
+        self._index = {int(zone_id): i for i, zone_id in enumerate(zone_ids)}
+
+    def index(self, zone_id: int) -> int:
+        """Position of zone_id in the stats arrays; raises ValueError if unknown."""
+        try:
+            return self._index[zone_id]
+        except KeyError:
+            raise ValueError("Zone ID does not exist.") from None
+
+    def as_dict(self) -> dict[int, dict[str, float]]:
+        return {
+            int(zone_id): {
+                "average": float(self.average[i]),
+                "min": float(self.minimum[i]),
+                "max": float(self.maximum[i]),
+                "std": float(self.std[i]),
+                "pixel_count": int(self.count[i]),
+            }
+            for i, zone_id in enumerate(self.zone_ids)
+        }
+
+    def __len__(self) -> int:
+        return len(self.zone_ids)
+
+
+class ZoneStatsEngine:
+    """
+    Precomputes one pixel mask per zone (overlapping zones allowed) when zones change,
+    then computes avg/min/max/std for all zones in one vectorised pass per frame.
+    """
+    def __init__(self, zones: Iterable[Zone]) -> None:
+        ordered = sorted(zones, key=lambda z: z.id)
+        self.zone_ids = np.array([z.id for z in ordered], dtype=np.int64)
+        masks = np.zeros((len(ordered),) + FRAME_SHAPE, dtype=bool)
+        for i, zone in enumerate(ordered):
+            # Slicing clips zones that extend past the 32x24 frame
+            masks[i, max(zone.y, 0):zone.y + zone.height, max(zone.x, 0):zone.x + zone.width] = True
+        self.masks = masks.reshape(len(ordered), FRAME_PIXELS)
+        self.weights = self.masks.astype(np.float64)
+        self.counts = self.masks.sum(axis=1)
+        self._safe_counts = np.maximum(self.counts, 1)
+        self._empty = self.counts == 0
+        for zone_id in self.zone_ids[self._empty]:
+            logging.warning("Zone %d has no valid pixels.", zone_id)
+
+    def compute(self, frame: FrameLike) -> ZoneStats:
+        """Compute statistics for every zone from one frame."""
+        flat = as_frame_array(frame).reshape(FRAME_PIXELS).astype(np.float64)
+        sums = self.weights @ flat
+        sumsq = self.weights @ (flat * flat)
+        average = sums / self._safe_counts
+        std = np.sqrt(np.maximum(sumsq / self._safe_counts - average * average, 0.0))
+        minimum = np.where(self.masks, flat, np.inf).min(axis=1, initial=np.inf)
+        maximum = np.where(self.masks, flat, -np.inf).max(axis=1, initial=-np.inf)
+        if self._empty.any():
+            for arr in (average, std, minimum, maximum):
+                arr[self._empty] = 0.0
+        return ZoneStats(self.zone_ids, average, minimum, maximum, std, self.counts)
+
+
 class ZonesManager:
     """
-    Manages up to 2 zones, provides CRUD and average calculation, now persistent.
+    Manages zones (count limited by the max_zones setting), provides CRUD, per-zone statistics
+    and average calculation, now persistent. Zones are loaded from SQLite once and kept in
+    memory; `version` increases on every change so derived structures know when to rebuild.
     """
-    def __init__(self, db: Database) -> None:
+    def __init__(self, db: Database, max_zones: Optional[int] = None) -> None:
         self.db = db
         self.zones: dict[int, Zone] = {}
+        self.version = 0
+        self.max_zones = max_zones if max_zones is not None else self._configured_max_zones()
+        self._stats_engine: Optional[tuple[int, ZoneStatsEngine]] = None
+        self._lock = threading.RLock()
         self.load_zones_from_db()
 
+    def _configured_max_zones(self) -> int:
+        """Read the max_zones setting, falling back to DEFAULT_MAX_ZONES if missing or invalid."""
+        try:
+            setting = self.db.get_setting("max_zones")
+            return int(setting["value"]) if setting else DEFAULT_MAX_ZONES
+        except (ValueError, AttributeError, sqlite3.Error) as e:
+            logging.warning("Invalid max_zones setting (%s); using %d.", e, DEFAULT_MAX_ZONES)
+            return DEFAULT_MAX_ZONES
+
     def load_zones_from_db(self) -> None:
+        """(Re)load all zones from SQLite, e.g. after a database restore."""
         try:
-            self.zones.clear()
             cur = self.db.execute_query("SELECT id, x, y, width, height, name, color, enabled, threshold FROM zones")
+            zones: dict[int, Zone] = {}
             for row in cur.fetchall():
                 zone_id, x, y, width, height, name, color, enabled, threshold = row
-                self.zones[zone_id] = Zone(zone_id, x, y, width, height, name, color, bool(enabled), threshold)
-            logging.info("Loaded %d zones from DB.", len(self.zones))
+                zones[zone_id] = Zone(zone_id, x, y, width, height, name, color, bool(enabled), threshold)
+            with self._lock:
+                self.zones = zones
+                self.version += 1
+            logging.info("Loaded %d zones from DB.", len(zones))
         except Exception as e:
             logging.error("Error loading zones from DB: %s", e, exc_info=True)
             raise
 
     def add_zone(self, zone_id: int, x: int, y: int, width: int, height: int, name: str | None = None, color: str | None = None, enabled: bool = True, threshold: float | None = None) -> None:
         try:
-            if len(self.zones) >= 2:
-                logging.error("Cannot add more than 2 zones.")
-                raise ValueError("Maximum of 2 zones allowed.")
-            self.db.execute_query(
-                "INSERT OR REPLACE INTO zones (id, x, y, width, height, name, color, enabled, threshold) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                (zone_id, x, y, width, height, name or f"Zone ({x},{y})", color or "#FF0000", int(enabled), threshold)
-            )
-            self.zones[zone_id] = Zone(zone_id, x, y, width, height, name, color, enabled, threshold)
+            with self._lock:
+                if zone_id not in self.zones and len(self.zones) >= self.max_zones:
+                    logging.error("Cannot add more than %d zones.", self.max_zones)
+                    raise ValueError(f"Maximum of {self.max_zones} zones allowed; raise the max_zones setting to add more.")
+                with self.db.transaction():
+                    self.db.execute_query(
+                        "INSERT OR REPLACE INTO zones (id, x, y, width, height, name, color, enabled, threshold) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (zone_id, x, y, width, height, name or f"Zone ({x},{y})", color or "#FF0000", int(enabled), threshold)
+                    )
+                self.zones[zone_id] = Zone(zone_id, x, y, width, height, name, color, enabled, threshold)
+                self.version += 1
             logging.info("Zone %d added with name '%s', color '%s', enabled %s, threshold %s.", zone_id, name, color, enabled, threshold)
         except Exception as e:
             logging.error("Error adding zone %d: %s", zone_id, e, exc_info=True)
@@ -61,58 +160,85 @@ class ZonesManager:
 
     def remove_zone(self, zone_id: int) -> None:
         try:
-            if zone_id not in self.zones:
-                logging.error("Zone ID %d does not exist.", zone_id)
-                raise ValueError("Zone ID does not exist.")
-            self.db.execute_query("DELETE FROM zones WHERE id = ?", (zone_id,))
-            del self.zones[zone_id]
+            with self._lock:
+                if zone_id not in self.zones:
+                    logging.error("Zone ID %d does not exist.", zone_id)
+                    raise ValueError("Zone ID does not exist.")
+                with self.db.transaction():
+                    self.db.execute_query("DELETE FROM zones WHERE id = ?", (zone_id,))
+                del self.zones[zone_id]
+                self.version += 1
             logging.info("Zone %d removed.", zone_id)
         except Exception as e:
             logging.error("Error removing zone %d: %s", zone_id, e, exc_info=True)
             raise
 
     def get_zones(self) -> list[Zone]:
-        try:
-            self.load_zones_from_db()
+        """Return the cached zones (no database access)."""
+        with self._lock:
             return list(self.zones.values())
-        except Exception as e:
-            logging.error("Error getting zones: %s", e, exc_info=True)
-            raise
 
-    def compute_zone_average(self, zone_id: int, frame: list[float]) -> float:
+    def compute_zone_average(self, zone_id: int, frame: FrameLike) -> float:
         try:
-            if zone_id not in self.zones:
+            zone = self.zones.get(zone_id)
+            if zone is None:
                 logging.error("Zone ID %d does not exist for average computation.", zone_id)
                 raise ValueError("Zone ID does not exist.")
-            zone = self.zones[zone_id]
-            # MLX90640 is 32x24
-            values: list[float] = []
-            for row in range(zone.y, zone.y + zone.height):
-                for col in range(zone.x, zone.x + zone.width):
-                    idx = row * 32 + col
-                    if 0 <= idx < len(frame):
-                        values.append(frame[idx])
-            if not values:
+            # MLX90640 is 32x24; slicing clips the zone to the frame bounds
+            values = as_frame_array(frame)[max(zone.y, 0):zone.y + zone.height, max(zone.x, 0):zone.x + zone.width]
+            if values.size == 0:
                 logging.warning("Zone %d has no valid pixels.", zone_id)
                 return 0.0
-            avg: float = sum(values) / len(values)
-            logging.info("Zone %d average: %.2f", zone_id, avg)
+            avg: float = float(values.mean(dtype=np.float64))
+            logging.debug("Zone %d average: %.2f", zone_id, avg)
             return avg
         except Exception as e:
             logging.error("Error computing average for zone %d: %s", zone_id, e, exc_info=True)
             raise
 
+    def stats_engine(self) -> ZoneStatsEngine:
+        """Return the zone mask engine, rebuilding it only when the zone version changed."""
+        cached = self._stats_engine
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        with self._lock:
+            engine = ZoneStatsEngine(self.zones.values())
+            self._stats_engine = (self.version, engine)
+        return engine
+
+    def compute_zone_stats(self, frame: FrameLike) -> ZoneStats:
+        """Compute avg/min/max/std for all zones from one frame."""
+        return self.stats_engine().compute(frame)
+
     def update_zone(self, zone_id: int, x: int, y: int, width: int, height: int, name: str | None = None, color: str | None = None, enabled: bool = True, threshold: float | None = None) -> None:
         try:
-            if zone_id not in self.zones:
-                logging.error("Zone ID %d does not exist.", zone_id)
-                raise ValueError("Zone ID does not exist.")
-            self.db.execute_query(
-                "UPDATE zones SET x=?, y=?, width=?, height=?, name=?, color=?, enabled=?, threshold=? WHERE id=?",
-                (x, y, width, height, name or f"Zone ({x},{y})", color or "#FF0000", int(enabled), threshold, zone_id)
-            )
-            self.zones[zone_id] = Zone(zone_id, x, y, width, height, name, color, enabled, threshold)
+            with self._lock:
+                if zone_id not in self.zones:
+                    logging.error("Zone ID %d does not exist.", zone_id)
+                    raise ValueError("Zone ID does not exist.")
+                with self.db.transaction():
+                    self.db.execute_query(
+                        "UPDATE zones SET x=?, y=?, width=?, height=?, name=?, color=?, enabled=?, threshold=? WHERE id=?",
+                        (x, y, width, height, name or f"Zone ({x},{y})", color or "#FF0000", int(enabled), threshold, zone_id)
+                    )
+                self.zones[zone_id] = Zone(zone_id, x, y, width, height, name, color, enabled, threshold)
+                self.version += 1
             logging.info("Zone %d updated with name '%s', color '%s', enabled %s, threshold %s.", zone_id, name, color, enabled, threshold)
         except Exception as e:
             logging.error("Error updating zone %d: %s", zone_id, e, exc_info=True)
             raise
+
+
+_registry: Optional[ZonesManager] = None
+_registry_lock = threading.Lock()
+
+def get_zone_registry(db: Database) -> ZonesManager:
+    """
+    Return the process-wide ZonesManager for db, loading zones from SQLite only on first use.
+    A different Database instance (e.g. a test database) gets a fresh registry.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None or _registry.db is not db:
+            _registry = ZonesManager(db)
+        return _registry
@@ -0,0 +1,72 @@
+"""
+bench_alarm_table.py
+
+Benchmark: per-frame alarm evaluation with 500 alarms at 16 Hz,
+legacy check_thresholds (SQLite reload + linear scan per zone) vs the compiled AlarmTable.
+
+Usage:
+    python benchmarks/bench_alarm_table.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import logging
+import tempfile
+import time
+import numpy as np
+from backend.src.database import Database
+from backend.src.alarms import AlarmManager
+
+ALARMS = 500
+ZONES = 64
+RATE_HZ = 16
+FRAMES = RATE_HZ * 10
+
+def legacy_check_thresholds(am: AlarmManager, zone_id: int, temperature: float) -> bool:
+    """The pre-table hot path: reload every alarm from SQLite, then scan linearly."""
+    am.load_alarms_from_db()
+    for alarm_id, cfg in am.alarms.items():
+        if cfg["zone_id"] == zone_id and cfg["enabled"] and temperature >= cfg["threshold"]:
+            return True
+    return False
+
+def report(name: str, samples: list[float]) -> None:
+    arr = np.array(samples) * 1e3
+    budget = 1e3 / RATE_HZ
+    print(f"  {name:<28s} mean {arr.mean():8.3f} ms   p99 {np.percentile(arr, 99):8.3f} ms   "
+          f"({arr.mean() / budget * 100:5.1f}% of {budget:.1f} ms frame budget)")
+
+def main() -> None:
+    logging.disable(logging.INFO)
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        db.connect()
+        db.initialize_schema()
+        am = AlarmManager(db)
+        for alarm_id in range(1, ALARMS + 1):
+            am.add_alarm(alarm_id, int(rng.integers(1, ZONES + 1)), float(rng.uniform(30.0, 80.0)))
+        db.conn.commit()
+        zone_ids = np.arange(1, ZONES + 1, dtype=np.int64)
+        frames = rng.normal(45.0, 10.0, (FRAMES, ZONES))
+
+        legacy = []
+        for temps in frames:
+            t0 = time.perf_counter()
+            for zone_id, temp in zip(zone_ids, temps):
+                legacy_check_thresholds(am, int(zone_id), float(temp))
+            legacy.append(time.perf_counter() - t0)
+
+        table = []
+        for temps in frames:
+            t0 = time.perf_counter()
+            am.table.evaluate(zone_ids, temps)
+            table.append(time.perf_counter() - t0)
+
+        print(f"{ALARMS} alarms over {ZONES} zones, {FRAMES} frames at {RATE_HZ} Hz")
+        report("legacy per-zone DB reload", legacy)
+        report("AlarmTable.evaluate", table)
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+bench_analytics.py
+
+Benchmark: raw-resolution analytics over 1M thermal_data rows. The dict path (one dict per
+row from Database.get_thermal_data, then the per-row Python loops the analytics functions
+used) against the columnar path (fetch_zone_series arrays, vectorised functions).
+
+Usage:
+    python benchmarks/bench_analytics.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import logging
+import tempfile
+import time
+import numpy as np
+from backend.src.database import Database
+from backend.src.frames import anomaly_mask, compute_heatmap, compute_trend, detect_anomalies
+from backend.src.rollups import Totals, epoch_to_iso
+from backend.src.timeseries import fetch_zone_series
+
+ROWS = 1_000_000
+ZONES = 4
+T0 = 1700006400  # 2023-11-15T00:00:00Z
+
+def build(path: str) -> Database:
+    db = Database(path)
+    db.connect()
+    db.initialize_schema()
+    rng = np.random.default_rng(0)
+    values = rng.normal(30.0, 2.0, ROWS)
+    with db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO thermal_data (zone_id, timestamp, temperature) VALUES (?, ?, ?)",
+            ((1 + i % ZONES, epoch_to_iso(T0 + (i // ZONES) * 0.25), float(values[i])) for i in range(ROWS)),
+        )
+    return db
+
+# The analytics functions as they worked on dict rows before the columnar path
+def dict_trend(data: list[dict]) -> tuple[list, list]:
+    return [d["timestamp"] for d in data], [d["temperature"] for d in data]
+
+def dict_anomalies(data: list[dict], z_thresh: float = 2.5) -> list[dict]:
+    temps = np.array([d["temperature"] for d in data])
+    mean, std = np.mean(temps), np.std(temps)
+    return [d for d in data if std > 0 and abs((d["temperature"] - mean) / std) > z_thresh]
+
+def dict_heatmap(data: list[dict], width: int, height: int) -> list[list[float]]:
+    avg = float(np.mean([d["temperature"] for d in data]))
+    return [[avg for _ in range(width)] for _ in range(height)]
+
+def dict_summary(data: list[dict]) -> dict:
+    temps = [d["temperature"] for d in data]
+    return {"mean": float(np.mean(temps)), "min": float(np.min(temps)), "max": float(np.max(temps)), "std": float(np.std(temps))}
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - t0
+
+def main() -> None:
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = build(os.path.join(tmp, "analytics.db"))
+        start, end = epoch_to_iso(T0), epoch_to_iso(T0 + ROWS)
+        rows, dict_fetch = timed(lambda: db.get_thermal_data(start, end))
+        series, col_fetch = timed(lambda: fetch_zone_series(db, start, end))
+        assert len(rows) == len(series) == ROWS
+        print(f"{ROWS} thermal_data rows, {ZONES} zones:")
+        print(f"  {'step':<12s} {'dict rows':>10s} {'columnar':>10s}")
+        print(f"  {'fetch':<12s} {dict_fetch:9.2f}s {col_fetch:9.2f}s")
+        steps = [
+            ("trend", lambda: dict_trend(rows), lambda: compute_trend(series)),
+            ("anomalies", lambda: dict_anomalies(rows), lambda: detect_anomalies(series)),
+            ("anom. count", lambda: len(dict_anomalies(rows)), lambda: int(anomaly_mask(series.temperatures).sum())),
+            ("heatmap", lambda: dict_heatmap(rows, 32, 24), lambda: compute_heatmap(series, 32, 24)),
+            ("summary", lambda: dict_summary(rows),
+             lambda: Totals(len(series), float(series.temperatures.sum()), float(np.square(series.temperatures).sum()),
+                            float(series.temperatures.min()), float(series.temperatures.max())).as_dict()),
+        ]
+        for name, dict_fn, col_fn in steps:
+            expected, dict_time = timed(dict_fn)
+            result, col_time = timed(col_fn)
+            if name == "anomalies":
+                assert [a["temperature"] for a in result] == [a["temperature"] for a in expected]
+            print(f"  {name:<12s} {dict_time:9.3f}s {col_time:9.3f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+bench_anomaly.py
+
+Benchmark: online anomaly scoring of 64 zones per frame, with one baseline per zone and
+with 24 hour-of-day baselines, against re-running the batch z-score (frames.anomaly_mask)
+over the last hour of samples of every zone each frame. Also reports checkpoint size and
+the time to store and restore it.
+
+Usage:
+    python benchmarks/bench_anomaly.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import logging
+import tempfile
+import time
+import numpy as np
+from backend.src.alarms import AlarmManager
+from backend.src.anomaly import AnomalyDetector
+from backend.src.database import Database
+from backend.src.frames import anomaly_mask
+
+ZONES = 64
+FRAMES = 20_000
+WINDOW = 3600  # batch baseline: the last hour at 1 Hz
+T0 = 1700006400  # 2023-11-15T00:00:00Z
+
+def main() -> None:
+    logging.disable(logging.INFO)
+    zone_ids = np.arange(1, ZONES + 1, dtype=np.int64)
+    values = np.random.default_rng(0).normal(30.0, 1.0, (FRAMES, ZONES))
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "anomaly.db"))
+        db.connect()
+        db.initialize_schema()
+        alarms = AlarmManager(db)
+        print(f"{ZONES} zones, {FRAMES} frames:")
+        for seasons in (1, 24):
+            detector = AnomalyDetector(alarms, seasons=seasons, checkpoint_interval=1e9)
+            t0 = time.perf_counter()
+            for i in range(FRAMES):
+                detector.update(zone_ids, values[i], T0 + i)
+            elapsed = time.perf_counter() - t0
+            print(f"  online, {seasons:2d} season(s): {elapsed / FRAMES * 1e6:7.1f} µs/frame")
+        window = values[:WINDOW]
+        t0 = time.perf_counter()
+        repeats = 200
+        for _ in range(repeats):
+            for zone in range(ZONES):
+                anomaly_mask(window[:, zone])
+        print(f"  batch z-score over {WINDOW} samples/zone: {(time.perf_counter() - t0) / repeats * 1e6:7.1f} µs/frame")
+        t0 = time.perf_counter()
+        detector.checkpoint(timeout=10.0)
+        saved = time.perf_counter() - t0
+        size = sum(len(blob) for blob in db.execute_query(
+            "SELECT zone_ids, count, mean, var, active, last_event FROM anomaly_state").fetchone())
+        t0 = time.perf_counter()
+        AnomalyDetector(alarms, seasons=24).restore()
+        print(f"  checkpoint: {size / 1024:.1f} KiB, stored in {saved * 1e3:.1f} ms, restored in {(time.perf_counter() - t0) * 1e3:.1f} ms")
+        db.close()
+
+if __name__ == "__main__":
+    main()
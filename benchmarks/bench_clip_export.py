@@ -0,0 +1,88 @@
+"""
+bench_clip_export.py
+
+Benchmark: animated clip export of an event as GIF and APNG (iron, 4x upscaled). Compares
+building every frame as a PIL image and writing them with Pillow's save_all against
+/api/v1/events/{id}/clip, which streams frames from the database as they are encoded
+(its response body is consumed directly, as the server would send it). Reports time to
+the first byte, total time, output size and peak Python memory (tracemalloc) for events
+of increasing length.
+
+Usage:
+    python benchmarks/bench_clip_export.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import asyncio
+import io
+import logging
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from PIL import Image
+from backend.src.clips import clip_chunk_row, read_event_frames, write_clip_chunks
+from backend.src.database import Database
+from backend.src.main import export_event_clip
+from backend.src.render import render_indexed
+
+EVENT_FRAMES = (300, 1200, 4800)
+SCALE = 4
+T0 = 1700006400  # 2023-11-15T00:00:00Z
+
+def save_all(db: Database, event_id: int, fmt: str) -> tuple[float, float, int]:
+    """Whole clip in memory, then Pillow's save_all; the first byte is available only at the end."""
+    t0 = time.perf_counter()
+    _, _, frames = read_event_frames(db, event_id)
+    index, palette = render_indexed(frames, "iron", scale=SCALE, reserve_nan=True)
+    images = []
+    for part in index.reshape(len(frames), 24 * SCALE, 32 * SCALE):
+        image = Image.fromarray(part, mode="P")
+        image.putpalette(palette.tobytes())
+        images.append(image)
+    buf = io.BytesIO()
+    images[0].save(buf, format=fmt, save_all=True, append_images=images[1:], duration=100, loop=0)
+    seconds = time.perf_counter() - t0
+    return seconds, seconds, len(buf.getvalue())
+
+def streamed(db: Database, event_id: int, fmt: str) -> tuple[float, float, int]:
+    """The endpoint's streaming body, consumed chunk by chunk as the server sends it."""
+    async def consume() -> tuple[float, float, int]:
+        t0 = time.perf_counter()
+        response = export_event_clip(event_id, format=fmt, scale=SCALE, db=db)
+        first = None
+        size = 0
+        async for chunk in response.body_iterator:
+            first = first or time.perf_counter() - t0
+            size += len(chunk)
+        return first, time.perf_counter() - t0, size
+    return asyncio.run(consume())
+
+def main() -> None:
+    logging.disable(logging.INFO)
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "clips.db"))
+        db.connect()
+        db.initialize_schema()
+        for event_id, count in enumerate(EVENT_FRAMES, start=1):
+            frames = (30.0 + np.cumsum(rng.normal(0.0, 0.05, (count, 24, 32)), axis=0)).astype(np.float32)
+            timestamps_ns = ((T0 + np.arange(count) * 0.125) * 10**9).astype(np.int64)
+            write_clip_chunks(db, [clip_chunk_row(event_id, i, timestamps_ns[i:i + 64], frames[i:i + 64], "i16+delta+zlib")
+                                   for i in range(0, count, 64)])
+        print(f"{'frames':>6s} {'format':<5s} {'method':<9s} {'first byte':>10s} {'total':>9s} {'size':>9s} {'peak mem':>9s}")
+        for event_id, count in enumerate(EVENT_FRAMES, start=1):
+            for fmt, pil_format in (("gif", "GIF"), ("apng", "PNG")):
+                for method, run in (("save_all", lambda: save_all(db, event_id, pil_format)),
+                                    ("streamed", lambda: streamed(db, event_id, fmt))):
+                    tracemalloc.start()
+                    first, total, size = run()
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    print(f"{count:6d} {fmt:<5s} {method:<9s} {first * 1e3:8.0f}ms {total * 1e3:7.0f}ms "
+                          f"{size / 1e6:7.2f}MB {peak / 1e6:7.1f}MB")
+        db.close()
+
+if __name__ == "__main__":
+    main()
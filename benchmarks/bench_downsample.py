@@ -0,0 +1,64 @@
+"""
+bench_downsample.py
+
+Benchmark: /api/v1/analytics/trends over 1M raw thermal_data samples of one zone, returning
+every sample (max_points above the row count) vs downsampled to 1000 points with LTTB and
+with min/max buckets. Reports end-to-end request time and JSON response size, plus the
+time of the downsampler alone.
+
+Usage:
+    python benchmarks/bench_downsample.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import logging
+import tempfile
+import time
+import numpy as np
+from fastapi.testclient import TestClient
+from backend.src.database import Database
+from backend.src.downsample import lttb_indices, minmax_indices
+from backend.src.main import app, get_db
+from backend.src.rollups import epoch_to_iso
+
+ROWS = 1_000_000
+T0 = 1700006400  # 2023-11-15T00:00:00Z
+INTERVAL = 0.0625  # 16 Hz, so 1M samples span under 18 h and stay at raw resolution
+
+def build(path: str) -> Database:
+    db = Database(path)
+    db.connect()
+    db.initialize_schema()
+    rng = np.random.default_rng(0)
+    values = 30.0 + np.sin(np.arange(ROWS) / 5000.0) + rng.normal(0.0, 0.2, ROWS)
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO thermal_data (zone_id, timestamp, temperature) VALUES (1, ?, ?)",
+                         ((epoch_to_iso(T0 + i * INTERVAL), float(values[i])) for i in range(ROWS)))
+    return db
+
+def main() -> None:
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = build(os.path.join(tmp, "trend.db"))
+        app.dependency_overrides[get_db] = lambda: db
+        client = TestClient(app)
+        params = {"start_time": epoch_to_iso(T0), "end_time": epoch_to_iso(T0 + ROWS * INTERVAL), "zone_id": 1, "resolution": "raw"}
+        print(f"trend over {ROWS} raw samples:")
+        for label, extra in (("all samples", {"max_points": ROWS}), ("lttb 1000", {"max_points": 1000}),
+                             ("minmax 1000", {"max_points": 1000, "downsample": "minmax"})):
+            t0 = time.perf_counter()
+            response = client.get("/api/v1/analytics/trends", params={**params, **extra})
+            elapsed = time.perf_counter() - t0
+            assert response.status_code == 200
+            print(f"  {label:<12s} {elapsed:6.2f} s  {len(response.content) / 1e6:8.2f} MB  {len(response.json()['values'])} points")
+        app.dependency_overrides.pop(get_db, None)
+        x = np.arange(ROWS, dtype=np.float64)
+        y = np.random.default_rng(1).normal(30.0, 1.0, ROWS)
+        for label, fn in (("lttb", lambda: lttb_indices(x, y, 1000)), ("minmax", lambda: minmax_indices(y, 1000))):
+            t0 = time.perf_counter()
+            fn()
+            print(f"  {label} indices alone: {(time.perf_counter() - t0) * 1e3:.1f} ms")
+
+if __name__ == "__main__":
+    main()
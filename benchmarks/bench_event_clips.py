@@ -0,0 +1,63 @@
+"""
+bench_event_clips.py
+
+Benchmark: storing and fetching one alarm event (600 pre-event + 20 post-event frames)
+as one thermal_frames row per frame vs an event clip of 64-frame chunks.
+Reports database bytes per event, SQLite pages read per fetch and fetch time.
+
+Usage:
+    python benchmarks/bench_event_clips.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import logging
+import tempfile
+import time
+import numpy as np
+from backend.src.clips import CLIP_CHUNK_FRAMES, read_event_frames
+from backend.src.database import Database
+from backend.src.frames import EventTriggeredStorage, ThermalFrameBuffer
+from backend.src.thermal_frame import ThermalFrame
+
+PRE_EVENT_FRAMES = 600
+POST_EVENT_FRAMES = 20
+EVENTS = 20
+REPEATS = 20
+
+def build(path: str, clip_chunk_frames) -> Database:
+    db = Database(path)
+    db.connect()
+    db.initialize_schema()
+    rng = np.random.default_rng(0)
+    for event_id in range(1, EVENTS + 1):
+        storage = EventTriggeredStorage(ThermalFrameBuffer(PRE_EVENT_FRAMES), db, POST_EVENT_FRAMES, clip_chunk_frames=clip_chunk_frames)
+        t = event_id * 10000.0
+        for i in range(PRE_EVENT_FRAMES):
+            storage.record_frame(ThermalFrame(rng.normal(25.0, 2.0, (24, 32)).astype(np.float32), t + i))
+        storage.trigger_event(event_id)
+        for i in range(POST_EVENT_FRAMES):
+            storage.record_frame(ThermalFrame(rng.normal(25.0, 2.0, (24, 32)).astype(np.float32), t + PRE_EVENT_FRAMES + i))
+    db.checkpoint()
+    return db
+
+def measure(name: str, db: Database) -> None:
+    pages = os.path.getsize(db.db_path) / db.execute_query("PRAGMA page_size").fetchone()[0]
+    timings = []
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        _, _, frames = read_event_frames(db, EVENTS // 2)
+        timings.append(time.perf_counter() - t0)
+    rows = db.execute_query("SELECT (SELECT COUNT(*) FROM thermal_frames) + (SELECT COUNT(*) FROM event_clips)").fetchone()[0]
+    print(f"  {name:<24s} {rows / EVENTS:6.0f} rows/event  {os.path.getsize(db.db_path) / EVENTS / 1e6:6.2f} MB/event  "
+          f"{pages / EVENTS:6.0f} pages/event  fetch {np.median(timings) * 1e3:7.2f} ms ({len(frames)} frames)")
+
+def main() -> None:
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{EVENTS} events x {PRE_EVENT_FRAMES + POST_EVENT_FRAMES} frames:")
+        measure("row per frame", build(os.path.join(tmp, "rows.db"), None))
+        measure(f"clip ({CLIP_CHUNK_FRAMES} frames/chunk)", build(os.path.join(tmp, "clips.db"), CLIP_CHUNK_FRAMES))
+
+if __name__ == "__main__":
+    main()
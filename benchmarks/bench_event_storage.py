@@ -0,0 +1,72 @@
+"""
+bench_event_storage.py
+
+Benchmark: time spent on the capture thread when an alarm fires with a full
+10-minute pre-event buffer at 1 Hz (600 frames), legacy one-transaction-per-frame
+persistence vs the queued BatchWriter (one executemany transaction).
+
+Usage:
+    python benchmarks/bench_event_storage.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import logging
+import tempfile
+import time
+import numpy as np
+from backend.src.database import Database
+from backend.src.frames import EventTriggeredStorage, ThermalFrameBuffer
+from backend.src.thermal_frame import ThermalFrame
+
+PRE_EVENT_FRAMES = 600
+
+def legacy_trigger(db: Database, buffer: ThermalFrameBuffer) -> None:
+    """The pre-writer path: one INSERT + COMMIT per buffered frame on the caller's thread."""
+    _, frames, labels = buffer.snapshot()
+    for label, frame in zip(labels, frames):
+        with db.transaction():
+            db.execute_query(
+                "INSERT INTO thermal_frames (timestamp, frame, frame_size) VALUES (?, ?, ?)",
+                (label, frame.tobytes(), frame.size),
+            )
+
+def fill(buffer: ThermalFrameBuffer, rng: np.random.Generator) -> None:
+    for i in range(PRE_EVENT_FRAMES):
+        frame = ThermalFrame(rng.normal(25.0, 2.0, (24, 32)).astype(np.float32), 1700000000.0 + i)
+        buffer.append(frame, frame.isoformat())
+
+def main() -> None:
+    logging.disable(logging.INFO)
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        db.connect()
+        db.initialize_schema()
+
+        buffer = ThermalFrameBuffer(PRE_EVENT_FRAMES)
+        fill(buffer, rng)
+        t0 = time.perf_counter()
+        legacy_trigger(db, buffer)
+        legacy = time.perf_counter() - t0
+
+        storage = EventTriggeredStorage(ThermalFrameBuffer(PRE_EVENT_FRAMES), db)
+        fill(storage.buffer, rng)
+        storage.start()
+        t0 = time.perf_counter()
+        storage.trigger_event()
+        capture_path = time.perf_counter() - t0
+        storage.flush()
+        total = time.perf_counter() - t0
+        stats = storage.stats()
+        storage.stop()
+
+        print(f"Alarm with {PRE_EVENT_FRAMES} pre-event frames:")
+        print(f"  legacy per-frame commits     {legacy * 1e3:9.2f} ms on the capture thread")
+        print(f"  queued writer                {capture_path * 1e3:9.2f} ms on the capture thread")
+        print(f"                               {total * 1e3:9.2f} ms until committed "
+              f"({stats['commits']} commit, {stats['last_commit_ms']:.2f} ms)")
+        db.close()
+
+if __name__ == "__main__":
+    main()
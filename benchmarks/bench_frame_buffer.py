@@ -0,0 +1,70 @@
+"""
+bench_frame_buffer.py
+
+Benchmark: legacy deque ThermalFrameBuffer vs preallocated FrameRingBuffer.
+
+Usage:
+    python benchmarks/bench_frame_buffer.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import threading
+import time
+from collections import deque
+import numpy as np
+from backend.src.frames import FrameRingBuffer
+
+class DequeFrameBuffer:
+    """The pre-ring implementation: deque of (timestamp, frame copy) under one lock."""
+    def __init__(self, capacity: int) -> None:
+        self.buffer: deque = deque(maxlen=capacity)
+        self.lock = threading.Lock()
+
+    def append(self, frame: np.ndarray, timestamp: int) -> None:
+        with self.lock:
+            self.buffer.append((timestamp, frame.copy()))
+
+    def get_all(self) -> list:
+        with self.lock:
+            return list(self.buffer)
+
+def bench(capacity: int, tail: int = 100) -> None:
+    frame = np.random.default_rng(0).normal(25.0, 2.0, (24, 32)).astype(np.float32)
+    writes = capacity + capacity // 10
+
+    legacy = DequeFrameBuffer(capacity)
+    t0 = time.perf_counter()
+    for i in range(writes):
+        legacy.append(frame, i)
+    legacy_write = (time.perf_counter() - t0) / writes
+    t0 = time.perf_counter()
+    frames = legacy.get_all()
+    stacked = np.stack([f for _, f in frames])  # what a caller needs for vectorised work
+    legacy_all = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    last = np.stack([f for _, f in list(legacy.get_all())[-tail:]])
+    legacy_tail = time.perf_counter() - t0
+    del legacy, frames, stacked, last
+
+    ring = FrameRingBuffer(capacity)
+    t0 = time.perf_counter()
+    for i in range(writes):
+        ring.write(frame, i)
+    ring_write = (time.perf_counter() - t0) / writes
+    t0 = time.perf_counter()
+    ring.snapshot()
+    ring_all = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    ring.snapshot(tail)
+    ring_tail = time.perf_counter() - t0
+    del ring
+
+    print(f"capacity={capacity}")
+    print(f"  append/write per frame : deque {legacy_write * 1e6:8.2f} us   ring {ring_write * 1e6:8.2f} us")
+    print(f"  read all as array      : deque {legacy_all * 1e3:8.2f} ms   ring {ring_all * 1e3:8.2f} ms")
+    print(f"  read last {tail:<5d}        : deque {legacy_tail * 1e3:8.2f} ms   ring {ring_tail * 1e3:8.2f} ms")
+
+if __name__ == "__main__":
+    for cap in (1_000, 100_000):
+        bench(cap)
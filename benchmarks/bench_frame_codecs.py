@@ -0,0 +1,83 @@
+"""
+bench_frame_codecs.py
+
+Benchmark: compression ratio, encode/decode throughput and worst-case error of every
+registered frame codec, for single-frame rows (thermal_frames) and 64-frame clip chunks
+(event_clips).
+
+Frames come from a recorded IRCAM database when one is given (event clips first, else
+thermal_frames rows); otherwise a synthetic MLX90640-like scene is used: a static
+background gradient, a slowly drifting hot spot and 0.15 degC sensor noise.
+
+Usage:
+    python benchmarks/bench_frame_codecs.py [path/to/ircam.db]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import time
+import numpy as np
+from backend.src.clips import CLIP_CHUNK_FRAMES, iter_clip_chunks
+from backend.src.database import Database
+from backend.src.frame_codecs import codec_names, decode_frames, encode_frames, get_codec
+
+FRAMES = 1280
+REPEATS = 3
+
+def recorded_frames(path: str) -> np.ndarray:
+    db = Database(path)
+    db.connect()
+    try:
+        chunks = [chunk for _, _, _, chunk in iter_clip_chunks(db)]
+        if not chunks:
+            rows = db.execute_query("SELECT frame, codec FROM thermal_frames ORDER BY event_id, timestamp").fetchall()
+            chunks = [decode_frames(row[0], row[1]) for row in rows]
+        if not chunks:
+            raise SystemExit(f"No stored frames in {path}")
+        return np.concatenate(chunks)[:FRAMES]
+    finally:
+        db.close()
+
+def synthetic_frames() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:24, 0:32].astype(np.float32)
+    background = 22.0 + 0.08 * x + 0.05 * y
+    frames = np.empty((FRAMES, 24, 32), dtype=np.float32)
+    for i in range(FRAMES):
+        cx, cy = 16 + 8 * np.sin(i / 200), 12 + 5 * np.cos(i / 300)
+        spot = 35.0 * np.exp(-((x - cx) ** 2 + (y - cy) ** 2) / 8.0)
+        frames[i] = background + spot + rng.normal(0, 0.15, (24, 32))
+    return frames
+
+def best_of(fn) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return min(timings)
+
+def measure(name: str, frames: np.ndarray, group: int) -> None:
+    groups = [frames[i:i + group] for i in range(0, len(frames), group)]
+    blobs = [encode_frames(g, name) for g in groups]
+    encode = best_of(lambda: [encode_frames(g, name) for g in groups])
+    decode = best_of(lambda: [decode_frames(b, name) for b in blobs])
+    decoded = np.concatenate([decode_frames(b, name) for b in blobs])
+    raw_mb = frames.nbytes / 1e6
+    stored = sum(len(b) for b in blobs)
+    error = float(np.nanmax(np.abs(decoded - frames)))
+    print(f"  {name:<16s} {frames.nbytes / stored:6.2f}x  {stored / len(frames):7.0f} B/frame  "
+          f"encode {raw_mb / encode:8.1f} MB/s  decode {raw_mb / decode:8.1f} MB/s  max err {error:.4f} degC"
+          f"{'' if get_codec(name).lossless else ' (lossy)'}")
+
+def main() -> None:
+    frames = recorded_frames(sys.argv[1]) if len(sys.argv) > 1 else synthetic_frames()
+    source = sys.argv[1] if len(sys.argv) > 1 else "synthetic scene"
+    print(f"{len(frames)} frames from {source}; ratio and throughput relative to raw float32")
+    for group, label in ((1, "one frame per row (thermal_frames)"), (CLIP_CHUNK_FRAMES, f"{CLIP_CHUNK_FRAMES}-frame clip chunks (event_clips)")):
+        print(f"{label}:")
+        for name in codec_names():
+            measure(name, frames, group)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+bench_frame_formats.py
+
+Benchmark: response size and server time of /api/v1/thermal/real-time as JSON vs the
+binary float32 / float16 / int16 formats (plus the encoding step alone, without the
+test client's per-request overhead), and of /api/v1/events/{id}/frames/blobs for a
+600-frame event clip as base64-in-JSON vs binary records.
+
+Usage:
+    python benchmarks/bench_frame_formats.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import logging
+import tempfile
+import time
+import numpy as np
+from fastapi.testclient import TestClient
+from backend.src.acquisition import AcquisitionService
+from backend.src.clips import clip_chunk_row, write_clip_chunks
+from backend.src.database import Database
+from backend.src.frame_formats import FRAME_FORMATS
+from backend.src.main import ThermalFrameResponse, app, get_acquisition, get_db
+
+REQUESTS = 500
+CLIP_FRAMES = 600
+T0 = 1700006400  # 2023-11-15T00:00:00Z
+ACCEPTS = (("json", "application/json"), ("float32", "application/octet-stream"),
+           ("float16", "application/octet-stream; dtype=float16"), ("int16", "application/octet-stream; dtype=int16"))
+
+class Sensor:
+    def __init__(self) -> None:
+        self.rng = np.random.default_rng(0)
+
+    def read_frame(self) -> np.ndarray:
+        return self.rng.normal(30.0, 3.0, (24, 32)).astype(np.float32)
+
+def timed(client: TestClient, path: str, accept: str, repeats: int) -> tuple[float, int]:
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        response = client.get(path, headers={"Accept": accept})
+    assert response.status_code == 200
+    return (time.perf_counter() - t0) / repeats, len(response.content)
+
+def main() -> None:
+    logging.disable(logging.INFO)
+    acquisition = AcquisitionService(Sensor())
+    acquisition.capture_once()
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "formats.db"))
+        db.connect()
+        db.initialize_schema()
+        frames = np.random.default_rng(1).normal(30.0, 3.0, (CLIP_FRAMES, 24, 32)).astype(np.float32)
+        timestamps_ns = (T0 + np.arange(CLIP_FRAMES)) * 10**9
+        write_clip_chunks(db, [clip_chunk_row(1, i, timestamps_ns[i:i + 64], frames[i:i + 64], "i16+delta+zlib")
+                               for i in range(0, CLIP_FRAMES, 64)])
+        app.dependency_overrides[get_acquisition] = lambda: acquisition
+        app.dependency_overrides[get_db] = lambda: db
+        client = TestClient(app)
+        print("real-time frame:")
+        for label, accept in ACCEPTS:
+            seconds, size = timed(client, "/api/v1/thermal/real-time", accept, REQUESTS)
+            print(f"  {label:<8s} {size:7d} bytes  {seconds * 1e6:7.0f} µs/request")
+        frame = acquisition.latest()
+        encoders = [("json", lambda: ThermalFrameResponse(timestamp=frame.isoformat(), frame=frame.tolist(), age_seconds=0.0).model_dump_json())]
+        encoders += [(name, lambda fmt=fmt: fmt.encode(np.array([frame.timestamp]), frame.data)) for name, fmt in FRAME_FORMATS.items()]
+        for label, encode in encoders:
+            t0 = time.perf_counter()
+            for _ in range(REQUESTS):
+                encode()
+            print(f"  {label:<8s} encode only {(time.perf_counter() - t0) / REQUESTS * 1e6:7.1f} µs")
+        print(f"event clip of {CLIP_FRAMES} frames (frames/blobs):")
+        for label, accept in ACCEPTS:
+            seconds, size = timed(client, "/api/v1/events/1/frames/blobs", accept, 10)
+            print(f"  {label:<8s} {size / 1e6:7.2f} MB  {seconds * 1e3:7.1f} ms/request")
+        app.dependency_overrides.pop(get_acquisition, None)
+        app.dependency_overrides.pop(get_db, None)
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+bench_live_broadcast.py
+
+Load test: 1 to 100 viewers connected to the /api/v1/thermal/live WebSocket endpoint (driven
+in-process through ASGI, so socket I/O is excluded) while frames are published from a
+separate capture thread. Reports per frame the time spent on the capture thread, the number
+of JSON encodes, and the server CPU time in total and per viewer. The polling baseline is
+the JSON encode of /api/v1/thermal/real-time that every viewer's poll costs.
+
+Usage:
+    python benchmarks/bench_live_broadcast.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import asyncio
+import logging
+import threading
+import time
+import numpy as np
+from backend.src.broadcast import FrameBroadcaster
+from backend.src.main import ThermalFrameResponse, app, get_broadcaster
+from backend.src.thermal_frame import ThermalFrame
+
+FRAMES = 200
+VIEWERS = (1, 10, 50, 100)
+INTERVAL = 0.01  # seconds between published frames
+
+async def viewer(received: list[int], index: int, done: asyncio.Event) -> None:
+    scope = {"type": "websocket", "path": "/api/v1/thermal/live", "raw_path": b"/api/v1/thermal/live", "query_string": b"",
+             "headers": [], "scheme": "ws", "server": ("bench", 80), "client": ("viewer", index), "root_path": "",
+             "subprotocols": [], "app": app}
+    connected = False
+
+    async def receive() -> dict:
+        nonlocal connected
+        if not connected:
+            connected = True
+            return {"type": "websocket.connect"}
+        await done.wait()
+        return {"type": "websocket.disconnect", "code": 1000}
+
+    async def send(message: dict) -> None:
+        if message["type"] == "websocket.send":
+            received[index] += 1
+
+    await app(scope, receive, send)
+
+async def run(viewers: int, frames: list[ThermalFrame]) -> dict:
+    broadcaster = FrameBroadcaster(default_queue_size=4)
+    app.dependency_overrides[get_broadcaster] = lambda: broadcaster
+    received = [0] * viewers
+    done = asyncio.Event()
+    tasks = [asyncio.create_task(viewer(received, i, done)) for i in range(viewers)]
+    while broadcaster.stats()["subscribers"] < viewers:
+        await asyncio.sleep(0.001)
+    publish_seconds = [0.0]
+
+    def capture() -> None:
+        for frame in frames:
+            t0 = time.perf_counter()
+            broadcaster(frame)
+            publish_seconds[0] += time.perf_counter() - t0
+            time.sleep(INTERVAL)
+
+    cpu0 = time.process_time()
+    thread = threading.Thread(target=capture)
+    thread.start()
+    while thread.is_alive() or sum(received) + broadcaster.stats()["frames_dropped"] < viewers * len(frames):
+        await asyncio.sleep(0.005)
+    cpu = time.process_time() - cpu0
+    done.set()
+    await asyncio.gather(*tasks)
+    app.dependency_overrides.pop(get_broadcaster, None)
+    stats = broadcaster.stats()
+    return {"publish_us": publish_seconds[0] / len(frames) * 1e6, "encodes": stats["frames_encoded"] / len(frames),
+            "cpu_us": cpu / len(frames) * 1e6, "dropped": stats["frames_dropped"], "sent": sum(received)}
+
+def main() -> None:
+    logging.disable(logging.INFO)
+    rng = np.random.default_rng(0)
+    frames = [ThermalFrame(rng.normal(30.0, 3.0, (24, 32)).astype(np.float32), 1700006400 + i) for i in range(FRAMES)]
+    # Idle CPU of the capture thread's sleep loop is included in every row
+    print(f"{FRAMES} frames every {INTERVAL * 1e3:.0f} ms:")
+    for viewers in VIEWERS:
+        result = asyncio.run(run(viewers, frames))
+        print(f"  {viewers:3d} viewers: capture thread {result['publish_us']:6.1f} µs/frame, {result['encodes']:.2f} encodes/frame, "
+              f"server CPU {result['cpu_us']:8.1f} µs/frame ({result['cpu_us'] / viewers:6.1f} µs/viewer), "
+              f"{result['sent']} sent, {result['dropped']} dropped")
+    frame = frames[0]
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        ThermalFrameResponse(timestamp=frame.isoformat(), frame=frame.tolist(), age_seconds=0.0).model_dump_json()
+    encode_us = (time.perf_counter() - t0) / 1000 * 1e6
+    for viewers in VIEWERS:
+        print(f"  polling, {viewers:3d} viewers: {viewers * encode_us:8.1f} µs/frame of JSON encoding alone")
+
+if __name__ == "__main__":
+    main()
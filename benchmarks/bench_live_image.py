@@ -0,0 +1,98 @@
+"""
+bench_live_image.py
+
+Benchmark: upscaled live images. Compares interpolating a frame with the precomputed
+weight matrices (two matrix multiplies) against resampling with Pillow and against
+computing the interpolation weights per frame, then measures /api/v1/thermal/live/image
+with many polling clients per captured frame: server time per request for the first
+(rendering) request, later requests served from the renderer and conditional requests
+answered with 304.
+
+Usage:
+    python benchmarks/bench_live_image.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import logging
+import tempfile
+import time
+import numpy as np
+from PIL import Image
+from fastapi.testclient import TestClient
+from backend.src.acquisition import AcquisitionService
+from backend.src.database import Database
+from backend.src.main import app, get_acquisition, get_db, get_live_image_renderer
+from backend.src.render import LiveImageRenderer, interpolation_weights
+
+SCALE = 10
+REPEATS = 500
+CLIENTS = 50
+CAPTURES = 20
+
+class Sensor:
+    def __init__(self) -> None:
+        self.rng = np.random.default_rng(0)
+
+    def read_frame(self) -> np.ndarray:
+        return self.rng.normal(30.0, 3.0, (24, 32)).astype(np.float32)
+
+def per_frame(fn) -> float:
+    t0 = time.perf_counter()
+    for _ in range(REPEATS):
+        fn()
+    return (time.perf_counter() - t0) / REPEATS
+
+def main() -> None:
+    logging.disable(logging.INFO)
+    frame = Sensor().read_frame()
+    size = (32 * SCALE, 24 * SCALE)
+    print(f"interpolate one frame to {size[0]}x{size[1]}:")
+    for method, resample in (("bilinear", Image.BILINEAR), ("bicubic", Image.BICUBIC)):
+        wy, wx = interpolation_weights(24, SCALE, method), interpolation_weights(32, SCALE, method)
+        timings = [
+            ("weight matrices", per_frame(lambda: wy @ frame @ wx.T)),
+            ("weights per frame", per_frame(lambda: interpolation_weights.__wrapped__(24, SCALE, method)
+                                            @ frame @ interpolation_weights.__wrapped__(32, SCALE, method).T)),
+            ("Pillow resize", per_frame(lambda: np.asarray(Image.fromarray(frame, mode="F").resize(size, resample)))),
+        ]
+        for label, seconds in timings:
+            print(f"  {method:<9s} {label:<18s} {seconds * 1e6:7.1f} µs")
+    acquisition = AcquisitionService(Sensor())
+    renderer = LiveImageRenderer()
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "live.db"))
+        db.connect()
+        db.initialize_schema()
+        app.dependency_overrides[get_acquisition] = lambda: acquisition
+        app.dependency_overrides[get_live_image_renderer] = lambda: renderer
+        app.dependency_overrides[get_db] = lambda: db
+        client = TestClient(app)
+        path = "/api/v1/thermal/live/image"
+        print(f"{path}, {CLIENTS} clients polling each of {CAPTURES} frames:")
+        for fmt in ("png", "jpeg"):
+            first = shared = not_modified = 0.0
+            for _ in range(CAPTURES):
+                acquisition.capture_once()
+                t0 = time.perf_counter()
+                etag = client.get(path, params={"format": fmt}).headers["etag"]
+                t1 = time.perf_counter()
+                for _ in range(CLIENTS - 1):
+                    client.get(path, params={"format": fmt})
+                t2 = time.perf_counter()
+                for _ in range(CLIENTS):
+                    assert client.get(path, params={"format": fmt}, headers={"If-None-Match": etag}).status_code == 304
+                t3 = time.perf_counter()
+                first += t1 - t0
+                shared += (t2 - t1) / (CLIENTS - 1)
+                not_modified += (t3 - t2) / CLIENTS
+            print(f"  {fmt:<5s} rendering {first / CAPTURES * 1e3:6.2f} ms  rendered once {shared / CAPTURES * 1e3:6.2f} ms"
+                  f"  304 {not_modified / CAPTURES * 1e3:6.2f} ms")
+        print(f"  renderer: {renderer.stats()}")
+        app.dependency_overrides.pop(get_acquisition, None)
+        app.dependency_overrides.pop(get_live_image_renderer, None)
+        app.dependency_overrides.pop(get_db, None)
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+bench_pixel_rollups.py
+
+Benchmark: per-pixel heatmap over 30 days of frames captured once a minute (43,200
+frames). Reports the capture-thread cost of PixelRollupWriter per frame and the heatmap
+query time from pixel_rollups, against computing the same mean/max/std from the frames
+themselves (recording segments or thermal_frames), timed here from decoded frames already
+in memory, i.e. a lower bound for re-reading them.
+
+Usage:
+    python benchmarks/bench_pixel_rollups.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import logging
+import tempfile
+import time
+import numpy as np
+from backend.src.database import Database
+from backend.src.pixel_rollups import PixelRollupWriter, pixel_stats
+from backend.src.thermal_frame import ThermalFrame
+
+DAYS = 30
+INTERVAL = 60.0
+T0 = 1700006400  # 2023-11-15T00:00:00Z
+
+def main() -> None:
+    logging.disable(logging.INFO)
+    count = int(DAYS * 86400 / INTERVAL)
+    rng = np.random.default_rng(0)
+    stack = rng.normal(30.0, 3.0, (count, 24, 32)).astype(np.float32)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "pixels.db"))
+        db.connect()
+        db.initialize_schema()
+        writer = PixelRollupWriter(db, flush_interval=60.0)
+        writer.start()
+        frames = [ThermalFrame(stack[i], T0 + i * INTERVAL) for i in range(count)]
+        t0 = time.perf_counter()
+        for frame in frames:
+            writer(frame)
+        per_frame = (time.perf_counter() - t0) / count
+        writer.stop()
+        rows, size = db.execute_query("SELECT COUNT(*), SUM(LENGTH(count) + LENGTH(sum) + LENGTH(sumsq) + LENGTH(min) + LENGTH(max)) FROM pixel_rollups").fetchone()
+        print(f"{count} frames over {DAYS} days, {rows} pixel_rollups rows ({size / 1e6:.1f} MB):")
+        print(f"  capture thread          {per_frame * 1e6:8.1f} us/frame")
+        for label, start, end in (("1 day", T0 + 3 * 86400 + 1234, T0 + 4 * 86400 + 1234), ("30 days", T0, T0 + DAYS * 86400 - 1)):
+            t0 = time.perf_counter()
+            stats, _, _ = pixel_stats(db, start, end)
+            stats.mean, stats.std, stats.max
+            rollup = time.perf_counter() - t0
+            lo, hi = int((start - T0) // INTERVAL), int((end - T0) // INTERVAL) + 1
+            t0 = time.perf_counter()
+            window = stack[lo:hi].astype(np.float64)
+            window.mean(axis=0), window.std(axis=0), window.max(axis=0)
+            direct = time.perf_counter() - t0
+            print(f"  heatmap {label:<8s} rollups {rollup * 1e3:7.1f} ms ({stats.frames} frames)   frames in memory {direct * 1e3:7.1f} ms")
+        db.close()
+
+if __name__ == "__main__":
+    main()
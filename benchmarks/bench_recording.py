@@ -0,0 +1,76 @@
+"""
+bench_recording.py
+
+Benchmark: continuous recording of one hour at 1 Hz into a memory-mapped segment file vs
+one thermal_frames row per frame, and reading that hour back (plus its mean frame).
+
+Usage:
+    python benchmarks/bench_recording.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import logging
+import tempfile
+import time
+import numpy as np
+from backend.src.database import Database
+from backend.src.recording import SegmentRecorder, read_range
+from backend.src.thermal_frame import ThermalFrame, frame_from_bytes
+
+FRAMES = 3600
+T0 = 1699999200  # 2023-11-14T22:00:00Z, start of a clock hour
+REPEATS = 5
+
+def open_db(path: str) -> Database:
+    db = Database(path)
+    db.connect()
+    db.initialize_schema()
+    return db
+
+def best_of(fn) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return min(timings)
+
+def main() -> None:
+    logging.disable(logging.INFO)
+    rng = np.random.default_rng(0)
+    frames = [ThermalFrame(rng.normal(25.0, 2.0, (24, 32)).astype(np.float32), T0 + i) for i in range(FRAMES)]
+    with tempfile.TemporaryDirectory() as tmp:
+        db = open_db(os.path.join(tmp, "segments.db"))
+        recorder = SegmentRecorder(db, os.path.join(tmp, "rec"), capture_interval=1.0)
+        recorder.start()  # catalog syncs on the writer thread, as in the app
+        t0 = time.perf_counter()
+        for frame in frames:
+            recorder(frame)
+        write = time.perf_counter() - t0
+        recorder.close()
+        db.checkpoint()
+        segment_bytes = sum(os.stat(e.path).st_blocks * 512 for e in os.scandir(recorder.directory))
+        read = best_of(lambda: read_range(db, T0 * 10**9, (T0 + FRAMES) * 10**9)[1].mean(axis=0))
+        print(f"  {'segment file':<22s} append {write / FRAMES * 1e6:7.1f} us/frame  read hour + mean {read * 1e3:7.2f} ms  "
+              f"db {os.path.getsize(db.db_path) / 1e6:6.2f} MB + segments {segment_bytes / 1e6:6.2f} MB")
+
+        db = open_db(os.path.join(tmp, "rows.db"))
+        t0 = time.perf_counter()
+        for frame in frames:
+            with db.transaction() as conn:
+                conn.execute("INSERT INTO thermal_frames (timestamp, frame, frame_size) VALUES (?, ?, ?)", (frame.isoformat(), frame.tobytes(), 768))
+        write = time.perf_counter() - t0
+
+        def read_rows() -> None:
+            rows = db.execute_query("SELECT frame FROM thermal_frames WHERE timestamp >= ? AND timestamp < ?",
+                                    (frames[0].isoformat(), "9999-12-31")).fetchall()
+            np.stack([frame_from_bytes(row[0]) for row in rows]).mean(axis=0)
+
+        read = best_of(read_rows)
+        db.checkpoint()
+        print(f"  {'thermal_frames rows':<22s} append {write / FRAMES * 1e6:7.1f} us/frame  read hour + mean {read * 1e3:7.2f} ms  "
+              f"db {os.path.getsize(db.db_path) / 1e6:6.2f} MB")
+
+if __name__ == "__main__":
+    main()
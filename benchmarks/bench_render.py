@@ -0,0 +1,91 @@
+"""
+bench_render.py
+
+Benchmark: rendering a 600-frame event as a stacked PNG. Compares the previous per-frame
+grayscale rendering with the LUT renderer (gray and iron, with and without 4x upscaling)
+encoded as RGB and as a palette PNG, and /api/v1/events/{id}/frames.png on a cold cache,
+a memory hit, a disk hit (fresh process cache over the same directory) and a conditional
+request answered with 304.
+
+Usage:
+    python benchmarks/bench_render.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import io
+import logging
+import tempfile
+import time
+import numpy as np
+from PIL import Image
+from fastapi.testclient import TestClient
+from backend.src.clips import clip_chunk_row, write_clip_chunks
+from backend.src.database import Database
+from backend.src.main import app, get_db, get_render_cache
+from backend.src.render import RenderCache, encode_png, render_frames, render_indexed
+from backend.src.thermal_frame import FRAME_WIDTH
+
+CLIP_FRAMES = 600
+REPEATS = 5
+T0 = 1700006400  # 2023-11-15T00:00:00Z
+
+def legacy_png(frames: np.ndarray) -> bytes:
+    """The previous renderer: grayscale, each frame scaled to its own range."""
+    lo = frames.min(axis=(1, 2), keepdims=True)
+    span = frames.max(axis=(1, 2), keepdims=True) - lo
+    span[span == 0] = 1
+    pixels = ((frames - lo) / span * 255).astype(np.uint8).reshape(-1, FRAME_WIDTH)
+    buf = io.BytesIO()
+    Image.fromarray(pixels, mode="L").save(buf, format="PNG")
+    return buf.getvalue()
+
+def timed(fn, repeats: int = REPEATS) -> tuple[float, object]:
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return (time.perf_counter() - t0) / repeats, result
+
+def main() -> None:
+    logging.disable(logging.INFO)
+    frames = np.random.default_rng(0).normal(30.0, 3.0, (CLIP_FRAMES, 24, 32)).astype(np.float32)
+    print(f"render + PNG encode of {CLIP_FRAMES} frames:")
+    seconds, png = timed(lambda: legacy_png(frames))
+    print(f"  {'legacy gray/frame':<24s} {seconds * 1e3:7.1f} ms  {len(png) / 1e3:8.1f} KB")
+    for colormap, scale in (("gray", 1), ("iron", 1), ("iron", 4)):
+        for label, render in (("rgb", render_frames), ("palette", render_indexed)):
+            seconds, image = timed(lambda: render(frames, colormap, "shared", scale=scale))
+            encode_seconds, png = timed(lambda: encode_png(*image) if label == "palette" else encode_png(image))
+            print(f"  {colormap + ' x' + str(scale) + ' ' + label:<24s} {(seconds + encode_seconds) * 1e3:7.1f} ms"
+                  f"  {len(png) / 1e3:8.1f} KB  (render {seconds * 1e3:.1f} ms)")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "render.db"))
+        db.connect()
+        db.initialize_schema()
+        timestamps_ns = (T0 + np.arange(CLIP_FRAMES)) * 10**9
+        write_clip_chunks(db, [clip_chunk_row(1, i, timestamps_ns[i:i + 64], frames[i:i + 64], "i16+delta+zlib")
+                               for i in range(0, CLIP_FRAMES, 64)])
+        cache_dir = os.path.join(tmp, "cache")
+        caches = [RenderCache(cache_dir)]
+        app.dependency_overrides[get_db] = lambda: db
+        app.dependency_overrides[get_render_cache] = lambda: caches[-1]
+        client = TestClient(app)
+        path, params = "/api/v1/events/1/frames.png", {"colormap": "iron", "scale": 4}
+        print(f"{path} (iron, x4):")
+        t0 = time.perf_counter()
+        first = client.get(path, params=params)
+        print(f"  {'cold (' + first.headers['x-render-cache'] + ')':<24s} {(time.perf_counter() - t0) * 1e3:7.1f} ms")
+        seconds, resp = timed(lambda: client.get(path, params=params), 50)
+        print(f"  {'warm (' + resp.headers['x-render-cache'] + ')':<24s} {seconds * 1e3:7.1f} ms")
+        caches.append(RenderCache(cache_dir))  # as after a restart
+        t0 = time.perf_counter()
+        resp = client.get(path, params=params)
+        print(f"  {'restart (' + resp.headers['x-render-cache'] + ')':<24s} {(time.perf_counter() - t0) * 1e3:7.1f} ms")
+        seconds, resp = timed(lambda: client.get(path, params=params, headers={"If-None-Match": first.headers["etag"]}), 50)
+        print(f"  {'conditional (' + str(resp.status_code) + ')':<24s} {seconds * 1e3:7.1f} ms")
+        app.dependency_overrides.pop(get_db, None)
+        app.dependency_overrides.pop(get_render_cache, None)
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+bench_retention.py
+
+Benchmark: expire 1M thermal_data rows (plus their minute rollups) while the zone series
+BatchWriter keeps committing a frame's rows every 10 ms, with the app's connection layout:
+the writer and RetentionJob each on their own connection, request handlers on the shared
+one. Compares a single DELETE statement issued on the shared connection against
+RetentionJob's chunked deletes, reporting the worst commit latency the writer saw, and the
+bytes incremental vacuum gave back to the filesystem.
+
+Usage:
+    python benchmarks/bench_retention.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import logging
+import tempfile
+import threading
+import time
+import numpy as np
+from backend.src.database import Database
+from backend.src.retention import RetentionJob
+from backend.src.rollups import epoch_to_iso
+from backend.src.timeseries import _write_zone_rows
+from backend.src.writer import BatchWriter
+
+ZONES = 16
+EXPIRED_ROWS = 1_000_000
+NOW = 1700006400.0  # 2023-11-15T00:00:00Z
+
+def build(path: str) -> Database:
+    db = Database(path)
+    db.connect()
+    db.initialize_schema()
+    db.set_setting("data_retention_days", "7")
+    zone_ids = np.arange(1, ZONES + 1)
+    start = NOW - 30 * 86400
+    frames = EXPIRED_ROWS // ZONES
+    for first in range(0, frames, 10000):
+        items = [(epoch_to_iso(start + i), zone_ids, np.full(ZONES, 30.0)) for i in range(first, min(first + 10000, frames))]
+        with db.transaction():
+            _write_zone_rows(db, items)
+    db.checkpoint()
+    return db
+
+def worst_writer_latency(db: Database, work) -> tuple[float, float]:
+    """
+    Run work() while the zone series writer (a BatchWriter on its own connection, as in the
+    app) commits one frame's rows every 10 ms. Returns (work seconds, worst commit seconds).
+    """
+    writer = BatchWriter(db, _write_zone_rows, name="zone-series-writer", flush_interval=0.01)
+    writer.start()
+    stop = threading.Event()
+    worst = [0.0]
+    zone_ids = np.arange(1, ZONES + 1)
+
+    def capture_loop() -> None:
+        while not stop.is_set():
+            writer.submit((epoch_to_iso(NOW), zone_ids, np.full(ZONES, 30.0)))
+            worst[0] = max(worst[0], writer.stats()["max_commit_ms"] or 0.0)  # of the last 100 commits
+            stop.wait(0.01)
+
+    thread = threading.Thread(target=capture_loop)
+    thread.start()
+    t0 = time.perf_counter()
+    work()
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    thread.join()
+    writer.stop()
+    return elapsed, max(worst[0], writer.stats()["max_commit_ms"] or 0.0) / 1e3
+
+def main() -> None:
+    logging.disable(logging.INFO)
+    print(f"{EXPIRED_ROWS} expired thermal_data rows ({ZONES} zones), zone series writer committing every 10 ms:")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "single.db")
+        db = build(path)
+        cutoff = epoch_to_iso(NOW - 7 * 86400)
+
+        def single_delete() -> None:
+            with db.transaction() as conn:
+                conn.execute("DELETE FROM thermal_data WHERE timestamp < ?", (cutoff,))
+                conn.execute("DELETE FROM thermal_rollups WHERE resolution = 60 AND bucket < ?", (int(NOW - 7 * 86400),))
+
+        elapsed, worst = worst_writer_latency(db, single_delete)
+        print(f"  single DELETE            {elapsed:6.2f} s  worst writer commit {worst * 1e3:8.1f} ms")
+        db.close()
+
+        path = os.path.join(tmp, "chunked.db")
+        db = build(path)
+        job = RetentionJob(db)
+        report: dict = {}
+        elapsed, worst = worst_writer_latency(db, lambda: report.update(job.run_once(now=NOW)))
+        print(f"  RetentionJob chunks      {elapsed:6.2f} s  worst writer commit {worst * 1e3:8.1f} ms")
+        print(f"  rows deleted {sum(report['rows_deleted'].values())}, pages vacuumed {report['pages_vacuumed']}, "
+              f"file {report['db_bytes_before'] / 1e6:.1f} MB -> {report['db_bytes_after'] / 1e6:.1f} MB "
+              f"({report['bytes_reclaimed'] / 1e6:.1f} MB reclaimed)")
+        job.stop()
+        db.close()
+
+if __name__ == "__main__":
+    main()
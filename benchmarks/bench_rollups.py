@@ -0,0 +1,68 @@
+"""
+bench_rollups.py
+
+Benchmark: a 14-day trend and summary for one zone sampled at 1 Hz (1.2M thermal_data
+rows), read as raw rows (the old endpoint path) vs from thermal_rollups at the resolution
+choose_resolution() picks for 500 points.
+
+Usage:
+    python benchmarks/bench_rollups.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import logging
+import tempfile
+import time
+import numpy as np
+from backend.src.database import Database
+from backend.src.frames import compute_trend
+from backend.src.rollups import RESOLUTION_NAMES, bucket_series, choose_resolution, epoch_to_iso, range_summary
+from backend.src.timeseries import _write_zone_rows
+
+DAYS = 14
+T0 = 1700006400  # 2023-11-15T00:00:00Z
+POINTS = 500
+
+def build(path: str) -> Database:
+    db = Database(path)
+    db.connect()
+    db.initialize_schema()
+    rng = np.random.default_rng(0)
+    zone = np.array([1])
+    seconds = DAYS * 86400
+    t0 = time.perf_counter()
+    for start in range(0, seconds, 86400):
+        values = rng.normal(30.0, 2.0, 86400)
+        items = [(epoch_to_iso(T0 + start + i), zone, values[i:i + 1]) for i in range(86400)]
+        with db.transaction():
+            _write_zone_rows(db, items)
+    print(f"  ingested {seconds} rows with rollups in {time.perf_counter() - t0:.1f} s")
+    return db
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - t0
+
+def main() -> None:
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = build(os.path.join(tmp, "rollups.db"))
+        # Unaligned range so the exact-edge path is exercised
+        start, end = T0 + 1234.5, T0 + DAYS * 86400 - 4321.0
+        resolution = choose_resolution(start, end, POINTS)
+        (timestamps, _), raw_trend = timed(lambda: compute_trend(db.get_thermal_data(epoch_to_iso(start), epoch_to_iso(end), 1)))
+        series, rollup_trend = timed(lambda: bucket_series(db, start, end, resolution, 1))
+        summary_raw, raw_summary = timed(lambda: db.execute_query(
+            "SELECT COUNT(*), AVG(temperature), MIN(temperature), MAX(temperature) FROM thermal_data "
+            "WHERE timestamp BETWEEN ? AND ? AND zone_id = 1", (epoch_to_iso(start), epoch_to_iso(end))).fetchone())
+        totals, rollup_summary = timed(lambda: range_summary(db, start, end, 1))
+        assert totals.count == summary_raw[0] and totals.min == summary_raw[2] and totals.max == summary_raw[3]
+        print(f"  trend   raw rows          {raw_trend * 1e3:8.1f} ms ({len(timestamps)} points)")
+        print(f"  trend   {RESOLUTION_NAMES[resolution]} rollup         {rollup_trend * 1e3:8.1f} ms ({len(series)} points)")
+        print(f"  summary raw SQL aggregate {raw_summary * 1e3:8.1f} ms")
+        print(f"  summary rollups           {rollup_summary * 1e3:8.1f} ms (mean {totals.mean:.6f} vs {summary_raw[1]:.6f})")
+
+if __name__ == "__main__":
+    main()
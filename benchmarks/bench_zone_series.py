@@ -0,0 +1,79 @@
+"""
+bench_zone_series.py
+
+Benchmark: sustained thermal_data ingestion on SQLite WAL. Frames' zone statistics are
+pushed through ZoneSeriesWriter as fast as possible for several batch sizes, against a
+baseline that inserts and commits each frame's rows on the capture thread. Reports rows
+committed per second and the capture-thread cost per frame.
+
+Usage:
+    python benchmarks/bench_zone_series.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import logging
+import tempfile
+import time
+import numpy as np
+from backend.src.database import Database
+from backend.src.thermal_frame import ThermalFrame
+from backend.src.timeseries import ZoneSeriesWriter
+from backend.src.zones import ZoneStats
+
+ZONES = 16
+FRAMES = 20000
+
+def open_db(path: str) -> Database:
+    db = Database(path)
+    db.connect()
+    db.initialize_schema()
+    return db
+
+def workload() -> list[tuple[ThermalFrame, ZoneStats]]:
+    rng = np.random.default_rng(0)
+    zone_ids = np.arange(1, ZONES + 1)
+    frame = ThermalFrame(np.zeros((24, 32), dtype=np.float32), 0.0)
+    items = []
+    for i in range(FRAMES):
+        values = rng.normal(30.0, 2.0, ZONES)
+        items.append((ThermalFrame(frame.data, 1700000000.0 + i * 0.0625), ZoneStats(zone_ids, values, values, values, values, zone_ids)))
+    return items
+
+def report(name: str, elapsed: float, capture: float) -> None:
+    rows = FRAMES * ZONES
+    print(f"  {name:<28s} {rows / elapsed:10.0f} rows/s  capture thread {capture / FRAMES * 1e6:7.1f} us/frame")
+
+def bench_direct(db: Database, items) -> None:
+    t0 = time.perf_counter()
+    for frame, stats in items:
+        with db.transaction() as conn:
+            conn.executemany("INSERT INTO thermal_data (zone_id, timestamp, temperature) VALUES (?, ?, ?)",
+                             [(int(z), frame.isoformat(), float(v)) for z, v in zip(stats.zone_ids, stats.average)])
+    elapsed = time.perf_counter() - t0
+    report("commit per frame (inline)", elapsed, elapsed)
+
+def bench_writer(db: Database, items, batch_size: int) -> None:
+    series = ZoneSeriesWriter(db, flush_interval=1.0, batch_size=batch_size, max_queue=FRAMES)
+    series.start()
+    t0 = time.perf_counter()
+    for frame, stats in items:
+        series(frame, stats)
+    capture = time.perf_counter() - t0
+    series.flush(timeout=None)
+    elapsed = time.perf_counter() - t0
+    series.stop()
+    report(f"ZoneSeriesWriter batch {batch_size}", elapsed, capture)
+    assert series.stats()["dropped"] == 0
+
+def main() -> None:
+    logging.disable(logging.INFO)
+    items = workload()
+    print(f"{FRAMES} frames x {ZONES} zones = {FRAMES * ZONES} rows, SQLite WAL, synchronous=NORMAL:")
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_direct(open_db(os.path.join(tmp, "direct.db")), items)
+        for batch_size in (ZONES, 256, 1000, 5000):
+            bench_writer(open_db(os.path.join(tmp, f"batch{batch_size}.db")), items, batch_size)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""
+Shared fixtures for the test suite.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from backend.src.database import Database
+
+@pytest.fixture
+def db(tmp_path):
+    """A database with the full schema in the test's temporary directory."""
+    database = Database(str(tmp_path / "test.db"))
+    database.connect()
+    database.initialize_schema()
+    yield database
+    database.close()
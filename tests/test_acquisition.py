@@ -0,0 +1,70 @@
+"""
+Unit tests for AcquisitionService.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import time
+import pytest
+from backend.src.acquisition import AcquisitionService
+from backend.src.thermal_frame import ThermalFrame
+
+class CountingSensor:
+    def __init__(self):
+        self.reads = 0
+    def read_frame(self):
+        self.reads += 1
+        return [float(self.reads)] * 768
+
+class FailingSensor:
+    def read_frame(self):
+        raise IOError("Simulated I2C error")
+
+def test_capture_once_publishes_latest():
+    service = AcquisitionService(CountingSensor())
+    assert service.latest() is None
+    assert service.frame_age() is None
+    assert service.capture_once()
+    frame = service.latest()
+    assert isinstance(frame, ThermalFrame)
+    assert frame.data.shape == (24, 32)
+    assert frame[0] == 1.0
+    assert abs(time.time() - frame.timestamp) < 5
+    assert service.frames_captured == 1
+
+def test_consumers_receive_frames_and_errors_are_isolated():
+    received = []
+    def broken(frame):
+        raise RuntimeError("consumer bug")
+    service = AcquisitionService(CountingSensor())
+    service.add_consumer(broken)
+    service.add_consumer(lambda frame: received.append(frame[0]))
+    service.capture_once()
+    service.capture_once()
+    assert received == [1.0, 2.0]
+
+def test_read_failure_counted():
+    service = AcquisitionService(FailingSensor())
+    assert not service.capture_once()
+    stats = service.stats()
+    assert stats["read_errors"] == 1
+    assert "Simulated" in stats["last_error"]
+    assert service.latest() is None
+
+def test_background_loop_reports_rate():
+    sensor = CountingSensor()
+    service = AcquisitionService(sensor, interval=0.01)
+    service.start()
+    try:
+        deadline = time.time() + 2.0
+        while service.frames_captured < 10 and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        service.stop()
+    assert service.frames_captured >= 10
+    assert not service.running
+    assert service.capture_rate() > 0
+
+def test_invalid_interval():
+    with pytest.raises(ValueError):
+        AcquisitionService(CountingSensor(), interval=0)
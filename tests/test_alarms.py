@@ -7,6 +7,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 import pytest
 import tempfile
 from backend.src.database import Database
+from datetime import datetime, timezone
 from backend.src.alarms import AlarmManager, AlarmEvent
 
 def test_add_and_remove_alarm():
@@ -113,3 +114,119 @@ def test_acknowledge_and_cooldown_fields():
     finally:
         tf.close()
         os.unlink(tf.name)
+
+def test_evaluate_returns_every_fired_alarm_without_db_reload():
+    import numpy as np
+    tf = tempfile.NamedTemporaryFile(delete=False)
+    try:
+        db = Database(tf.name)
+        db.connect()
+        db.initialize_schema()
+        am = AlarmManager(db)
+        am.add_alarm(1, 1, 25.0)
+        am.add_alarm(2, 1, 28.0)
+        am.add_alarm(3, 2, 40.0)
+        am.add_alarm(4, 3, 10.0, enabled=False)
+        am.add_alarm(5, 9, 0.0)  # zone not present in the frame
+        # Rows written behind the manager's back are not picked up until CRUD/reload
+        db.execute_query("INSERT INTO alarms (id, zone_id, threshold, enabled) VALUES (?, ?, ?, ?)", (6, 2, 0.0, 1))
+        zone_ids = np.array([3, 1, 2])
+        temps = np.array([50.0, 30.0, 35.0])
+        events = am.evaluate(zone_ids, temps, "2025-06-10T12:00:00Z")
+        assert sorted(e.alarm_id for e in events) == [1, 2]
+        assert all(e.zone_id == 1 and e.temperature == 30.0 for e in events)
+        # Same zone array again uses the cached mapping
+        events = am.evaluate(zone_ids, np.array([50.0, 20.0, 45.0]), "2025-06-10T12:00:01Z")
+        assert [e.alarm_id for e in events] == [3]
+        am.remove_alarm(3)
+        assert am.evaluate(zone_ids, np.array([50.0, 20.0, 45.0]), "t") == []
+        assert am.evaluate(np.array([], dtype=np.int64), np.array([]), "t") == []
+        db.close()
+    finally:
+        tf.close()
+        os.unlink(tf.name)
+
+def test_check_zone_stats():
+    import numpy as np
+    from backend.src.zones import Zone, ZoneStatsEngine
+    tf = tempfile.NamedTemporaryFile(delete=False)
+    try:
+        db = Database(tf.name)
+        db.connect()
+        db.initialize_schema()
+        am = AlarmManager(db)
+        am.add_alarm(1, 1, 30.0)
+        frame = np.full((24, 32), 20.0, dtype=np.float32)
+        frame[0, 0] = 60.0
+        stats = ZoneStatsEngine([Zone(1, 0, 0, 4, 4)]).compute(frame)
+        assert am.check_zone_stats(stats, "t") == []
+        assert [e.alarm_id for e in am.check_zone_stats(stats, "t", statistic="maximum")] == [1]
+        with pytest.raises(ValueError):
+            am.check_zone_stats(stats, "t", statistic="median")
+        db.close()
+    finally:
+        tf.close()
+        os.unlink(tf.name)
+
+def test_state_machine_cooldown_hysteresis_and_acknowledge():
+    import numpy as np
+    tf = tempfile.NamedTemporaryFile(delete=False)
+    try:
+        db = Database(tf.name)
+        db.connect()
+        db.initialize_schema()
+        am = AlarmManager(db)
+        am.add_alarm(1, 1, 30.0, cooldown_period=60, hysteresis=2.0)
+        zones = np.array([1])
+        def step(temp, now):
+            return [e.alarm_id for e in am.evaluate(zones, np.array([temp]), f"t{now}", now=now)]
+        assert step(31.0, 0) == [1]
+        assert am.alarms[1]["state"] == "triggered"
+        # Staying hot, or dipping inside the hysteresis band, does not refire
+        assert step(32.0, 1) == []
+        assert step(29.0, 2) == []
+        assert am.alarms[1]["state"] == "triggered"
+        am.acknowledge_alarm(1)
+        assert am.alarms[1]["state"] == "acknowledged"
+        # Clearing below threshold - hysteresis enters cooldown; heat during cooldown is suppressed
+        assert step(27.0, 3) == []
+        assert am.alarms[1]["state"] == "cooldown"
+        assert step(35.0, 30) == []
+        # Cooldown expires and the alarm re-arms and fires again
+        assert step(35.0, 61) == [1]
+        assert am.alarms[1]["acknowledged"] is False
+        db.close()
+    finally:
+        tf.close()
+        os.unlink(tf.name)
+
+def test_state_is_written_behind_and_restored_on_startup():
+    import numpy as np
+    tf = tempfile.NamedTemporaryFile(delete=False)
+    try:
+        db = Database(tf.name)
+        db.connect()
+        db.initialize_schema()
+        am = AlarmManager(db)
+        am.add_alarm(1, 1, 30.0, cooldown_period=600)
+        writer = am.start_persistence(flush_interval=60.0)
+        am.evaluate(np.array([1]), np.array([35.0]), "2025-06-10T12:00:00", now=1.0)
+        am.evaluate(np.array([1]), np.array([20.0]), "2025-06-10T12:00:01", now=2.0)
+        # Nothing committed until the writer flushes
+        assert db.execute_query("SELECT state FROM alarms WHERE id = 1").fetchone()[0] == "armed"
+        assert am.flush_persistence()
+        assert tuple(db.execute_query("SELECT state, last_triggered FROM alarms WHERE id = 1").fetchone()) == ("cooldown", "2025-06-10T12:00:00")
+        assert db.execute_query("SELECT COUNT(*) FROM alarm_events WHERE alarm_id = 1").fetchone()[0] == 1
+        # Two state changes and one event were committed in a single transaction
+        assert writer.stats()["commits"] == 1
+        am.stop_persistence()
+        restored = AlarmManager(db)
+        assert restored.alarms[1]["state"] == "cooldown"
+        # Cooldown is measured from the stored trigger time
+        now = datetime(2025, 6, 10, 12, 5, tzinfo=timezone.utc).timestamp()
+        assert restored.evaluate(np.array([1]), np.array([35.0]), "t", now=now) == []
+        assert [e.alarm_id for e in restored.evaluate(np.array([1]), np.array([35.0]), "t", now=now + 600)] == [1]
+        db.close()
+    finally:
+        tf.close()
+        os.unlink(tf.name)
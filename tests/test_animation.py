@@ -0,0 +1,100 @@
+"""
+Unit tests for streaming animated GIF / APNG clip export.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import io
+import numpy as np
+import pytest
+from PIL import Image
+from fastapi.testclient import TestClient
+from backend.src.animation import MIN_FRAME_MS, apng_stream, gif_stream, timed_frames
+from backend.src.clips import clip_chunk_row, write_clip_chunks
+from backend.src.render import render_indexed, render_palette
+
+T0 = 1700006400  # 2023-11-15T00:00:00Z
+
+def decoded_frames(data):
+    image = Image.open(io.BytesIO(data))
+    frames = []
+    for i in range(image.n_frames):
+        image.seek(i)
+        frames.append((np.asarray(image.convert("RGB")), image.info.get("duration")))
+    return image.format, frames
+
+def test_timed_frames_durations():
+    images = np.zeros((5, 2, 2), dtype=np.uint8)
+    batches = [(np.array([0.0, 0.1, 0.3]), images[:3]), (np.array([0.305, 0.5]), images[3:])]
+    assert [d for _, d in timed_frames(batches)] == [100, 200, MIN_FRAME_MS, 195, 195]
+    assert [d for _, d in timed_frames(batches, speed=2.0)] == [50, 100, MIN_FRAME_MS, 98, 98]
+
+@pytest.mark.parametrize("encoder", ["gif", "apng"])
+def test_streams_decode_to_rendered_frames(encoder):
+    frames = np.stack([np.full((24, 32), float(i)) for i in range(4)])
+    frames[2, 1, 1] = np.nan
+    zones = [(1, 1, 4, 4, (0, 255, 0))]
+    index, palette = render_indexed(frames, "iron", zones=zones, reserve_nan=True)
+    assert (palette == render_palette("iron", True, zones)).all()
+    timed = timed_frames([(np.array([0.0, 0.1, 0.2, 0.4]), index.reshape(4, 24, 32))])
+    stream = gif_stream(timed, palette, 32, 24) if encoder == "gif" else apng_stream(timed, palette, 32, 24, 4)
+    fmt, decoded = decoded_frames(b"".join(stream))
+    assert fmt == ("GIF" if encoder == "gif" else "PNG") and len(decoded) == 4
+    for i, (rgb, duration) in enumerate(decoded):
+        assert (rgb == palette[index[i * 24:(i + 1) * 24]]).all()
+        assert duration == [100, 100, 200, 200][i]
+
+def test_header_is_sent_before_frames_are_read():
+    def frames():
+        raise AssertionError("frames read before the header was sent")
+        yield
+
+    palette = render_palette("iron", True)
+    assert next(gif_stream(frames(), palette, 32, 24)).startswith(b"GIF89a")
+    assert next(apng_stream(frames(), palette, 32, 24, 3)).startswith(b"\x89PNG")
+
+def test_apng_writes_exactly_the_announced_frame_count():
+    palette = render_palette("gray")
+    images = [(np.full((24, 32), v, dtype=np.uint8), 100) for v in (10, 20, 30)]
+    assert len(decoded_frames(b"".join(apng_stream(iter(images), palette, 32, 24, 2)))[1]) == 2
+    _, padded = decoded_frames(b"".join(apng_stream(iter(images), palette, 32, 24, 5)))
+    assert len(padded) == 5 and (padded[4][0] == padded[2][0]).all()
+
+def test_clip_endpoint_streams_gif_and_apng(db):
+    from backend.src.main import app, get_db
+    frames = np.stack([np.full((24, 32), 20.0 + i, dtype=np.float32) for i in range(70)])
+    timestamps_ns = (T0 + np.arange(70) * 0.25) * 10**9
+    write_clip_chunks(db, [clip_chunk_row(5, i, timestamps_ns[i:i + 64].astype(np.int64), frames[i:i + 64]) for i in (0, 64)])
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        client = TestClient(app)
+        with client.stream("GET", "/api/v1/events/5/clip", params={"scale": 2}) as resp:
+            assert resp.headers["content-type"] == "image/gif"
+            chunks = list(resp.iter_bytes())
+        assert chunks[0].startswith(b"GIF89a") and chunks[-1].endswith(b";")
+        fmt, decoded = decoded_frames(b"".join(chunks))
+        assert fmt == "GIF" and len(decoded) == 70 and decoded[0][0].shape == (48, 64, 3) and decoded[0][1] == 250
+        # Shared scaling over the whole clip: first frame darkest, last brightest
+        assert tuple(decoded[0][0][0, 0]) == (0, 0, 0) and tuple(decoded[-1][0][0, 0]) == (255, 255, 255)
+        resp = client.get("/api/v1/events/5/clip", params={"format": "apng", "colormap": "gray", "speed": 5})
+        fmt, decoded = decoded_frames(resp.content)
+        assert resp.headers["content-type"] == "image/apng" and fmt == "PNG" and len(decoded) == 70
+        assert decoded[0][1] == 50 and decoded[0][0].shape == (96, 128, 3)
+        assert client.get("/api/v1/events/5/clip", params={"format": "webp"}).status_code == 400
+        assert client.get("/api/v1/events/6/clip").status_code == 404
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+def test_clip_endpoint_reads_legacy_frames(db):
+    from backend.src.main import app, get_db
+    for i in range(3):
+        frame = np.full((24, 32), 30.0 + i, dtype=np.float32)
+        db.execute_query("INSERT INTO thermal_frames (event_id, timestamp, frame, frame_size) VALUES (7, ?, ?, 768)",
+                         (f"2023-11-15T00:00:0{i}", frame.tobytes()))
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        resp = TestClient(app).get("/api/v1/events/7/clip", params={"format": "apng", "scale": 1, "vmin": 30, "vmax": 40})
+        _, decoded = decoded_frames(resp.content)
+        assert len(decoded) == 3 and [d for _, d in decoded] == [1000, 1000, 1000]
+    finally:
+        app.dependency_overrides.pop(get_db, None)
@@ -0,0 +1,136 @@
+"""
+Unit tests for the online per-zone anomaly detector.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import threading
+import time
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from backend.src.alarms import AlarmManager
+from backend.src.anomaly import ANOMALY_EVENT_TYPE, AnomalyDetector
+from backend.src.pipeline import FrameProcessor
+from backend.src.thermal_frame import ThermalFrame
+from backend.src.zones import ZonesManager
+
+T0 = 1700006400  # 2023-11-15T00:00:00Z
+DAY = 86400
+ZONES = np.array([1, 2, 3], dtype=np.int64)
+
+def feed(detector, values, start=T0, step=1.0):
+    events = []
+    for i, row in enumerate(values):
+        events += detector.update(ZONES, row, start + i * step)
+    return events
+
+def stored_events(db):
+    return [tuple(r) for r in db.execute_query("SELECT zone_id, alarm_id, event_type FROM alarm_events ORDER BY id").fetchall()]
+
+def test_detection_is_off_until_enabled(db):
+    from backend.src.main import get_bool_setting
+    assert not get_bool_setting(db, "anomaly_detection_enabled")
+
+def test_baseline_is_welford_then_ewma(db):
+    values = np.random.default_rng(0).normal(30.0, 2.0, (500, 3))
+    exact = AnomalyDetector(AlarmManager(db), alpha=1e-6, z_threshold=1e9)
+    feed(exact, values)
+    np.testing.assert_allclose(exact.state.mean[:, 0], values.mean(axis=0), rtol=1e-12)
+    np.testing.assert_allclose(exact.state.var[:, 0], values.var(axis=0), rtol=1e-9)
+    assert exact.state.count[:, 0].tolist() == [500, 500, 500]
+    # Past 1 / alpha samples the baseline follows a level shift
+    tracking = AnomalyDetector(AlarmManager(db), alpha=0.05, z_threshold=1e9)
+    feed(tracking, np.vstack([values[:100], values[100:] + 10.0]))
+    assert tracking.state.mean[:, 0] == pytest.approx(values[100:].mean(axis=0) + 10.0, abs=1.0)
+
+def test_spike_logs_one_anomaly_event_until_cleared(db):
+    detector = AnomalyDetector(AlarmManager(db), z_threshold=5.0, cooldown=0.0)
+    values = 30.0 + np.random.default_rng(1).normal(0.0, 0.2, (200, 3))
+    values[150:153, 1] = 45.0  # three anomalous frames in zone 2
+    values[180, 2] = np.nan
+    events = feed(detector, values)
+    assert [(e.zone_id, e.alarm_id, e.event_type) for e in events] == [(2, None, ANOMALY_EVENT_TYPE)]
+    assert events[0].timestamp == "2023-11-15T00:02:30" and events[0].event_id is not None
+    assert stored_events(db) == [(2, None, "anomaly")]
+    assert not detector.state.active.any() and detector.state.count[2, 0] == 199
+
+def test_warmup_and_cooldown_suppress_events(db):
+    detector = AnomalyDetector(AlarmManager(db), warmup=30, cooldown=60.0)
+    values = np.full((150, 3), 30.0)
+    values[10, 0] = 80.0  # still warming up
+    values[[40, 45, 110], 0] = 80.0  # 45 is within the cooldown after 40, 110 is not
+    events = feed(detector, values)
+    assert [e.timestamp for e in events] == ["2023-11-15T00:00:40", "2023-11-15T00:01:50"]
+    events = feed(detector, np.full((1, 3), 90.0), start=T0 + 150)
+    assert [e.zone_id for e in events] == [2, 3]
+
+def test_seasonal_baseline_scores_against_the_hour(db):
+    hours = np.repeat(np.arange(48), 60)  # two days of one sample a minute
+    values = np.where((hours % 24) < 12, 20.0, 40.0)[:, None] + np.random.default_rng(2).normal(0.0, 0.3, (len(hours), 3))
+    alarms = AlarmManager(db)
+    seasonal = AnomalyDetector(alarms, seasons=24, alpha=0.05, cooldown=0.0)
+    flat = AnomalyDetector(alarms, seasons=1, alpha=0.05, cooldown=0.0)
+    assert feed(flat, values, step=60.0)  # every switch between 20 and 40 °C is a surprise
+    assert not feed(seasonal, values, step=60.0)
+    assert seasonal.season_of(T0 + 13 * 3600 + 5) == 13
+    assert seasonal.state.mean[0, 3] == pytest.approx(20.0, abs=0.5) and seasonal.state.mean[0, 15] == pytest.approx(40.0, abs=0.5)
+    assert feed(seasonal, np.full((1, 3), 40.0), start=T0 + 2 * DAY + 3 * 3600)
+
+def test_checkpoint_restores_state_across_restarts(db):
+    detector = AnomalyDetector(AlarmManager(db), seasons=24)
+    feed(detector, np.random.default_rng(3).normal(30.0, 1.0, (100, 3)), step=300.0)
+    detector.update(np.array([7]), np.array([25.0]), T0 + 1000)  # zones added later get new rows
+    detector.stop()
+    restored = AnomalyDetector(AlarmManager(db), seasons=24)
+    assert restored.restore()
+    for name in ("zone_ids", "count", "mean", "var", "active", "last_event"):
+        np.testing.assert_array_equal(getattr(restored.state, name), getattr(detector.state, name))
+    assert restored.update(ZONES, np.full(3, 30.0), T0 + 40000) == []
+    assert restored.state.count[:, 11].sum() == detector.state.count[:, 11].sum() + 3
+    # A different season layout starts over instead of misreading the arrays
+    assert not AnomalyDetector(AlarmManager(db), seasons=1).restore()
+
+def test_periodic_checkpoints_never_wait_for_the_writer(db):
+    detector = AnomalyDetector(AlarmManager(db), checkpoint_interval=0.0)
+    values = np.random.default_rng(5).normal(30.0, 1.0, (10, 3))
+    feed(detector, values)  # writer not started: nothing is written on the capture thread
+    assert db.execute_query("SELECT COUNT(*) FROM anomaly_state").fetchone()[0] == 0
+    handler, release = detector.writer.handler, threading.Event()
+    def stalled(conn, items):
+        release.wait(5)
+        handler(conn, items)
+    detector.writer.handler = stalled
+    detector.start()
+    try:
+        started = time.monotonic()
+        feed(detector, values, start=T0 + 10)
+        assert time.monotonic() - started < 1.0
+    finally:
+        release.set()
+        detector.stop()
+    restored = AnomalyDetector(AlarmManager(db))
+    assert restored.restore() and restored.state.count.sum() == 60
+
+def test_pipeline_sink_and_alarm_history(db):
+    from backend.src.main import app, get_db
+    for zone_id in (1, 2):
+        db.execute_query("INSERT INTO zones (id, x, y, width, height, name) VALUES (?, 0, ?, 32, 12, 'z')", (zone_id, (zone_id - 1) * 12))
+    alarms = AlarmManager(db)
+    pipeline = FrameProcessor(ZonesManager(db), alarms)
+    detector = AnomalyDetector(alarms, warmup=10)
+    pipeline.add_sink(detector)
+    rng = np.random.default_rng(4)
+    for i in range(50):
+        data = rng.normal(30.0, 0.5, (24, 32)).astype(np.float32)
+        if i == 40:
+            data[12:] += 20.0
+        pipeline(ThermalFrame(data, T0 + i))
+    assert stored_events(db) == [(2, None, "anomaly")] and detector.frames_scored == 50
+    assert [b["zone_id"] for b in detector.baselines(T0)] == [1, 2]
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        history = TestClient(app).get("/api/v1/alarms/history").json()
+        assert [(e["zone_id"], e["alarm_id"], e["event_type"]) for e in history] == [(2, None, "anomaly")]
+    finally:
+        app.dependency_overrides.pop(get_db, None)
@@ -6,8 +6,9 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import pytest
 from fastapi.testclient import TestClient
-from backend.src.main import app, get_sensor
+from backend.src.main import app, get_sensor, get_acquisition
 from backend.src import main as main_module
+from backend.src.acquisition import AcquisitionService
 import tempfile
 from backend.src.database import Database
 from backend.src.main import get_db
@@ -18,9 +19,13 @@ class DummySensor:
 
 @pytest.fixture(autouse=True)
 def patch_sensor(monkeypatch):
+    acquisition = AcquisitionService(DummySensor())
+    acquisition.capture_once()
     app.dependency_overrides[get_sensor] = lambda: DummySensor()
+    app.dependency_overrides[get_acquisition] = lambda: acquisition
     yield
     app.dependency_overrides.pop(get_sensor, None)
+    app.dependency_overrides.pop(get_acquisition, None)
 
 @pytest.fixture(autouse=True)
 def patch_db(monkeypatch):
@@ -69,6 +74,31 @@ def test_real_time_frame():
     data = resp.json()
     assert "frame" in data and len(data["frame"]) == 768
     assert "timestamp" in data
+    assert data["age_seconds"] is not None
+
+def test_real_time_frame_before_first_capture():
+    app.dependency_overrides[get_acquisition] = lambda: AcquisitionService(DummySensor())
+    resp = client.get("/api/v1/thermal/real-time")
+    assert resp.status_code == 503
+
+def test_acquisition_status():
+    resp = client.get("/api/v1/thermal/acquisition")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["frames_captured"] == 1
+    assert data["read_errors"] == 0
+    assert data["frame_age_seconds"] is not None
+
+def test_zone_stats():
+    client.post("/api/v1/zones", json={"id": 1, "x": 0, "y": 0, "width": 2, "height": 2})
+    client.post("/api/v1/zones", json={"id": 2, "x": 4, "y": 4, "width": 3, "height": 3})
+    client.post("/api/v1/zones", json={"id": 3, "x": 8, "y": 8, "width": 1, "height": 1})
+    resp = client.get("/api/v1/zones/stats")
+    assert resp.status_code == 200
+    zones = resp.json()["zones"]
+    assert [z["zone_id"] for z in zones] == [1, 2, 3]
+    assert all(z["average"] == 42.0 and z["std"] == 0.0 for z in zones)
+    assert zones[1]["pixel_count"] == 9
 
 def test_frames_export_csv():
     # Insert a dummy event and frame
@@ -112,6 +142,16 @@ def test_settings_crud():
     assert any(s["key"] == "test_key" and s["value"] == "test_value" for s in settings)
 
 def test_database_backup_restore_and_migrate():
+    from backend.src.main import get_retention
+    from backend.src.retention import RetentionJob
+    retention = RetentionJob(app.dependency_overrides[get_db]())
+    app.dependency_overrides[get_retention] = lambda: retention
+    try:
+        backup_restore_and_migrate()
+    finally:
+        app.dependency_overrides.pop(get_retention, None)
+
+def backup_restore_and_migrate():
     # Backup
     resp = client.post("/api/v1/database/backup")
     assert resp.status_code == 200
@@ -0,0 +1,83 @@
+"""
+Unit tests for live frame broadcast over WebSocket and SSE.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import asyncio
+import json
+import time
+import numpy as np
+from fastapi.testclient import TestClient
+from backend.src.broadcast import FrameBroadcaster, sse_events
+from backend.src.thermal_frame import ThermalFrame
+
+T0 = 1700006400  # 2023-11-15T00:00:00Z
+
+def frame(i):
+    return ThermalFrame(np.full((24, 32), 20.0 + i, dtype=np.float32), T0 + i)
+
+def test_slow_subscriber_keeps_only_newest_frames():
+    async def scenario():
+        broadcaster = FrameBroadcaster()
+        slow = broadcaster.subscribe(queue_size=2)
+        for i in range(5):
+            broadcaster(frame(i))
+        await asyncio.sleep(0)  # run the deliveries queued by the capture side
+        received = [(await slow.get()).seq for _ in range(2)]
+        assert received == [4, 5] and slow.dropped == 3
+        slow.close()
+        assert await slow.get() is None
+        return broadcaster.stats()
+    stats = asyncio.run(scenario())
+    assert stats == {"subscribers": 0, "frames_published": 5, "frames_encoded": 0, "frames_sent": 0, "frames_dropped": 3}
+
+def test_frame_is_encoded_once_for_all_subscribers():
+    async def scenario():
+        broadcaster = FrameBroadcaster()
+        subscriptions = [broadcaster.subscribe() for _ in range(50)]
+        broadcaster(frame(1))
+        await asyncio.sleep(0)
+        items = [await s.get() for s in subscriptions]
+        texts = {id(item.json()) for item in items}
+        assert len({id(item) for item in items}) == 1 and len(texts) == 1
+        data = json.loads(items[0].json())
+        assert data["seq"] == 1 and data["timestamp"] == "2023-11-15T00:00:01" and len(data["frame"]) == 768
+        # Late subscribers start with the latest frame
+        late = broadcaster.subscribe()
+        assert (await late.get()) is items[0]
+        return broadcaster.frames_encoded
+    assert asyncio.run(scenario()) == 1
+
+def test_websocket_streams_frames():
+    from backend.src.main import app, get_broadcaster
+    broadcaster = FrameBroadcaster()
+    broadcaster(frame(0))
+    app.dependency_overrides[get_broadcaster] = lambda: broadcaster
+    try:
+        with TestClient(app).websocket_connect("/api/v1/thermal/live") as ws:
+            first = ws.receive_json()
+            broadcaster(frame(1))
+            second = ws.receive_json()
+        assert (first["seq"], second["seq"]) == (1, 2) and second["frame"][0] == 21.0
+        deadline = time.monotonic() + 5
+        while broadcaster.stats()["subscribers"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert broadcaster.stats()["subscribers"] == 0 and broadcaster.stats()["frames_sent"] == 2
+    finally:
+        app.dependency_overrides.pop(get_broadcaster, None)
+
+def test_sse_stream_records_and_keepalive():
+    async def scenario():
+        broadcaster = FrameBroadcaster()
+        stream = sse_events(broadcaster.subscribe(), keepalive=0.05)
+        assert await stream.__anext__() == b"retry: 2000\n\n"
+        assert await stream.__anext__() == b": keepalive\n\n"
+        broadcaster(frame(3))
+        record = (await stream.__anext__()).decode()
+        assert record.startswith("id: 1\nevent: frame\ndata: {") and record.endswith("}\n\n")
+        broadcaster.close()
+        assert [chunk async for chunk in stream] == []
+        return broadcaster.stats()
+    stats = asyncio.run(scenario())
+    assert stats["subscribers"] == 0 and stats["frames_sent"] == 1
@@ -0,0 +1,125 @@
+"""
+Unit tests for chunked event clip storage.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import base64
+import threading
+import time
+import numpy as np
+from fastapi.testclient import TestClient
+from backend.src.clips import clip_timestamps, read_clip, read_event_frames
+from backend.src.frames import EventTriggeredStorage, ThermalFrameBuffer
+from backend.src.thermal_frame import ThermalFrame
+from backend.src.writer import BatchWriter
+
+def frame(i):
+    return ThermalFrame(np.full((24, 32), float(i), dtype=np.float32), 1700000000.0 + i)
+
+def record_event(db, event_id=7, pre=100, post=40, chunk=64):
+    storage = EventTriggeredStorage(ThermalFrameBuffer(pre), db, post_event_frames=post, clip_chunk_frames=chunk)
+    for i in range(pre):
+        storage.record_frame(frame(i))
+    storage.trigger_event(event_id)
+    for i in range(pre, pre + post):
+        storage.record_frame(frame(i))
+    return storage
+
+def test_event_is_stored_as_chunked_clip(db):
+    record_event(db)
+    rows = db.execute_query("SELECT event_id, first_offset, frame_count, start_time FROM event_clips ORDER BY first_offset").fetchall()
+    assert [tuple(r) for r in rows] == [
+        (7, 0, 64, "2023-11-14T22:13:20"),
+        (7, 64, 64, "2023-11-14T22:14:24"),
+        (7, 128, 12, "2023-11-14T22:15:28"),
+    ]
+    assert db.execute_query("SELECT COUNT(*) FROM thermal_frames").fetchone()[0] == 0
+    timestamps, frames = read_clip(db, 7)
+    assert frames.shape == (140, 24, 32)
+    assert np.array_equal(frames[:, 0, 0], np.arange(140, dtype=np.float32))
+    assert timestamps[1] - timestamps[0] == 1_000_000_000
+    assert len(clip_timestamps(db, 7)) == 140
+
+def test_read_clip_range_touches_only_overlapping_chunks(db):
+    record_event(db)
+    _, frames = read_clip(db, 7, 60, 70)
+    assert frames[:, 0, 0].tolist() == list(range(60, 70))
+    _, frames = read_clip(db, 7, 130)
+    assert frames[:, 0, 0].tolist() == list(range(130, 140))
+    assert len(read_clip(db, 99)[1]) == 0
+
+def test_stop_flushes_partial_chunk(db):
+    storage = EventTriggeredStorage(ThermalFrameBuffer(10), db, post_event_frames=50, clip_chunk_frames=64)
+    storage.start()
+    for i in range(10):
+        storage.record_frame(frame(i))
+    storage.trigger_event(3)
+    storage.record_frame(frame(10))
+    storage.stop()
+    ids, labels, frames = read_event_frames(db, 3)
+    assert ids == list(range(11)) and labels[0] == "2023-11-14T22:13:20"
+    assert frames[-1, 0, 0] == 10.0
+
+def test_failed_clip_batch_rolls_back_only_its_own_rows(db):
+    with db.transaction():
+        db.execute_query("CREATE TRIGGER fail_clip BEFORE INSERT ON event_clips WHEN NEW.event_id = 99 "
+                         "BEGIN SELECT RAISE(ABORT, 'injected failure'); END")
+    opened = threading.Event()
+    def insert_events(conn, items):
+        conn.executemany("INSERT INTO alarm_events (zone_id, timestamp, temperature) VALUES (?, ?, ?)", items)
+        opened.set()
+        time.sleep(0.3)  # transaction still open while the clip batch fails
+    events = BatchWriter(db, insert_events, name="event-writer", flush_interval=0.01)
+    storage = EventTriggeredStorage(ThermalFrameBuffer(8), db, post_event_frames=4, clip_chunk_frames=4, flush_interval=0.01)
+    for _ in range(3):
+        events.submit((1, "2023-11-14T22:13:20", 40.0))
+    events.start()
+    storage.start()
+    try:
+        assert opened.wait(5)
+        for event_id in (99, 5):
+            for i in range(8):
+                storage.record_frame(frame(i))
+            storage.trigger_event(event_id)
+            for i in range(8, 12):
+                storage.record_frame(frame(i))
+            assert storage.flush()
+    finally:
+        storage.stop()
+        events.stop()
+    assert storage.stats()["failed_batches"] >= 1 and events.stats()["commits"] == 1
+    assert db.execute_query("SELECT COUNT(*) FROM alarm_events").fetchone()[0] == 3
+    assert [r[0] for r in db.execute_query("SELECT DISTINCT event_id FROM event_clips")] == [5]
+    assert len(read_clip(db, 5)[1]) == 12
+
+def test_clip_endpoints(db):
+    from backend.src.main import app, get_db
+    record_event(db, event_id=5, pre=70, post=2)
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        client = TestClient(app)
+        listed = client.get("/api/v1/events/5/frames").json()
+        assert len(listed) == 72 and listed[0]["timestamp"] == "2023-11-14T22:13:20" and listed[0]["frame_size"] == 768
+        blobs = client.get("/api/v1/events/5/frames/blobs").json()
+        assert len(blobs) == 72 and blobs[71]["id"] == 71
+        assert np.frombuffer(base64.b64decode(blobs[71]["frame"]), dtype=np.float32)[0] == 71.0
+        resp = client.get("/api/v1/events/5/frames.png")
+        assert resp.status_code == 200 and resp.headers["content-type"] == "image/png"
+        assert client.get("/api/v1/events/6/frames.png").status_code == 404
+        csv_rows = client.get("/api/v1/frames/export?event_id=5&overlay=stats").content.decode().strip().splitlines()
+        assert len(csv_rows) == 73
+        assert csv_rows[1].split(",")[:5] == ["0", "5", "2023-11-14T22:13:20", "768", "0.0"]
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+def test_alarm_events_get_ids_before_commit(db):
+    from backend.src.alarms import AlarmManager
+    db.execute_query("INSERT INTO alarm_events (id, zone_id, timestamp, temperature, alarm_id) VALUES (41, 1, 't', 1.0, 1)")
+    am = AlarmManager(db)
+    am.add_alarm(1, 1, 30.0)
+    am.start_persistence(flush_interval=60.0)
+    events = am.evaluate(np.array([1]), np.array([35.0]), "2025-06-10T12:00:00")
+    assert events[0].event_id == 42
+    am.stop_persistence()
+    assert db.execute_query("SELECT alarm_id FROM alarm_events WHERE id = 42").fetchone()[0] == 1
@@ -42,3 +42,48 @@ def test_database_crud() -> None:
     assert row[0] == 25.5
     db.close()
     os.remove(db_path)
+
+def test_restore_while_writer_rows_are_in_the_wal(tmp_path) -> None:
+    from backend.src.writer import BatchWriter
+    db = Database(str(tmp_path / "live.db"))
+    db.connect()
+    db.initialize_schema()
+    db.execute_query("INSERT INTO zones (name, color) VALUES (?, ?)", ("Backed up", "#00FF00"))
+    db.conn.commit()
+    db.backup(str(tmp_path / "backup.db"))
+    writer = BatchWriter(db, lambda conn, items: conn.executemany(
+        "INSERT INTO thermal_data (zone_id, temperature) VALUES (?, ?)", items))
+    writer.start()
+    for i in range(3000):
+        writer.submit((1, float(i)))
+    assert writer.flush()
+    assert os.path.getsize(str(tmp_path / "live.db") + "-wal") > 0
+    db.restore(str(tmp_path / "backup.db"))
+    assert db.execute_query("SELECT COUNT(*) FROM thermal_data").fetchone()[0] == 0
+    assert db.execute_query("SELECT name FROM zones").fetchall()[0][0] == "Backed up"
+    # The writer's own connection keeps working on the restored file
+    writer.submit((1, 1.0))
+    assert writer.flush()
+    assert db.execute_query("SELECT COUNT(*) FROM thermal_data").fetchone()[0] == 1
+    assert db.execute_query("PRAGMA integrity_check").fetchone()[0] == "ok"
+    writer.stop()
+    db.close()
+
+def test_backup_includes_rows_a_checkpoint_cannot_reach(tmp_path) -> None:
+    db = Database(str(tmp_path / "live.db"))
+    db.connect()
+    db.initialize_schema()
+    reader = db.clone()
+    reader.conn.execute("BEGIN")
+    reader.conn.execute("SELECT COUNT(*) FROM zones").fetchone()  # holds a snapshot, so TRUNCATE reports busy
+    db.execute_query("INSERT INTO zones (name, color) VALUES (?, ?)", ("In the WAL", "#00FF00"))
+    db.conn.commit()
+    db.conn.execute("PRAGMA busy_timeout = 100")  # TRUNCATE waits for the reader before reporting busy
+    assert db.checkpoint()[0] == 1
+    db.backup(str(tmp_path / "backup.db"))
+    copy = Database(str(tmp_path / "backup.db"))
+    copy.connect()
+    assert copy.execute_query("SELECT name FROM zones").fetchall()[0][0] == "In the WAL"
+    copy.close()
+    reader.close()
+    db.close()
@@ -0,0 +1,96 @@
+"""
+Unit tests for trend downsampling (LTTB and min/max buckets).
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from backend.src.database import Database
+from backend.src.downsample import downsample_indices, lttb_indices, minmax_indices
+from backend.src.rollups import epoch_to_iso
+
+def noisy_series(n, spike_at=None):
+    rng = np.random.default_rng(1)
+    x = np.arange(n, dtype=np.float64)
+    y = 30.0 + np.sin(x / 500.0) + rng.normal(0, 0.05, n)
+    if spike_at is not None:
+        y[spike_at] = 80.0
+    return x, y
+
+def test_lttb_keeps_endpoints_and_peaks():
+    x, y = noisy_series(100_000, spike_at=31_337)
+    kept = lttb_indices(x, y, 500)
+    assert len(kept) == 500 and kept[0] == 0 and kept[-1] == 99_999
+    assert np.all(np.diff(kept) > 0)
+    assert 31_337 in kept
+
+def test_lttb_matches_reference_implementation():
+    x, y = noisy_series(1000)
+    n_out = 37
+    # Straightforward per-point LTTB
+    expected, a = [0], 0
+    edges = np.linspace(1, len(x) - 1, n_out - 1).astype(int)
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 1 < n_out - 2:
+            cx, cy = x[edges[i + 1]:edges[i + 2]].mean(), y[edges[i + 1]:edges[i + 2]].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        best = max(range(lo, hi), key=lambda j: abs((x[a] - cx) * (y[j] - y[a]) - (x[a] - x[j]) * (cy - y[a])))
+        expected.append(best)
+        a = best
+    expected.append(len(x) - 1)
+    assert lttb_indices(x, y, n_out).tolist() == expected
+
+def test_minmax_keeps_every_bucket_extreme():
+    x, y = noisy_series(10_001, spike_at=5_000)
+    y[7_777] = -10.0
+    kept = minmax_indices(y, 100)
+    assert len(kept) <= 100 and np.all(np.diff(kept) > 0)
+    assert 5_000 in kept and 7_777 in kept
+    size = -(-len(y) // 50)
+    for start in range(0, len(y), size):
+        bucket = y[start:start + size]
+        assert start + int(bucket.argmin()) in kept and start + int(bucket.argmax()) in kept
+
+def test_short_series_are_returned_whole():
+    x, y = noisy_series(10)
+    assert lttb_indices(x, y, 10).tolist() == list(range(10))
+    assert minmax_indices(y, 50).tolist() == list(range(10))
+
+def test_invalid_arguments_are_rejected():
+    x, y = noisy_series(10)
+    with pytest.raises(ValueError):
+        lttb_indices(x, y, 2)
+    with pytest.raises(ValueError):
+        downsample_indices(x, y, 5, method="median")
+
+def test_trend_endpoint_bounds_response_size(tmp_path):
+    from backend.src.main import app, get_db
+    db = Database(str(tmp_path / "downsample.db"))
+    db.connect()
+    db.initialize_schema()
+    x, y = noisy_series(5000, spike_at=1234)
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO thermal_data (zone_id, timestamp, temperature) VALUES (1, ?, ?)",
+                         [(epoch_to_iso(1700000000 + i * 0.5), float(v)) for i, v in enumerate(y)])
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        client = TestClient(app)
+        params = {"start_time": epoch_to_iso(1700000000), "end_time": epoch_to_iso(1700003000), "zone_id": 1}
+        data = client.get("/api/v1/analytics/trends", params={**params, "max_points": 200}).json()
+        assert data["resolution"] == "raw" and data["source_points"] == 5000
+        assert len(data["values"]) == len(data["timestamps"]) == 200 and 80.0 in data["values"]
+        assert data["timestamps"][0] == epoch_to_iso(1700000000)
+        data = client.get("/api/v1/analytics/trends", params={**params, "max_points": 200, "downsample": "minmax"}).json()
+        assert len(data["values"]) <= 200 and 80.0 in data["values"]
+        assert len(client.get("/api/v1/analytics/trends", params=params).json()["values"]) == 1000
+        assert client.get("/api/v1/analytics/trends", params={**params, "max_points": 1}).status_code == 400
+        assert client.get("/api/v1/analytics/trends", params={**params, "downsample": "avg"}).status_code == 400
+        report = client.get("/api/v1/reports", params={**params, "report_type": "trend", "max_points": 50}).json()["summary"]
+        assert len(report["values"]) == 50 and report["source_points"] == 5000
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        db.close()
@@ -0,0 +1,97 @@
+"""
+Unit tests for frame BLOB codecs.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import base64
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from backend.src.clips import read_clip, read_event_frames
+from backend.src.frame_codecs import CodecError, FrameCodec, codec_names, decode_frames, encode_frames, get_codec, register_codec
+from backend.src.frames import EventTriggeredStorage, ThermalFrameBuffer, get_frame_stats
+from backend.src.thermal_frame import ThermalFrame
+
+def sample_frames(n=10):
+    rng = np.random.default_rng(1)
+    base = rng.normal(25.0, 3.0, (24, 32))
+    return np.stack([base + 0.05 * i + rng.normal(0, 0.1, (24, 32)) for i in range(n)]).astype(np.float32)
+
+@pytest.mark.parametrize("name", codec_names())
+def test_codec_round_trip(name):
+    frames = sample_frames()
+    decoded = decode_frames(encode_frames(frames, name), name)
+    assert decoded.shape == frames.shape and decoded.dtype == np.float32
+    if get_codec(name).lossless:
+        assert np.array_equal(decoded, frames)
+    else:
+        assert np.max(np.abs(decoded - frames)) <= 0.005 + 1e-4
+
+def test_centi_degree_delta_is_exact_across_extremes():
+    frames = np.zeros((3, 24, 32), dtype=np.float32)
+    frames[0, 0, 0], frames[1, 0, 0], frames[2, 0, 0] = -300.0, 300.0, float("nan")
+    frames[1, 0, 1] = 1000.0  # clips to the int16 range
+    decoded = decode_frames(encode_frames(frames, "i16+delta+zlib"), "i16+delta+zlib")
+    assert decoded[0, 0, 0] == pytest.approx(-300.0) and decoded[1, 0, 0] == pytest.approx(300.0)
+    assert np.isnan(decoded[2, 0, 0]) and decoded[1, 0, 1] == pytest.approx(327.67)
+
+def test_quantized_codecs_shrink_frames():
+    frames = sample_frames(64)
+    raw = len(encode_frames(frames, "f32"))
+    assert len(encode_frames(frames, "i16")) == raw // 2
+    assert len(encode_frames(frames, "i16+delta+zlib")) < len(encode_frames(frames, "i16+zlib")) < raw // 2
+
+def test_invalid_codecs_and_blobs():
+    with pytest.raises(CodecError):
+        get_codec("png")
+    with pytest.raises(CodecError):
+        decode_frames(b"not deflate", "i16+zlib")
+    with pytest.raises(CodecError):
+        decode_frames(b"\x00" * 12, "f32")
+    assert decode_frames(np.ones((24, 32), np.float32).tobytes(), None).shape == (1, 24, 32)
+
+def test_incomplete_codec_cannot_be_registered():
+    class EncodeOnly(FrameCodec):
+        name = "encode-only"
+
+        def encode(self, frames):
+            return b""
+
+    with pytest.raises(TypeError):
+        register_codec(EncodeOnly())
+    with pytest.raises(CodecError):
+        register_codec(object())
+    assert "encode-only" not in codec_names()
+
+def test_storage_encodes_rows_and_clips(db):
+    frames = sample_frames(5)
+    for chunk, event_id in ((None, 1), (2, 2)):
+        storage = EventTriggeredStorage(ThermalFrameBuffer(10), db, post_event_frames=2, clip_chunk_frames=chunk, codec="i16+delta+zlib")
+        for i in range(3):
+            storage.record_frame(ThermalFrame(frames[i], 1700000000.0 + i))
+        storage.trigger_event(event_id)
+        for i in range(3, 5):
+            storage.record_frame(ThermalFrame(frames[i], 1700000000.0 + i))
+    codecs = {row[0] for row in db.execute_query("SELECT codec FROM thermal_frames UNION SELECT codec FROM event_clips")}
+    assert codecs == {"i16+delta+zlib"}
+    for event_id in (1, 2):
+        _, _, decoded = read_event_frames(db, event_id)
+        assert np.allclose(decoded, frames, atol=0.006)
+    assert np.allclose(read_clip(db, 2, 1, 4)[1], frames[1:4], atol=0.006)
+
+def test_endpoints_decode_stored_codecs(db):
+    from backend.src.main import app, get_db
+    frame = np.full((24, 32), 21.5, dtype=np.float32)
+    db.execute_query("INSERT INTO thermal_frames (event_id, timestamp, frame, frame_size, codec) VALUES (?, ?, ?, ?, ?)",
+                     (9, "2025-06-12T12:00:00", encode_frames(frame, "i16+lzma"), 768, "i16+lzma"))
+    assert get_frame_stats(encode_frames(frame, "i16+lzma"), "i16+lzma")["mean"] == pytest.approx(21.5)
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        client = TestClient(app)
+        blob = base64.b64decode(client.get("/api/v1/events/9/frames/blobs").json()[0]["frame"])
+        assert np.frombuffer(blob, dtype=np.float32).tolist() == [21.5] * 768
+        assert "21.5" in client.get("/api/v1/frames/export?event_id=9&overlay=stats").text
+        assert client.get("/api/v1/events/9/frames.png").status_code == 200
+    finally:
+        app.dependency_overrides.pop(get_db, None)
@@ -0,0 +1,96 @@
+"""
+Unit tests for binary frame formats and Accept negotiation on frame endpoints.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from backend.src.acquisition import AcquisitionService
+from backend.src.clips import clip_chunk_row, write_clip_chunks
+from backend.src.frame_formats import FRAME_FORMATS, FrameFormatError, negotiate_frame_format
+
+T0 = 1700006400  # 2023-11-15T00:00:00Z
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, None),
+    ("*/*", None),
+    ("application/json", None),
+    ("application/octet-stream", "float32"),
+    ("application/octet-stream; dtype=int16", "int16"),
+    ('application/octet-stream;dtype="float16", */*;q=0.1', "float16"),
+    ("application/json, application/octet-stream;q=0.5", None),
+    ("application/json;q=0.5, application/octet-stream;q=0.9;dtype=int16", "int16"),
+    ("application/octet-stream;q=0, application/json", None),
+])
+def test_negotiation(accept, expected):
+    fmt = negotiate_frame_format(accept)
+    assert (fmt.name if fmt else None) == expected
+
+def test_unknown_dtype_is_rejected():
+    with pytest.raises(FrameFormatError):
+        negotiate_frame_format("application/octet-stream; dtype=float64")
+
+def test_records_round_trip():
+    frames = np.random.default_rng(0).normal(30.0, 5.0, (3, 24, 32)).astype(np.float32)
+    frames[1, 2, 3] = np.nan
+    timestamps = np.array([T0, T0 + 0.5, T0 + 1.0])
+    for name, size, tolerance in (("float32", 3080, 0.0), ("float16", 1544, 0.02), ("int16", 1544, 0.005)):
+        fmt = FRAME_FORMATS[name]
+        body = fmt.encode(timestamps, frames)
+        assert fmt.record_bytes == size and len(body) == 3 * size
+        decoded_ts, decoded = fmt.decode(body)
+        assert decoded_ts.tolist() == timestamps.tolist() and np.isnan(decoded[1, 2, 3])
+        np.testing.assert_allclose(decoded, frames, atol=tolerance)
+
+def test_real_time_frame_negotiation():
+    from backend.src.main import app, get_acquisition
+
+    class Sensor:
+        def read_frame(self):
+            return [21.5] * 768
+
+    acquisition = AcquisitionService(Sensor())
+    acquisition.capture_once()
+    app.dependency_overrides[get_acquisition] = lambda: acquisition
+    try:
+        client = TestClient(app)
+        assert len(client.get("/api/v1/thermal/real-time").json()["frame"]) == 768
+        resp = client.get("/api/v1/thermal/real-time", headers={"Accept": "application/octet-stream; dtype=int16"})
+        assert resp.headers["content-type"] == "application/octet-stream; dtype=int16"
+        assert resp.headers["x-frame-height"] == "24" and resp.headers["x-frame-width"] == "32"
+        assert resp.headers["x-frame-scale"] == "0.01" and resp.headers["x-frame-timestamp"] == acquisition.latest().isoformat()
+        assert len(resp.content) == 8 + 768 * 2
+        timestamps, frames = FRAME_FORMATS["int16"].decode(resp.content)
+        assert timestamps[0] == acquisition.latest().timestamp and np.all(frames == np.float32(21.5))
+        assert client.get("/api/v1/thermal/real-time", headers={"Accept": "application/octet-stream; dtype=u8"}).status_code == 406
+    finally:
+        app.dependency_overrides.pop(get_acquisition, None)
+
+def test_event_and_export_endpoints_stream_records(db):
+    from backend.src.main import app, get_db
+    clip = np.arange(5, dtype=np.float32)[:, None, None] + np.zeros((5, 24, 32), dtype=np.float32)
+    write_clip_chunks(db, [clip_chunk_row(3, 0, (T0 + np.arange(3)) * 10**9, clip[:3], "i16+delta+zlib"),
+                           clip_chunk_row(3, 3, (T0 + np.arange(3, 5)) * 10**9, clip[3:])])
+    legacy = np.full((24, 32), 50.0, dtype=np.float32)
+    db.execute_query("INSERT INTO thermal_frames (event_id, timestamp, frame, frame_size) VALUES (4, ?, ?, 768)",
+                     ("2023-11-15T00:01:00", legacy.tobytes()))
+    app.dependency_overrides[get_db] = lambda: db
+    binary = {"Accept": "application/octet-stream"}
+    try:
+        client = TestClient(app)
+        for path in ("/api/v1/events/3/frames", "/api/v1/events/3/frames/blobs"):
+            resp = client.get(path, headers=binary)
+            timestamps, frames = FRAME_FORMATS["float32"].decode(resp.content)
+            assert resp.headers["x-frame-record-bytes"] == "3080"
+            assert timestamps.tolist() == [T0 + i for i in range(5)] and frames[:, 0, 0].tolist() == [0, 1, 2, 3, 4]
+        timestamps, frames = FRAME_FORMATS["float32"].decode(client.get("/api/v1/events/4/frames/blobs", headers=binary).content)
+        assert timestamps.tolist() == [T0 + 60] and frames[0, 5, 5] == 50.0
+        exported = client.get("/api/v1/frames/export", headers={"Accept": "application/octet-stream; dtype=float16"})
+        timestamps, frames = FRAME_FORMATS["float16"].decode(exported.content)
+        assert frames[:, 0, 0].tolist() == [50, 0, 1, 2, 3, 4]
+        assert client.get("/api/v1/frames/export").headers["content-type"].startswith("text/csv")
+        assert len(client.get("/api/v1/events/3/frames").json()) == 5
+    finally:
+        app.dependency_overrides.pop(get_db, None)
@@ -18,6 +18,8 @@ class DummyDB:
         return _tx()
     def execute_query(self, query: str, params: tuple = ()):  # Add default param
         self.persisted.append(params)
+    def executemany(self, query: str, params_seq):
+        self.persisted.extend(params_seq)
     def __enter__(self):
         return self
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -111,3 +113,102 @@ def test_compute_heatmap_trend_anomalies():
     data.append({"timestamp": "2025-06-12T12:00:10Z", "temperature": 100.0, "zone_id": 1})
     anomalies = detect_anomalies(data)
     assert any(a["temperature"] == 100.0 for a in anomalies)
+
+def test_record_thermal_frame_uses_capture_time():
+    import numpy as np
+    from backend.src.thermal_frame import ThermalFrame
+    buf = ThermalFrameBuffer(2)
+    db = DummyDB()
+    storage = EventTriggeredStorage(buf, db, post_event_frames=1)
+    storage.trigger_event()
+    frame = ThermalFrame(np.full((24, 32), 7.5, dtype=np.float32), 1700000000.0)
+    storage.record_frame(frame)
+    event_id, timestamp, blob, size, codec = db.persisted[-1]
+    assert event_id is None
+    assert timestamp == "2023-11-14T22:13:20"
+    assert size == 768 and codec == "f32"
+    assert np.frombuffer(blob, dtype=np.float32)[0] == 7.5
+
+def test_ring_buffer_wraps_in_order():
+    import numpy as np
+    from backend.src.frames import FrameRingBuffer
+    ring = FrameRingBuffer(4)
+    for i in range(6):
+        ring.write(np.full((24, 32), i, dtype=np.float32), i * 1000, f"t{i}")
+    assert len(ring) == 4
+    timestamps, frames, labels = ring.snapshot()
+    assert list(timestamps) == [2000, 3000, 4000, 5000]
+    assert frames.shape == (4, 24, 32) and frames.flags["C_CONTIGUOUS"]
+    assert [float(f[0, 0]) for f in frames] == [2.0, 3.0, 4.0, 5.0]
+    assert labels == ["t2", "t3", "t4", "t5"]
+    timestamps, frames, _ = ring.snapshot(2)
+    assert list(timestamps) == [4000, 5000]
+    ring.clear()
+    assert len(ring) == 0
+    assert ring.snapshot()[1].shape == (0, 24, 32)
+
+def test_ring_buffer_drops_frames_lapped_during_read():
+    import numpy as np
+    from backend.src.frames import FrameRingBuffer
+    ring = FrameRingBuffer(4)
+    for i in range(4):
+        ring.write(np.full((24, 32), i, dtype=np.float32), i)
+    # Simulate a writer that claimed the next slot (overwriting frame 0) mid-copy
+    ring._claimed_seq = ring._write_seq + 1
+    timestamps, frames, _ = ring.snapshot()
+    assert list(timestamps) == [1, 2, 3]
+
+def test_ring_buffer_concurrent_reads_are_consistent():
+    import threading
+    import numpy as np
+    from backend.src.frames import FrameRingBuffer
+    ring = FrameRingBuffer(8)
+    stop = threading.Event()
+    def writer():
+        i = 0
+        while not stop.is_set():
+            ring.write(np.full((24, 32), i, dtype=np.float32), i)
+            i += 1
+    t = threading.Thread(target=writer)
+    t.start()
+    try:
+        for _ in range(500):
+            timestamps, frames, _ = ring.snapshot()
+            for ts, frame in zip(timestamps, frames):
+                assert frame.min() == frame.max() == ts
+            assert np.all(np.diff(timestamps) == 1)
+    finally:
+        stop.set()
+        t.join()
+
+def test_background_writer_persists_pre_event_frames_in_one_commit(tmp_path):
+    import numpy as np
+    from backend.src.database import Database
+    from backend.src.thermal_frame import ThermalFrame
+    db = Database(str(tmp_path / "frames.db"))
+    db.connect()
+    db.initialize_schema()
+    storage = EventTriggeredStorage(ThermalFrameBuffer(50), db, post_event_frames=5, flush_interval=60.0)
+    storage.start()
+    try:
+        for i in range(50):
+            storage.record_frame(ThermalFrame(np.full((24, 32), float(i), dtype=np.float32), 1700000000.0 + i))
+        storage.trigger_event()
+        # Queued, not yet committed: the capture path never waits on SQLite
+        assert db.execute_query("SELECT COUNT(*) FROM thermal_frames").fetchone()[0] == 0
+        assert storage.stats()["frames_queued"] == 50
+        assert storage.flush()
+        stats = storage.stats()
+        assert stats["commits"] == 1 and stats["items_written"] == 1 and stats["last_commit_ms"] is not None
+        for i in range(5):
+            storage.record_frame(ThermalFrame(np.full((24, 32), 100.0 + i, dtype=np.float32), 1700000100.0 + i))
+        assert not storage._event_active
+        storage.stop()
+        rows = db.execute_query("SELECT timestamp, frame FROM thermal_frames ORDER BY id").fetchall()
+        assert len(rows) == 55
+        assert rows[0][0] == "2023-11-14T22:13:20"
+        assert np.frombuffer(rows[-1][1], dtype=np.float32)[0] == 104.0
+        assert storage.stats()["frames_queued"] == 55
+    finally:
+        storage.stop()
+        db.close()
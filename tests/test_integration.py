@@ -6,7 +6,8 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import pytest
 from fastapi.testclient import TestClient
-from backend.src.main import app, get_sensor
+from backend.src.main import app, get_sensor, get_acquisition
+from backend.src.acquisition import AcquisitionService
 from backend.src.zones import ZonesManager
 from backend.src.alarms import AlarmManager
 from backend.src.frames import ThermalFrameBuffer, EventTriggeredStorage
@@ -23,6 +24,9 @@ def test_full_workflow():
         def read_frame(self):
             return [10.0] * 768
     app.dependency_overrides[get_sensor] = lambda: DummySensor()
+    acquisition = AcquisitionService(DummySensor())
+    acquisition.capture_once()
+    app.dependency_overrides[get_acquisition] = lambda: acquisition
 
     # Patch DB for isolation
     tf = tempfile.NamedTemporaryFile(delete=False)
@@ -54,3 +58,4 @@ def test_full_workflow():
         os.unlink(tf.name)
         app.dependency_overrides.pop(get_db, None)
         app.dependency_overrides.pop(get_sensor, None)
+        app.dependency_overrides.pop(get_acquisition, None)
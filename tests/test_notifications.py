@@ -0,0 +1,176 @@
+"""
+Unit tests for the notification dispatcher, using an in-process SMTP stand-in.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import socketserver
+import tempfile
+import threading
+import pytest
+from backend.src.alarms import AlarmEvent, AlarmManager
+from backend.src.database import Database
+from backend.src.notifications import EmailChannel, NotificationDispatcher, QueuedDispatcher, SMTPConnectionPool
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Minimal SMTP server that records messages and counts sessions."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.messages = []
+        self.sessions = 0
+        self.fail_next = 0
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        self.server.sessions += 1
+        self.reply("220 stand-in ready")
+        while True:
+            line = self.rfile.readline().decode().rstrip("\r\n")
+            if not line:
+                return
+            verb = line.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 stand-in")
+            elif verb == "DATA":
+                self.reply("354 end with .")
+                data = []
+                while True:
+                    chunk = self.rfile.readline().decode()
+                    if chunk in (".\r\n", ".\n"):
+                        break
+                    data.append(chunk)
+                if self.server.fail_next:
+                    self.server.fail_next -= 1
+                    self.reply("451 try again later")
+                else:
+                    self.server.messages.append("".join(data))
+                    self.reply("250 queued")
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+@pytest.fixture
+def smtp_server():
+    server = SMTPStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def channel_for(server, to="ops@example.com"):
+    return EmailChannel(1, "127.0.0.1", server.server_address[1], "ir@example.com", to, starttls=False)
+
+def event(alarm_id=1, zone_id=1, temperature=40.0):
+    return AlarmEvent(alarm_id, zone_id, temperature, "2025-06-10T12:00:00", "threshold")
+
+def test_burst_is_coalesced_into_one_digest(smtp_server):
+    dispatcher = NotificationDispatcher(lambda: [channel_for(smtp_server)], digest_window=0.3)
+    dispatcher.start()
+    for i in range(5):
+        assert dispatcher.submit(event(alarm_id=i))
+    assert dispatcher.wait_idle(5)
+    assert len(smtp_server.messages) == 1
+    assert "IR Alarm Digest: 5 events" in smtp_server.messages[0]
+    stats = dispatcher.stats()
+    assert stats["sent"] == 1 and stats["digests"] == 1 and stats["queue_depth"] == 0
+    assert stats["avg_latency_ms"] is not None
+    dispatcher.stop()
+
+def test_sessions_are_reused_and_failures_retried(smtp_server):
+    pool = SMTPConnectionPool()
+    dispatcher = NotificationDispatcher(lambda: [channel_for(smtp_server)], pool=pool, max_workers=1,
+                                        digest_window=0, retry_backoff=0.01)
+    dispatcher.start()
+    smtp_server.fail_next = 1
+    dispatcher.submit(event())
+    assert dispatcher.wait_idle(5)
+    for i in range(3):
+        dispatcher.submit(event(alarm_id=i))
+        assert dispatcher.wait_idle(5)
+    assert len(smtp_server.messages) == 4
+    assert dispatcher.retries == 1 and dispatcher.failed == 0
+    # The failed session is dropped; every later send reuses the replacement session
+    assert pool.connections_opened == 2 and pool.connections_reused == 3
+    assert smtp_server.sessions == 2
+    dispatcher.stop()
+
+def test_gives_up_after_max_retries(smtp_server):
+    dispatcher = NotificationDispatcher(lambda: [channel_for(smtp_server)], digest_window=0, max_retries=1, retry_backoff=0.01)
+    dispatcher.start()
+    smtp_server.fail_next = 2
+    dispatcher.submit(event())
+    assert dispatcher.wait_idle(5)
+    assert dispatcher.failed == 1 and smtp_server.messages == []
+    dispatcher.stop()
+
+def test_alarm_manager_dispatches_fired_alarms(smtp_server):
+    import numpy as np
+    tf = tempfile.NamedTemporaryFile(delete=False)
+    try:
+        db = Database(tf.name)
+        db.connect()
+        db.initialize_schema()
+        am = AlarmManager(db)
+        config = {"smtp_host": "127.0.0.1", "smtp_port": smtp_server.server_address[1], "from": "ir@example.com", "starttls": False}
+        am.add_notification("Ops", "email", json.dumps(config), True)
+        am.add_alarm(1, 1, 30.0)
+        # Synchronous fallback uses the caller-supplied recipient
+        am.notify(event(), email="oncall@example.com")
+        assert len(smtp_server.messages) == 1 and "oncall@example.com" in smtp_server.messages[0]
+        am.update_notification(1, "Ops", "email", json.dumps(dict(config, to="ops@example.com")), True)
+        dispatcher = am.start_notifications(digest_window=0)
+        am.evaluate(np.array([1]), np.array([35.0]), "2025-06-10T12:00:00")
+        assert dispatcher.wait_idle(5)
+        assert len(smtp_server.messages) == 2 and "ops@example.com" in smtp_server.messages[1]
+        am.stop_notifications()
+        db.close()
+    finally:
+        tf.close()
+        os.unlink(tf.name)
+
+def test_synchronous_fallback_reuses_one_dispatcher(smtp_server, db):
+    am = AlarmManager(db)
+    config = {"smtp_host": "127.0.0.1", "smtp_port": smtp_server.server_address[1], "from": "ir@example.com", "starttls": False}
+    am.add_notification("Ops", "email", json.dumps(config), True)
+    for _ in range(3):
+        am.notify(event(), email="oncall@example.com")
+    assert len(smtp_server.messages) == 3
+    stats = am._inline_dispatcher.stats()
+    assert stats["connections_opened"] == 1 and stats["connections_reused"] == 2
+    am.stop_notifications()
+    am.stop_webhooks()
+    assert am._inline_dispatcher.pool._idle == {}
+
+def test_invalid_channel_config_is_skipped():
+    assert EmailChannel.from_notification({"id": 1, "config": "not json"}) is None
+    assert EmailChannel.from_notification({"id": 1, "config": json.dumps({"to": "a@example.com"})}) is None
+    channel = EmailChannel.from_notification({"id": 2, "config": json.dumps({"smtp_host": "mail", "smtp_user": "u", "smtp_pass": "p"})})
+    assert channel is not None and channel.from_addr == "u" and channel.port == 587
+
+def test_dispatcher_must_implement_jobs_and_counts_across_workers():
+    class Incomplete(QueuedDispatcher):
+        pass
+    with pytest.raises(TypeError):
+        Incomplete()
+
+    class Counting(QueuedDispatcher):
+        def jobs(self, batch):
+            return [lambda item=item: self._delivered([item]) for item in batch for _ in range(50)]
+
+    dispatcher = Counting(max_workers=8, batch_window=0)
+    dispatcher.start()
+    for i in range(20):
+        dispatcher.submit(event(alarm_id=i))
+    assert dispatcher.wait_idle(5)
+    dispatcher.stop()
+    assert dispatcher.stats()["sent"] == 20 * 50
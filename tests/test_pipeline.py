@@ -0,0 +1,65 @@
+"""
+Unit tests for FrameProcessor.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import tempfile
+import numpy as np
+from backend.src.database import Database
+from backend.src.zones import ZonesManager
+from backend.src.alarms import AlarmManager
+from backend.src.pipeline import FrameProcessor
+from backend.src.thermal_frame import ThermalFrame
+
+def test_frame_processor_evaluates_alarms_and_feeds_sinks():
+    tf = tempfile.NamedTemporaryFile(delete=False)
+    try:
+        db = Database(tf.name)
+        db.connect()
+        db.initialize_schema()
+        zones = ZonesManager(db)
+        zones.add_zone(1, 0, 0, 4, 4)
+        alarms = AlarmManager(db)
+        alarms.add_alarm(1, 1, 30.0)
+        processor = FrameProcessor(zones, alarms)
+        seen = []
+        processor.add_sink(lambda frame, stats: seen.append(float(stats.average[0])))
+        processor.add_sink(lambda frame, stats: 1 / 0)  # failing sinks are isolated
+        processor(ThermalFrame(np.full((24, 32), 35.0, dtype=np.float32), 100.0))
+        processor(ThermalFrame(np.full((24, 32), 36.0, dtype=np.float32), 101.0))
+        assert seen == [35.0, 36.0]
+        assert processor.frames_processed == 2
+        assert len(alarms.events) == 1
+        assert alarms.alarms[1]["state"] == "triggered"
+        db.close()
+    finally:
+        tf.close()
+        os.unlink(tf.name)
+
+def test_fired_alarm_triggers_event_storage():
+    from backend.src.frames import EventTriggeredStorage, ThermalFrameBuffer
+    tf = tempfile.NamedTemporaryFile(delete=False)
+    try:
+        db = Database(tf.name)
+        db.connect()
+        db.initialize_schema()
+        zones = ZonesManager(db)
+        zones.add_zone(1, 0, 0, 4, 4)
+        alarms = AlarmManager(db)
+        alarms.add_alarm(1, 1, 30.0)
+        storage = EventTriggeredStorage(ThermalFrameBuffer(3), db, post_event_frames=2)
+        processor = FrameProcessor(zones, alarms, storage=storage)
+        for i, temp in enumerate([20.0, 21.0, 35.0, 36.0, 37.0, 20.0]):
+            processor(ThermalFrame(np.full((24, 32), temp, dtype=np.float32), 100.0 + i))
+        # Three buffered frames up to and including the alarm frame, then two post-event frames
+        temps = [np.frombuffer(row[0], dtype=np.float32)[0] for row in db.execute_query("SELECT frame FROM thermal_frames ORDER BY id")]
+        assert temps == [20.0, 21.0, 35.0, 36.0, 37.0]
+        # Frames are linked to the alarm_events row of the event that triggered them
+        event_ids = {row[0] for row in db.execute_query("SELECT event_id FROM thermal_frames")}
+        assert event_ids == {alarms.events[0].event_id}
+        assert db.execute_query("SELECT alarm_id FROM alarm_events WHERE id = ?", (alarms.events[0].event_id,)).fetchone()[0] == 1
+        db.close()
+    finally:
+        tf.close()
+        os.unlink(tf.name)
@@ -0,0 +1,141 @@
+"""
+Unit tests for per-pixel heatmap rollups.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import threading
+import time
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from backend.src.pixel_rollups import PixelRollupWriter, PixelStats, pixel_stats
+from backend.src.retention import RetentionJob
+from backend.src.rollups import epoch_to_iso
+from backend.src.thermal_frame import ThermalFrame
+
+T0 = 1700006400  # 2023-11-15T00:00:00Z
+HOUR = 3600
+DAY = 86400
+
+def frames(count, start, step, seed=0):
+    rng = np.random.default_rng(seed)
+    return [ThermalFrame(rng.normal(30.0, 3.0, (24, 32)).astype(np.float32), start + i * step) for i in range(count)]
+
+def record(db, captured):
+    writer = PixelRollupWriter(db)
+    for frame in captured:
+        writer(frame)
+    writer.stop()
+    return writer
+
+def test_stats_match_numpy_and_skip_nan():
+    stack = np.stack([f.data for f in frames(20, T0, 1.0)])
+    stack[3, 5, 7] = np.nan
+    stats = PixelStats()
+    for frame in stack[:12]:
+        stats.add(frame)
+    rest = PixelStats()
+    for frame in stack[12:]:
+        rest.add(frame)
+    stats.merge(rest)
+    assert stats.frames == 20 and stats.count[5, 7] == 19 and stats.count[0, 0] == 20
+    np.testing.assert_allclose(stats.mean, np.nanmean(stack, axis=0), rtol=1e-6)
+    np.testing.assert_allclose(stats.std, np.nanstd(stack.astype(np.float64), axis=0), rtol=1e-4)
+    np.testing.assert_array_equal(stats.max, np.nanmax(stack, axis=0))
+    restored = PixelStats.from_row(stats.to_row())
+    np.testing.assert_array_equal(restored.min, stats.min)
+    assert restored.crop(30, 20, 10, 10).count.shape == (4, 2)
+
+def test_writer_stores_hour_and_day_buckets(db):
+    captured = frames(12, T0 + HOUR - 300, 60.0)  # 23:55 .. 00:06 crosses an hour boundary
+    record(db, captured)
+    rows = db.execute_query("SELECT resolution, bucket, frames FROM pixel_rollups ORDER BY resolution, bucket").fetchall()
+    assert [tuple(r) for r in rows] == [(HOUR, T0, 5), (HOUR, T0 + HOUR, 7), (DAY, T0, 12)]
+    stats, covered_start, covered_end = pixel_stats(db, T0, T0 + 2 * HOUR)
+    stack = np.stack([f.data for f in captured])
+    assert stats.frames == 12 and (covered_start, covered_end) == (T0, T0 + 2 * HOUR)
+    np.testing.assert_allclose(stats.mean, stack.mean(axis=0), rtol=1e-6)
+    np.testing.assert_array_equal(stats.max, stack.max(axis=0))
+
+def test_reopened_bucket_resumes_from_stored_snapshot(db):
+    record(db, frames(5, T0, 10.0))
+    record(db, frames(3, T0 + 100, 10.0, seed=1))
+    assert pixel_stats(db, T0, T0 + 60)[0].frames == 8
+
+def test_clock_step_back_resumes_without_waiting_for_the_writer(db):
+    rollups = PixelRollupWriter(db)
+    handler, release = rollups.writer.handler, threading.Event()
+    def stalled(conn, items):
+        release.wait(5)  # e.g. a slow disk
+        handler(conn, items)
+    rollups.writer.handler = stalled
+    rollups.start()
+    try:
+        captured = frames(3, T0 + HOUR - 60, 60.0)  # 00:59, 01:00, then back to 00:59
+        started = time.monotonic()
+        for frame in (captured[0], captured[1], captured[0]):
+            rollups(frame)
+        assert time.monotonic() - started < 1.0
+    finally:
+        release.set()
+        rollups.stop()
+    rows = db.execute_query("SELECT resolution, bucket, frames FROM pixel_rollups ORDER BY resolution, bucket").fetchall()
+    assert [tuple(r) for r in rows] == [(HOUR, T0, 2), (HOUR, T0 + HOUR, 1), (DAY, T0, 3)]
+
+def test_capture_thread_never_commits_or_uses_the_shared_connection(db):
+    record(db, frames(5, T0, 10.0))
+    rollups = PixelRollupWriter(db)
+    def shared(*args):
+        raise AssertionError("capture thread used the request connection")
+    db.execute_query = db.executemany = shared
+    try:
+        for frame in frames(3, T0 + 100, 10.0, seed=1) + frames(1, T0 + HOUR, 10.0):
+            rollups(frame)
+        assert rollups.writer.commits == 0 and rollups.writer.queue_depth == 1
+    finally:
+        del db.execute_query, db.executemany
+    rollups.stop()
+    assert pixel_stats(db, T0, T0 + 60)[0].frames == 8
+
+def test_multi_day_range_merges_days_and_edge_hours(db):
+    # One frame per hour for three days
+    record(db, frames(72, T0 + 1800, HOUR))
+    stats, covered_start, covered_end = pixel_stats(db, T0 + 20 * HOUR + 5, T0 + 50 * HOUR + 5)
+    # Hours 20..23 of day one, all of day two, hours 0..2 of day three
+    assert stats.frames == 4 + 24 + 3
+    assert (covered_start, covered_end) == (T0 + 20 * HOUR, T0 + 51 * HOUR)
+    assert pixel_stats(db, T0 + 10 * DAY, T0 + 11 * DAY)[0].frames == 0
+
+def test_heatmap_endpoint_crops_to_zone(db):
+    from backend.src.main import app, get_db
+    captured = frames(30, T0, 10.0)
+    hot = captured[4].data.copy()  # frames are read-only
+    hot[6, 9] = 90.0
+    captured[4] = ThermalFrame(hot, captured[4].timestamp)
+    record(db, captured)
+    db.execute_query("INSERT INTO zones (id, x, y, width, height, name) VALUES (7, 8, 4, 6, 5, 'z')")
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        client = TestClient(app)
+        params = {"start_time": epoch_to_iso(T0), "end_time": epoch_to_iso(T0 + 600)}
+        data = client.get("/api/v1/analytics/heatmap", params={**params, "zone_id": 7}).json()
+        assert data["source"] == "pixels" and data["frames"] == 30
+        assert (data["x"], data["y"], data["width"], data["height"]) == (8, 4, 6, 5)
+        assert len(data["heatmap"]) == 5 and len(data["heatmap"][0]) == 6
+        assert data["max"][2][1] == 90.0 and data["covered_start"] == epoch_to_iso(T0)
+        whole = client.get("/api/v1/analytics/heatmap", params=params).json()
+        assert len(whole["std"]) == 24 and len(whole["std"][0]) == 32
+        assert whole["heatmap"][6][9] == pytest.approx(data["heatmap"][2][1])
+        empty = client.get("/api/v1/analytics/heatmap", params={"start_time": epoch_to_iso(T0 + 5 * DAY),
+                                                               "end_time": epoch_to_iso(T0 + 6 * DAY)}).json()
+        assert empty["source"] == "zones" and empty["frames"] == 0
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+def test_retention_keeps_daily_pixel_rollups(db):
+    record(db, frames(3, T0, HOUR))
+    db.set_setting("data_retention_days", "7")
+    report = RetentionJob(db).run_once(now=T0 + 30 * DAY)
+    assert report["rows_deleted"]["pixel_rollups"] == 3
+    assert pixel_stats(db, T0, T0 + DAY)[0].frames == 3
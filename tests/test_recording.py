@@ -0,0 +1,105 @@
+"""
+Unit tests for continuous recording into memory-mapped segment files.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import threading
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from backend.src.recording import HOUR_NS, Segment, SegmentRecorder, list_segments, read_range, recover_segments
+from backend.src.thermal_frame import ThermalFrame
+
+T0 = 1700000000  # 2023-11-14T22:13:20Z
+
+def frame(value, t):
+    return ThermalFrame(np.full((24, 32), float(value), dtype=np.float32), t)
+
+def test_frames_roll_into_hourly_segments(db, tmp_path):
+    recorder = SegmentRecorder(db, str(tmp_path / "rec"), capture_interval=60.0)
+    # 22:13:20 .. 23:03:20 in 10-minute steps crosses one hour boundary
+    for i in range(6):
+        recorder(frame(i, T0 + 600 * i))
+    recorder.close()
+    segments = list_segments(db)
+    assert [s["frame_count"] for s in segments] == [5, 1] and all(s["closed"] for s in segments)
+    assert segments[1]["start_ns"] // HOUR_NS == segments[0]["start_ns"] // HOUR_NS + 1
+    assert sorted(os.listdir(tmp_path / "rec")) == [os.path.basename(s["path"]) for s in segments]
+    timestamps, frames = read_range(db)
+    assert frames[:, 0, 0].tolist() == list(range(6))
+    assert timestamps[1] - timestamps[0] == 600 * 10**9
+
+def test_range_within_one_segment_is_zero_copy(db, tmp_path):
+    recorder = SegmentRecorder(db, str(tmp_path), capture_interval=1.0)
+    for i in range(100):
+        recorder(frame(i, T0 + i))
+    # Readers see frames of the open segment without waiting for a catalog sync
+    timestamps, frames = read_range(db, (T0 + 10) * 10**9, (T0 + 20) * 10**9)
+    assert isinstance(frames, np.memmap) and not frames.flags.writeable
+    assert frames[:, 0, 0].tolist() == list(range(10, 20)) and len(timestamps) == 10
+    assert len(read_range(db, (T0 + 500) * 10**9)[1]) == 0
+    recorder.close()
+
+def test_full_segment_and_clock_jump_start_new_segments(db, tmp_path):
+    recorder = SegmentRecorder(db, str(tmp_path), capture_interval=3600.0)
+    capacity = recorder.capacity
+    for i in range(capacity + 1):
+        recorder(frame(i, T0 + i))
+    recorder(frame(-1, T0 - 5))  # clock went backwards
+    recorder.close()
+    assert [s["frame_count"] for s in list_segments(db)] == [1, capacity, 1]
+    assert recorder.stats()["segments_created"] == 3 and recorder.write_errors == 0
+
+def test_recover_open_segment_after_crash(db, tmp_path):
+    recorder = SegmentRecorder(db, str(tmp_path), capture_interval=1.0, sync_interval=3600.0)
+    for i in range(7):
+        recorder(frame(i, T0 + i))
+    # No close(): the catalog still shows the open segment as empty
+    assert list_segments(db)[0]["frame_count"] == 0
+    assert recover_segments(db) == 1
+    entry = list_segments(db)[0]
+    assert entry["closed"] and entry["frame_count"] == 7 and entry["end_ns"] == (T0 + 6) * 10**9
+
+def test_catalog_is_written_off_the_capture_thread(db, tmp_path):
+    recorder = SegmentRecorder(db, str(tmp_path), capture_interval=60.0, sync_interval=0.0)
+    handler = recorder.catalog.handler
+    threads = set()
+    def tracking(conn, items):
+        threads.add(threading.current_thread().name)
+        handler(conn, items)
+    recorder.catalog.handler = tracking
+    with db.transaction():
+        db.execute_query("CREATE TRIGGER fail_sync BEFORE UPDATE ON recording_segments WHEN NEW.frame_count = 2 "
+                         "BEGIN SELECT RAISE(ABORT, 'injected failure'); END")
+    recorder.start()
+    for i in range(4):
+        recorder(frame(i, T0 + i))
+        assert recorder.flush()
+    recorder.close()
+    # The failed catalog update is logged and counted; recording carries on
+    assert threads == {"recording-catalog"}
+    assert recorder.write_errors == 0 and recorder.stats()["catalog_failed_batches"] == 1
+    assert [(s["frame_count"], s["closed"]) for s in list_segments(db)] == [(4, True)]
+    assert len(read_range(db)[1]) == 4
+
+def test_segment_rejects_foreign_files(tmp_path):
+    path = tmp_path / "bogus.seg"
+    path.write_bytes(b"\x00" * 4096)
+    with pytest.raises(ValueError):
+        Segment(str(path))
+
+def test_recording_segments_endpoint(db, tmp_path):
+    from backend.src.main import app, get_db
+    recorder = SegmentRecorder(db, str(tmp_path), capture_interval=1.0)
+    recorder(frame(1, T0))
+    recorder.close()
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        client = TestClient(app)
+        segments = client.get("/api/v1/recording/segments?start=2023-11-14T22:00:00").json()
+        assert len(segments) == 1 and segments[0]["start_time"] == "2023-11-14T22:13:20"
+        assert client.get("/api/v1/recording/segments?start=2023-11-15T00:00:00").json() == []
+        assert client.get("/api/v1/recording/segments?start=yesterday").status_code == 400
+    finally:
+        app.dependency_overrides.pop(get_db, None)
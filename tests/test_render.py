@@ -0,0 +1,193 @@
+"""
+Unit tests for LUT frame rendering and the rendered-image cache.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import io
+import numpy as np
+import pytest
+from PIL import Image
+from fastapi.testclient import TestClient
+from backend.src.acquisition import AcquisitionService
+from backend.src.clips import clip_chunk_row, write_clip_chunks
+from backend.src.render import (
+    COLORMAPS, NAN_COLOR, LiveImageRenderer, RenderCache, cache_key, interpolation_weights, parse_color, render_frames,
+    render_indexed,
+)
+
+T0 = 1700006400  # 2023-11-15T00:00:00Z
+
+def ramp(offset=0.0):
+    return np.tile(np.linspace(0.0, 10.0, 32, dtype=np.float32), (24, 1)) + offset
+
+def test_luts():
+    for lut in COLORMAPS.values():
+        assert lut.shape == (257, 3) and lut.dtype == np.uint8 and tuple(lut[256]) == NAN_COLOR
+    assert tuple(COLORMAPS["gray"][0]) == (0, 0, 0) and tuple(COLORMAPS["gray"][255]) == (255, 255, 255)
+    assert tuple(COLORMAPS["iron"][255]) == (255, 255, 255) and parse_color("#00ff80") == (0, 255, 128)
+
+def test_shared_and_per_frame_scaling_match_reference():
+    frames = np.stack([ramp(), ramp(10.0)])
+    shared = render_frames(frames, "iron", "shared")
+    per_frame = render_frames(frames, "iron", "frame")
+    assert shared.shape == per_frame.shape == (48, 32, 3)
+    lut = COLORMAPS["iron"]
+    for image, lo, hi in ((shared, [0, 0], [20, 20]), (per_frame, [0, 10], [10, 20])):
+        for i in range(2):
+            expected = lut[np.rint(np.clip((frames[i] - lo[i]) / (hi[i] - lo[i]) * 255, 0, 255)).astype(int)]
+            np.testing.assert_array_equal(image[i * 24:(i + 1) * 24], expected)
+    # Shared scaling keeps frames comparable: the warmer frame is brighter
+    gray = render_frames(frames, "gray", "shared")
+    assert gray[24:, :, 0].astype(int).sum() > gray[:24, :, 0].astype(int).sum()
+    assert (render_frames(frames, "gray", "frame", vmin=0.0, vmax=20.0) == gray).all()
+    with pytest.raises(ValueError):
+        render_frames(frames, "viridis")
+
+def test_nan_and_zone_colours_take_palette_slots():
+    frames = np.stack([ramp(), ramp(10.0)])
+    frames[1, 3, 4] = np.nan
+    index, palette = render_indexed(frames, "rainbow", zones=[(0, 0, 2, 2, (1, 2, 3))])
+    assert len(palette) == 256 and tuple(palette[254]) == NAN_COLOR and tuple(palette[255]) == (1, 2, 3)
+    assert index[24 + 3, 4] == 254 and index[0, 0] == 255 and index[47, 31] == 253
+    assert tuple(palette[0]) == tuple(COLORMAPS["rainbow"][0]) and tuple(palette[253]) == tuple(COLORMAPS["rainbow"][255])
+    # Resampled levels stay within one LUT step of the exact colours
+    rgb = render_frames(frames, "gray")
+    assert np.abs(rgb[:24, 2:].astype(int) - render_frames(ramp()[None], "gray", vmin=0.0, vmax=20.0)[:, 2:]).max() <= 1
+
+def test_zone_outline_and_upscale():
+    image = render_frames(np.full((2, 24, 32), 25.0), "gray", scale=4, zones=[(2, 1, 3, 2, (0, 255, 0)), (30, 20, 10, 10, (0, 0, 255))])
+    assert image.shape == (2 * 96, 128, 3)
+    frame = image[96:]
+    assert tuple(frame[4, 8]) == (0, 255, 0) and tuple(frame[11, 19]) == (0, 255, 0)  # corners of the first zone
+    assert tuple(frame[6, 12]) == (0, 0, 0)  # inside the outline
+    assert tuple(frame[95, 127]) == (0, 0, 255)  # second zone clipped at the frame edge
+
+def test_cache_lru_in_memory_and_on_disk(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"), max_memory_bytes=250, max_disk_bytes=350)
+    for name in "abcd":
+        cache.put(name, name.encode() * 100)
+    assert cache.get("a") == (None, "miss")  # evicted from memory and disk
+    assert cache.get("d")[1] == "memory" and cache.get("b")[1] == "disk"
+    reopened = RenderCache(str(tmp_path / "cache"), max_memory_bytes=250, max_disk_bytes=350)
+    assert reopened.get("c") == (b"c" * 100, "disk") and reopened.get("c")[1] == "memory"
+    stats = reopened.stats()
+    assert stats["disk_entries"] == 3 and stats["disk_bytes"] == 300 and stats["hits_disk"] == 1
+    assert cache_key("x", 1) == cache_key("x", 1) != cache_key("x", 2)
+
+def test_event_png_endpoint_caches_by_version(db, tmp_path):
+    from backend.src.main import app, get_db, get_render_cache
+    frames = np.stack([ramp(i) for i in range(6)])
+    write_clip_chunks(db, [clip_chunk_row(8, 0, (T0 + np.arange(4)) * 10**9, frames[:4])])
+    db.execute_query("INSERT INTO zones (id, x, y, width, height, name, color) VALUES (1, 4, 4, 8, 8, 'z', '#00FF00')")
+    cache = RenderCache(str(tmp_path / "cache"))
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_render_cache] = lambda: cache
+    try:
+        client = TestClient(app)
+        params = {"colormap": "iron", "scale": 2, "zones": True}
+        first = client.get("/api/v1/events/8/frames.png", params=params)
+        assert first.status_code == 200 and first.headers["x-render-cache"] == "miss"
+        image = np.asarray(Image.open(io.BytesIO(first.content)).convert("RGB"))
+        assert image.shape == (4 * 48, 64, 3) and tuple(image[8, 8]) == (0, 255, 0)
+        again = client.get("/api/v1/events/8/frames.png", params=params)
+        assert again.headers["x-render-cache"] == "memory" and again.content == first.content
+        assert client.get("/api/v1/events/8/frames.png", params=params,
+                          headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+        assert client.get("/api/v1/events/8/frames.png", params={**params, "scaling": "frame"}).headers["x-render-cache"] == "miss"
+        # New frames change the data version, so the cached render is not reused
+        write_clip_chunks(db, [clip_chunk_row(8, 4, (T0 + np.arange(4, 6)) * 10**9, frames[4:])])
+        grown = client.get("/api/v1/events/8/frames.png", params=params)
+        assert grown.headers["x-render-cache"] == "miss" and grown.headers["etag"] != first.headers["etag"]
+        assert Image.open(io.BytesIO(grown.content)).size == (64, 6 * 48)
+        assert client.get("/api/v1/events/8/frames.png", params={"colormap": "jet"}).status_code == 400
+        assert client.get("/api/v1/events/9/frames.png").status_code == 404
+        assert client.get("/api/v1/render/cache").json()["hits_memory"] == 1
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        app.dependency_overrides.pop(get_render_cache, None)
+
+def test_render_cache_is_created_once_per_database(db):
+    from concurrent.futures import ThreadPoolExecutor
+    from backend.src.main import _render_caches, get_render_cache
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            caches = list(pool.map(lambda _: get_render_cache(db), range(32)))
+        assert all(cache is caches[0] for cache in caches)
+    finally:
+        _render_caches.pop(os.path.abspath(db.db_path), None)
+
+@pytest.mark.parametrize("method", ["nearest", "bilinear", "bicubic"])
+def test_interpolation_weights_match_direct_interpolation(method):
+    weights = interpolation_weights(24, 4, method)
+    assert weights.shape == (96, 24) and not weights.flags.writeable
+    np.testing.assert_allclose(weights.sum(axis=1), 1.0, rtol=1e-6)
+    frame = ramp()
+    upscaled = interpolation_weights(24, 4, method) @ frame @ interpolation_weights(32, 4, method).T
+    if method == "nearest":
+        np.testing.assert_array_equal(upscaled, frame.repeat(4, axis=0).repeat(4, axis=1))
+    else:
+        # A linear ramp is reproduced exactly away from the clamped edges
+        expected = np.interp((np.arange(128) + 0.5) / 4 - 0.5, np.arange(32), frame[0])
+        np.testing.assert_allclose(upscaled[10, 8:120], expected[8:120], atol=1e-4)
+    assert interpolation_weights(24, 4, method) is weights  # cached per output size
+
+def test_interpolated_render_keeps_nan_and_zones():
+    frame = ramp()
+    frame[5, 5] = np.nan
+    index, palette = render_indexed(frame, "iron", scale=4, interpolation="bicubic", zones=[(10, 10, 4, 4, (0, 255, 0))])
+    assert index.shape == (96, 128) and tuple(palette[index[22, 22]]) == NAN_COLOR
+    assert tuple(palette[index[40, 40]]) == (0, 255, 0) and np.all(np.diff(index[60, 44:120].astype(int)) >= 0)
+    with pytest.raises(ValueError):
+        render_indexed(frame, interpolation="lanczos", scale=2)
+
+def test_live_renderer_renders_once_per_frame():
+    renderer = LiveImageRenderer(max_entries=2)
+    calls = []
+    render = lambda: calls.append(1) or b"img%d" % len(calls)
+    first, second = object(), object()
+    assert renderer.get(first, ("a",), render) == (b"img1", False)
+    assert renderer.get(first, ("a",), render) == (b"img1", True)
+    assert renderer.get(second, ("a",), render) == (b"img2", False)
+    renderer.get(second, ("b",), render)
+    renderer.get(second, ("c",), render)  # evicts ("a",)
+    assert renderer.get(second, ("a",), render)[1] is False
+    assert renderer.stats() == {"entries": 2, "renders": 5, "hits": 1}
+
+def test_live_image_endpoint(db):
+    from backend.src.main import app, get_acquisition, get_db, get_live_image_renderer
+
+    class Sensor:
+        def __init__(self):
+            self.value = 20.0
+
+        def read_frame(self):
+            self.value += 1.0
+            return ramp(self.value).ravel().tolist()
+
+    acquisition = AcquisitionService(Sensor())
+    renderer = LiveImageRenderer()
+    app.dependency_overrides[get_acquisition] = lambda: acquisition
+    app.dependency_overrides[get_live_image_renderer] = lambda: renderer
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        client = TestClient(app)
+        assert client.get("/api/v1/thermal/live/image").status_code == 503
+        acquisition.capture_once()
+        first = client.get("/api/v1/thermal/live/image", params={"scale": 8})
+        assert first.status_code == 200 and first.headers["content-type"] == "image/png"
+        assert first.headers["x-render-cache"] == "miss" and Image.open(io.BytesIO(first.content)).size == (256, 192)
+        assert client.get("/api/v1/thermal/live/image", params={"scale": 8}).headers["x-render-cache"] == "hit"
+        conditional = {"If-None-Match": first.headers["etag"]}
+        assert client.get("/api/v1/thermal/live/image", params={"scale": 8}, headers=conditional).status_code == 304
+        jpeg = client.get("/api/v1/thermal/live/image", params={"format": "jpeg", "interpolation": "bilinear", "scale": 4})
+        assert jpeg.headers["content-type"] == "image/jpeg" and Image.open(io.BytesIO(jpeg.content)).size == (128, 96)
+        assert renderer.stats()["renders"] == 2
+        acquisition.capture_once()  # a new frame changes the ETag
+        fresh = client.get("/api/v1/thermal/live/image", params={"scale": 8}, headers=conditional)
+        assert fresh.status_code == 200 and fresh.headers["etag"] != first.headers["etag"]
+        assert client.get("/api/v1/thermal/live/image", params={"interpolation": "lanczos"}).status_code == 400
+    finally:
+        app.dependency_overrides.pop(get_acquisition, None)
+        app.dependency_overrides.pop(get_live_image_renderer, None)
+        app.dependency_overrides.pop(get_db, None)
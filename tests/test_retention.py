@@ -0,0 +1,166 @@
+"""
+Unit tests for the retention job: chunked expiry, vacuum, and recording segment cleanup.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import sqlite3
+import time
+import numpy as np
+import pytest
+from backend.src.alarms import AlarmManager
+from backend.src.database import Database
+from backend.src.recording import SegmentRecorder, list_segments, segment_file_size
+from backend.src.retention import RetentionJob
+from backend.src.rollups import epoch_to_iso
+from backend.src.thermal_frame import ThermalFrame
+from backend.src.timeseries import _write_zone_rows
+
+NOW = 1700006400.0  # 2023-11-15T00:00:00Z
+DAY = 86400
+
+@pytest.fixture
+def db(db):
+    db.set_setting("data_retention_days", "7")
+    return db
+
+def add_samples(db, start, count, zones=(1, 2)):
+    zone_ids = np.array(zones)
+    items = [(epoch_to_iso(start + i * 60), zone_ids, np.full(len(zones), 30.0 + i % 5)) for i in range(count)]
+    with db.transaction():
+        _write_zone_rows(db, items)
+
+def add_event(db, event_id, t, frame_bytes=b"\x00" * 3072):
+    with db.transaction() as conn:
+        conn.execute("INSERT INTO alarm_events (id, zone_id, timestamp, temperature, alarm_id) VALUES (?, 1, ?, 50.0, 1)",
+                     (event_id, epoch_to_iso(t)))
+        conn.executemany("INSERT INTO thermal_frames (event_id, timestamp, frame, frame_size, codec) VALUES (?, ?, ?, ?, NULL)",
+                         [(event_id, epoch_to_iso(t + i), frame_bytes, len(frame_bytes)) for i in range(5)])
+        conn.execute("INSERT INTO event_clips (event_id, first_offset, frame_count, start_time, end_time, timestamps, frames) "
+                     "VALUES (?, 0, 5, ?, ?, ?, ?)", (event_id, epoch_to_iso(t), epoch_to_iso(t + 4), b"", frame_bytes * 5))
+
+def count(db, table, where="1 = 1"):
+    return db.execute_query(f"SELECT COUNT(*) FROM {table} WHERE {where}").fetchone()[0]
+
+def test_expired_rows_are_deleted_in_chunks(db):
+    add_samples(db, NOW - 9 * DAY, 500)  # expired
+    add_samples(db, NOW - 1 * DAY, 100)  # kept
+    job = RetentionJob(db, chunk_rows=64, chunk_pause=0)
+    report = job.run_once(now=NOW)
+    assert report["cutoff"] == "2023-11-08T00:00:00"
+    assert report["rows_deleted"]["thermal_data"] == 1000
+    assert count(db, "thermal_data") == 200
+    assert count(db, "thermal_data", "timestamp < '2023-11-08'") == 0
+    # Minute rollups expire with the raw rows; hourly and daily ones are kept
+    assert report["rows_deleted"]["thermal_rollups"] == 1000
+    assert count(db, "thermal_rollups", "resolution = 60 AND bucket < 1699401600") == 0
+    assert count(db, "thermal_rollups", "resolution = 3600 AND bucket < 1699401600") > 0
+    assert job.runs == 1 and job.last_report is report
+
+def test_expired_events_take_their_frames_and_clips(db):
+    add_event(db, 1, NOW - 8 * DAY)
+    add_event(db, 2, NOW - 7 * DAY - 2)  # event expired, its last frames still inside the window
+    add_event(db, 3, NOW - DAY)
+    report = RetentionJob(db).run_once(now=NOW)
+    assert report["rows_deleted"]["alarm_events"] == 2
+    assert report["rows_deleted"]["thermal_frames"] == 10 and report["rows_deleted"]["event_clips"] == 2
+    assert [row[0] for row in db.execute_query("SELECT DISTINCT event_id FROM thermal_frames").fetchall()] == [3]
+    assert [row[0] for row in db.execute_query("SELECT event_id FROM event_clips").fetchall()] == [3]
+
+def test_deleted_event_ids_are_not_reused(db):
+    add_event(db, 5, NOW - 30 * DAY)
+    RetentionJob(db).run_once(now=NOW)
+    assert count(db, "alarm_events") == 0
+    manager = AlarmManager(db)
+    manager.load_alarms_from_db()
+    assert manager._next_event_id == 6
+
+def test_space_is_returned_to_the_filesystem(db):
+    add_event(db, 1, NOW - 30 * DAY, frame_bytes=os.urandom(3072))
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO thermal_frames (event_id, timestamp, frame, frame_size) VALUES (1, ?, ?, 3072)",
+                         [(epoch_to_iso(NOW - 30 * DAY + i), os.urandom(3072)) for i in range(2000)])
+    db.checkpoint()
+    assert db.storage_stats()["auto_vacuum"] == 2
+    size = os.path.getsize(db.db_path)
+    report = RetentionJob(db, vacuum_pages=100).run_once(now=NOW)
+    assert report["auto_vacuum"] == "incremental" and report["pages_vacuumed"] > 1000
+    assert report["bytes_reclaimed"] > 5_000_000 and report["free_bytes"] == 0
+    assert os.path.getsize(db.db_path) < size - 5_000_000
+    assert db.storage_stats()["wal_bytes"] == 0
+
+def test_zero_retention_keeps_everything(db):
+    db.set_setting("data_retention_days", "0")
+    add_samples(db, NOW - 400 * DAY, 10)
+    report = RetentionJob(db).run_once(now=NOW)
+    assert report["cutoff"] is None and report["rows_deleted"] == {}
+    assert count(db, "thermal_data") == 20
+
+def test_closed_segments_are_removed(db, tmp_path):
+    recorder = SegmentRecorder(db, str(tmp_path / "rec"), capture_interval=600.0)
+    frame = np.zeros((24, 32), dtype=np.float32)
+    recorder(ThermalFrame(frame, NOW - 10 * DAY))
+    recorder(ThermalFrame(frame, NOW - 10 * DAY + 3600))
+    recorder(ThermalFrame(frame, NOW - 3600))
+    old = [s["path"] for s in list_segments(db)[:2]]
+    report = RetentionJob(db).run_once(now=NOW)
+    assert report["segments_deleted"] == 2
+    assert report["segment_bytes_reclaimed"] == 2 * segment_file_size(recorder.capacity)
+    assert not any(os.path.exists(path) for path in old)
+    # The open segment is never touched, even once it is old
+    assert [s["closed"] for s in list_segments(db)] == [False]
+    assert RetentionJob(db).run_once(now=NOW + 30 * DAY)["segments_deleted"] == 0
+    recorder.close()
+
+def test_migrate_converts_legacy_database(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE legacy (x)")
+    conn.commit()
+    conn.close()
+    database = Database(path)
+    database.connect()
+    assert database.storage_stats()["auto_vacuum"] == 0
+    database.migrate()
+    assert database.storage_stats()["auto_vacuum"] == 2
+    assert database.enable_incremental_vacuum() is False
+    database.close()
+
+def test_background_job_runs_and_stops(db):
+    add_samples(db, time.time() - 9 * DAY, 10)
+    job = RetentionJob(db, interval=3600, checkpoint_interval=0.01)
+    job.start()
+    deadline = time.monotonic() + 5
+    while job.checkpoints < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    job.stop()
+    assert not job.running and job.runs == 1 and job.checkpoints >= 3
+    assert count(db, "thermal_data") == 0
+
+def test_job_uses_its_own_connection_and_never_commits_others(db):
+    job = RetentionJob(db)
+    job.run_once(now=NOW)
+    assert job._conn is not None and job._conn.conn is not db.conn
+    job._conn.conn.execute("PRAGMA busy_timeout = 100")  # TRUNCATE waits for the open writer below
+    # A request-path transaction still open on the shared connection is left alone
+    db.conn.execute("BEGIN")
+    db.conn.execute("INSERT INTO thermal_data (zone_id, timestamp, temperature) VALUES (1, ?, 30.0)", (epoch_to_iso(NOW),))
+    job._checkpoint()
+    assert db.conn.in_transaction
+    db.conn.rollback()
+    assert count(db, "thermal_data") == 0
+    job.stop()
+    assert job._conn is None
+
+def test_restore_closes_the_job_connection_and_runs_reopen_it(db, tmp_path):
+    job = RetentionJob(db)
+    job.run_once(now=NOW)
+    db.backup(str(tmp_path / "backup.db"))
+    add_samples(db, NOW - 9 * DAY, 10)
+    with job.paused():
+        assert job._conn is None
+        db.restore(str(tmp_path / "backup.db"))
+    assert job.run_once(now=NOW)["rows_deleted"]["thermal_data"] == 0
+    assert job._conn is not None
+    job.stop()
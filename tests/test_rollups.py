@@ -0,0 +1,83 @@
+"""
+Unit tests for multi-resolution thermal_data rollups.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from backend.src.rollups import (
+    bucket_series, choose_resolution, epoch_to_iso, range_summary, rebuild_rollups, iso_to_epoch,
+)
+from backend.src.timeseries import _write_zone_rows
+
+T0 = 1700000000.0  # 2023-11-14T22:13:20Z
+
+@pytest.fixture
+def samples(db):
+    """Three days of irregular samples for zones 1 and 2, ingested in a few batches."""
+    rng = np.random.default_rng(3)
+    epochs = T0 + np.cumsum(rng.uniform(5.0, 70.0, 5000)).round(3)
+    values = rng.normal(30.0, 5.0, (len(epochs), 2))
+    items = [(epoch_to_iso(t), np.array([1, 2]), v) for t, v in zip(epochs, values)]
+    for i in range(0, len(items), 700):
+        with db.transaction():
+            _write_zone_rows(db, items[i:i + 700])
+    return np.array([iso_to_epoch(item[0]) for item in items]), values
+
+def raw_stats(epochs, values, start, end):
+    v = values[(epochs >= start) & (epochs <= end)]
+    return (len(v), v.mean(), v.min(), v.max()) if len(v) else (0, None, None, None)
+
+@pytest.mark.parametrize("start_offset,end_offset", [(0, 250000), (1234.5, 86400 * 2 + 17), (3599, 3661), (100, 100)])
+def test_range_summary_is_exact(db, samples, start_offset, end_offset):
+    epochs, values = samples
+    start, end = T0 + start_offset, T0 + end_offset
+    totals = range_summary(db, start, end, zone_id=2)
+    count, mean, lo, hi = raw_stats(epochs, values[:, 1], start, end)
+    assert totals.count == count
+    if count:
+        assert totals.mean == pytest.approx(mean, rel=1e-12) and totals.min == lo and totals.max == hi
+
+def test_bucket_series_points_cover_only_the_range(db, samples):
+    epochs, values = samples
+    start, end = T0 + 1800.25, T0 + 86400 + 900
+    series = bucket_series(db, start, end, 3600, zone_id=1)
+    assert [b for b, _ in series] == sorted(b for b, _ in series)
+    assert sum(t.count for _, t in series) == raw_stats(epochs, values[:, 0], start, end)[0]
+    for bucket, totals in series:
+        count, mean, lo, hi = raw_stats(epochs, values[:, 0], max(start, bucket), min(end, bucket + 3600 - 1e-6))
+        assert (totals.count, totals.min, totals.max) == (count, lo, hi) and totals.mean == pytest.approx(mean, rel=1e-12)
+    # Without a zone, both zones' samples are pooled per bucket
+    pooled = bucket_series(db, start, end, 3600)
+    assert sum(t.count for _, t in pooled) == 2 * sum(t.count for _, t in series)
+
+def test_rebuild_matches_incremental_rollups(db, samples):
+    query = "SELECT resolution, zone_id, bucket, count, round(sum, 6), min, max FROM thermal_rollups ORDER BY 1, 2, 3"
+    incremental = [tuple(r) for r in db.execute_query(query)]
+    rebuild_rollups(db)
+    assert [tuple(r) for r in db.execute_query(query)] == incremental
+
+def test_choose_resolution_picks_coarsest_meeting_density():
+    day = 86400
+    assert choose_resolution(0, 30 * day, points=500) == 3600
+    assert choose_resolution(0, 30 * day, points=20) == day
+    assert choose_resolution(0, 3600, points=500) == 0
+    assert choose_resolution(0, 10 * 3600, points=500) == 60
+
+def test_trend_endpoint_uses_rollups_for_long_ranges(db, samples):
+    from backend.src.main import app, get_db
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        client = TestClient(app)
+        params = {"start_time": epoch_to_iso(T0), "end_time": epoch_to_iso(T0 + 3 * 86400), "zone_id": 1}
+        data = client.get("/api/v1/analytics/trends", params={**params, "points": 50}).json()
+        assert data["resolution"] == "1h" and 50 <= len(data["values"]) <= 73
+        assert client.get("/api/v1/analytics/trends", params={**params, "resolution": "1d"}).json()["resolution"] == "1d"
+        assert client.get("/api/v1/analytics/trends", params={**params, "resolution": "5m"}).status_code == 400
+        report = client.get("/api/v1/reports", params={**params, "report_type": "summary"}).json()["summary"]
+        epochs, values = samples
+        assert report["count"] == raw_stats(epochs, values[:, 0], T0, T0 + 3 * 86400)[0]
+    finally:
+        app.dependency_overrides.pop(get_db, None)
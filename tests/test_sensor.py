@@ -49,3 +49,19 @@ def test_read_frame_fail(monkeypatch):
     sensor.sensor.fail_count = 5
     with pytest.raises(IOError):
         sensor.read_frame()
+
+def test_read_frame_returns_thermal_frame(monkeypatch):
+    from backend.src.thermal_frame import ThermalFrame
+    monkeypatch.setattr("backend.src.sensor.MLX90640", DummyMLX90640)
+    monkeypatch.setattr("backend.src.sensor.busio", type("busio", (), {"I2C": lambda scl, sda: DummyI2C()}) )
+    frame = ThermalSensor().read_frame()
+    assert isinstance(frame, ThermalFrame)
+    assert frame.data.shape == (24, 32)
+    assert frame.data[1, 0] == 32.0
+
+def test_mock_sensor_frame():
+    from backend.src.sensor import MockThermalSensor
+    frame = MockThermalSensor(base_temp=30.0, noise=0.5, seed=1).read_frame()
+    assert frame.data.shape == (24, 32)
+    assert frame.data.dtype.name == "float32"
+    assert 28.0 < float(frame.data.mean()) < 32.0
@@ -0,0 +1,48 @@
+"""
+Unit tests for the ThermalFrame type and serialization helpers.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+import struct
+import numpy as np
+from backend.src.thermal_frame import (
+    ThermalFrame, as_frame_array, frame_from_bytes, frame_to_bytes, to_thermal_frame, FRAME_SHAPE,
+)
+
+def test_frame_from_list_and_compat_shim():
+    values = [float(i) for i in range(768)]
+    frame = ThermalFrame(values, 1700000000.0)
+    assert frame.data.shape == FRAME_SHAPE
+    assert frame.data.dtype == np.float32
+    assert len(frame) == 768
+    assert frame[0] == 0.0 and frame[-1] == 767.0
+    assert isinstance(frame[5], float)
+    assert list(frame) == values
+    assert frame.tolist() == values
+    assert frame.isoformat() == "2023-11-14T22:13:20"
+
+def test_float32_input_not_copied_and_read_only():
+    arr = np.ones(FRAME_SHAPE, dtype=np.float32)
+    frame = ThermalFrame(arr)
+    assert np.shares_memory(frame.data, arr)
+    with pytest.raises(ValueError):
+        frame.data[0, 0] = 5.0
+    assert to_thermal_frame(frame) is frame
+
+def test_wrong_size_rejected():
+    with pytest.raises(ValueError):
+        ThermalFrame([1.0] * 10)
+    with pytest.raises(ValueError):
+        frame_from_bytes(b"\x00" * 12)
+
+def test_bytes_roundtrip_matches_legacy_struct_format():
+    values = [float(i) / 10 for i in range(768)]
+    legacy = struct.pack("768f", *values)
+    assert frame_to_bytes(values) == legacy
+    decoded = frame_from_bytes(legacy)
+    assert decoded.shape == FRAME_SHAPE
+    np.testing.assert_array_equal(decoded, as_frame_array(values))
+    frame = ThermalFrame.frombytes(legacy, 1.0)
+    assert frame.tobytes() == legacy
@@ -0,0 +1,126 @@
+"""
+Unit tests for zone time-series ingestion into thermal_data.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import threading
+import time
+import numpy as np
+import pytest
+from backend.src.alarms import AlarmManager
+from backend.src.pipeline import FrameProcessor
+from backend.src.thermal_frame import ThermalFrame
+from backend.src.frames import compute_trend, detect_anomalies
+from backend.src.timeseries import ZoneSeriesWriter, fetch_zone_series, format_timestamps, parse_timestamps
+from backend.src.writer import BatchWriter
+from backend.src.zones import ZonesManager
+
+def make_processor(db, series):
+    zones = ZonesManager(db)
+    zones.add_zone(1, 0, 0, 4, 4)
+    zones.add_zone(2, 10, 10, 2, 2)
+    processor = FrameProcessor(zones, AlarmManager(db))
+    processor.add_sink(series)
+    return processor
+
+def frame(t, hot=30.0):
+    data = np.full((24, 32), 20.0, dtype=np.float32)
+    data[0, 0] = hot
+    return ThermalFrame(data, 1700000000.0 + t)
+
+def rows(db):
+    return [tuple(r) for r in db.execute_query("SELECT zone_id, timestamp, temperature FROM thermal_data ORDER BY id")]
+
+def test_every_frame_records_one_row_per_zone(db):
+    processor = make_processor(db, ZoneSeriesWriter(db, statistic="maximum"))
+    processor(frame(0))
+    processor(frame(1, hot=50.0))
+    assert rows(db) == [
+        (1, "2023-11-14T22:13:20", 30.0), (2, "2023-11-14T22:13:20", 20.0),
+        (1, "2023-11-14T22:13:21", 50.0), (2, "2023-11-14T22:13:21", 20.0),
+    ]
+    data = db.get_thermal_data("2023-11-14T22:13:21", "2023-11-14T23:00:00", zone_id=1)
+    assert [d["temperature"] for d in data] == [50.0]
+
+def test_rows_commit_in_batches_on_size_threshold(db):
+    series = ZoneSeriesWriter(db, flush_interval=60.0, batch_size=6)
+    processor = make_processor(db, series)
+    series.start()
+    try:
+        for t in range(4):
+            processor(frame(t))
+        # 8 rows queued: one 6-row batch commits at once, the rest waits for the interval
+        deadline = time.monotonic() + 5
+        while series.stats()["commits"] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(rows(db)) == 6
+    finally:
+        series.stop()
+    stats = series.stats()
+    assert len(rows(db)) == 8 and stats["commits"] == 2 and stats["rows_queued"] == 8
+
+def test_rows_and_rollups_commit_atomically_beside_a_failing_writer(db):
+    hour = (1700000000 + 3600) // 3600 * 3600
+    with db.transaction():
+        db.execute_query("CREATE TRIGGER fail_rollup BEFORE INSERT ON thermal_rollups "
+                         f"WHEN NEW.resolution = 3600 AND NEW.bucket = {hour} BEGIN SELECT RAISE(ABORT, 'injected failure'); END")
+    opened = threading.Event()
+    def broken(conn, items):
+        conn.executemany("INSERT INTO alarm_events (zone_id, timestamp, temperature) VALUES (?, ?, ?)", items)
+        opened.set()
+        time.sleep(0.3)  # transaction still open while the zone series commits
+        raise RuntimeError("disk full")
+    failing = BatchWriter(db, broken, name="failing-writer", flush_interval=0.01)
+    failing.submit((1, "2023-11-14T22:13:20", 40.0))
+    series = ZoneSeriesWriter(db, flush_interval=0.01)
+    processor = make_processor(db, series)
+    failing.start()
+    series.start()
+    try:
+        assert opened.wait(5)
+        processor(frame(0))
+        processor(frame(1))
+        assert series.flush()
+        processor(frame(3600))  # its hourly rollup insert fails: the frame's rows must go too
+        assert series.flush()
+    finally:
+        series.stop()
+        failing.stop()
+    assert failing.failed_batches == 1 and series.stats()["failed_batches"] == 1
+    assert db.execute_query("SELECT COUNT(*) FROM alarm_events").fetchone()[0] == 0
+    assert [r[1] for r in rows(db)] == ["2023-11-14T22:13:20"] * 2 + ["2023-11-14T22:13:21"] * 2
+    for resolution in (60, 3600, 86400):
+        assert db.execute_query("SELECT SUM(count) FROM thermal_rollups WHERE resolution = ?", (resolution,)).fetchone()[0] == 4
+
+def test_unknown_statistic_is_rejected(db):
+    with pytest.raises(ValueError):
+        ZoneSeriesWriter(db, statistic="median")
+
+def test_columnar_fetch_matches_row_path(db):
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO thermal_data (zone_id, timestamp, temperature) VALUES (?, ?, ?)",
+                         [(1 + i % 2, f"2023-11-14T22:{i // 60:02d}:{i % 60:02d}.250000", 20.0 + i % 7) for i in range(300)]
+                         + [(1, "2023-11-14T22:00:30", None)])
+    expected = db.get_thermal_data("2023-11-14T22:00:00", "2023-11-14T22:04:00", zone_id=1)
+    series = fetch_zone_series(db, "2023-11-14T22:00:00", "2023-11-14T22:04:00", zone_id=1, chunk_rows=16)
+    expected = [d for d in expected if d["temperature"] is not None]  # NULL temperatures are skipped
+    assert len(series) == len(expected) == 120
+    assert series.zone_ids.tolist() == [1] * 120
+    assert compute_trend(series) == ([d["timestamp"] for d in expected], [d["temperature"] for d in expected])
+    assert series.epochs[0] == 1699999200.25
+    assert len(fetch_zone_series(db, "2023-11-15T00:00:00", "2023-11-16T00:00:00")) == 0
+
+def test_columnar_anomalies_return_rows(db):
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO thermal_data (zone_id, timestamp, temperature) VALUES (3, ?, ?)",
+                         [(f"2023-11-14T22:00:{i:02d}", 100.0 if i == 17 else 20.0 + i % 2) for i in range(40)])
+    anomalies = detect_anomalies(fetch_zone_series(db, "2023-11-14T22:00:00", "2023-11-14T23:00:00"))
+    assert anomalies == [{"timestamp": "2023-11-14T22:00:17", "temperature": 100.0, "zone_id": 3}]
+
+def test_timestamp_parsing_and_formatting_round_trip():
+    texts = ["2023-11-14T22:13:20", "2023-11-14T22:13:20.000500", "2023-11-14 22:13:21"]
+    assert format_timestamps(parse_timestamps(texts)) == ["2023-11-14T22:13:20", "2023-11-14T22:13:20.000500", "2023-11-14T22:13:21"]
+    # Offsets are converted to naive UTC; garbage becomes NaT instead of failing the whole query
+    parsed = parse_timestamps(["2023-11-14T23:13:20+01:00", "not a time"])
+    assert format_timestamps(parsed[:1]) == ["2023-11-14T22:13:20"] and np.isnat(parsed[1])
@@ -0,0 +1,177 @@
+"""
+Unit tests for webhook delivery, using an in-process HTTP server stand-in.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from backend.src.alarms import AlarmEvent, AlarmManager
+from backend.src.database import Database
+from backend.src.webhooks import HTTPConnectionPool, WebhookDispatcher, WebhookEndpoint
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+            server.connections.add(self.client_address)
+        time.sleep(server.delays.get(self.path, server.delay))
+        with server.lock:
+            server.active -= 1
+            status = server.statuses.pop(0) if server.statuses else 200
+            if status == 200:
+                server.bodies.append(body)
+                server.paths.append(self.path)
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), WebhookHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.bodies, server.statuses, server.connections, server.paths = [], [], set(), []
+    server.active = server.peak = 0
+    server.delay = 0.0
+    server.delays = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def db():
+    tf = tempfile.NamedTemporaryFile(delete=False)
+    database = Database(tf.name)
+    database.connect()
+    database.initialize_schema()
+    yield database
+    database.close()
+    tf.close()
+    os.unlink(tf.name)
+
+def url(server, path="/hook"):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+def event(alarm_id=1):
+    return AlarmEvent(alarm_id, 1, 40.0, "2025-06-10T12:00:00", "threshold")
+
+def test_single_posts_reuse_one_keep_alive_connection(http_server, db):
+    pool = HTTPConnectionPool()
+    endpoint = WebhookEndpoint(1, url(http_server), max_concurrency=1)
+    dispatcher = WebhookDispatcher(lambda: [endpoint], db, pool=pool, batch_window=0)
+    dispatcher.start()
+    for i in range(4):
+        dispatcher.submit(event(i))
+        assert dispatcher.wait_idle(5)
+    assert [b["alarm_id"] for b in http_server.bodies] == [0, 1, 2, 3]
+    assert pool.connections_opened == 1 and pool.connections_reused == 3
+    assert len(http_server.connections) == 1
+    dispatcher.stop()
+
+def test_batching_endpoint_gets_one_post_per_burst(http_server, db):
+    endpoint = WebhookEndpoint(1, url(http_server), batch=True, max_batch=3)
+    dispatcher = WebhookDispatcher(lambda: [endpoint], db, batch_window=0.3)
+    dispatcher.start()
+    for i in range(5):
+        dispatcher.submit(event(i))
+    assert dispatcher.wait_idle(5)
+    assert sorted(len(b["events"]) for b in http_server.bodies) == [2, 3]
+    assert dispatcher.stats()["events_delivered"] == 5
+    dispatcher.stop()
+
+def test_concurrency_is_limited_per_endpoint(http_server, db):
+    http_server.delay = 0.05
+    endpoint = WebhookEndpoint(1, url(http_server), max_concurrency=2)
+    dispatcher = WebhookDispatcher(lambda: [endpoint], db, max_workers=8, batch_window=0.1)
+    dispatcher.start()
+    for i in range(8):
+        dispatcher.submit(event(i))
+    assert dispatcher.wait_idle(5)
+    assert len(http_server.bodies) == 8
+    assert http_server.peak == 2
+    dispatcher.stop()
+
+def test_slow_endpoint_does_not_hold_up_others(http_server, db):
+    http_server.delays["/slow"] = 0.1
+    endpoints = [WebhookEndpoint(1, url(http_server, "/slow"), max_concurrency=1), WebhookEndpoint(2, url(http_server, "/fast"))]
+    dispatcher = WebhookDispatcher(lambda: endpoints, db, max_workers=2, batch_window=0.1)
+    dispatcher.start()
+    for i in range(5):
+        dispatcher.submit(event(i))
+    assert dispatcher.wait_idle(5)
+    dispatcher.stop()
+    assert http_server.paths.count("/slow") == 5 and http_server.paths.count("/fast") == 5
+    # One worker works through the slow endpoint's queue while the other serves the fast endpoint
+    assert http_server.paths.index("/slow") > max(i for i, path in enumerate(http_server.paths) if path == "/fast")
+
+def test_concurrency_limit_survives_endpoint_reload(http_server, db):
+    http_server.delay = 0.1
+    # Endpoints are reparsed whenever notifications change; the limit must hold across copies
+    dispatcher = WebhookDispatcher(lambda: [WebhookEndpoint(1, url(http_server), max_concurrency=1)], db,
+                                   max_workers=4, batch_window=0)
+    dispatcher.start()
+    for i in range(4):
+        dispatcher.submit(event(i))
+        time.sleep(0.02)
+    assert dispatcher.wait_idle(5)
+    dispatcher.stop()
+    assert len(http_server.bodies) == 4 and http_server.peak == 1
+
+def test_failures_are_retried_then_dead_lettered(http_server, db):
+    http_server.statuses = [500, 503, 500]
+    endpoint = WebhookEndpoint(7, url(http_server))
+    dispatcher = WebhookDispatcher(lambda: [endpoint], db, batch_window=0, max_retries=1, retry_backoff=0.01)
+    dispatcher.start()
+    dispatcher.submit(event(1))
+    assert dispatcher.wait_idle(5)
+    assert dispatcher.retries == 1 and dispatcher.dead_lettered == 1
+    dispatcher.submit(event(2))  # 500 then success
+    assert dispatcher.wait_idle(5)
+    dispatcher.stop()
+    assert [b["alarm_id"] for b in http_server.bodies] == [2]
+    letters = db.get_webhook_dead_letters()
+    assert len(letters) == 1
+    assert letters[0]["notification_id"] == 7 and json.loads(letters[0]["payload"])["alarm_id"] == 1
+    assert "503" in letters[0]["error"] and letters[0]["attempts"] == 2
+
+def test_inline_delivery_writes_dead_letters_before_returning(http_server, db):
+    http_server.statuses = [500]
+    dispatcher = WebhookDispatcher(lambda: [WebhookEndpoint(3, url(http_server))], db, max_retries=0)
+    dispatcher.deliver([(event(1), None, time.monotonic())])
+    assert [letter["notification_id"] for letter in db.get_webhook_dead_letters()] == [3]
+    assert dispatcher.dead_letters.stats()["queue_depth"] == 0
+
+def test_alarm_manager_posts_configured_and_adhoc_webhooks(http_server, db):
+    import numpy as np
+    am = AlarmManager(db)
+    am.add_notification("Hook", "webhook", json.dumps({"url": url(http_server, "/configured")}), True)
+    am.add_notification("Broken", "webhook", json.dumps({"timeout": 1}), True)  # no url: skipped
+    # Without a running dispatcher, delivery happens on the caller's thread
+    am.notify(event(1), webhook=url(http_server, "/adhoc"))
+    assert sorted(b["alarm_id"] for b in http_server.bodies) == [1, 1]
+    am.add_alarm(1, 1, 30.0)
+    webhooks = am.start_webhooks(batch_window=0)
+    am.evaluate(np.array([1]), np.array([35.0]), "2025-06-10T12:00:00")
+    assert webhooks.wait_idle(5)
+    assert len(http_server.bodies) == 3 and http_server.bodies[-1]["temperature"] == 35.0
+    am.stop_webhooks()
+
+def test_invalid_endpoint_config():
+    assert WebhookEndpoint.from_notification({"id": 1, "config": json.dumps({"url": "ftp://x"})}) is None
+    endpoint = WebhookEndpoint.from_notification({"id": 1, "config": json.dumps({"url": "https://example.com/a?b=1", "batch": True})})
+    assert endpoint.port == 443 and endpoint.path == "/a?b=1" and endpoint.batch
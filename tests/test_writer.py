@@ -0,0 +1,98 @@
+"""
+Unit tests for BatchWriter.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import tempfile
+import threading
+import pytest
+from backend.src.database import Database
+from backend.src.writer import BatchWriter
+
+def insert_events(db, items):
+    db.executemany("INSERT INTO alarm_events (zone_id, timestamp, temperature) VALUES (?, ?, ?)", items)
+
+@pytest.fixture
+def db():
+    tf = tempfile.NamedTemporaryFile(delete=False)
+    database = Database(tf.name)
+    database.connect()
+    database.initialize_schema()
+    yield database
+    database.close()
+    tf.close()
+    os.unlink(tf.name)
+
+def count(db):
+    return db.execute_query("SELECT COUNT(*) FROM alarm_events").fetchone()[0]
+
+def test_items_are_batched_and_flushed(db):
+    writer = BatchWriter(db, insert_events, flush_interval=60.0)
+    writer.start()
+    for i in range(50):
+        assert writer.submit((1, f"t{i}", float(i)))
+    assert writer.flush()
+    assert count(db) == 50
+    stats = writer.stats()
+    assert stats["commits"] == 1 and stats["items_written"] == 50
+    assert stats["queue_depth"] == 0 and stats["last_commit_ms"] is not None
+    writer.stop()
+    assert not writer.running
+
+def test_flush_without_thread_writes_inline(db):
+    writer = BatchWriter(db, insert_events, max_batch=4)
+    for i in range(10):
+        writer.submit((1, "t", 1.0))
+    assert writer.queue_depth == 10
+    assert writer.flush()
+    assert count(db) == 10
+    assert writer.commits == 3
+
+def test_full_queue_drops_and_failed_batches_are_counted(db):
+    writer = BatchWriter(db, insert_events, max_queue=1)
+    assert writer.submit((1, "t", 1.0), timeout=0)
+    assert not writer.submit((1, "t", 1.0), timeout=0)
+    assert writer.dropped == 1
+    def broken(db, items):
+        raise RuntimeError("disk full")
+    failing = BatchWriter(db, broken)
+    failing.submit(1)
+    failing.flush()
+    assert failing.failed_batches == 1
+    with pytest.raises(ValueError):
+        BatchWriter(db, insert_events, flush_interval=0)
+
+def test_item_size_counts_rows_towards_max_batch(db):
+    writer = BatchWriter(db, lambda db, items: insert_events(db, [row for item in items for row in item]),
+                         max_batch=4, item_size=len)
+    for i in range(5):
+        writer.submit([(1, f"t{i}", 1.0), (2, f"t{i}", 2.0)])
+    writer.flush()
+    # 10 rows in items of 2 with max_batch 4 rows: 2 + 2 + 1 items per commit
+    assert count(db) == 10 and writer.stats()["commits"] == 3
+
+def test_failing_writer_does_not_roll_back_another_writers_rows(db):
+    a_inserted = threading.Event()
+    def slow(conn, items):
+        insert_events(conn, items)
+        a_inserted.set()
+        threading.Event().wait(0.2)  # keep the transaction open while the other writer fails
+    def broken(conn, items):
+        a_inserted.wait(5)
+        insert_events(conn, items)
+        raise RuntimeError("disk full")
+    a = BatchWriter(db, slow, name="writer-a", flush_interval=0.05)
+    b = BatchWriter(db, broken, name="writer-b", flush_interval=0.05)
+    a.start()
+    b.start()
+    try:
+        b.submit((2, "t", 2.0))
+        for i in range(5):
+            a.submit((1, f"t{i}", 1.0))
+        assert a.flush() and b.flush()
+    finally:
+        a.stop()
+        b.stop()
+    assert a.items_written == 5 and b.failed_batches == 1
+    assert [tuple(row) for row in db.execute_query("SELECT zone_id, COUNT(*) FROM alarm_events GROUP BY zone_id")] == [(1, 5)]
@@ -40,6 +40,7 @@ def test_add_zone_limit():
         db = Database(tf.name)
         db.connect()
         db.initialize_schema()
+        db.set_setting("max_zones", "2")
         zm = ZonesManager(db)
         zm.add_zone(1, 0, 0, 4, 4, name="Zone A", color="#123456")
         zm.add_zone(2, 5, 5, 3, 3, name="Zone B", color="#654321")
@@ -117,3 +118,121 @@ def test_add_and_get_zones_persistent():
     finally:
         tf.close()
         os.unlink(tf.name)
+
+def test_many_zones_allowed_by_default():
+    import tempfile
+    from backend.src.database import Database
+    tf = tempfile.NamedTemporaryFile(delete=False)
+    try:
+        db = Database(tf.name)
+        db.connect()
+        db.initialize_schema()
+        zm = ZonesManager(db)
+        for i in range(1, 41):
+            zm.add_zone(i, i % 30, i % 20, 2, 2)
+        assert len(zm.get_zones()) == 40
+        # Replacing an existing zone does not count against the limit
+        zm.max_zones = 40
+        zm.add_zone(1, 0, 0, 3, 3)
+        db.close()
+    finally:
+        tf.close()
+        os.unlink(tf.name)
+
+def test_zone_stats_engine_matches_per_zone_computation():
+    import numpy as np
+    from backend.src.zones import Zone, ZoneStatsEngine
+    rng = np.random.default_rng(0)
+    frame = rng.normal(30.0, 5.0, (24, 32)).astype(np.float32)
+    zones = [
+        Zone(3, 0, 0, 2, 2),
+        Zone(1, 10, 5, 8, 6),
+        Zone(2, 12, 7, 8, 6),     # overlaps zone 1
+        Zone(4, 30, 20, 10, 10),  # clipped to the frame edge
+        Zone(5, 40, 40, 2, 2),    # entirely outside the frame
+    ]
+    stats = ZoneStatsEngine(zones).compute(frame)
+    assert list(stats.zone_ids) == [1, 2, 3, 4, 5]
+    for zone in zones[:4]:
+        region = frame[zone.y:zone.y + zone.height, zone.x:zone.x + zone.width].astype(np.float64)
+        i = stats.index(zone.id)
+        assert stats.count[i] == region.size
+        assert abs(stats.average[i] - region.mean()) < 1e-9
+        assert abs(stats.std[i] - region.std()) < 1e-6
+        assert stats.minimum[i] == region.min()
+        assert stats.maximum[i] == region.max()
+    empty = stats.as_dict()[5]
+    assert empty == {"average": 0.0, "min": 0.0, "max": 0.0, "std": 0.0, "pixel_count": 0}
+    with pytest.raises(ValueError):
+        stats.index(99)
+
+def test_stats_engine_rebuilt_after_zone_change():
+    import tempfile
+    import numpy as np
+    from backend.src.database import Database
+    tf = tempfile.NamedTemporaryFile(delete=False)
+    try:
+        db = Database(tf.name)
+        db.connect()
+        db.initialize_schema()
+        zm = ZonesManager(db)
+        zm.add_zone(1, 0, 0, 2, 2)
+        frame = np.arange(768, dtype=np.float32).reshape(24, 32)
+        engine = zm.stats_engine()
+        assert zm.stats_engine() is engine
+        zm.update_zone(1, 0, 1, 2, 2)
+        assert zm.stats_engine() is not engine
+        stats = zm.compute_zone_stats(frame)
+        assert stats.average[stats.index(1)] == (32 + 33 + 64 + 65) / 4
+        db.close()
+    finally:
+        tf.close()
+        os.unlink(tf.name)
+
+def test_zones_cached_and_versioned():
+    import tempfile
+    from backend.src.database import Database
+    tf = tempfile.NamedTemporaryFile(delete=False)
+    try:
+        db = Database(tf.name)
+        db.connect()
+        db.initialize_schema()
+        zm = ZonesManager(db)
+        v0 = zm.version
+        zm.add_zone(1, 0, 0, 2, 2)
+        assert zm.version == v0 + 1
+        # Rows written behind the registry's back are not re-read per call
+        db.execute_query("INSERT INTO zones (id, name) VALUES (?, ?)", (7, "External"))
+        assert [z.id for z in zm.get_zones()] == [1]
+        assert zm.version == v0 + 1
+        zm.update_zone(1, 1, 1, 2, 2)
+        zm.remove_zone(1)
+        assert zm.version == v0 + 3
+        zm.load_zones_from_db()
+        assert [z.id for z in zm.get_zones()] == [7]
+        db.close()
+    finally:
+        tf.close()
+        os.unlink(tf.name)
+
+def test_zone_registry_is_shared_per_database():
+    import tempfile
+    from backend.src.database import Database
+    from backend.src.zones import get_zone_registry
+    tf = tempfile.NamedTemporaryFile(delete=False)
+    try:
+        db = Database(tf.name)
+        db.connect()
+        db.initialize_schema()
+        registry = get_zone_registry(db)
+        assert get_zone_registry(db) is registry
+        registry.add_zone(1, 0, 0, 2, 2)
+        assert [z.id for z in get_zone_registry(db).get_zones()] == [1]
+        other = Database(tf.name)
+        other.connect()
+        assert get_zone_registry(other) is not registry
+        other.close()
+        db.close()
+    finally:
+        tf.close()
+        os.unlink(tf.name)